@@ -0,0 +1,55 @@
+"""
+One-off backfill: adds the duplicate-index fields (dup_goal, dup_numbers, dup_signature,
+deadline_at) to Active contracts written before they existed. The reaper does the same
+pass itself, a time-budgeted page per tick, until it has covered every Active contract;
+running this once at deploy just gets legacy contracts reaped (and duplicate-checked)
+without waiting for those ticks.
+
+Usage (from backend/, with Firebase credentials configured):
+    python scripts/backfill_contract_index.py [--dry-run]
+"""
+import os
+import sys
+import argparse
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/..")
+
+from src.api import db
+from src.core.similarity import contract_index_fields
+
+BATCH_SIZE = 500  # Firestore WriteBatch limit
+
+def backfill(dry_run: bool = False):
+    if not db:
+        print("❌ Database not initialized. Check serviceAccountKey.json / FIREBASE_SERVICE_ACCOUNT_BASE64.")
+        return
+
+    batch = db.batch()
+    pending = 0
+    updated = 0
+    for doc in db.collection('contracts').where('status', '==', 'Active').stream():
+        data = doc.to_dict()
+        if 'dup_signature' in data and 'deadline_at' in data:
+            continue
+        fields = contract_index_fields(data.get('goal_description'), data.get('deadline_utc'))
+        if fields['deadline_at'] is None:
+            print(f"Skipping {doc.id}: unparseable deadline_utc {data.get('deadline_utc')!r}")
+            continue
+        updated += 1
+        if dry_run:
+            continue
+        batch.update(doc.reference, fields)
+        pending += 1
+        if pending == BATCH_SIZE:
+            batch.commit()
+            batch = db.batch()
+            pending = 0
+
+    if pending:
+        batch.commit()
+    print(f"✅ {'Would update' if dry_run else 'Updated'} {updated} contracts.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill contract index fields")
+    parser.add_argument("--dry-run", action="store_true")
+    backfill(parser.parse_args().dry_run)
@@ -0,0 +1,88 @@
+"""
+Activity-history scan: per-activity Python rule checks (the verify_strava gates, one
+activity at a time) vs ActivityIndex's binary-search window + vectorized rules, for one
+athlete with N activities.
+
+Usage: python scripts/bench_activity_index.py [--activities 10000] [--window-days 30] [--repeat 20]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+from datetime import datetime, timedelta, timezone
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/..")
+
+import dateutil.parser
+from src.core.activity_index import ActivityIndex
+from src.core.schemas import GoalContract, Penalty, ConsequenceType
+
+def make_activities(n: int, now: datetime):
+    rng = random.Random(1)
+    rows = []
+    for i in range(n):
+        km = rng.uniform(2, 15)
+        rows.append({
+            "id": str(i),
+            "type": "Ride" if rng.random() < 0.15 else "Run",
+            "start_date": (now - timedelta(days=rng.uniform(0, 3 * 365))).isoformat(),
+            "distance": km * 1000,
+            "elapsed_time": km * rng.uniform(240, 420),
+            "manual": rng.random() < 0.02,
+            "trainer": rng.random() < 0.2,
+            "has_heartrate": rng.random() < 0.9,
+            "average_heartrate": rng.uniform(110, 170),
+        })
+    return rows
+
+def python_scan(activities, contract, start, end):
+    best = None
+    for a in activities:
+        act_start = dateutil.parser.isoparse(a["start_date"])
+        if not (start <= act_start <= end):
+            continue
+        km = a["distance"] / 1000.0
+        pace = (a["elapsed_time"] / 60) / km if km > 0 else 0
+        if a["type"] != "Run" or km < contract.target_distance_km * 0.97 or pace < 3.0 or a["manual"]:
+            continue
+        if a["trainer"] and (not a["has_heartrate"] or (contract.min_heart_rate_avg and a["average_heartrate"] < contract.min_heart_rate_avg)):
+            continue
+        if best is None or km > best[0]:
+            best = (km, a["id"])
+    return best[1] if best else None
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--activities", type=int, default=10_000)
+    parser.add_argument("--window-days", type=float, default=30)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    now = datetime.now(timezone.utc)
+    activities = make_activities(args.activities, now)
+    contract = GoalContract(target_distance_km=10.0, deadline_utc=now, min_heart_rate_avg=130.0,
+                            penalty=Penalty(type=ConsequenceType.DONATION, amount_usd=10))
+    start = now - timedelta(days=args.window_days)
+
+    t = time.perf_counter()
+    for _ in range(args.repeat):
+        expected = python_scan(activities, contract, start, now)
+    python_ms = (time.perf_counter() - t) * 1000 / args.repeat
+
+    t = time.perf_counter()
+    index = ActivityIndex(activities)
+    build_ms = (time.perf_counter() - t) * 1000
+
+    t = time.perf_counter()
+    for _ in range(args.repeat):
+        scan = index.evaluate(contract, start, now)
+    index_ms = (time.perf_counter() - t) * 1000 / args.repeat
+
+    best = scan["qualifying"][0] if scan["qualifying"] else None
+    print(f"{args.activities} activities, {scan['candidates']} in a {args.window_days:g}-day window, {len(scan['qualifying'])} qualifying")
+    print(f"python scan        {python_ms:8.2f} ms/contract  best={expected}")
+    print(f"ActivityIndex      {index_ms:8.2f} ms/contract  best={best}  (index build {build_ms:.0f} ms, once per refresh)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Activity stream representation: memory per point and the cost of getting a stream
+ready for analysis, list-of-dicts vs columnar ActivityStreams (parsed from a Strava
+JSON payload, or memory-mapped from the on-disk cache).
+
+Usage: python scripts/bench_activity_streams.py [--points 20000] [--repeat 20]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/..")
+
+import numpy as np
+from src.core.activity_streams import ActivityStreams, StreamCache
+from src.core.stream_analytics import analyze_streams
+
+CHANNELS = ("time", "heartrate", "distance", "cadence", "velocity_smooth")
+
+def strava_payload(n: int) -> str:
+    rng = np.random.default_rng(0)
+    t = np.arange(n)
+    columns = {
+        "time": t.tolist(),
+        "heartrate": (140 + rng.normal(0, 5, n)).round(1).tolist(),
+        "distance": (t * 2.9).round(1).tolist(),
+        "cadence": rng.integers(165, 180, n).tolist(),
+        "velocity_smooth": (2.9 + rng.normal(0, 0.2, n)).round(2).tolist(),
+    }
+    return json.dumps({name: {"data": data} for name, data in columns.items()})
+
+def measure_memory(build):
+    tracemalloc.start()
+    obj = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return obj, size
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--points", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    n = args.points
+    payload = strava_payload(n)
+
+    def as_points():
+        data = json.loads(payload)
+        return [{name: data[name]["data"][i] for name in CHANNELS} for i in range(n)]
+
+    _, dict_bytes = measure_memory(as_points)
+    columnar, _ = measure_memory(lambda: ActivityStreams.from_strava(json.loads(payload)))
+    print(f"{n} points x {len(CHANNELS)} channels")
+    print(f"list of dicts      {dict_bytes / n:8.1f} bytes/point")
+    print(f"ActivityStreams    {columnar.nbytes / n:8.1f} bytes/point")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = StreamCache(tmp)
+        cache.put("bench", columnar)
+        print(f"parse JSON -> dicts -> analyze       {timed(lambda: analyze_streams(as_points()), args.repeat):8.2f} ms")
+        print(f"parse JSON -> columns -> analyze     {timed(lambda: analyze_streams(ActivityStreams.from_strava(json.loads(payload))), args.repeat):8.2f} ms")
+        print(f"mmap cache -> analyze                {timed(lambda: analyze_streams(cache.get('bench')), args.repeat):8.2f} ms")
+        print(f"mmap cache open only                 {timed(lambda: cache.get('bench'), args.repeat):8.2f} ms")
+
+if __name__ == "__main__":
+    main()
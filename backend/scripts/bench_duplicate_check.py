@@ -0,0 +1,123 @@
+"""
+Benchmark: /commit duplicate check at N active pacts per user.
+
+Compares the original difflib scan over every Active contract with the indexed lookup
+(number fingerprint + deadline window, then signature-ordered confirmation). The Firestore
+composite index is emulated in memory with a per-fingerprint list sorted by deadline.
+
+Usage (from backend/):
+    python scripts/bench_duplicate_check.py --pacts 1000 --probes 500
+"""
+import os
+import sys
+import re
+import time
+import bisect
+import random
+import difflib
+import argparse
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/..")
+
+from src.core.similarity import DUPLICATE_WINDOW, as_utc, contract_index_fields, find_duplicate, normalize_goal_text, number_fingerprint
+
+TEMPLATES = [
+    "Do {n} pushups/day", "Exercise {n}x/week", "Save ${n} this month", "Meditate {n}min daily",
+    "Eat {n} servings of veg", "No work after {n} PM", "Read {n} pages of my book", "Drink {n} glasses of water/day",
+    "Walk {n},000 steps/day", "Run {n}km before work", "Ship {n} pull requests", "Screen time < {n}h/day",
+]
+
+def legacy_scan(new_goal, new_deadline, active):
+    """The original /commit loop."""
+    new_goal = (new_goal or "").strip().lower()
+    for existing in active:
+        existing_goal = (existing.get('goal_description') or "").strip().lower()
+        is_duplicate_text = existing_goal == new_goal
+        if not is_duplicate_text:
+            similarity = difflib.SequenceMatcher(None, existing_goal, new_goal).ratio()
+            if similarity > 0.8:
+                nums_new = set(re.findall(r'\d+', new_goal))
+                nums_existing = set(re.findall(r'\d+', existing_goal))
+                if nums_new == nums_existing:
+                    is_duplicate_text = True
+        if is_duplicate_text:
+            existing_deadline = as_utc(existing.get('deadline_utc'))
+            if existing_deadline and abs((new_deadline - existing_deadline).total_seconds()) < 43200:
+                return existing
+    return None
+
+class EmulatedIndex:
+    """In-memory stand-in for the (user_id, status, dup_numbers, deadline_at) composite index."""
+
+    def __init__(self):
+        self.postings = defaultdict(list)  # fingerprint -> sorted [(deadline_ts, seq, doc)]
+        self.seq = 0
+
+    def add(self, doc):
+        self.seq += 1
+        bisect.insort(self.postings[doc["dup_numbers"]], (doc["deadline_at"].timestamp(), self.seq, doc))
+
+    def query(self, goal, deadline):
+        entries = self.postings.get(number_fingerprint(normalize_goal_text(goal)), [])
+        window = DUPLICATE_WINDOW.total_seconds()
+        lo = bisect.bisect_right(entries, (deadline.timestamp() - window, float("inf")))
+        hi = bisect.bisect_left(entries, (deadline.timestamp() + window, -1))
+        return [doc for _, _, doc in entries[lo:hi]]
+
+def make_goal(rng):
+    return rng.choice(TEMPLATES).format(n=rng.randint(1, 60))
+
+def main():
+    parser = argparse.ArgumentParser(description="Duplicate-pact check benchmark")
+    parser.add_argument("--pacts", type=int, default=1000)
+    parser.add_argument("--probes", type=int, default=500)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    now = datetime.now(timezone.utc)
+    active, index = [], EmulatedIndex()
+
+    start = time.perf_counter()
+    for _ in range(args.pacts):
+        goal = make_goal(rng)
+        deadline = now + timedelta(hours=rng.uniform(1, 24 * 60))
+        doc = {"goal_description": goal, "deadline_utc": deadline.isoformat()}
+        doc.update(contract_index_fields(goal, deadline))
+        active.append(doc)
+        index.add(doc)
+    index_ms = (time.perf_counter() - start) * 1000
+
+    probes = []
+    for _ in range(args.probes):
+        if rng.random() < 0.3:
+            # Near-duplicate of an existing pact
+            base = rng.choice(active)
+            probes.append((base["goal_description"] + rng.choice(["", "!", " daily", "s"]),
+                           as_utc(base["deadline_utc"]) + timedelta(hours=rng.uniform(-6, 6))))
+        else:
+            probes.append((make_goal(rng), now + timedelta(hours=rng.uniform(1, 24 * 60))))
+
+    start = time.perf_counter()
+    legacy = [legacy_scan(goal, deadline, active) for goal, deadline in probes]
+    legacy_ms = (time.perf_counter() - start) * 1000 / len(probes)
+
+    start = time.perf_counter()
+    candidate_counts = []
+    indexed = []
+    for goal, deadline in probes:
+        candidates = index.query(goal, deadline)
+        candidate_counts.append(len(candidates))
+        indexed.append(find_duplicate(goal, deadline, candidates))
+    indexed_ms = (time.perf_counter() - start) * 1000 / len(probes)
+
+    agree = sum(1 for a, b in zip(legacy, indexed) if (a is None) == (b is None))
+    print(f"active pacts/user: {args.pacts}, probes: {args.probes}")
+    print(f"index build (signatures at write time): {index_ms / args.pacts:.3f} ms/contract")
+    print(f"legacy difflib scan:  {legacy_ms:.3f} ms/commit (docs read: {args.pacts})")
+    print(f"indexed lookup:       {indexed_ms:.3f} ms/commit (docs read: avg {sum(candidate_counts) / len(candidate_counts):.1f})")
+    print(f"speedup: {legacy_ms / indexed_ms:.1f}x, verdict agreement: {agree}/{len(probes)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Benchmark: /health latency while /verify is saturated with slow (simulated) Gemini judgements.
+
+Runs the FastAPI app in-process via httpx's ASGI transport and compares the legacy
+inline mode against the bounded executor mode.
+
+Usage (from backend/):
+    python scripts/bench_event_loop.py --verify-requests 32 --judge-seconds 2
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import statistics
+from datetime import datetime, timedelta, timezone
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/..")
+
+import httpx
+from src import api
+from src.core.schemas import VerificationResult, VerificationStatus
+
+def slow_verify(judge_seconds: float):
+    def _verify(contract, activity_id=None, evidence_input=None, user_id=None):
+        time.sleep(judge_seconds)  # Stand-in for a blocking generate_content call
+        return VerificationResult(status=VerificationStatus.UNCERTAIN, confidence=0.0, failure_reason="bench")
+    return _verify
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    idx = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[idx]
+
+async def run_scenario(offload: bool, verify_requests: int, health_probes: int) -> dict:
+    api.blocking_executor.enabled = offload
+    transport = httpx.ASGITransport(app=api.app)
+    payload = {
+        "user_id": "bench_user",
+        "contract": {
+            "goal_description": "Meditate 10min daily",
+            "deadline_utc": (datetime.now(timezone.utc) + timedelta(days=1)).isoformat(),
+            "is_public": False,
+            "penalty": {"type": "stake_burn", "amount_usd": 10}
+        },
+        "text_evidence": "Did it."
+    }
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        async def fire_verifies():
+            # Verifications arrive in a steady stream, not a single burst
+            tasks = []
+            for _ in range(verify_requests):
+                tasks.append(asyncio.create_task(client.post("/verify", json=payload)))
+                await asyncio.sleep(0.02)
+            await asyncio.gather(*tasks)
+
+        verify_load = asyncio.create_task(fire_verifies())
+        await asyncio.sleep(0.05)
+
+        # Latency is measured from the *scheduled* probe time, so time spent waiting
+        # for a blocked loop to come back counts against the probe (no coordinated omission).
+        latencies = []
+        interval = 0.01
+        origin = time.perf_counter()
+        for i in range(health_probes):
+            scheduled = origin + i * interval
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await client.get("/health")
+            latencies.append((time.perf_counter() - scheduled) * 1000)
+
+        await verify_load
+
+    return {
+        "mode": "executor" if offload else "inline",
+        "health_p50_ms": round(statistics.median(latencies), 2),
+        "health_p99_ms": round(percentile(latencies, 99), 2),
+        "health_max_ms": round(max(latencies), 2),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Event-loop blocking benchmark")
+    parser.add_argument("--verify-requests", type=int, default=32)
+    parser.add_argument("--health-probes", type=int, default=100)
+    parser.add_argument("--judge-seconds", type=float, default=2.0)
+    args = parser.parse_args()
+
+    api.verify_agent.verify = slow_verify(args.judge_seconds)
+
+    print(f"Saturating /verify with {args.verify_requests} requests ({args.judge_seconds}s judge each), "
+          f"executor cap={api.blocking_executor.max_workers}")
+    for offload in (False, True):
+        print(asyncio.run(run_scenario(offload, args.verify_requests, args.health_probes)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Measures /upload_evidence storage work on ~20 MB phone photos: throughput and peak
+Python memory per request, for the old whole-file upload vs the chunked
+content-addressed store (first upload, then a duplicate).
+
+The bucket here drains uploads like a network send would (nothing is kept), so the
+numbers reflect the pipeline itself.
+
+Usage: python scripts/bench_evidence_upload.py [--mb 20] [--requests 5]
+"""
+import io
+import os
+import sys
+import time
+import uuid
+import argparse
+import tempfile
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/..")
+
+from src.core.evidence import EvidenceStore, PIL_AVAILABLE
+
+class DrainBlob:
+    def __init__(self, bucket, name):
+        self.bucket = bucket
+        self.name = name
+        self.chunk_size = None
+        self.public_url = f"https://storage.example/{name}"
+
+    def exists(self):
+        return self.name in self.bucket.names
+
+    def upload_from_file(self, fileobj, size=None, content_type=None):
+        # Like the client's resumable upload: one chunk in memory at a time
+        while fileobj.read(self.chunk_size or 8 * 1024 * 1024):
+            pass
+        self.bucket.names.add(self.name)
+
+    def upload_from_string(self, data, content_type=None):
+        self.bucket.names.add(self.name)
+
+    def make_public(self):
+        pass
+
+class DrainBucket:
+    def __init__(self):
+        self.names = set()
+
+    def blob(self, name):
+        return DrainBlob(self, name)
+
+def make_photo(path: str, mb: int):
+    if PIL_AVAILABLE:
+        from PIL import Image
+        # Noise barely compresses, so the JPEG size tracks the pixel count
+        side = int((mb * 1024 * 1024 / 1.25) ** 0.5)
+        Image.frombytes("RGB", (side, side), os.urandom(side * side * 3)).save(path, format="JPEG", quality=95)
+    else:
+        with open(path, "wb") as f:
+            f.write(os.urandom(mb * 1024 * 1024))
+
+def legacy_upload(bucket, fileobj):
+    # Previous handler: random name, whole body handed to the client, no dedup
+    data = fileobj.read()
+    bucket.blob(f"evidence/{uuid.uuid4()}_photo.jpg").upload_from_string(data, content_type="image/jpeg")
+
+def measure(label, fn, requests, size):
+    timings, peaks = [], []
+    for _ in range(requests):
+        tracemalloc.start()
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    avg = sum(timings) / len(timings)
+    print(f"{label:<28} {avg * 1000:8.1f} ms/req  {size / avg / 1e6:8.1f} MB/s  peak {max(peaks) / 1e6:6.1f} MB")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mb", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "photo.jpg")
+        make_photo(path, args.mb)
+        size = os.path.getsize(path)
+        print(f"Photo: {size / 1e6:.1f} MB, Pillow derivative: {PIL_AVAILABLE}")
+
+        bucket = DrainBucket()
+        def legacy():
+            with open(path, "rb") as f:
+                legacy_upload(bucket, f)
+        measure("legacy (read + upload)", legacy, args.requests, size)
+
+        def first_upload():
+            with open(path, "rb") as f:
+                EvidenceStore(DrainBucket()).store(f, "photo.jpg", "image/jpeg")
+        measure("chunked, new content", first_upload, args.requests, size)
+
+        def no_derivative():
+            with open(path, "rb") as f:
+                EvidenceStore(DrainBucket(), derivative_px=0).store(f, "photo.jpg", "image/jpeg")
+        measure("chunked, no derivative", no_derivative, args.requests, size)
+
+        store = EvidenceStore(DrainBucket())
+        with open(path, "rb") as f:
+            store.store(f, "photo.jpg", "image/jpeg")
+        def duplicate():
+            with open(path, "rb") as f:
+                store.store(f, "photo.jpg", "image/jpeg")
+        measure("chunked, duplicate", duplicate, args.requests, size)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Goal parser fast path: how many goals skip the LLM, and how much time that saves.
+Runs the rule-based parser over GOALS_DATASET (src/evaluate.py) and, optionally, a log
+of production goals (plain text, one goal per line, or JSONL with goal_text/input/goal).
+
+Usage: python scripts/bench_goal_parser.py [--log goals.jsonl] [--min-confidence 0.8] [--llm-ms 2000] [-v]
+"""
+import os
+import sys
+import ast
+import json
+import time
+import argparse
+from collections import Counter
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/..")
+
+from src.core.goal_parser import parse_goal, DEFAULT_MIN_CONFIDENCE
+
+def load_dataset_goals():
+    # Read the literal instead of importing src.evaluate (it exits without opik installed)
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "evaluate.py")
+    with open(path) as f:
+        tree = ast.parse(f.read())
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(getattr(t, "id", None) == "GOALS_DATASET" for t in node.targets):
+            return [item["input"] for item in ast.literal_eval(node.value)]
+    return []
+
+def load_log_goals(path):
+    goals = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                record = json.loads(line)
+                goal = record.get("goal_text") or record.get("input") or record.get("goal")
+                if goal:
+                    goals.append(goal)
+            else:
+                goals.append(line)
+    return goals
+
+def report(label, goals, args):
+    hits, templates, misses = 0, Counter(), []
+    start = time.perf_counter()
+    for goal in goals:
+        parsed = parse_goal(goal)
+        if parsed.contract is not None and parsed.confidence >= args.min_confidence:
+            hits += 1
+            templates[parsed.template] += 1
+        else:
+            misses.append((goal, parsed.template, parsed.confidence))
+    elapsed = time.perf_counter() - start
+    total = len(goals)
+    print(f"{label}: {total} goals, fast path {hits}/{total} ({hits / total:.0%}), "
+          f"parse {elapsed / total * 1000:.3f} ms/goal")
+    print(f"  LLM time saved ~{hits * args.llm_ms / 1000:.1f} s "
+          f"(of {total * args.llm_ms / 1000:.1f} s at {args.llm_ms:.0f} ms/call)")
+    print(f"  templates: {dict(templates.most_common())}")
+    if args.verbose:
+        for goal, template, confidence in misses:
+            print(f"  -> LLM: {goal!r} (template={template}, confidence={confidence})")
+
+def main():
+    parser = argparse.ArgumentParser(description="Rule-based goal parser hit rate")
+    parser.add_argument("--log", help="Production goals: text (one per line) or JSONL")
+    parser.add_argument("--min-confidence", type=float, default=DEFAULT_MIN_CONFIDENCE)
+    parser.add_argument("--llm-ms", type=float, default=2000.0, help="Average Gemini negotiation latency")
+    parser.add_argument("-v", "--verbose", action="store_true", help="List the goals that still go to the LLM")
+    args = parser.parse_args()
+
+    report("GOALS_DATASET", load_dataset_goals(), args)
+    if args.log:
+        report(os.path.basename(args.log), load_log_goals(args.log), args)
+
+if __name__ == "__main__":
+    main()
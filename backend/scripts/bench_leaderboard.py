@@ -0,0 +1,69 @@
+"""
+Benchmark: incrementally maintained top-K leaderboard at 1M users.
+
+Usage (from backend/):
+    python scripts/bench_leaderboard.py --users 1000000 --updates 3000000
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import datetime
+import tempfile
+import resource
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/..")
+
+from src.core.leaderboard import Leaderboard
+
+def pick(rng: random.Random, n: int) -> int:
+    # Skewed activity: a few power users complete far more pacts than everyone else
+    if rng.random() < 0.3:
+        return min(n - 1, int(rng.paretovariate(1.2)) - 1)
+    return rng.randrange(n)
+
+def main():
+    parser = argparse.ArgumentParser(description="Leaderboard benchmark")
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--updates", type=int, default=3_000_000)
+    parser.add_argument("--k", type=int, default=100)
+    args = parser.parse_args()
+
+    rng = random.Random(11)
+    user_ids = [f"user_{i}" for i in range(args.users)]
+    picks = [user_ids[pick(rng, args.users)] for _ in range(args.updates)]
+
+    snapshot_path = os.path.join(tempfile.gettempdir(), "pact_leaderboard_bench.json")
+    board = Leaderboard(None, None, k=args.k, snapshot_path=snapshot_path, snapshot_interval_sec=float("inf"))
+    board._loaded = True # No snapshot / Firestore seeding for the benchmark
+    now = datetime.datetime.now(datetime.timezone.utc)
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    for user_id in picks:
+        board.record(user_id, completed=1, at=now)
+    elapsed = time.perf_counter() - start
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    start = time.perf_counter()
+    board.save_snapshot()
+    snapshot_sec = time.perf_counter() - start
+    snapshot_mb = os.path.getsize(snapshot_path) / 1e6
+    os.remove(snapshot_path)
+
+    reads = 10_000
+    start = time.perf_counter()
+    for _ in range(reads):
+        board.top("all", limit=10, at=now)
+    read_us = (time.perf_counter() - start) / reads * 1e6
+
+    print(f"users touched: {len(board._boards['all'].completed):,} / {args.users:,}, updates: {args.updates:,}")
+    print(f"update: {elapsed / args.updates * 1e6:.2f} us/op ({args.updates / elapsed:,.0f} ops/s across all/weekly/monthly boards)")
+    print(f"top-10 read: {read_us:.2f} us/op")
+    print(f"board memory (max RSS growth): {(rss_after - rss_before) / 1e3:.0f} MB")
+    print(f"snapshot: {snapshot_mb:.1f} MB written in {snapshot_sec:.2f}s")
+    print("top 3:", [(e['user_id'], e['contracts_completed']) for e in board.top('all', limit=3, at=now)])
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+LLM gateway under a degraded Gemini (simulated): a share of calls fail with 429/503
+and a few hang. Compares direct model calls (no retry, no timeout) with the gateway
+(retries, deadline, concurrency cap), then a full outage to show the circuit breaker.
+
+Usage: python scripts/bench_llm_gateway.py [--calls 200] [--error-rate 0.2] [--hang-rate 0.02] [--call-ms 200]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import statistics
+from types import SimpleNamespace
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/..")
+
+from src.core.llm_gateway import LLMGateway, CircuitBreaker
+
+class ApiError(Exception):
+    def __init__(self, code):
+        super().__init__(f"HTTP {code}")
+        self.code = code
+
+class DegradedModel:
+    def __init__(self, args, seed=1):
+        self.args = args
+        self.rng = random.Random(seed)
+        self.calls = 0
+
+    def generate_content(self, contents, generation_config=None):
+        self.calls += 1
+        roll = self.rng.random()
+        if roll < self.args.hang_rate:
+            time.sleep(self.args.hang_sec)
+        time.sleep(self.args.call_ms / 1000.0)
+        if roll > 1 - self.args.error_rate:
+            raise ApiError(self.rng.choice([429, 503]))
+        return SimpleNamespace(text="{}", usage_metadata=None)
+
+def run(label, call, calls, workers):
+    latencies, failures = [], 0
+    def one(_):
+        start = time.perf_counter()
+        try:
+            call()
+            return time.perf_counter() - start, True
+        except Exception:
+            return time.perf_counter() - start, False
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for latency, ok in pool.map(one, range(calls)):
+            latencies.append(latency)
+            failures += not ok
+    wall = time.perf_counter() - start
+    latencies.sort()
+    print(f"{label:<18} ok={calls - failures:<4} failed={failures:<4} p50={statistics.median(latencies) * 1000:6.0f} ms "
+          f"p99={latencies[int(0.99 * (len(latencies) - 1))] * 1000:6.0f} ms  wall={wall:5.1f} s")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--error-rate", type=float, default=0.2)
+    parser.add_argument("--hang-rate", type=float, default=0.02)
+    parser.add_argument("--hang-sec", type=float, default=10.0)
+    parser.add_argument("--call-ms", type=float, default=200)
+    parser.add_argument("--timeout-sec", type=float, default=3.0)
+    args = parser.parse_args()
+
+    print(f"{args.calls} calls, {args.error_rate:.0%} 429/503, {args.hang_rate:.0%} hang {args.hang_sec:g}s, {args.call_ms:g} ms per call")
+    direct = DegradedModel(args)
+    run("direct", lambda: direct.generate_content("hi"), args.calls, args.workers)
+
+    gateway = LLMGateway(api_key="", concurrency=8, timeout_sec=args.timeout_sec, backoff_sec=0.2, breaker=CircuitBreaker(10, 5))
+    model = DegradedModel(args)
+    run("gateway", lambda: gateway.generate(model, "hi"), args.calls, args.workers)
+    stats = gateway.stats()
+    print(f"{'':<18} retries={stats['retries']} timeouts={stats['timeouts']} breaker opens={stats['breaker']['opens']}")
+
+    # Full outage: every call fails; the breaker turns seconds of retries into immediate errors
+    args.error_rate, args.hang_rate = 1.0, 0.0
+    gateway = LLMGateway(api_key="", concurrency=8, timeout_sec=args.timeout_sec, backoff_sec=0.2, breaker=CircuitBreaker(10, 30))
+    model = DegradedModel(args)
+    run("gateway (outage)", lambda: gateway.generate(model, "hi"), args.calls, args.workers)
+    stats = gateway.stats()
+    print(f"{'':<18} upstream calls={model.calls} short_circuited={stats['short_circuited']}")
+
+if __name__ == "__main__":
+    main()
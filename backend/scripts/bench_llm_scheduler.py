@@ -0,0 +1,92 @@
+"""
+One Gemini quota, two kinds of traffic: an eval/batch job dumps `--batch` calls at once
+while interactive users arrive steadily. Without priorities (everything in one FIFO class)
+users queue behind the batch; with the scheduler they go first and the batch soaks up
+the rest of the quota. Time is compressed: the quota window is `--window-sec`.
+
+Usage: python scripts/bench_llm_scheduler.py [--quota 15] [--window-sec 6] [--batch 60] [--users 20] [--user-every-ms 400]
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+import threading
+from types import SimpleNamespace
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/..")
+
+from src.core.llm_gateway import LLMGateway, CircuitBreaker, QuotaExhausted
+from src.core.llm_scheduler import LLMScheduler, llm_priority, INTERACTIVE, EVAL
+
+class SimulatedGemini:
+    def generate_content(self, contents, generation_config=None):
+        time.sleep(0.05)
+        return SimpleNamespace(text="{}", usage_metadata=None)
+
+def scenario(label, args, batch_priority):
+    window = args.window_sec
+    duration = args.users * args.user_every_ms / 1000 + window
+    # One FIFO class has a single deadline for everyone; the scheduler gives users a short one
+    user_wait = duration if batch_priority == INTERACTIVE else window / 2
+    scheduler = LLMScheduler(limits=[(args.quota, window)], max_wait_sec={INTERACTIVE: user_wait, EVAL: duration})
+    llm = LLMGateway(api_key="", concurrency=8, timeout_sec=30, breaker=CircuitBreaker(100, 1), scheduler=scheduler)
+    model = SimulatedGemini()
+    user_waits, user_failures, batch_done_at = [], 0, []
+    lock = threading.Lock()
+
+    def batch_call():
+        with llm_priority(batch_priority):
+            try:
+                llm.generate(model, "eval", caller="evaluate")
+                with lock:
+                    batch_done_at.append(time.perf_counter())
+            except QuotaExhausted:
+                pass
+
+    def user_call():
+        nonlocal user_failures
+        start = time.perf_counter()
+        try:
+            llm.generate(model, "goal", caller="contract_agent")
+            with lock:
+                user_waits.append(time.perf_counter() - start)
+        except QuotaExhausted:
+            with lock:
+                user_failures += 1
+
+    batch = [threading.Thread(target=batch_call) for _ in range(args.batch)]
+    for t in batch:
+        t.start()
+    time.sleep(0.05)
+    users = []
+    for _ in range(args.users):
+        users.append(threading.Thread(target=user_call))
+        users[-1].start()
+        time.sleep(args.user_every_ms / 1000)
+    for t in users:
+        t.join()
+    users_done = time.perf_counter()
+    for t in batch:
+        t.join()
+
+    waits = sorted(user_waits) or [0.0]
+    print(f"{label:<20} users ok={len(user_waits):<3} failed={user_failures:<3} "
+          f"p50={statistics.median(waits) * 1000:6.0f} ms  p95={waits[int(0.95 * (len(waits) - 1))] * 1000:6.0f} ms  "
+          f"batch done by then={sum(1 for t in batch_done_at if t <= users_done):<3} in total={len(batch_done_at)}")
+
+def main():
+    parser = argparse.ArgumentParser(description="LLM priority scheduler benchmark")
+    parser.add_argument("--quota", type=int, default=15, help="Calls per window")
+    parser.add_argument("--window-sec", type=float, default=6.0, help="Quota window (60s compressed)")
+    parser.add_argument("--batch", type=int, default=60)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--user-every-ms", type=float, default=400)
+    args = parser.parse_args()
+
+    print(f"Quota {args.quota}/{args.window_sec:g}s; {args.batch} batch calls at t=0, {args.users} users every {args.user_every_ms:g} ms")
+    scenario("single FIFO class", args, INTERACTIVE)
+    scenario("priority scheduler", args, EVAL)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Time to first useful byte for negotiation: blocking negotiate() vs negotiate_stream(),
+against a simulated Gemini that generates the contract JSON at a fixed token rate.
+Reports when the first field, goal_description, deadline_utc, penalty and the validated
+contract reach the client.
+
+Usage: python scripts/bench_negotiate_stream.py [--gen-ms 2000] [--first-token-ms 400] [--chunk-chars 12] [--runs 5]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+from types import SimpleNamespace
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/..")
+
+from src.agents.contract import ContractAgent
+from src.core.llm_gateway import LLMGateway
+from src.core.llm_scheduler import LLMScheduler
+
+CONTRACT = {
+    "goal_type": "general",
+    "goal_description": "Learn a new skill: 3 guitar lessons with practice notes",
+    "target_distance_km": None,
+    "allowed_activity_types": ["General"],
+    "deadline_utc": "2026-10-25T23:59:59Z",
+    "min_heart_rate_avg": None,
+    "confidence_required": 0.95,
+    "penalty": {"type": "stake_burn", "amount_usd": 10, "destination": "Ledger"},
+}
+
+class SimulatedGemini:
+    """Time to first token, then the JSON at a steady rate, in chunks of `chunk_chars`."""
+
+    def __init__(self, args):
+        self.text = json.dumps(CONTRACT, indent=4)
+        self.args = args
+
+    def _chunks(self):
+        time.sleep(self.args.first_token_ms / 1000)
+        step = self.args.chunk_chars
+        per_chunk = (self.args.gen_ms - self.args.first_token_ms) / 1000 * step / len(self.text)
+        for i in range(0, len(self.text), step):
+            time.sleep(per_chunk)
+            yield SimpleNamespace(text=self.text[i:i + step], usage_metadata=None)
+
+    def generate_content(self, contents, generation_config=None, stream=False):
+        if stream:
+            return self._chunks()
+        return SimpleNamespace(text="".join(c.text for c in self._chunks()), usage_metadata=None)
+
+def main():
+    parser = argparse.ArgumentParser(description="Streaming negotiation benchmark")
+    parser.add_argument("--gen-ms", type=float, default=2000.0, help="Full generation time")
+    parser.add_argument("--first-token-ms", type=float, default=400.0)
+    parser.add_argument("--chunk-chars", type=int, default=12)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    agent = ContractAgent(cache=False, llm=LLMGateway(api_key="bench", scheduler=LLMScheduler(limits=[])))
+    agent.fast_path = False # Measure the LLM path
+    agent.model = SimulatedGemini(args)
+    goal = "Learn a new skill"
+
+    blocking = []
+    for _ in range(args.runs):
+        start = time.perf_counter()
+        agent.negotiate(goal)
+        blocking.append(time.perf_counter() - start)
+
+    marks = {}
+    for _ in range(args.runs):
+        start = time.perf_counter()
+        first = None
+        for kind, data in agent.negotiate_stream(goal):
+            now = (time.perf_counter() - start) * 1000
+            if first is None:
+                first = now
+                marks.setdefault("first field", []).append(now)
+            name = data["name"] if kind == "field" else "validated contract"
+            if name in ("goal_description", "deadline_utc", "penalty", "validated contract"):
+                marks.setdefault(name, []).append(now)
+
+    print(f"/negotiate (blocking)        {statistics.median(blocking) * 1000:7.0f} ms to the contract")
+    print("/negotiate/stream:")
+    for name, values in marks.items():
+        print(f"  {name:<26} {statistics.median(values):7.0f} ms")
+
+if __name__ == "__main__":
+    main()
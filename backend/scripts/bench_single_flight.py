@@ -0,0 +1,93 @@
+"""
+Single-flight negotiation under a burst: `--clients` requests for a handful of popular goals
+(GoalInput re-submits, many users on the same catalogue goal), a share of which disconnect
+early. Compares Gemini calls, p50 latency and wall time with single-flight off and on, then
+runs distinct goals to show calls being cancelled once their only client has gone.
+
+Usage: python scripts/bench_single_flight.py [--clients 200] [--goals 5] [--gen-ms 800] [--disconnect-rate 0.3] [--concurrency 4]
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import statistics
+from types import SimpleNamespace
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/..")
+
+from src.agents.contract import ContractAgent
+from src.core.llm_gateway import LLMGateway, CircuitBreaker
+from src.core.llm_scheduler import LLMScheduler
+from src.core.single_flight import SingleFlight, ClientDisconnected
+
+CONTRACT = json.dumps({
+    "goal_type": "general", "goal_description": "Learn a new skill", "target_distance_km": None,
+    "allowed_activity_types": ["General"], "deadline_utc": "2026-10-25T23:59:59Z",
+    "penalty": {"type": "stake_burn", "amount_usd": 10, "destination": "Ledger"},
+})
+
+class SimulatedGemini:
+    def __init__(self, gen_ms):
+        self.gen_ms = gen_ms
+        self.calls = 0
+
+    def generate_content(self, contents, generation_config=None, stream=False):
+        self.calls += 1
+        def chunks():
+            for i in range(0, len(CONTRACT), 20):
+                time.sleep(self.gen_ms / 1000 * 20 / len(CONTRACT))
+                yield SimpleNamespace(text=CONTRACT[i:i + 20], usage_metadata=None)
+        return chunks()
+
+async def burst(args, enabled, goals):
+    # Simulated Gemini: no quota to queue for (see bench_llm_scheduler.py for that)
+    llm = LLMGateway(api_key="bench", concurrency=args.concurrency, timeout_sec=120, breaker=CircuitBreaker(100, 1),
+                     scheduler=LLMScheduler(limits=[]))
+    agent = ContractAgent(cache=False, llm=llm)
+    agent.fast_path = False
+    agent.model = SimulatedGemini(args.gen_ms)
+    flights = SingleFlight(enabled=enabled, poll_sec=0.05)
+    rng = random.Random(3)
+
+    async def client(i):
+        await asyncio.sleep(rng.uniform(0, 0.2))
+        goal = f"Learn a new skill #{rng.randrange(goals)}"
+        leaves_at = time.monotonic() + rng.uniform(0.05, 0.3) if rng.random() < args.disconnect_rate else None
+        async def is_disconnected():
+            return leaves_at is not None and time.monotonic() >= leaves_at
+        start = time.perf_counter()
+        try:
+            await flights.run(f"negotiate:{goal}", agent.negotiate, goal, is_disconnected=is_disconnected)
+            return time.perf_counter() - start
+        except ClientDisconnected:
+            return None
+
+    start = time.perf_counter()
+    latencies = [l for l in await asyncio.gather(*[client(i) for i in range(args.clients)]) if l is not None]
+    wall = time.perf_counter() - start
+    await asyncio.sleep(0.3) # Let cancelled calls notice
+    stats = flights.stats()
+    print(f"single-flight {'on ' if enabled else 'off'} goals={goals:<4} gemini_calls={agent.model.calls:<4} served={len(latencies):<4} "
+          f"p50={statistics.median(latencies) * 1000:6.0f} ms  wall={wall:5.1f} s  "
+          f"coalesced={stats['coalesced']} cancelled={stats['cancelled']} gateway_cancelled={llm.stats()['cancelled']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Single-flight negotiation benchmark")
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--goals", type=int, default=5)
+    parser.add_argument("--gen-ms", type=float, default=800.0)
+    parser.add_argument("--disconnect-rate", type=float, default=0.3)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    # Without single-flight nobody notices a disconnect: every call runs to completion
+    asyncio.run(burst(args, False, args.goals))
+    asyncio.run(burst(args, True, args.goals))
+    # Distinct goals: nothing to coalesce, but calls whose only client left are cancelled
+    asyncio.run(burst(args, True, args.clients))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Strava client against the local stand-in: naive per-call requests (new connection,
+no caching) vs StravaClient (pooled keep-alive, ETag/TTL summary cache) behind the
+verifier's immutable stream cache, for a verification workload that re-checks the same activities.
+Then a burst well past the 15-minute quota, to show the shared limiter stopping
+short of Strava's 429s.
+
+Usage: python scripts/bench_strava_client.py [--activities 100] [--rounds 3] [--latency-ms 20]
+"""
+import os
+import sys
+import time
+import tempfile
+import argparse
+import requests
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/..")
+
+from src.core.activity_streams import ActivityStreams, StreamCache
+from src.core.rate_limit import SharedRateLimiter, RateLimitExceeded
+from src.integrations.strava import StravaClient
+from src.utils.strava_standin import StravaStandIn
+
+def naive_verify(base_url: str, activity_id: str):
+    headers = {"Authorization": "Bearer token", "Connection": "close"}
+    requests.get(f"{base_url}/activities/{activity_id}", headers=headers, timeout=10).json()
+    ActivityStreams.from_strava(requests.get(f"{base_url}/activities/{activity_id}/streams",
+                                             params={"key_by_type": "true"}, headers=headers, timeout=10).json())
+
+def run(label, standin, fn, ids, workers):
+    before = standin.stats()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(fn, ids))
+    elapsed = time.perf_counter() - start
+    after = standin.stats()
+    print(f"{label:<12} {elapsed * 1000:8.0f} ms  http={after['requests'] - before['requests']:<5} "
+          f"tcp_connections={after['connections'] - before['connections']:<5} 304s={after['not_modified'] - before['not_modified']}")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--activities", type=int, default=100)
+    parser.add_argument("--rounds", type=int, default=3, help="Each activity is verified this many times")
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    ids = [f"act_{i}" for i in range(args.activities)] * args.rounds
+    tmp = tempfile.mkdtemp(prefix="pact_strava_bench_")
+    print(f"{args.activities} activities x {args.rounds} verifications (summary + streams), "
+          f"{args.latency_ms:g} ms server latency, {args.workers} workers")
+
+    with StravaStandIn(limits=(10 ** 6, 10 ** 7), latency_ms=args.latency_ms) as standin:
+        run("naive", standin, lambda a: naive_verify(standin.base_url, a), ids, args.workers)
+        client = StravaClient("token", standin.base_url, summary_ttl_sec=300,
+                              limiter=SharedRateLimiter("bench", [(10 ** 6, 900)], db_path=os.path.join(tmp, "limits.db")))
+        streams = StreamCache(os.path.join(tmp, "streams"))
+        run("StravaClient", standin, lambda a: (client.get_activity(a), streams.get_or_fetch(a, lambda: client.get_activity_streams(a))),
+            ids, args.workers)
+
+    # Quota burst: 300 summary fetches against 100 per 15 minutes
+    with StravaStandIn(limits=(100, 1000)) as standin:
+        client = StravaClient("token", standin.base_url, summary_ttl_sec=0,
+                              limiter=SharedRateLimiter("burst", [(100, 900), (1000, 86400)], db_path=os.path.join(tmp, "limits.db")))
+        client.limit_wait_sec = 0
+        served = refused = 0
+        for i in range(300):
+            try:
+                client.get_activity(f"burst_{i}")
+                served += 1
+            except RateLimitExceeded:
+                refused += 1
+        print(f"quota burst  served={served} refused_locally={refused} strava_429s={standin.stats()['throttled']}")
+
+if __name__ == "__main__":
+    main()
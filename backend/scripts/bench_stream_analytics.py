@@ -0,0 +1,53 @@
+"""
+Per-activity cost of the treadmill HR checks at Strava-sized streams.
+
+Compares the previous check (statistics.stdev over a Python list) with the NumPy
+analytics (rolling variability, flat segments, spikes, HR/pace correlation), both
+from the list-of-dicts stream shape and from ready-made arrays.
+
+Usage: python scripts/bench_stream_analytics.py [--points 20000] [--repeat 50]
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/..")
+
+import numpy as np
+from src.core.stream_analytics import analyze_hr_stream, analyze_streams
+
+def make_stream(n: int):
+    rng = np.random.default_rng(0)
+    t = np.arange(n, dtype=np.float64)
+    velocity = 3.0 + (np.sin(t / 300.0) > 0)
+    hr = 100 + 15 * np.convolve(velocity, np.ones(45) / 45, mode="same") + rng.normal(0, 2.0, n)
+    points = [{"time": float(t[i]), "heartrate": float(hr[i]), "velocity_smooth": float(velocity[i])} for i in range(n)]
+    return points, (t, hr, velocity)
+
+def timed(fn, repeat: int) -> float:
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+def legacy(points):
+    hrs = [p['heartrate'] for p in points]
+    return statistics.stdev(hrs)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--points", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    points, arrays = make_stream(args.points)
+    print(f"{args.points} points per activity")
+    print(f"legacy stdev only (list of dicts)    {timed(lambda: legacy(points), args.repeat):8.2f} ms")
+    print(f"numpy analytics (list of dicts)      {timed(lambda: analyze_streams(points), args.repeat):8.2f} ms")
+    print(f"numpy analytics (arrays)             {timed(lambda: analyze_hr_stream(*arrays), args.repeat):8.2f} ms")
+
+if __name__ == "__main__":
+    main()
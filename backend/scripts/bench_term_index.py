@@ -0,0 +1,74 @@
+"""
+RAG retrieval at knowledge-base scale: builds a synthetic KB with thousands of terms,
+compiles it to the memory-mapped index and measures load time and per-goal retrieval
+latency (embed + top-k cosine + snippet assembly), next to the real standard_terms.json.
+
+Usage: python scripts/bench_term_index.py [--categories 200] [--terms 25] [--queries 2000] [--k 4]
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/..")
+
+from src.core.term_index import TermIndex
+
+KB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "data", "standard_terms.json")
+VOCAB = ("run ride swim lift read write code ship study meditate sleep save budget cook walk climb paint practice "
+         "photo video gps commit receipt timestamp summary screenshot heart rate wearable witness ledger streak "
+         "distance pace pages chapter minutes hours steps reps sets money calories glasses").split()
+
+def synthetic_kb(categories, terms, rng):
+    kb = {}
+    for c in range(categories):
+        words = rng.sample(VOCAB, 6)
+        kb[f"category_{c}"] = {
+            "description": f"Standard terms for {' '.join(words[:2])} goals.",
+            "keywords": ", ".join(words),
+            "terms": [f"{' '.join(rng.sample(VOCAB, 5)).capitalize()} evidence required ({c}.{t})." for t in range(terms)],
+            "risk_factors": f"{rng.choice(VOCAB)} fraud.",
+        }
+    return kb
+
+def measure(label, index, goals, k):
+    latencies = []
+    for goal in goals:
+        start = time.perf_counter()
+        index.context(goal, k=k)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    pct = lambda p: latencies[int(p * (len(latencies) - 1))] * 1000
+    print(f"{label:<28} rows={len(index.rows):<6} p50={pct(0.5):.3f} ms  p99={pct(0.99):.3f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="Term index retrieval latency")
+    parser.add_argument("--categories", type=int, default=200)
+    parser.add_argument("--terms", type=int, default=25)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--k", type=int, default=4)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    goals = [f"{rng.choice(VOCAB).capitalize()} {rng.randint(1, 50)} {rng.choice(VOCAB)} by Sunday" for _ in range(args.queries)]
+
+    measure("standard_terms.json", TermIndex.load_or_build(KB_PATH), goals, args.k)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        kb_path = os.path.join(tmp, "kb.json")
+        with open(kb_path, "w") as f:
+            json.dump(synthetic_kb(args.categories, args.terms, rng), f)
+        start = time.perf_counter()
+        with open(kb_path) as f:
+            TermIndex.build(json.load(f)).save(kb_path)
+        print(f"Compiled {args.categories * args.terms} terms offline in {time.perf_counter() - start:.2f} s")
+        start = time.perf_counter()
+        index = TermIndex.load(kb_path)
+        print(f"Startup load (memory-mapped): {(time.perf_counter() - start) * 1000:.1f} ms")
+        measure("synthetic KB", index, goals, args.k)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Generic verification micro-batching: Gemini calls and end-to-end latency for a burst
+of concurrent verifications, with batching off vs on. The model is simulated
+(fixed per-call latency plus a small per-item cost), so no API key is needed.
+
+Usage: python scripts/bench_verify_batching.py [--requests 40] [--spread-ms 500] [--call-ms 1500]
+"""
+import os
+import re
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+import statistics
+from types import SimpleNamespace
+from datetime import datetime, timedelta, timezone
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/..")
+
+from src.agents.verify import VerifyAgent
+from src.core.schemas import GoalContract, Penalty, ConsequenceType, Evidence
+
+class SimulatedModel:
+    def __init__(self, call_ms: float, per_item_ms: float):
+        self.call_ms = call_ms
+        self.per_item_ms = per_item_ms
+
+    def generate_content(self, contents, generation_config=None):
+        prompt = "\n".join(part for part in contents if isinstance(part, str))
+        ids = [int(i) for i in re.findall(r"\[ITEM id=(\d+)\]", prompt)]
+        time.sleep((self.call_ms + self.per_item_ms * max(1, len(ids))) / 1000.0)
+        if not ids:
+            return SimpleNamespace(text=json.dumps({"final_verdict": "SUCCESS", "proof_quality_score": 75, "reasoning": "ok"}))
+        return SimpleNamespace(text=json.dumps([{"id": i, "final_verdict": "SUCCESS", "proof_quality_score": 75, "reasoning": "ok"} for i in ids]))
+
+def run(window_ms: int, args) -> dict:
+    os.environ["PACT_VERIFY_BATCH_WINDOW_MS"] = str(window_ms)
+    agent = VerifyAgent()
+    agent.model = SimulatedModel(args.call_ms, args.per_item_ms)
+    contract = GoalContract(
+        goal_description="Do 50 pushups",
+        deadline_utc=datetime.now(timezone.utc) + timedelta(days=1),
+        penalty=Penalty(type=ConsequenceType.STAKE_BURN, amount_usd=5)
+    )
+    rng = random.Random(1)
+    offsets = sorted(rng.uniform(0, args.spread_ms / 1000.0) for _ in range(args.requests))
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(offset):
+        time.sleep(offset)
+        start = time.perf_counter()
+        agent.verify_generic(contract, Evidence(start_time=datetime.now(timezone.utc), activity_type="Generic", text_evidence="50 pushups, felt it"))
+        with lock:
+            latencies.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=worker, args=(o,)) for o in offsets]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    stats = agent.batch_stats()
+    return {
+        "calls": agent.generic_calls,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "max_ms": max(latencies) * 1000,
+        "calls_saved": stats["calls_saved"],
+        "added_ms": stats.get("avg_added_latency_ms", 0.0),
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--spread-ms", type=int, default=500, help="Arrivals spread uniformly over this span")
+    parser.add_argument("--call-ms", type=float, default=1500)
+    parser.add_argument("--per-item-ms", type=float, default=50)
+    parser.add_argument("--window-ms", type=int, default=100)
+    args = parser.parse_args()
+
+    print(f"{args.requests} generic verifications over {args.spread_ms} ms, {args.call_ms:.0f} ms per call")
+    for label, window in (("unbatched", 0), (f"batched ({args.window_ms} ms)", args.window_ms)):
+        r = run(window, args)
+        print(f"{label:<20} calls={r['calls']:<4} saved={r['calls_saved']:<4} "
+              f"p50={r['p50_ms']:7.0f} ms  max={r['max_ms']:7.0f} ms  window wait avg={r['added_ms']:.0f} ms")
+
+if __name__ == "__main__":
+    main()
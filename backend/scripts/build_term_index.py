@@ -0,0 +1,40 @@
+"""
+Compiles the RAG knowledge base (src/data/standard_terms.json) into the vector index
+ContractAgent memory-maps at startup: standard_terms.index.npy (embeddings) and
+standard_terms.index.json (rows and pre-rendered snippets). Re-run after editing the KB;
+a stale index is detected by its source fingerprint and rebuilt in memory with a warning.
+
+Usage (from backend/): python scripts/build_term_index.py [--kb src/data/standard_terms.json] [--dim 512]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/..")
+
+from src.core.term_index import TermIndex, DEFAULT_DIM
+
+DEFAULT_KB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "data", "standard_terms.json")
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the standard terms vector index")
+    parser.add_argument("--kb", default=DEFAULT_KB)
+    parser.add_argument("--dim", type=int, default=DEFAULT_DIM)
+    args = parser.parse_args()
+
+    kb_path = os.path.normpath(args.kb)
+    with open(kb_path) as f:
+        knowledge_base = json.load(f)
+    start = time.perf_counter()
+    index = TermIndex.build(knowledge_base, dim=args.dim)
+    index.save(kb_path)
+    matrix_path, meta_path = TermIndex.paths(kb_path)
+    print(f"Indexed {len(index.rows)} terms in {len(index.categories)} categories ({args.dim} dims) "
+          f"in {(time.perf_counter() - start) * 1000:.0f} ms")
+    print(f"  {matrix_path} ({os.path.getsize(matrix_path) / 1024:.0f} KB)")
+    print(f"  {meta_path} ({os.path.getsize(meta_path) / 1024:.0f} KB)")
+
+if __name__ == "__main__":
+    main()
@@ -1,68 +1,92 @@
 import os
 import json
-import google.generativeai as genai
-from typing import Optional
+import time
+import threading
+from typing import Any, Dict, Iterator, Optional, Tuple
 from dotenv import load_dotenv
 from src.core.schemas import GoalContract
+from src.core.llm_gateway import LLMGateway, LLMUnavailable, llm_gateway
+from src.core.contract_cache import ContractCache, build_contract_cache_from_env
+from src.core.goal_parser import parse_goal, DEFAULT_MIN_CONFIDENCE
+from src.core.term_index import TermIndex
+from src.core.streaming import IncrementalJSONParser
 from src.utils.opik_utils import log_agent_trace
 
 load_dotenv()
 
+DEFAULT_LLM_LATENCY_MS = 2000.0 # Assumed per-call cost until the gateway has measured some
+
 class ContractAgent:
     """
     LLM-powered agent to translate natural language goals into verifiable contracts.
     Renamed from NegotiatorAgent.
     """
-    def __init__(self):
-        self.api_key = os.getenv("GOOGLE_API_KEY")
+    def __init__(self, cache: Optional[ContractCache] = None, llm: Optional[LLMGateway] = None):
+        # Negotiation cache for repeated catalogue goals (None disables it)
+        self.cache = cache if cache is not None else build_contract_cache_from_env()
+
+        # Rule-based fast path for common goal shapes (PACT_GOAL_FAST_PATH=off disables)
+        self.fast_path = os.getenv("PACT_GOAL_FAST_PATH", "on").lower() not in ("0", "off", "false")
+        self.fast_path_min_confidence = float(os.getenv("PACT_GOAL_PARSER_MIN_CONFIDENCE", DEFAULT_MIN_CONFIDENCE))
+        self._fast_lock = threading.Lock()
+        self._fast_counts = {"attempts": 0, "hits": 0, "parse_sec": 0.0}
+        self._fast_templates: Dict[str, int] = {}
+
+        # Shared LLM gateway (concurrency cap, deadlines, retries, circuit breaker)
+        self.llm = llm or llm_gateway
+        self.api_key = self.llm.api_key
         if not self.api_key:
             print("[WARN] GOOGLE_API_KEY not found. Negotiator will fail unless mocked.")
         else:
-            genai.configure(api_key=self.api_key)
-            # Use 1.5-flash for higher rate limits (15 RPM vs 2 RPM on experimental)
-            self.model = genai.GenerativeModel("gemini-2.5-flash") 
+            self.model = self.llm.model()
             
-            # RAG: Load Knowledge Base
+            # RAG: compiled term index over the knowledge base (scripts/build_term_index.py)
+            self.term_index = None
             try:
                 base_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
                 kb_path = os.path.join(base_path, "data", "standard_terms.json")
-                with open(kb_path, "r") as f:
-                    self.knowledge_base = json.load(f)
+                self.term_index = TermIndex.load_or_build(kb_path)
             except Exception as e:
                 print(f"[WARN] Failed to load RAG Knowledge Base: {e}")
-                self.knowledge_base = {}
 
     def _retrieve_context(self, goal: str) -> str:
-        """Simple RAG Retrieval: Finds best matching category."""
-        goal_lower = goal.lower()
-        best_match = "general"
-        
-        # Simple keyword fallback for MVP RAG
-        if "run" in goal_lower or "marathon" in goal_lower or "km" in goal_lower:
-            best_match = "running"
-        elif "code" in goal_lower or "program" in goal_lower or "app" in goal_lower:
-            best_match = "coding"
-        elif "read" in goal_lower or "book" in goal_lower:
-            best_match = "reading"
-        elif "gym" in goal_lower or "lift" in goal_lower or "yoga" in goal_lower:
-            best_match = "fitness"
-            
-        kb_data = self.knowledge_base.get(best_match, {})
-        if not kb_data:
+        """RAG Retrieval: top-k standard terms by embedding similarity, as pre-rendered prompt context."""
+        if not self.term_index:
             return ""
-            
-        return f"""
-        [RAG CONTEXT RETRIEVED]
-        CATEGORY: {best_match.upper()}
-        STANDARD TERMS: {json.dumps(kb_data.get('terms', []))}
-        KNOWN RISK FACTORS: {kb_data.get('risk_factors', 'None')}
-        (Use these to inform the 'terms' array in the contract)
-        """ 
+        return self.term_index.context(goal)
 
-    def negotiate(self, user_goal: str) -> Optional[GoalContract]:
-        if not self.api_key:
+    def _try_fast_path(self, user_goal: str) -> Optional[GoalContract]:
+        started = time.perf_counter()
+        parsed = parse_goal(user_goal)
+        hit = parsed.contract is not None and parsed.confidence >= self.fast_path_min_confidence
+        with self._fast_lock:
+            self._fast_counts["attempts"] += 1
+            self._fast_counts["parse_sec"] += time.perf_counter() - started
+            if hit:
+                self._fast_counts["hits"] += 1
+                self._fast_templates[parsed.template] = self._fast_templates.get(parsed.template, 0) + 1
+        if not hit:
             return None
+        log_agent_trace("contract_agent", {"goal": user_goal}, {"fast_path": parsed.template, "confidence": parsed.confidence})
+        return parsed.contract
 
+    def fast_path_stats(self) -> Dict[str, Any]:
+        """Fast-path hit rate and the LLM time it saved (hits x measured avg negotiation latency)."""
+        llm_ms = self.llm.stats()["by_caller"].get("contract_agent", {}).get("avg_latency_ms") or DEFAULT_LLM_LATENCY_MS
+        with self._fast_lock:
+            attempts, hits = self._fast_counts["attempts"], self._fast_counts["hits"]
+            return {
+                "enabled": self.fast_path,
+                "min_confidence": self.fast_path_min_confidence,
+                "attempts": attempts,
+                "hits": hits,
+                "hit_rate": round(hits / attempts, 3) if attempts else 0.0,
+                "by_template": dict(self._fast_templates),
+                "avg_parse_ms": round(self._fast_counts["parse_sec"] / attempts * 1000, 3) if attempts else 0.0,
+                "est_llm_sec_saved": round(hits * llm_ms / 1000, 1),
+            }
+
+    def _build_prompt(self, user_goal: str) -> str:
         # RAG Step: Retrieve Context
         rag_context = self._retrieve_context(user_goal)
 
@@ -104,14 +128,62 @@ class ContractAgent:
 
         IMPORTANT: Return ONLY the JSON. No markdown formatting.
         """
+        return prompt
+
+    def _fallback_contract(self, user_goal: str) -> GoalContract:
+        # Fallback Contract
+        from datetime import datetime, timedelta, timezone
+        from src.core.schemas import Penalty, ConsequenceType, ActivityType
+        
+        # Smart Fallback
+        penalty_type = ConsequenceType.STAKE_BURN
+        amount = 10
+        
+        goal_lower = user_goal.lower()
+        if "public_shame" in goal_lower.replace(" ", "_"):
+            penalty_type = ConsequenceType.PUBLIC_SHAME
+            amount = 0
+        elif "donation" in goal_lower:
+            penalty_type = ConsequenceType.DONATION
+            amount = 10
+        
+        return GoalContract(
+            goal_type="general",
+            goal_description=user_goal,
+            target_distance_km=None,
+            allowed_activity_types=[ActivityType.GENERAL],
+            deadline_utc=datetime.now(timezone.utc) + timedelta(days=2),
+            penalty=Penalty(type=penalty_type, amount_usd=amount, destination="Ledger")
+        )
+
+    def negotiate(self, user_goal: str) -> Optional[GoalContract]:
+        # Fast path: templated goals ("Run 5km by Sunday", "Read 30 pages/day") need no LLM call
+        if self.fast_path:
+            contract = self._try_fast_path(user_goal)
+            if contract:
+                return contract
+
+        if not self.api_key:
+            return None
+
+        # Cache Step: identical goals asked within the same deadline bucket skip the LLM
+        if self.cache:
+            cached = self.cache.get(user_goal)
+            if cached:
+                return cached
+
+        prompt = self._build_prompt(user_goal)
 
         try:
-            response = self.model.generate_content(
+            # Transient errors (429/5xx) are retried inside the gateway; we only fall back once it gives up.
+            # Read as a stream so a cancelled negotiation (see SingleFlight) frees its slot at the next chunk
+            raw_json = "".join(self.llm.generate_stream(
+                self.model,
                 prompt,
-                generation_config={"response_mime_type": "application/json"}
-            )
-            
-            raw_json = response.text
+                generation_config={"response_mime_type": "application/json"},
+                caller="contract_agent"
+            ))
+
             # Log trace
             log_agent_trace("contract_agent", {"goal": user_goal}, {"json": raw_json})
             
@@ -119,34 +191,72 @@ class ContractAgent:
             data = json.loads(raw_json)
             # Validate with Pydantic
             contract = GoalContract(**data)
+
+            # Only real LLM answers are cached, never the fallback below
+            if self.cache:
+                self.cache.set(user_goal, contract)
             return contract
 
+        except LLMUnavailable as e:
+            # Quota spent, circuit open or deadline gone: the caller gets a retryable error, not a generic contract
+            log_agent_trace("contract_agent", {"goal": user_goal}, {"error": str(e), "unavailable": True})
+            raise
         except Exception as e:
             print(f"Contract Agent Error: {e}")
             print(f"[FALLBACK] Using default contract due to API error.")
             log_agent_trace("contract_agent", {"goal": user_goal}, {"error": str(e), "fallback": True})
             
-            # Fallback Contract
-            from datetime import datetime, timedelta, timezone
-            from src.core.schemas import Penalty, ConsequenceType, ActivityType
-            
-            # Smart Fallback
-            penalty_type = ConsequenceType.STAKE_BURN
-            amount = 10
-            
-            goal_lower = user_goal.lower()
-            if "public_shame" in goal_lower.replace(" ", "_"):
-                penalty_type = ConsequenceType.PUBLIC_SHAME
-                amount = 0
-            elif "donation" in goal_lower:
-                penalty_type = ConsequenceType.DONATION
-                amount = 10
-            
-            return GoalContract(
-                goal_type="general",
-                goal_description=user_goal,
-                target_distance_km=None,
-                allowed_activity_types=[ActivityType.GENERAL],
-                deadline_utc=datetime.now(timezone.utc) + timedelta(days=2),
-                penalty=Penalty(type=penalty_type, amount_usd=amount, destination="Ledger")
-            )
+            return self._fallback_contract(user_goal)
+
+    def negotiate_stream(self, user_goal: str) -> Iterator[Tuple[str, Any]]:
+        """
+        negotiate() as a stream of events for /negotiate/stream:
+        ("field", {"name", "value"}) as soon as the LLM has finished each contract field,
+        then ("contract", GoalContract) once the whole contract validates. Fast-path and cached
+        contracts are emitted at once. ("error", {...}) precedes a fallback contract, or ends
+        the stream when negotiation isn't possible at all (no API key, or the LLM unavailable:
+        then it carries "retry_after").
+        """
+        contract = self._try_fast_path(user_goal) if self.fast_path else None
+        if not contract and self.api_key and self.cache:
+            contract = self.cache.get(user_goal)
+        if contract:
+            for name, value in contract.model_dump(mode="json").items():
+                yield "field", {"name": name, "value": value}
+            yield "contract", contract
+            return
+
+        if not self.api_key:
+            yield "error", {"detail": "Negotiation failed. Check API keys."}
+            return
+
+        parser = IncrementalJSONParser()
+        raw = []
+        stream = self.llm.generate_stream(
+            self.model,
+            self._build_prompt(user_goal),
+            generation_config={"response_mime_type": "application/json"},
+            caller="contract_agent"
+        )
+        try:
+            for chunk in stream:
+                raw.append(chunk)
+                for name, value in parser.feed(chunk):
+                    yield "field", {"name": name, "value": value}
+            log_agent_trace("contract_agent", {"goal": user_goal}, {"json": "".join(raw), "stream": True})
+            contract = GoalContract(**parser.result())
+            if self.cache:
+                self.cache.set(user_goal, contract)
+        except LLMUnavailable as e:
+            log_agent_trace("contract_agent", {"goal": user_goal}, {"error": str(e), "unavailable": True, "stream": True})
+            yield "error", {"detail": str(e), "retry_after": e.retry_after}
+            return
+        except Exception as e:
+            print(f"Contract Agent Error: {e}")
+            print(f"[FALLBACK] Using default contract due to API error.")
+            log_agent_trace("contract_agent", {"goal": user_goal}, {"error": str(e), "fallback": True, "stream": True})
+            yield "error", {"detail": str(e), "fallback": True}
+            contract = self._fallback_contract(user_goal)
+        finally:
+            stream.close() # Client went away: stop reading from Gemini
+        yield "contract", contract
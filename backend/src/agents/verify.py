@@ -1,38 +1,134 @@
-from datetime import datetime, timezone
-from typing import Optional
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
 import os
-import google.generativeai as genai
+import time
+import threading
 from src.utils.opik_utils import track
 from src.core.schemas import GoalContract, VerificationResult, VerificationStatus, Evidence, ActivityType
 from src.utils.strava_mock import StravaMockClient
+from src.integrations.strava import StravaAccounts
 from src.utils.opik_utils import log_agent_trace
+from src.core.micro_batch import MicroBatcher
+from src.core.llm_gateway import LLMGateway, llm_gateway
+from src.core.image_pipeline import EvidenceImagePipeline, StageTimings
+from src.core.stream_analytics import analyze_streams
+from src.core.activity_streams import StreamCache
+from src.core.activity_index import ActivityIndex, activity_type_allowed, sport
+from src.core.verification_memo import ResultMemo, build_memo_from_env, verification_key
 import dateutil.parser
 import json
 
+DEFAULT_BATCH_WINDOW_MS = 100
+DEFAULT_BATCH_MAX = 8
+DEFAULT_HISTORY_LOOKBACK_DAYS = 30
+DEFAULT_ACTIVITY_INDEX_TTL_SEC = 300
+DEFAULT_ACTIVITY_INDEX_USERS = 1000
+HISTORY_CONFIRM_LIMIT = 5 # Top candidates re-checked with the full (stream) rules
+INDEX_REFRESH_OVERLAP_SEC = 86400 # Refreshes re-read the last day, catching late uploads and edits
+
+JUDGE_INSTRUCTIONS = """
+        You are the PACT⁰ Verification Judge. Your job is to verify physical task completion based on provided evidence.
+        You are skeptical. 
+        - IF IMAGE PROVIDED: Look for visual artifacts (sweat, equipment, timestamps).
+        - IF TEXT ONLY: Evaluate the credibility, specific details, and effort described.
+        
+        YOUR TASK:
+        1. Analyze Evidence:
+           - Image: consistency, metadata clues, generic stock photo detection.
+           - Text: Specificity (reps, time, feeling), consistency with goal.
+        2. Verify Recency & Authenticity.
+        3. Make a Verdict.
+"""
+
+JUDGE_OUTPUT_FIELDS = """{
+          "visual_artifacts_detected": ["List items or 'None'"],
+          "is_generic_stock_photo": boolean,
+          "relevance_score": 0-100,
+          "proof_quality_score": 0-100 (If text only, max is 80 unless extremely convincing),
+          "final_verdict": "SUCCESS" | "FAILURE" | "UNCERTAIN",
+          "reasoning": "Explanation citing specific evidence or lack thereof."
+        }"""
+
 class VerifyAgent:
-    def __init__(self, strava_client: Optional[StravaMockClient] = None):
+    def __init__(self, strava_client: Optional[StravaMockClient] = None, memo: Optional[ResultMemo] = None,
+                 llm: Optional[LLMGateway] = None, evidence_prefix: Optional[str] = None,
+                 strava_accounts: Optional[StravaAccounts] = None, timings: Optional[StageTimings] = None):
+        # Each user's activities are read with their own Strava token (strava_accounts);
+        # without a user or accounts, the given client (demo data by default)
         self.strava_client = strava_client or StravaMockClient()
+        self.strava_accounts = strava_accounts
+        self.stream_cache = StreamCache()
+
+        # Time-sorted index of each user's activities from the earliest window asked for;
+        # refreshed incrementally at most every TTL (LRU over users)
+        self.index_ttl_sec = float(os.getenv("PACT_ACTIVITY_INDEX_TTL_SEC", DEFAULT_ACTIVITY_INDEX_TTL_SEC))
+        self.index_users = int(os.getenv("PACT_ACTIVITY_INDEX_USERS", DEFAULT_ACTIVITY_INDEX_USERS))
+        self.history_lookback = timedelta(days=float(os.getenv("PACT_HISTORY_LOOKBACK_DAYS", DEFAULT_HISTORY_LOOKBACK_DAYS)))
+        # user -> (rows by id, index, covered-from epoch, refreshed at)
+        self._indexes: "OrderedDict[Optional[str], Tuple[Dict[str, Dict[str, Any]], ActivityIndex, int, float]]" = OrderedDict()
+        self._index_builds: Dict[Optional[str], threading.Lock] = {}
+        self._index_lock = threading.Lock()
+
+        # Memoized verdicts for retries / double-taps (PACT_VERIFY_MEMO=off disables)
+        self.memo = memo if memo is not None else build_memo_from_env("PACT_VERIFY_MEMO", "verification_memo")
         
-        # Initialize LLM for Generic Verification
-        self.api_key = os.getenv("GOOGLE_API_KEY")
-        if self.api_key:
-            genai.configure(api_key=self.api_key)
-            self.model = genai.GenerativeModel("gemini-2.5-flash")
-        else:
-            self.model = None
+        # LLM for Generic Verification, through the shared gateway (concurrency cap, retries, breaker)
+        self.llm = llm or llm_gateway
+        self.api_key = self.llm.api_key
+        self.model = self.llm.model()
+
+        # Micro-batching of generic verifications (PACT_VERIFY_BATCH_WINDOW_MS=0 disables)
+        self.generic_calls = 0
+        self.batch_fallbacks = 0
+        self._stats_lock = threading.Lock()
+        window_ms = float(os.getenv("PACT_VERIFY_BATCH_WINDOW_MS", DEFAULT_BATCH_WINDOW_MS))
+        max_batch = int(os.getenv("PACT_VERIFY_BATCH_MAX", DEFAULT_BATCH_MAX))
+        # Stored evidence derivatives -> JPEG bytes; shares stage timings with the model call
+        # (and, when given the EvidenceStore's, with the upload's decode / resize / encode)
+        self.timings = timings or StageTimings()
+        self.images = EvidenceImagePipeline(evidence_prefix, timings=self.timings)
+
+        self.batcher = MicroBatcher(self._judge_batch, window_ms / 1000.0, max_batch) if window_ms > 0 and max_batch > 1 else None
 
     @track(name="verify_agent", tags=["verification"])
-    def verify(self, contract: GoalContract, activity_id: str = None, evidence_input: Evidence = None) -> VerificationResult:
+    def verify(self, contract: GoalContract, activity_id: str = None, evidence_input: Evidence = None,
+               user_id: Optional[str] = None) -> VerificationResult:
         """
         Verifies if a specific activity fulfills the GoalContract.
         Supports both Strava Activities (specific) and Generic Evidence (LLM check).
+        Without an activity_id, a distance contract is checked against `user_id`'s activity history.
+        A repeat of the same user + contract + evidence within the memo TTL returns the stored verdict.
         """
-        
-        # Route to Generic Verifier if explicit evidence provided or non-Strava contract
-        if (evidence_input and (evidence_input.text_evidence or evidence_input.image_urls)) or contract.target_distance_km is None:
+        if not self.memo:
+            return self._verify_uncached(contract, activity_id, evidence_input, user_id)
+
+        history_scan = activity_id is None and not self._is_generic(contract, evidence_input)
+        result, _ = self.memo.get_or_compute(
+            verification_key(contract, activity_id, evidence_input, user_id),
+            lambda: self._verify_uncached(contract, activity_id, evidence_input, user_id).model_dump(mode="json"),
+            # Only decisive verdicts are kept; an UNCERTAIN (e.g. API error) is worth retrying,
+            # and a failed history scan may pass once a new activity syncs
+            store_if=lambda value: value["status"] == VerificationStatus.SUCCESS.value or (
+                value["status"] == VerificationStatus.FAILURE.value and not history_scan
+            )
+        )
+        return VerificationResult(**result)
+
+    @staticmethod
+    def _is_generic(contract: GoalContract, evidence_input: Optional[Evidence]) -> bool:
+        # Generic Verifier if explicit evidence provided or non-Strava contract
+        return bool(evidence_input and (evidence_input.text_evidence or evidence_input.image_urls)) or contract.target_distance_km is None
+
+    def _verify_uncached(self, contract: GoalContract, activity_id: str = None, evidence_input: Evidence = None,
+                         user_id: Optional[str] = None) -> VerificationResult:
+        if self._is_generic(contract, evidence_input):
             return self.verify_generic(contract, evidence_input)
+
+        if activity_id is None:
+            return self.verify_history(contract, user_id=user_id)
             
-        return self.verify_strava(contract, activity_id)
+        return self.verify_strava(contract, activity_id, user_id)
 
     def verify_generic(self, contract: GoalContract, evidence: Optional[Evidence]) -> VerificationResult:
         """
@@ -52,73 +148,33 @@ class VerifyAgent:
                 failure_reason="No evidence provided for generic goal."
             )
 
+        if self.batcher:
+            # Coalesced with other generic verifications arriving in the same window
+            return self.batcher.submit((contract, evidence))
+        return self._judge_one(contract, evidence)
+
+    def _judge_one(self, contract: GoalContract, evidence: Evidence) -> VerificationResult:
+        # Downscaled image bytes (fetched once, cached on disk) go to the model alongside the prompt
+        images = self.images.prepare_all(evidence.image_urls)
         prompt = f"""
         System Instruction:
-        
-        You are the PACT⁰ Verification Judge. Your job is to verify physical task completion based on provided evidence.
-        You are skeptical. 
-        - IF IMAGE PROVIDED: Look for visual artifacts (sweat, equipment, timestamps).
-        - IF TEXT ONLY: Evaluate the credibility, specific details, and effort described.
-        
+        {JUDGE_INSTRUCTIONS}
         INPUT:
-        - Goal: "{contract.goal_description}"
-        - Evidence Image: {evidence.image_urls if evidence.image_urls else 'No Image Provided'}
-        - Text Context: {evidence.text_evidence}
-        - Timestamp: {evidence.start_time}
-        
-        YOUR TASK:
-        1. Analyze Evidence:
-           - Image: consistency, metadata clues, generic stock photo detection.
-           - Text: Specificity (reps, time, feeling), consistency with goal.
-        2. Verify Recency & Authenticity.
-        3. Make a Verdict.
+{self._describe_item(contract, evidence, len(images))}
         
         OUTPUT JSON:
-        {{
-          "visual_artifacts_detected": ["List items or 'None'"],
-          "is_generic_stock_photo": boolean,
-          "relevance_score": 0-100,
-          "proof_quality_score": 0-100 (If text only, max is 80 unless extremely convincing),
-          "final_verdict": "SUCCESS" | "FAILURE" | "UNCERTAIN",
-          "reasoning": "Explanation citing specific evidence or lack thereof."
-        }}
+        {JUDGE_OUTPUT_FIELDS}
         """
         
         try:
-             # If image URLs are present, we should actually download/pass them.
-             # For this demo step, we assume the URL allows the model (if multimodal) or we just rely on text + context.
-             # In a production version with Gemini 1.5, we would pass the image bytes.
-             
-             response = self.model.generate_content(prompt, generation_config={"response_mime_type": "application/json"})
+             self._count_call()
+             with self.timings.stage("model_call"):
+                 response = self.llm.generate(self.model, [prompt] + images, generation_config={"response_mime_type": "application/json"},
+                                              caller="verify_generic")
              result = json.loads(response.text)
              
              log_agent_trace("verify_generic", {"evidence": evidence.model_dump()}, result)
-             
-             # Map Forensic Output to Standard Result
-             status_map = {
-                 "SUCCESS": VerificationStatus.SUCCESS,
-                 "FAILURE": VerificationStatus.FAILURE,
-                 "UNCERTAIN": VerificationStatus.UNCERTAIN
-             }
-             
-             verdict = result.get("final_verdict", "UNCERTAIN")
-             
-             # Logic Fix: If verdict is FAILURE, we are confident in the failure (lack of proof).
-             # If verdict is SUCCESS, we use the proof_quality_score as confidence.
-             mapped_status = status_map.get(verdict, VerificationStatus.UNCERTAIN)
-             
-             final_confidence = 0.0
-             if mapped_status == VerificationStatus.FAILURE:
-                 final_confidence = 1.0
-             elif mapped_status == VerificationStatus.SUCCESS:
-                 final_confidence = result.get("proof_quality_score", 0) / 100.0
-             
-             return VerificationResult(
-                 status=mapped_status,
-                 confidence=final_confidence,
-                 failure_reason=result.get("reasoning") if mapped_status != VerificationStatus.SUCCESS else None,
-                 evidence=evidence
-             )
+             return self._map_judgement(result, evidence)
              
         except Exception as e:
             return VerificationResult(
@@ -127,10 +183,225 @@ class VerifyAgent:
                 failure_reason=f"Verification Error: {str(e)}"
             )
 
-    def verify_strava(self, contract: GoalContract, activity_id: str) -> VerificationResult:
+    def _judge_batch(self, items: List[Tuple[GoalContract, Evidence]]) -> List[VerificationResult]:
+        """
+        One prompt for several (contract, evidence) pairs: the instruction block is sent once
+        and the model returns a JSON array tagged by item id. Items missing from a malformed
+        response are re-judged individually.
+        """
+        if len(items) == 1:
+            return [self._judge_one(*items[0])]
+
+        images = [self.images.prepare_all(evidence.image_urls) for _, evidence in items]
+        described = "\n".join(
+            f"        [ITEM id={i}]\n{self._describe_item(contract, evidence, len(images[i]))}"
+            for i, (contract, evidence) in enumerate(items)
+        )
+        prompt = f"""
+        System Instruction:
+        {JUDGE_INSTRUCTIONS}
+        Judge EACH item below independently; evidence from one item says nothing about another.
+
+        INPUT ({len(items)} items):
+{described}
+        
+        OUTPUT JSON: an array with exactly one object per item. Each object has an "id"
+        (the item id) plus these fields:
+        {JUDGE_OUTPUT_FIELDS}
+        """
+
+        contents = [prompt]
+        for i, parts in enumerate(images):
+            if parts:
+                contents.append(f"Images for ITEM id={i}:")
+                contents.extend(parts)
+
+        try:
+            self._count_call()
+            with self.timings.stage("model_call"):
+                response = self.llm.generate(self.model, contents, generation_config={"response_mime_type": "application/json"},
+                                             caller="verify_generic_batch")
+        except Exception as e:
+            # The API call failed even after the gateway's retries: same outcome as the single-item path
+            return [VerificationResult(status=VerificationStatus.UNCERTAIN, confidence=0.0, failure_reason=f"Verification Error: {str(e)}")
+                    for _ in items]
+
+        by_id = {}
+        try:
+            parsed = json.loads(response.text)
+            if isinstance(parsed, dict):
+                parsed = parsed.get("results") or parsed.get("items") or []
+            for entry in parsed:
+                if isinstance(entry, dict) and isinstance(entry.get("id"), int) and 0 <= entry["id"] < len(items):
+                    by_id.setdefault(entry["id"], entry)
+        except Exception as e:
+            print(f"[WARN] Malformed batched verification response: {e}")
+
+        results = []
+        for i, (contract, evidence) in enumerate(items):
+            if i in by_id:
+                log_agent_trace("verify_generic", {"evidence": evidence.model_dump(), "batch_size": len(items)}, by_id[i])
+                results.append(self._map_judgement(by_id[i], evidence))
+            else:
+                with self._stats_lock:
+                    self.batch_fallbacks += 1
+                results.append(self._judge_one(contract, evidence))
+        return results
+
+    def _describe_item(self, contract: GoalContract, evidence: Evidence, attached: int = 0) -> str:
+        if attached:
+            image_line = f"{attached} image(s) attached"
+        elif evidence.image_urls:
+            image_line = f"{evidence.image_urls} (could not be loaded)"
+        else:
+            image_line = "No Image Provided"
+        return f"""        - Goal: "{contract.goal_description}"
+        - Evidence Image: {image_line}
+        - Text Context: {evidence.text_evidence}
+        - Timestamp: {evidence.start_time}"""
+
+    def _map_judgement(self, result: Dict[str, Any], evidence: Evidence) -> VerificationResult:
+        # Map Forensic Output to Standard Result
+        status_map = {
+            "SUCCESS": VerificationStatus.SUCCESS,
+            "FAILURE": VerificationStatus.FAILURE,
+            "UNCERTAIN": VerificationStatus.UNCERTAIN
+        }
+        
+        verdict = result.get("final_verdict", "UNCERTAIN")
+        
+        # Logic Fix: If verdict is FAILURE, we are confident in the failure (lack of proof).
+        # If verdict is SUCCESS, we use the proof_quality_score as confidence.
+        mapped_status = status_map.get(verdict, VerificationStatus.UNCERTAIN)
+        
+        final_confidence = 0.0
+        if mapped_status == VerificationStatus.FAILURE:
+            final_confidence = 1.0
+        elif mapped_status == VerificationStatus.SUCCESS:
+            final_confidence = result.get("proof_quality_score", 0) / 100.0
+        
+        return VerificationResult(
+            status=mapped_status,
+            confidence=final_confidence,
+            failure_reason=result.get("reasoning") if mapped_status != VerificationStatus.SUCCESS else None,
+            evidence=evidence
+        )
+
+    def _count_call(self):
+        with self._stats_lock:
+            self.generic_calls += 1
+
+    def batch_stats(self) -> Dict[str, Any]:
+        stats = self.batcher.stats() if self.batcher else {"items": self.generic_calls, "flushes": self.generic_calls}
+        stats.update({
+            "enabled": self.batcher is not None,
+            "llm_calls": self.generic_calls,
+            "fallback_calls": self.batch_fallbacks,
+            "calls_saved": max(0, stats["items"] - self.generic_calls),
+        })
+        return stats
+
+    def _fresh_index(self, user_id: Optional[str], after: int) -> Optional[ActivityIndex]:
+        # Caller holds _index_lock
+        entry = self._indexes.get(user_id)
+        if entry is None or entry[2] > after or time.monotonic() - entry[3] > self.index_ttl_sec:
+            return None
+        self._indexes.move_to_end(user_id)
+        return entry[1]
+
+    def _activity_index(self, user_id: Optional[str], start: datetime) -> ActivityIndex:
+        """
+        `user_id`'s activities from `start` on. Only the missing part is fetched from Strava:
+        the first build reads from `start`, an earlier window reads the gap before what is
+        cached, and a stale index re-reads from its newest activity (minus an overlap).
+        """
+        after = int(start.timestamp()) # Inclusive; Strava's `after` is exclusive, hence the -1 below
+        with self._index_lock:
+            index = self._fresh_index(user_id, after)
+            if index is not None:
+                return index
+            build_lock = self._index_builds.setdefault(user_id, threading.Lock())
+
+        # One build per user at a time; other users' lookups don't wait on it
+        with build_lock:
+            with self._index_lock:
+                index = self._fresh_index(user_id, after)
+                entry = self._indexes.get(user_id)
+            if index is not None:
+                return index
+
+            client = self._strava(user_id)
+            if entry is None:
+                rows, covered = {}, after
+                fetched = client.list_activities(after=after - 1)
+            else:
+                rows, old_index, covered, refreshed_at = dict(entry[0]), entry[1], entry[2], entry[3]
+                fetched = []
+                if after < covered:
+                    fetched += client.list_activities(after=after - 1, before=covered)
+                    covered = after
+                if time.monotonic() - refreshed_at > self.index_ttl_sec:
+                    newest = int(old_index.start[-1]) if len(old_index) else covered
+                    fetched += client.list_activities(after=max(covered, newest - INDEX_REFRESH_OVERLAP_SEC))
+            for activity in fetched:
+                rows[str(activity.get("id"))] = activity
+            index = ActivityIndex(list(rows.values()))
+
+            with self._index_lock:
+                self._indexes[user_id] = (rows, index, covered, time.monotonic())
+                self._indexes.move_to_end(user_id)
+                while len(self._indexes) > self.index_users:
+                    evicted, _ = self._indexes.popitem(last=False)
+                    self._index_builds.pop(evicted, None)
+            return index
+
+    def verify_history(self, contract: GoalContract, since: Optional[datetime] = None,
+                       user_id: Optional[str] = None) -> VerificationResult:
+        """
+        Looks for any of `user_id`'s activities between `since` and the deadline that satisfies
+        the contract. The window starts when the pact was signed (`created_at`), so an activity
+        from before it doesn't count; a contract without one falls back to
+        deadline - PACT_HISTORY_LOOKBACK_DAYS. Summary rules run over the whole window at once;
+        the best few candidates are then confirmed with verify_strava (stream checks).
+        """
+        deadline = _utc(contract.deadline_utc)
+        start = since or (_utc(contract.created_at) if contract.created_at else deadline - self.history_lookback)
+        try:
+            index = self._activity_index(user_id, start)
+        except Exception as e:
+            return VerificationResult(
+                status=VerificationStatus.UNCERTAIN,
+                confidence=0.0,
+                failure_reason=f"API Error: {str(e)}"
+            )
+
+        scan = index.evaluate(contract, start, deadline)
+        last_failure = None
+        for activity_id in scan["qualifying"][:HISTORY_CONFIRM_LIMIT]:
+            result = self.verify_strava(contract, activity_id, user_id)
+            if result.status == VerificationStatus.SUCCESS:
+                return result
+            last_failure = result
+
+        if last_failure:
+            return last_failure
+        if scan["closest"]:
+            reason = f"No qualifying activity between {start.isoformat()} and {deadline.isoformat()} ({scan['candidates']} checked); closest {scan['closest']['id']}: " + "; ".join(scan["closest"]["reasons"])
+        else:
+            reason = f"No activities between {start.isoformat()} and {deadline.isoformat()}"
+        return VerificationResult(status=VerificationStatus.FAILURE, confidence=1.0, failure_reason=reason)
+
+    def _strava(self, user_id: Optional[str]):
+        # Raises StravaNotLinked for a user who hasn't connected Strava
+        if user_id and self.strava_accounts is not None:
+            return self.strava_accounts.client(user_id)
+        return self.strava_client
+
+    def verify_strava(self, contract: GoalContract, activity_id: str, user_id: Optional[str] = None) -> VerificationResult:
         # 1. Fetch Data
         try:
-            activity = self.strava_client.get_activity(activity_id)
+            client = self._strava(user_id)
+            activity = client.get_activity(activity_id)
         except Exception as e:
             return VerificationResult(
                 status=VerificationStatus.UNCERTAIN, 
@@ -165,7 +436,11 @@ class VerifyAgent:
 
         # --- LOGIC GATES ---
 
-        # 3. Time Validation
+        # 3. Activity Type (a long ride never satisfies a running pact)
+        if not activity_type_allowed(contract, sport(activity), is_treadmill):
+            failure_reasons.append(f"Activity type {sport(activity) or 'Unknown'}{' (indoor)' if is_treadmill else ''} is not allowed")
+
+        # 3b. Time Validation
         if act_start > contract.deadline_utc:
             failure_reasons.append(f"Activity started after deadline ({act_start} > {contract.deadline_utc})")
         
@@ -191,15 +466,12 @@ class VerifyAgent:
             elif contract.min_heart_rate_avg and avg_hr < contract.min_heart_rate_avg:
                 failure_reasons.append(f"Avg HR {avg_hr} < min required {contract.min_heart_rate_avg}")
             
-            # Advanced Stream Check (Opik Trace for detailed cheat detection)
-            streams = self.strava_client.get_activity_streams(activity_id)
+            # Advanced Stream Check: vectorized HR analytics over the full stream
+            # (variability, flat segments, spikes, HR/pace correlation)
+            # Streams are cached on disk (memory-mapped), so re-verifying never refetches them
+            streams = self.stream_cache.get_or_fetch(activity_id, lambda: client.get_activity_streams(activity_id))
             if streams:
-                hrs = [p['heartrate'] for p in streams]
-                if len(hrs) > 10:
-                    import statistics
-                    stdev = statistics.stdev(hrs)
-                    if stdev < 2.0: # Extremely flat HR
-                        failure_reasons.append(f"HR Variability suspicious (stdev={stdev:.2f})")
+                failure_reasons.extend(analyze_streams(streams)["flags"])
 
         # --- CONCLUSION ---
         
@@ -216,3 +488,6 @@ class VerifyAgent:
             confidence=0.98, # High confidence
             evidence=evidence
         )
+
+def _utc(value: datetime) -> datetime:
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
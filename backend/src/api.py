@@ -1,22 +1,33 @@
 import firebase_admin
 from firebase_admin import credentials, firestore, auth
-from fastapi import FastAPI, HTTPException, Header, Depends
+from fastapi import FastAPI, HTTPException, Header, Depends, Response, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Optional, List, Dict, Any
 from fastapi import UploadFile, File, Form
 from firebase_admin import storage
 import uuid
+import math
+import hashlib
+import secrets
 import datetime
 import os
+import requests
 from src.agents.contract import ContractAgent
 from src.agents.verify import VerifyAgent
 from src.agents.detect import DetectAgent
 from src.agents.adapt import AdaptAgent
 from src.core.schemas import GoalContract, VerificationResult, AuditorDecision, Penalty, ConsequenceType
 from src.integrations.twitter import twitter_client
-import difflib
-import re
+from src.integrations.strava import StravaAccounts
+from src.core.executor import run_blocking, blocking_executor
+from src.core.llm_gateway import llm_gateway, LLMUnavailable, QuotaExhausted
+from src.core.llm_scheduler import llm_priority, BACKGROUND
+from src.core.similarity import (
+    DUPLICATE_WINDOW, as_utc, contract_index_fields, find_duplicate, normalize_goal_text, number_fingerprint
+)
 
 app = FastAPI(title="PACT API", description="API for PACT Zero Agent System", root_path="/api")
 
@@ -70,16 +81,72 @@ app.add_middleware(
 )
 
 from src.core.stakes import StakeManager
+from src.core.jobs import JobQueue
+from src.core.post_verification import PostVerificationEffects
+from src.core.reaper import Reaper
+from src.core.profiles import ProfileCache
+from src.core.feed import FeedCache
+from src.core.leaderboard import Leaderboard
+from src.core.counters import ShardedCounters
+from src.core.evidence import EvidenceStore, EvidenceTooLarge
+from src.core.stage_timings import StageTimings
+from src.core.batch_verify import stream_batch, batch_concurrency, batch_max_items
+from src.core.streaming import stream_sse
+from src.core.verification_memo import build_memo_from_env, verification_key
+from src.core.contract_cache import normalize_goal
+from src.core.single_flight import SingleFlight, ClientDisconnected
+from src.core.auto_verify import AutoVerifier
+from src.core.webhooks import WebhookIngestor
+
+# Content-addressed evidence storage; the verifier only reads images stored here.
+# Upload (decode/resize/encode) and verification (fetch/model_call) stage timings are reported together
+image_timings = StageTimings()
+evidence_store = EvidenceStore(bucket, timings=image_timings)
 
 # Agents
 contract_agent = ContractAgent()
-verify_agent = VerifyAgent()
+# Per-user Strava tokens (users/{uid}.strava_auth) once the app's OAuth client is configured
+strava_accounts = StravaAccounts(db) if db and StravaAccounts.configured() else None
+verify_agent = VerifyAgent(evidence_prefix=evidence_store.url_prefix, strava_accounts=strava_accounts, timings=image_timings)
 detect_agent = DetectAgent()
 adapt_agent = AdaptAgent()
 
+# Identical concurrent negotiate/verify requests share one call; cancelled once every client has gone
+llm_flights = SingleFlight()
+
 # Stake Manager
 stake_manager = StakeManager(db)
 
+# Social: cached profiles + materialized public feed
+profile_cache = ProfileCache(db)
+feed_cache = FeedCache(db)
+stat_counters = ShardedCounters(db)
+leaderboard = Leaderboard(db, profile_cache, counters=stat_counters)
+
+# Stored /verify responses for Idempotency-Key replays (PACT_IDEMPOTENCY_CACHE=off disables)
+verify_responses = build_memo_from_env("PACT_IDEMPOTENCY_CACHE", "idempotent_responses", default_ttl_sec=24 * 3600)
+
+# Durable queue for post-verification side effects
+job_queue = JobQueue()
+post_verification = PostVerificationEffects(job_queue, db, adapt_agent, stake_manager, profile_cache, feed_cache, leaderboard, stat_counters)
+
+@app.on_event("startup")
+def start_job_workers():
+    # Jobs left pending by a restart run now rather than on the next enqueue
+    job_queue.start()
+
+@app.on_event("shutdown")
+def stop_job_workers():
+    job_queue.stop()
+
+# Strava webhooks -> coalesced per-athlete batches -> auto-verification of open contracts.
+# Accepted events are journaled in the job queue, so none is lost to a restart or a full pipeline.
+auto_verifier = AutoVerifier(db, verify_agent, detect_agent, post_verification)
+webhook_ingestor = WebhookIngestor(auto_verifier.run, journal=job_queue)
+
+# The Reaper (expired contract enforcement)
+reaper = Reaper(db, detect_agent, adapt_agent, stake_manager, twitter_client, profile_cache, leaderboard=leaderboard, counters=stat_counters)
+
 class GoalRequest(BaseModel):
     goal_text: str
     user_id: Optional[str] = None
@@ -104,15 +171,59 @@ async def verify_token(authorization: str = Header(...)):
         raise HTTPException(status_code=401, detail="Invalid Token")
 
 @app.post("/negotiate", response_model=GoalContract)
-async def negotiate_goal(request: GoalRequest):
+async def negotiate_goal(request: GoalRequest, http_request: Request):
     """
     Step 1: User sends goal text, Agent returns a structured contract.
+    Identical goals negotiated concurrently share one Gemini call.
     """
-    contract = contract_agent.negotiate(request.goal_text)
+    try:
+        contract = await llm_flights.run(
+            f"negotiate:{normalize_goal(request.goal_text)}",
+            contract_agent.negotiate, request.goal_text,
+            is_disconnected=http_request.is_disconnected
+        )
+    except ClientDisconnected:
+        return Response(status_code=499) # Nobody is listening; the status only shows up in access logs
+    except LLMUnavailable as e:
+        raise _llm_unavailable(e)
     if not contract:
         raise HTTPException(status_code=500, detail="Negotiation failed. Check API keys.")
     return contract
 
+def _llm_unavailable(e: LLMUnavailable) -> HTTPException:
+    """429 when the Gemini quota is spent, 503 when the gateway is failing fast; both say when to retry."""
+    retry_after = max(1, math.ceil(e.retry_after or 1))
+    status = 429 if isinstance(e, QuotaExhausted) else 503
+    return HTTPException(status_code=status, detail=str(e), headers={"Retry-After": str(retry_after)})
+
+@app.post("/negotiate/stream")
+async def negotiate_goal_stream(request: GoalRequest):
+    """
+    Step 1, streamed: server-sent events with each contract field as soon as Gemini has
+    produced it (`event: field`), then the validated contract (`event: contract`).
+    """
+    return StreamingResponse(
+        stream_sse(contract_agent.negotiate_stream(request.goal_text)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def _find_duplicate_contract(user_id: str, contract: GoalContract) -> Optional[dict]:
+    """
+    Fetches only the user's Active contracts with the same number fingerprint and a deadline
+    within the duplicate window, then confirms similarity on that short list.
+    """
+    new_goal = normalize_goal_text(contract.goal_description)
+    new_deadline = as_utc(contract.deadline_utc)
+    query = db.collection('contracts') \
+        .where('user_id', '==', user_id) \
+        .where('status', '==', 'Active') \
+        .where('dup_numbers', '==', number_fingerprint(new_goal)) \
+        .where('deadline_at', '>', new_deadline - DUPLICATE_WINDOW) \
+        .where('deadline_at', '<', new_deadline + DUPLICATE_WINDOW)
+    candidates = [doc.to_dict() for doc in query.stream()]
+    return find_duplicate(contract.goal_description, contract.deadline_utc, candidates)
+
 @app.post("/commit")
 async def commit_goal(contract: GoalContract, token_data: dict = Depends(verify_token)):
     """
@@ -122,69 +233,11 @@ async def commit_goal(contract: GoalContract, token_data: dict = Depends(verify_
         user_id = token_data['uid']
         
         # 1.1 Duplicate Check (NEW)
-        # 1.1 Duplicate Check (NEW)
-        # Query for existing Active contracts for this user
-        contracts_ref = db.collection('contracts').where('user_id', '==', user_id).where('status', '==', 'Active')
-        active_docs = contracts_ref.stream()
-        
-        # Safely get new goal
-        new_goal = (contract.goal_description or "").strip().lower()
-        new_deadline = contract.deadline_utc 
-        
-        # Ensure new_deadline is offset-aware UTC
-        if new_deadline.tzinfo is None:
-            new_deadline = new_deadline.replace(tzinfo=datetime.timezone.utc)
-        
-        for doc in active_docs:
-            existing = doc.to_dict()
-            # Safely get existing goal (handle None/Null in DB)
-            existing_goal = (existing.get('goal_description') or "").strip().lower()
-            
-            # Check Goal Text Similarity (Smart Fuzzy Match)
-            # 1. Exact Match
-            is_duplicate_text = existing_goal == new_goal
-            
-            # 2. Fuzzy Match (if not exact)
-            if not is_duplicate_text:
-                similarity = difflib.SequenceMatcher(None, existing_goal, new_goal).ratio()
-                if similarity > 0.8: # 80% similarity threshold
-                    # 3. Number Safety Check (Avoid "Run 5km" matching "Run 10km")
-                    # Extract numbers from both strings
-                    nums_new = set(re.findall(r'\d+', new_goal))
-                    nums_existing = set(re.findall(r'\d+', existing_goal))
-                    
-                    # Only consider duplicate if numbers are identical (or both have no numbers)
-                    if nums_new == nums_existing:
-                        is_duplicate_text = True
-            
-            if is_duplicate_text:
-                # Check Deadline "within same timeframe"
-                # Parse existing deadline
-                existing_deadline_val = existing.get('deadline_utc')
-                existing_deadline = None
-                
-                # Handle Firestore Timestamp (has to_datetime)
-                if hasattr(existing_deadline_val, 'to_datetime'):
-                    existing_deadline = existing_deadline_val.to_datetime()
-                elif isinstance(existing_deadline_val, datetime.datetime):
-                    existing_deadline = existing_deadline_val
-                elif isinstance(existing_deadline_val, str):
-                    try:
-                        existing_deadline = datetime.datetime.fromisoformat(existing_deadline_val.replace('Z', '+00:00'))
-                    except:
-                        pass
-                
-                # If we have a valid existing deadline, compare
-                if existing_deadline:
-                    if existing_deadline.tzinfo is None:
-                        existing_deadline = existing_deadline.replace(tzinfo=datetime.timezone.utc)
-                    
-                    # Check if deadlines are close (e.g., within 12 hours) to consider it the "same timeframe"
-                    # Or strictly same day? User said "same timeframe", usually implies same deadline.
-                    # Let's check difference < 12 hours
-                    diff = abs((new_deadline - existing_deadline).total_seconds())
-                    if diff < 43200: # 12 hours
-                        raise HTTPException(status_code=409, detail=f"Duplicate active pact detected! You are already committed to: '{existing.get('goal_description')}' due by {existing_deadline.strftime('%Y-%m-%d %H:%M')}")
+        # Index lookup on fields written at commit time (see src/core/similarity.py)
+        duplicate = await run_blocking(_find_duplicate_contract, user_id, contract)
+        if duplicate:
+            existing_deadline = as_utc(duplicate.get('deadline_at') or duplicate.get('deadline_utc'))
+            raise HTTPException(status_code=409, detail=f"Duplicate active pact detected! You are already committed to: '{duplicate.get('goal_description')}' due by {existing_deadline.strftime('%Y-%m-%d %H:%M')}")
 
         # 1. Update/Create User Profile
         user_ref = db.collection(u'users').document(user_id)
@@ -195,16 +248,12 @@ async def commit_goal(contract: GoalContract, token_data: dict = Depends(verify_
             'last_login_at': firestore.SERVER_TIMESTAMP,
             'updated_at': firestore.SERVER_TIMESTAMP
         }
-        # Stats initialization (using set with merge=True to not overwrite existing stats)
-        user_ref.set(user_data, merge=True)
+        # Profile fields only (set with merge=True to not overwrite anything else)
+        await run_blocking(user_ref.set, user_data, merge=True)
+        profile_cache.prime(user_id, user_data['display_name'], user_data['photo_url'])
         
-        # Atomically increment total_contracts_signed
-        # (For MVP doing simple update to avoid transaction complexity if doc doesn't exist yet, 
-        # but technically we should check existence. `set(merge=True)` handles existence.)
-        # We can use FieldValue.increment
-        user_ref.update({
-            'stats.total_contracts_signed': firestore.Increment(1)
-        })
+        # Increment total_contracts_signed on a counter shard, not the user document itself
+        await run_blocking(stat_counters.increment, user_id, 'total_contracts_signed')
 
         # 2. Store Contract
         doc_ref = db.collection(u'contracts').document()
@@ -213,9 +262,13 @@ async def commit_goal(contract: GoalContract, token_data: dict = Depends(verify_
         contract_dict['user_id'] = user_id
         contract_dict['status'] = 'Active'
         contract_dict['created_at'] = firestore.SERVER_TIMESTAMP
-        doc_ref.set(contract_dict)
+        # Similarity signature + native deadline timestamp for the duplicate index
+        contract_dict.update(contract_index_fields(contract.goal_description, contract.deadline_utc))
+        await run_blocking(doc_ref.set, contract_dict)
         
         return {"status": "success", "contract_id": doc_ref.id}
+    except HTTPException:
+        raise
     except Exception as e:
         import traceback
         traceback.print_exc()
@@ -226,17 +279,15 @@ async def commit_goal(contract: GoalContract, token_data: dict = Depends(verify_
 async def upload_evidence(file: UploadFile = File(...)):
     """
     Uploads an image to Firebase Storage and returns the public URL.
+    Stored once per content hash; re-uploading the same image reuses the existing URL.
     """
+    if file.size is not None and file.size > evidence_store.max_bytes:
+        raise HTTPException(status_code=413, detail=str(EvidenceTooLarge(evidence_store.max_bytes)))
     try:
-        # Generate unique filename
-        filename = f"evidence/{uuid.uuid4()}_{file.filename}"
-        blob = bucket.blob(filename)
-        
-        # Upload
-        blob.upload_from_file(file.file, content_type=file.content_type)
-        blob.make_public()
-        
-        return {"url": blob.public_url}
+        # Chunked hash + upload off the event loop (the body is already spooled to disk)
+        return await run_blocking(evidence_store.store, file.file, file.filename, file.content_type)
+    except EvidenceTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         print(f"Upload Error: {e}")
         # MVP Mock Fallback if storage not configured
@@ -244,11 +295,12 @@ async def upload_evidence(file: UploadFile = File(...)):
     
 from src.utils.opik_utils import track
 
-@app.post("/verify")
-@track(name="pact_verification_flow", tags=["api", "verification"])
-async def verify_activity(request: VerifyRequest):
+async def _run_verification(request: VerifyRequest, request_key: Optional[str] = None, is_disconnected=None) -> dict:
     """
-    Step 2: Simulate verification (Demo purposes).
+    Verify -> Detect -> queue side effects for one request.
+    Shared by /verify and /verify/batch. `request_key` scopes the side-effect job
+    idempotency keys (a fresh one per call when not given). Identical verifications in
+    flight share one call; raises ClientDisconnected if the client left while waiting.
     """
     # 1. Verify
     
@@ -263,193 +315,193 @@ async def verify_activity(request: VerifyRequest):
             image_urls=[request.image_url] if request.image_url else []
         )
     
-    verification_result = verify_agent.verify(request.contract, request.activity_id, evidence_input)
+    verification_result = await llm_flights.run(
+        f"verify:{verification_key(request.contract, request.activity_id, evidence_input, request.user_id)}",
+        verify_agent.verify, request.contract, request.activity_id, evidence_input, request.user_id,
+        is_disconnected=is_disconnected
+    )
     
-    # Update Progress Stats in User Doc
-    if request.user_id:
-        try:
-           # We use a Fire-and-Forget approach or simple await for MVP
-           # In production, this might be a background task
-           user_ref = db.collection(u'users').document(request.user_id)
-           if verification_result.status == "SUCCESS":
-               user_ref.update({
-                   'stats.contracts_completed': firestore.Increment(1)
-               })
-           elif verification_result.status == "FAILURE":
-                user_ref.update({
-                   'stats.contracts_failed': firestore.Increment(1)
-               })
-        except Exception as e:
-            print(f"Stats Update Error: {e}")
-
     # 2. Detect (Audit)
-    auditor_decision = detect_agent.evaluate(request.contract, verification_result)
-    
-    # 3. Adapt (Enforce)
-    enforcement_log = None
-    if auditor_decision.verdict == "ALLOW_ENFORCEMENT":
-        enforcement_log = adapt_agent.adapt_and_enforce(request.contract, auditor_decision)
-        
-    # 4. Stake Accumulation (NEW)
-    stake_result = None
-    if request.user_id:
-        try:
-            stake_result = stake_manager.handle_outcome(request.user_id, verification_result)
-        except Exception as e:
-            print(f"Stake Error: {e}")
-            stake_result = {"error": str(e)}
+    # Pure local rule check; kept inline because the client renders the audit verdict
+    auditor_decision = await run_blocking(detect_agent.evaluate, request.contract, verification_result)
 
-    # Get Opik Trace ID
-    from src.utils.opik_utils import opik_context
-    trace_data = opik_context.get_current_trace_data()
-    trace_id = trace_data.id if trace_data else None
+    # 3. Queue Side Effects (stats, Adapt/enforce, stake, feed)
+    # They run on the durable job queue so the response doesn't wait on six more round trips
+    jobs = {}
+    try:
+        jobs = await run_blocking(
+            post_verification.schedule,
+            request_key or uuid.uuid4().hex,
+            request.user_id,
+            request.contract,
+            verification_result,
+            auditor_decision,
+            request.text_evidence
+        )
+    except Exception as e:
+        print(f"Side Effect Queue Error: {e}")
 
-    # 5. Create Feed Event (NEW - Social)
-    if verification_result.status != "UNCERTAIN" and request.contract.is_public:
-        try:
-             # Basic user info lookup (optimization: pass in request or cached)
-             user_doc = db.collection(u'users').document(request.user_id).get()
-             user_data = user_doc.to_dict() if user_doc.exists else {}
-             
-             feed_item = {
-                 "type": "verification",
-                 "user_id": request.user_id,
-                 "user_name": user_data.get("display_name", "Anonymous Agent"),
-                 "user_photo": user_data.get("photo_url"),
-                 "goal_description": request.contract.goal_description,
-                 "status": verification_result.status,
-                 "timestamp": firestore.SERVER_TIMESTAMP,
-                 "evidence_summary": request.text_evidence if request.text_evidence else "Evidence verified by AI.",
-                 "trust_score_delta": 5 if verification_result.status == "SUCCESS" else -10 # Mock logic
-             }
-             db.collection(u'feed').add(feed_item)
-        except Exception as e:
-            print(f"Feed Creation Error: {e}")
+    enforcement_log = None
+    if "enforce" in jobs:
+        enforcement_log = f"QUEUED: Consequence scheduled for execution (job {jobs['enforce']})."
+
+    stake_result = None
+    if "stake" in jobs:
+        stake_result = {"action": "QUEUED", "amount": 0, "reason": "Stake update queued.", "job_id": jobs["stake"]}
 
     return {
         "verification": verification_result,
         "audit": auditor_decision,
         "enforcement": enforcement_log,
         "stake_update": stake_result,
-        "opik_trace_id": trace_id
+        "jobs": jobs
     }
 
+@app.post("/verify")
+@track(name="pact_verification_flow", tags=["api", "verification"])
+async def verify_activity(request: VerifyRequest, response: Response, http_request: Request, idempotency_key: Optional[str] = Header(None)):
+    """
+    Step 2: Simulate verification (Demo purposes).
+
+    With an `Idempotency-Key` header, a retry of the same request replays the stored
+    response, and its stats/enforcement/stake/feed jobs are only ever enqueued once.
+    """
+    request_key = None
+    if idempotency_key:
+        scope = hashlib.sha256(f"{request.user_id}:{idempotency_key}".encode()).hexdigest()
+        fingerprint = hashlib.sha256(request.model_dump_json().encode()).hexdigest()
+        request_key = f"idem:{scope}"
+        stored = await run_blocking(verify_responses.get, scope) if verify_responses else None
+        if stored:
+            if stored["fingerprint"] != fingerprint:
+                raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request.")
+            response.headers["Idempotent-Replayed"] = "true"
+            return stored["response"]
+
+    try:
+        result = await _run_verification(request, request_key, is_disconnected=http_request.is_disconnected)
+    except ClientDisconnected:
+        return Response(status_code=499)
+
+    # Get Opik Trace ID
+    from src.utils.opik_utils import opik_context
+    trace_data = opik_context.get_current_trace_data()
+    result["opik_trace_id"] = trace_data.id if trace_data else None
+
+    if idempotency_key and verify_responses:
+        await run_blocking(verify_responses.set, scope, {"fingerprint": fingerprint, "response": jsonable_encoder(result)})
+    return result
+
+class VerifyBatchRequest(BaseModel):
+    # Validated per item, so one malformed entry fails alone instead of the whole batch
+    items: List[Dict[str, Any]]
+
+async def _run_batch_item(item: Dict[str, Any]) -> dict:
+    # Bulk verification queues behind single /verify and /negotiate requests for LLM quota
+    with llm_priority(BACKGROUND):
+        return await _run_verification(VerifyRequest(**item))
+
+@app.post("/verify/batch")
+async def verify_batch(request: VerifyBatchRequest):
+    """
+    Bulk verification (e.g. nightly activity sync). Items run concurrently, at most
+    PACT_VERIFY_BATCH_CONCURRENCY at a time, and each result is streamed back as one
+    NDJSON line as soon as it finishes: {"index", "status": "ok"|"error", "result"|"error"}.
+    """
+    max_items = batch_max_items()
+    if len(request.items) > max_items:
+        raise HTTPException(status_code=413, detail=f"Batch too large (max {max_items} items)")
+    return StreamingResponse(
+        stream_batch(request.items, _run_batch_item, batch_concurrency()),
+        media_type="application/x-ndjson"
+    )
+
+class StravaConnectRequest(BaseModel):
+    code: str # From Strava's OAuth redirect (scope activity:read_all)
+
+@app.post("/strava/connect")
+async def strava_connect(request: StravaConnectRequest, token_data: dict = Depends(verify_token)):
+    """
+    Links the signed-in user's Strava account: stores their tokens and athlete id, so
+    their activities are read with their own token and webhook events find their pacts.
+    """
+    if strava_accounts is None:
+        raise HTTPException(status_code=503, detail="Strava is not configured")
+    try:
+        athlete_id = await run_blocking(strava_accounts.link, token_data['uid'], request.code)
+    except requests.HTTPError as e:
+        raise HTTPException(status_code=400, detail=f"Strava authorization failed: {e}")
+    return {"status": "success", "athlete_id": athlete_id}
+
+@app.get("/webhooks/strava")
+async def strava_webhook_validation(
+    hub_mode: str = Query(None, alias="hub.mode"),
+    hub_verify_token: str = Query(None, alias="hub.verify_token"),
+    hub_challenge: str = Query(None, alias="hub.challenge")
+):
+    """
+    Strava push subscription handshake: echo the challenge if the verify token matches.
+    Refused unless STRAVA_VERIFY_TOKEN is configured.
+    """
+    expected = os.environ.get("STRAVA_VERIFY_TOKEN")
+    if not expected:
+        raise HTTPException(status_code=403, detail="Webhook subscriptions are not configured")
+    if hub_mode != "subscribe" or not hub_challenge or not secrets.compare_digest(hub_verify_token or "", expected):
+        raise HTTPException(status_code=403, detail="Invalid subscription request")
+    return {"hub.challenge": hub_challenge}
+
+@app.post("/webhooks/strava")
+async def strava_webhook(event: Dict[str, Any], response: Response):
+    """
+    Strava activity/athlete events. Acknowledged immediately (Strava wants a 200 within
+    2s); verification of the athlete's open contracts runs in the background once their
+    burst of events has gone quiet. Each event is journaled before the 200, so an event
+    that can't wait in memory is queued rather than refused. Refused unless
+    STRAVA_SUBSCRIPTION_ID is configured.
+    """
+    subscription_id = os.environ.get("STRAVA_SUBSCRIPTION_ID")
+    if not subscription_id:
+        raise HTTPException(status_code=403, detail="Webhook subscriptions are not configured")
+    if str(event.get("subscription_id")) != subscription_id:
+        raise HTTPException(status_code=403, detail="Unknown subscription")
+    outcome = await run_blocking(webhook_ingestor.handle, event)
+    return {"status": outcome}
+
 @app.get("/feed")
-async def get_feed():
-    """
-    Returns the 20 most recent public feed events. (Mock Data for Demo)
-    """
-    # MOCK DATA FOR DEMO
-    utc_now = datetime.datetime.now(datetime.timezone.utc)
-    return [
-        {
-            "type": "verification",
-            "user_name": "Sarah Jenkins",
-            "user_photo": "https://i.pravatar.cc/150?u=sarah",
-            "goal_description": "Run 5km before 8 AM",
-            "status": "SUCCESS",
-            "timestamp": (utc_now - datetime.timedelta(minutes=5)).isoformat(),
-            "evidence_summary": "Strava Activity Verified: 5.02km @ 5:30/km",
-            "trust_score_delta": 5
-        },
-        {
-            "type": "verification",
-            "user_name": "David Kim",
-            "user_photo": "https://i.pravatar.cc/150?u=david",
-            "goal_description": "Read 30 pages of 'Atomic Habits'",
-            "status": "SUCCESS",
-            "timestamp": (utc_now - datetime.timedelta(minutes=14)).isoformat(),
-            "evidence_summary": "Photo Verified: Open book with page number visible.",
-            "trust_score_delta": 5
-        },
-        {
-            "type": "verification",
-            "user_name": "Marcus Chen",
-            "user_photo": "https://i.pravatar.cc/150?u=marcus",
-            "goal_description": "No Sugar for 24h",
-            "status": "FAILURE",
-            "timestamp": (utc_now - datetime.timedelta(minutes=45)).isoformat(),
-            "evidence_summary": "Self-Reported: 'Ate a donut at the office.'",
-            "trust_score_delta": -15
-        },
-        {
-            "type": "verification",
-            "user_name": "Elena Rodriguez",
-            "user_photo": "https://i.pravatar.cc/150?u=elena",
-            "goal_description": "Ship 3 Pull Requests",
-            "status": "SUCCESS",
-            "timestamp": (utc_now - datetime.timedelta(hours=1, minutes=12)).isoformat(),
-            "evidence_summary": "GitHub API: 3 Merged PRs detected in repo/frontend.",
-            "trust_score_delta": 10
-        },
-        {
-            "type": "verification",
-            "user_name": "James T.",
-            "user_photo": "https://i.pravatar.cc/150?u=james",
-            "goal_description": "Wake up by 6:00 AM",
-            "status": "SUCCESS",
-            "timestamp": (utc_now - datetime.timedelta(hours=2)).isoformat(),
-            "evidence_summary": "Photo Verified: Watch face time check.",
-            "trust_score_delta": 5
-        }
-    ]
+async def get_feed(response: Response, cursor: Optional[str] = None, limit: int = 20):
+    """
+    Returns the most recent public feed events, newest first.
+    Pass the `X-Next-Cursor` response header back as `?cursor=` for older pages.
+    """
+    if not db:
+        return []
+
+    try:
+        items, next_cursor = await run_blocking(feed_cache.page, cursor, limit)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return items
 
 @app.get("/leaderboard")
-async def get_leaderboard():
-    """
-    Returns top 10 users by 'contracts_completed'. (Mock Data for Demo)
-    """
-    return [
-        {
-            "user_id": "user_001",
-            "display_name": "Sarah Jenkins",
-            "photo_url": "https://i.pravatar.cc/150?u=sarah",
-            "contracts_completed": 142,
-            "trust_score": 99
-        },
-        {
-            "user_id": "user_002",
-            "display_name": "David Kim",
-            "photo_url": "https://i.pravatar.cc/150?u=david",
-            "contracts_completed": 115,
-            "trust_score": 97
-        },
-         {
-            "user_id": "user_003",
-            "display_name": "Elena Rodriguez",
-            "photo_url": "https://i.pravatar.cc/150?u=elena",
-            "contracts_completed": 98,
-            "trust_score": 95
-        },
-        {
-            "user_id": "user_004",
-            "display_name": "Michael Chang",
-            "photo_url": "https://i.pravatar.cc/150?u=michael",
-            "contracts_completed": 89,
-            "trust_score": 92
-        },
-        {
-            "user_id": "user_088",
-            "display_name": "Jessica Wu",
-            "photo_url": "https://i.pravatar.cc/150?u=jessica",
-            "contracts_completed": 76,
-            "trust_score": 90
-        },
-        {
-            "user_id": "user_999",
-            "display_name": "Marcus Chen",
-            "photo_url": "https://i.pravatar.cc/150?u=marcus",
-            "contracts_completed": 45,
-            "trust_score": 82
-        },
-        {
-            "user_id": "user_777",
-            "display_name": "Alex T.",
-            "photo_url": "https://i.pravatar.cc/150?u=alex",
-            "contracts_completed": 30,
-            "trust_score": 78
-        }
-    ]
+async def get_leaderboard(window: str = "all", limit: int = 10):
+    """
+    Returns the top users by 'contracts_completed' for window = all | weekly | monthly.
+    """
+    try:
+        return await run_blocking(leaderboard.top, window, max(1, limit))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/users/me/stats")
+async def get_my_stats(token_data: dict = Depends(verify_token)):
+    """
+    Returns the signed-in user's stats (summed across counter shards, cached briefly).
+    """
+    if not db:
+        return {}
+    return await run_blocking(stat_counters.get, token_data['uid'])
 
 @app.get("/cron/reaper")
 async def reaper_job(authorization: str = Header(None)):
@@ -471,101 +523,12 @@ async def reaper_job(authorization: str = Header(None)):
         if CRON_SECRET:
             raise HTTPException(status_code=401, detail="Unauthorized Cron")
 
-    results = []
-    
     try:
         if not db:
             return {"status": "error", "detail": "Database not initialized. Check FIREBASE_SERVICE_ACCOUNT_BASE64 in Vercel Env Vars."}
 
-        # 2. Find Expired Active Contracts
-        # Note: Querying by 'status' == 'Active'
-        contracts_ref = db.collection('contracts').where('status', '==', 'Active')
-        docs = contracts_ref.stream()
-        
-        now_utc = datetime.datetime.now(datetime.timezone.utc)
-        
-        for doc in docs:
-            data = doc.to_dict()
-            contract_id = doc.id
-            
-            # Check Deadline
-            deadline_str = data.get('deadline_utc')
-            if not deadline_str:
-                continue
-                
-            # Parse Firestore Timestamp or String
-            if isinstance(deadline_str, datetime.datetime):
-                deadline = deadline_str
-            else:
-                 # Attempt string parse
-                 try:
-                     deadline = datetime.datetime.fromisoformat(deadline_str.replace('Z', '+00:00'))
-                 except:
-                     continue
-            
-            # Ensure TZ aware
-            if deadline.tzinfo is None:
-                deadline = deadline.replace(tzinfo=datetime.timezone.utc)
-                
-            # Grace period? Let's say 1 hour grace.
-            if now_utc > deadline + datetime.timedelta(hours=1):
-                # EXPIRED!
-                print(f"[Reaper] Reaping Contract {contract_id} (Deadline: {deadline})")
-                
-                # 3. Simulate Failure
-                # We construct a contract object
-                contract = GoalContract(**data) # Might need validation/handling
-                
-                verification_result = VerificationResult(
-                    status="FAILURE",
-                    confidence=1.0,
-                    failure_reason="Deadline exceeded without verification. Auto-Reaped.",
-                    evidence=None
-                )
-                
-                # 4. Enforce
-                # Detect
-                auditor_decision = detect_agent.evaluate(contract, verification_result)
-                
-                # Adapt
-                if auditor_decision.verdict == "ALLOW_ENFORCEMENT":
-                     adapt_agent.adapt_and_enforce(contract, auditor_decision)
-                
-                # Stake Burn
-                user_id = data.get('user_id')
-                if user_id:
-                     stake_manager.handle_outcome(user_id, verification_result)
-                     
-                     # Update User Stats
-                     try:
-                        db.collection('users').document(user_id).update({
-                            'stats.contracts_failed': firestore.Increment(1)
-                        })
-                     except:
-                        pass
-                        
-                     # 5. Public Shaming (X/Twitter)
-                     try:
-                         # Fetch user name for the tweet
-                         user_doc = db.collection('users').document(user_id).get()
-                         user_name = user_doc.to_dict().get('display_name', 'A PACT User') if user_doc.exists else 'A PACT User'
-                         
-                         shame_message = f"🚨 SHAME ALERT 🚨\n\n{user_name} just failed their PACT: \"{contract.goal_description}\"\n\nThey didn't verify in time and lost their stake! 💸\n\n#PACT #Accountability #PublicShaming"
-                         
-                         # Post Tweet
-                         twitter_client.post_shame_tweet(shame_message)
-                     except Exception as e:
-                         print(f"Shaming Error: {e}")
-
-                # 5. Update Contract Status
-                db.collection('contracts').document(contract_id).update({
-                    'status': 'Failed',
-                    'reaped_at': firestore.SERVER_TIMESTAMP
-                })
-                
-                results.append(f"Reaped {contract_id} for user {user_id}")
-                
-        return {"status": "success", "processed": len(results), "details": results}
+        # 2. Reap Expired Active Contracts (deadline-indexed, paged, time-budgeted)
+        return await run_blocking(reaper.run)
 
     except Exception as e:
         import traceback
@@ -683,3 +646,27 @@ async def get_opik_traces():
 async def health():
     return {"status": "ok"}
 
+@app.get("/metrics")
+async def get_metrics():
+    """
+    Internal runtime metrics for sizing workers and pools.
+    """
+    return {
+        "blocking_executor": blocking_executor.stats(),
+        "llm": llm_gateway.stats(),
+        "single_flight": llm_flights.stats(),
+        "job_queue": job_queue.metrics(),
+        "contract_cache": contract_agent.cache.stats() if contract_agent.cache else None,
+        "contract_fast_path": contract_agent.fast_path_stats(),
+        "feed": feed_cache.stats(),
+        "profile_cache": profile_cache.stats(),
+        "leaderboard": leaderboard.stats(),
+        "stat_counters": stat_counters.stats(),
+        "evidence": evidence_store.stats(),
+        "verify_batching": verify_agent.batch_stats(),
+        "verify_memo": verify_agent.memo.stats() if verify_agent.memo else None,
+        "verify_images": verify_agent.images.stats(),
+        "strava": strava_accounts.stats() if strava_accounts else None,
+        "webhooks": webhook_ingestor.stats()
+    }
+
@@ -0,0 +1,131 @@
+import datetime
+from typing import Any, Dict, List, Optional, Sequence
+import numpy as np
+import dateutil.parser
+from src.core.schemas import GoalContract, ActivityType
+
+DISTANCE_TOLERANCE = 0.97 # Same 3% tolerance as verify_strava
+MIN_PACE_MIN_PER_KM = 3.0 # Faster than this is treated as implausible
+RUN_SPORTS = ("Run", "TrailRun", "VirtualRun")
+
+def sport(activity: Dict[str, Any]) -> str:
+    """Strava's sport_type, falling back to the older `type` field."""
+    return activity.get("sport_type") or activity.get("type") or ""
+
+def allowed_kinds(contract: GoalContract) -> set:
+    """
+    The contract's activity kinds (RUN = outdoor run, TREADMILL = indoor run).
+    Distance contracts are runs (the negotiator only sets a distance for running goals),
+    so GENERAL or an empty list means either kind of run, never a ride or a walk.
+    """
+    kinds = set(contract.allowed_activity_types) - {ActivityType.GENERAL}
+    return kinds or {ActivityType.RUN, ActivityType.TREADMILL}
+
+def activity_type_allowed(contract: GoalContract, sport_type: str, trainer: bool) -> bool:
+    if sport_type not in RUN_SPORTS:
+        return False
+    indoor = trainer or sport_type == "VirtualRun"
+    kinds = allowed_kinds(contract)
+    return (ActivityType.TREADMILL in kinds) if indoor else (ActivityType.RUN in kinds)
+
+def _epoch(value) -> int:
+    if isinstance(value, (int, float)):
+        return int(value)
+    if isinstance(value, str):
+        try:
+            value = datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            value = dateutil.parser.isoparse(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=datetime.timezone.utc)
+    return int(value.timestamp())
+
+class ActivityIndex:
+    """
+    One athlete's activity summaries as columns sorted by start time.
+
+    A deadline window is two binary searches, and the contract rules (activity type,
+    distance with 3% tolerance, pace floor, manual entries, treadmill HR) are evaluated for every
+    activity in the window with array operations, so 10k activities cost about the
+    same as a handful.
+    """
+
+    def __init__(self, activities: Sequence[Dict[str, Any]] = ()):
+        starts = np.array([_epoch(a["start_date"]) for a in activities], dtype=np.int64)
+        order = np.argsort(starts, kind="stable")
+        rows = [activities[i] for i in order]
+        self.ids: List[str] = [str(a.get("id")) for a in rows]
+        self.sport = np.array([sport(a) for a in rows], dtype=object)
+        self.start = starts[order]
+        self.distance_km = np.array([a.get("distance", 0) / 1000.0 for a in rows], dtype=np.float64)
+        self.elapsed_sec = np.array([a.get("elapsed_time", 0) for a in rows], dtype=np.float64)
+        self.manual = np.array([bool(a.get("manual", False)) for a in rows], dtype=bool)
+        self.trainer = np.array([bool(a.get("trainer", False)) for a in rows], dtype=bool)
+        self.has_hr = np.array([bool(a.get("has_heartrate", False)) for a in rows], dtype=bool)
+        self.avg_hr = np.array([a.get("average_heartrate") or 0.0 for a in rows], dtype=np.float64)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def window(self, start: datetime.datetime, end: datetime.datetime) -> slice:
+        """Index range of activities with start <= start_date <= end."""
+        return slice(int(np.searchsorted(self.start, _epoch(start), "left")),
+                     int(np.searchsorted(self.start, _epoch(end), "right")))
+
+    def evaluate(self, contract: GoalContract, start: datetime.datetime, end: datetime.datetime) -> Dict[str, Any]:
+        """
+        Applies the contract rules to every activity in [start, end].
+        Returns {"candidates", "qualifying": [ids, best first], "closest": {"id", "reasons"} or None}.
+        Best = longest distance, then earliest.
+        """
+        window = self.window(start, end)
+        ids = self.ids[window]
+        if not ids:
+            return {"candidates": 0, "qualifying": [], "closest": None}
+
+        distance = self.distance_km[window]
+        elapsed = self.elapsed_sec[window]
+        required = (contract.target_distance_km or 0.0) * DISTANCE_TOLERANCE
+        with np.errstate(divide="ignore", invalid="ignore"):
+            pace = np.where(distance > 0, (elapsed / 60.0) / distance, 0.0)
+
+        trainer = self.trainer[window]
+        sports = self.sport[window]
+        is_run = np.isin(sports, RUN_SPORTS)
+        indoor = trainer | (sports == "VirtualRun")
+        kinds = allowed_kinds(contract)
+        checks = {
+            # Filtered first: a ride or a walk never counts, however long
+            "type": is_run & np.where(indoor, ActivityType.TREADMILL in kinds, ActivityType.RUN in kinds),
+            "distance": distance >= required,
+            "pace": pace >= MIN_PACE_MIN_PER_KM,
+            "manual": ~self.manual[window],
+            "treadmill_hr": ~self.trainer[window] | self.has_hr[window],
+        }
+        if contract.min_heart_rate_avg:
+            checks["treadmill_hr"] &= ~self.trainer[window] | (self.avg_hr[window] >= contract.min_heart_rate_avg)
+
+        passed = np.logical_and.reduce(list(checks.values()))
+        # Rank by distance (desc), then start time (asc); lexsort's last key is primary
+        order = np.lexsort((self.start[window], -distance))
+        qualifying = [ids[i] for i in order if passed[i]]
+
+        closest = None
+        if not qualifying:
+            # The activity failing the fewest rules (longest first among ties), for the failure message
+            failures = np.sum([~mask for mask in checks.values()], axis=0)
+            best = min(order, key=lambda i: failures[i])
+            reasons = []
+            if not checks["type"][best]:
+                reasons.append(f"Activity type {sports[best] or 'unknown'}{' (indoor)' if indoor[best] else ''} is not allowed")
+            if not checks["distance"][best]:
+                reasons.append(f"Distance {distance[best]:.2f}km < required {required:.2f}km")
+            if not checks["pace"][best]:
+                reasons.append(f"Pace {pace[best]:.2f}/km is suspicious (human limit check)")
+            if not checks["manual"][best]:
+                reasons.append("Manual entries are not allowed")
+            if not checks["treadmill_hr"][best]:
+                reasons.append("Treadmill run missing heart rate data or below required HR")
+            closest = {"id": ids[best], "reasons": reasons}
+
+        return {"candidates": len(ids), "qualifying": qualifying, "closest": closest}
@@ -0,0 +1,200 @@
+import os
+import re
+import json
+import struct
+import hashlib
+import tempfile
+import threading
+from typing import Any, Callable, Dict, Iterable, Mapping, Optional, Sequence
+import numpy as np
+
+# Compact per-channel dtypes; anything not listed is stored as float32
+CHANNEL_DTYPES = {
+    "time": np.int32,          # seconds from activity start
+    "heartrate": np.float32,
+    "distance": np.float32,    # metres
+    "cadence": np.float32,
+    "velocity_smooth": np.float32,
+    "altitude": np.float32,
+    "watts": np.float32,
+    "grade_smooth": np.float32,
+    "moving": np.bool_,
+}
+MAGIC = b"PACTSTR1"
+ALIGN = 64
+DEFAULT_CACHE_DIR = os.path.join(tempfile.gettempdir(), "pact_stream_cache")
+
+def _dtype_for(name: str):
+    return np.dtype(CHANNEL_DTYPES.get(name, np.float32))
+
+class ActivityStreams:
+    """
+    Columnar activity streams: one typed NumPy array per channel, all the same length.
+
+    ~4 bytes per channel per sample instead of a dict per sample. Slicing returns
+    views (no copy), and arrays loaded from the on-disk cache are memory-mapped.
+    """
+
+    def __init__(self, channels: Mapping[str, np.ndarray], activity_id: Optional[str] = None):
+        lengths = {len(values) for values in channels.values()}
+        if len(lengths) > 1:
+            raise ValueError(f"Stream channels differ in length: {sorted(lengths)}")
+        self.activity_id = activity_id
+        self._channels: Dict[str, np.ndarray] = dict(channels)
+        self._length = lengths.pop() if lengths else 0
+
+    # --- Construction ---
+
+    @classmethod
+    def from_columns(cls, columns: Mapping[str, Sequence[float]], activity_id: Optional[str] = None) -> "ActivityStreams":
+        return cls({name: np.asarray(values, dtype=_dtype_for(name)) for name, values in columns.items()}, activity_id)
+
+    @classmethod
+    def from_points(cls, points: Sequence[Dict[str, Any]], activity_id: Optional[str] = None) -> "ActivityStreams":
+        """From the legacy one-dict-per-sample shape."""
+        if not points:
+            return cls({}, activity_id)
+        return cls({
+            name: np.fromiter((p.get(name, np.nan) for p in points), dtype=np.float64, count=len(points)).astype(_dtype_for(name))
+            for name in points[0].keys()
+        }, activity_id)
+
+    @classmethod
+    def from_strava(cls, payload: Any, activity_id: Optional[str] = None) -> "ActivityStreams":
+        """
+        From a Strava /activities/{id}/streams response, either key_by_type
+        ({"heartrate": {"data": [...]}, ...}) or the list form ([{"type": ..., "data": [...]}]).
+        latlng is skipped (2-D; not used by verification).
+        """
+        items = payload.items() if isinstance(payload, dict) else ((s.get("type"), s) for s in payload)
+        return cls.from_columns({
+            name: stream.get("data", []) for name, stream in items if name and name != "latlng"
+        }, activity_id)
+
+    # --- Access ---
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._channels
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self._channels[name]
+
+    def get(self, name: str, default=None) -> Optional[np.ndarray]:
+        return self._channels.get(name, default)
+
+    @property
+    def channels(self) -> Iterable[str]:
+        return self._channels.keys()
+
+    @property
+    def nbytes(self) -> int:
+        return sum(values.nbytes for values in self._channels.values())
+
+    def slice(self, start: int, stop: int) -> "ActivityStreams":
+        """Sample range [start, stop) as views, no copy."""
+        return ActivityStreams({name: values[start:stop] for name, values in self._channels.items()}, self.activity_id)
+
+    def between(self, t_start: float, t_end: float) -> "ActivityStreams":
+        """Samples with t_start <= time < t_end (time is sorted, so this is two binary searches)."""
+        time = self._channels["time"]
+        return self.slice(int(np.searchsorted(time, t_start, "left")), int(np.searchsorted(time, t_end, "left")))
+
+    def to_points(self):
+        """Legacy one-dict-per-sample view (for callers that still want it)."""
+        names = list(self._channels)
+        columns = [self._channels[n].tolist() for n in names]
+        return [dict(zip(names, row)) for row in zip(*columns)]
+
+    # --- Binary format ---
+    # MAGIC | u32 header length | JSON header | channel arrays, each 64-byte aligned
+
+    def write(self, path: str):
+        header = {"activity_id": self.activity_id, "length": self._length, "channels": []}
+        offset = 0
+        arrays = []
+        for name, values in self._channels.items():
+            data = np.ascontiguousarray(values)
+            header["channels"].append({"name": name, "dtype": data.dtype.str, "offset": offset})
+            arrays.append((offset, data))
+            offset += -(-data.nbytes // ALIGN) * ALIGN
+
+        header_bytes = json.dumps(header).encode()
+        data_start = -(-(len(MAGIC) + 4 + len(header_bytes)) // ALIGN) * ALIGN
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(MAGIC)
+            f.write(struct.pack("<I", len(header_bytes)))
+            f.write(header_bytes)
+            for rel_offset, data in arrays:
+                f.seek(data_start + rel_offset)
+                f.write(data.tobytes())
+        os.replace(tmp_path, path) # Readers never see a partial file
+
+    @classmethod
+    def open(cls, path: str) -> "ActivityStreams":
+        """Memory-maps a file written by `write`; channel arrays are read-only views into it."""
+        mm = np.memmap(path, dtype=np.uint8, mode="r")
+        if bytes(mm[:len(MAGIC)]) != MAGIC:
+            raise ValueError(f"Not an activity stream file: {path}")
+        (header_len,) = struct.unpack("<I", bytes(mm[len(MAGIC):len(MAGIC) + 4]))
+        header_end = len(MAGIC) + 4 + header_len
+        header = json.loads(bytes(mm[len(MAGIC) + 4:header_end]))
+        data_start = -(-header_end // ALIGN) * ALIGN
+        length = header["length"]
+        channels = {}
+        for channel in header["channels"]:
+            dtype = np.dtype(channel["dtype"])
+            start = data_start + channel["offset"]
+            channels[channel["name"]] = mm[start:start + length * dtype.itemsize].view(dtype)
+        return cls(channels, header.get("activity_id"))
+
+class StreamCache:
+    """
+    On-disk cache of ActivityStreams, one memory-mappable file per activity.
+    Streams of a recorded activity don't change, so entries have no TTL.
+
+    Config (env): PACT_STREAM_CACHE_DIR
+    """
+
+    def __init__(self, cache_dir: str = None):
+        self.cache_dir = cache_dir or os.getenv("PACT_STREAM_CACHE_DIR", DEFAULT_CACHE_DIR)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, activity_id: str) -> str:
+        safe = activity_id if re.fullmatch(r"[\w-]{1,64}", activity_id) else hashlib.sha256(activity_id.encode()).hexdigest()
+        return os.path.join(self.cache_dir, f"{safe}.streams")
+
+    def get(self, activity_id: str) -> Optional[ActivityStreams]:
+        try:
+            streams = ActivityStreams.open(self._path(str(activity_id)))
+        except (FileNotFoundError, ValueError):
+            return None
+        with self._lock:
+            self.hits += 1
+        return streams
+
+    def put(self, activity_id: str, streams: ActivityStreams):
+        streams.write(self._path(str(activity_id)))
+
+    def get_or_fetch(self, activity_id: str, fetch: Callable[[], Optional[ActivityStreams]]) -> Optional[ActivityStreams]:
+        cached = self.get(activity_id)
+        if cached is not None:
+            return cached
+        with self._lock:
+            self.misses += 1
+        streams = fetch()
+        if streams is not None and len(streams):
+            try:
+                self.put(activity_id, streams)
+            except OSError as e:
+                print(f"[WARN] Could not cache streams for {activity_id}: {e}")
+        return streams
+
+    def stats(self) -> Dict[str, Any]:
+        return {"dir": self.cache_dir, "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,116 @@
+import datetime
+from typing import Any, Dict, List, Optional
+from firebase_admin import firestore
+from src.core.schemas import GoalContract, VerificationResult, VerificationStatus
+from src.core.llm_scheduler import llm_priority, BACKGROUND
+
+COMPLETE_JOB = "auto_verify.complete"
+
+class AutoVerifier:
+    """
+    Webhook sink: verifies an athlete's new activities against their open contracts.
+
+    The athlete is resolved through `users.strava_athlete_id` (written when the user connects
+    Strava, see StravaAccounts.link); open contracts are the user's Active ones whose deadline
+    hasn't passed (range on the native `deadline_at`). Each distance contract is checked
+    against the batch's activities. The first SUCCESS moves it Active -> Completed in a
+    transaction, and only if that wins (the Reaper may have settled it meanwhile) are the
+    usual post-verification side effects scheduled, keyed by contract + activity.
+
+    Completion and scheduling are one durable job (COMPLETE_JOB), enqueued before the
+    transaction and run inline: if scheduling fails after the commit, the job is retried,
+    finds the contract Completed by this same activity, and schedules again (a no-op for
+    effects already enqueued). A FAILURE is not final here: the athlete can still log
+    another activity before the deadline, and the Reaper handles contracts that run out of time.
+    """
+
+    def __init__(self, db, verify_agent, detect_agent, post_verification):
+        self.db = db
+        self.verify_agent = verify_agent
+        self.detect_agent = detect_agent
+        self.post_verification = post_verification
+        self.queue = post_verification.queue
+        self.queue.register(COMPLETE_JOB, self._run_complete)
+
+    def _user_for_athlete(self, owner_id: str) -> Optional[str]:
+        docs = list(self.db.collection('users').where('strava_athlete_id', '==', str(owner_id)).limit(1).stream())
+        return docs[0].id if docs else None
+
+    def _open_contracts(self, user_id: str, now: datetime.datetime):
+        query = self.db.collection('contracts') \
+            .where('user_id', '==', user_id) \
+            .where('status', '==', 'Active') \
+            .where('deadline_at', '>=', now)
+        return list(query.stream())
+
+    def run(self, owner_id: str, activity_ids: List[str], now: Optional[datetime.datetime] = None) -> Dict[str, Any]:
+        """Returns {"user_id", "contracts", "completed": [contract ids]}."""
+        # Webhook-driven, nobody is waiting on it: yields LLM quota to interactive requests
+        with llm_priority(BACKGROUND):
+            return self._run(owner_id, activity_ids, now)
+
+    def _run(self, owner_id: str, activity_ids: List[str], now: Optional[datetime.datetime]) -> Dict[str, Any]:
+        if not self.db:
+            return {"user_id": None, "contracts": 0, "completed": []}
+        user_id = self._user_for_athlete(owner_id)
+        if not user_id:
+            return {"user_id": None, "contracts": 0, "completed": []}
+
+        docs = self._open_contracts(user_id, now or datetime.datetime.now(datetime.timezone.utc))
+        completed = []
+        for doc in docs:
+            contract = GoalContract(**doc.to_dict())
+            if contract.target_distance_km is None:
+                continue # Generic goals need user-submitted evidence
+            for activity_id in activity_ids:
+                result = self.verify_agent.verify(contract, activity_id, user_id=user_id)
+                if result.status != VerificationStatus.SUCCESS:
+                    continue
+                key = f"strava:{doc.id}:{activity_id}"
+                payload = {
+                    "contract_id": doc.id,
+                    "activity_id": str(activity_id),
+                    "user_id": user_id,
+                    "contract": contract.model_dump(mode="json"),
+                    "verification": result.model_dump(mode="json"),
+                }
+                self.queue.enqueue(COMPLETE_JOB, payload, idempotency_key=f"{key}:complete")
+                try:
+                    won = self._run_complete(payload)
+                except Exception as e:
+                    print(f"[WARN] Completing contract {doc.id} failed, left to the job queue: {e}")
+                    break
+                self.queue.complete([f"{key}:complete"])
+                if won:
+                    completed.append(doc.id)
+                break # Settled (by us, or elsewhere first: its effects are already theirs)
+        return {"user_id": user_id, "contracts": len(docs), "completed": completed}
+
+    def _run_complete(self, payload: Dict[str, Any]) -> bool:
+        """Completes the contract and schedules its effects; False if it was settled elsewhere."""
+        ref = self.db.collection('contracts').document(payload["contract_id"])
+        if not _complete_contract(self.db.transaction(), ref, payload["activity_id"]):
+            return False
+        contract = GoalContract(**payload["contract"])
+        result = VerificationResult(**payload["verification"])
+        decision = self.detect_agent.evaluate(contract, result)
+        key = f"strava:{payload['contract_id']}:{payload['activity_id']}"
+        self.post_verification.schedule(key, payload["user_id"], contract, result, decision)
+        return True
+
+@firestore.transactional
+def _complete_contract(transaction, ref, activity_id: str) -> bool:
+    snapshot = ref.get(transaction=transaction)
+    data = snapshot.to_dict() if snapshot.exists else None
+    if data is None:
+        return False
+    if data.get('status') == 'Completed' and data.get('verified_activity_id') == activity_id:
+        return True # Completed by an earlier attempt of this same job
+    if data.get('status') != 'Active':
+        return False
+    transaction.update(ref, {
+        'status': 'Completed',
+        'completed_at': firestore.SERVER_TIMESTAMP,
+        'verified_activity_id': activity_id
+    })
+    return True
@@ -0,0 +1,39 @@
+import os
+import json
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, List
+from fastapi.encoders import jsonable_encoder
+
+DEFAULT_CONCURRENCY = 4
+DEFAULT_MAX_ITEMS = 500
+
+def batch_concurrency() -> int:
+    return max(1, int(os.getenv("PACT_VERIFY_BATCH_CONCURRENCY", DEFAULT_CONCURRENCY)))
+
+def batch_max_items() -> int:
+    return int(os.getenv("PACT_VERIFY_BATCH_MAX_ITEMS", DEFAULT_MAX_ITEMS))
+
+async def stream_batch(items: List[Any], run_one: Callable[[Any], Awaitable[Any]], concurrency: int) -> AsyncIterator[str]:
+    """
+    Runs `run_one` over `items` with at most `concurrency` in flight and yields one
+    NDJSON line per item as it finishes (completion order, tagged with its index).
+    A failing item yields {"status": "error"} without affecting the others.
+    If the consumer goes away (client disconnect), unfinished items are cancelled.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(index: int, item: Any):
+        async with semaphore:
+            try:
+                return {"index": index, "status": "ok", "result": await run_one(item)}
+            except Exception as e:
+                print(f"[WARN] Batch item {index} failed: {e}")
+                return {"index": index, "status": "error", "error": str(e)}
+
+    tasks = [asyncio.ensure_future(run(i, item)) for i, item in enumerate(items)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield json.dumps(jsonable_encoder(await next_done)) + "\n"
+    finally:
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,44 @@
+from typing import Any, Dict
+
+MAX_BATCH_WRITES = 500 # Firestore WriteBatch limit
+
+class BatchWriter:
+    """
+    Accumulates plain writes (updates, sets) into Firestore WriteBatches,
+    committing automatically every `max_writes` operations.
+    Not thread-safe: feed it from one thread.
+    """
+
+    def __init__(self, db, max_writes: int = MAX_BATCH_WRITES):
+        self.db = db
+        self.max_writes = min(max_writes, MAX_BATCH_WRITES)
+        self._batch = None
+        self._pending = 0
+        self.commits = 0
+        self.writes = 0
+
+    def _current(self):
+        if self._batch is None:
+            self._batch = self.db.batch()
+        return self._batch
+
+    def update(self, ref, data: Dict[str, Any]):
+        self._current().update(ref, data)
+        self._added()
+
+    def set(self, ref, data: Dict[str, Any], merge: bool = False):
+        self._current().set(ref, data, merge=merge)
+        self._added()
+
+    def _added(self):
+        self._pending += 1
+        self.writes += 1
+        if self._pending >= self.max_writes:
+            self.flush()
+
+    def flush(self):
+        if self._batch is not None and self._pending:
+            self._batch.commit()
+            self.commits += 1
+        self._batch = None
+        self._pending = 0
@@ -0,0 +1,210 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import tempfile
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple, Dict, Any
+from src.core.schemas import GoalContract
+
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_BUCKET_SEC = 3600
+DEFAULT_DISK_PATH = os.path.join(tempfile.gettempdir(), "pact_contract_cache.sqlite3")
+
+def normalize_goal(goal: str) -> str:
+    """
+    Canonical form of a goal for cache keys.
+    "🧘 Meditate  10min Daily!" -> "meditate 10min daily"
+    Comparison symbols, currency and units are kept ("< 2h/day" must not match "> 2h/day").
+    """
+    text = (goal or "").lower()
+    text = re.sub(r"[^\w\s$<>%/.,:]", " ", text)
+    text = re.sub(r"\s+", " ", text)
+    return text.strip(" .,:")
+
+# --- Backends ---
+# Backends store opaque strings with LRU eviction; TTL is applied by ContractCache.
+
+class MemoryCacheBackend:
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Tuple[str, float]]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                self._data.move_to_end(key)
+            return entry
+
+    def set(self, key: str, value: str):
+        with self._lock:
+            self._data[key] = (value, time.time())
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def __len__(self):
+        return len(self._data)
+
+class DiskCacheBackend:
+    """SQLite-backed LRU, shared by every worker process on the host and kept across restarts."""
+
+    def __init__(self, path: str = DEFAULT_DISK_PATH, max_entries: int = DEFAULT_MAX_ENTRIES, table: str = "contract_cache"):
+        if not re.fullmatch(r"\w+", table):
+            raise ValueError(f"Invalid cache table name '{table}'")
+        self.path = path
+        self.max_entries = max_entries
+        self.table = table
+        self._local = threading.local()
+        self.evictions = 0
+        self._conn().execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        index = "idx_cc_last_access" if table == "contract_cache" else f"idx_{table}_last_access"
+        self._conn().execute(f"CREATE INDEX IF NOT EXISTS {index} ON {table} (last_access)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[Tuple[str, float]]:
+        conn = self._conn()
+        row = conn.execute(f"SELECT value, stored_at FROM {self.table} WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        conn.execute(f"UPDATE {self.table} SET last_access = ? WHERE key = ?", (time.time(), key))
+        return row[0], row[1]
+
+    def set(self, key: str, value: str):
+        now = time.time()
+        conn = self._conn()
+        conn.execute(
+            f"INSERT OR REPLACE INTO {self.table} (key, value, stored_at, last_access) VALUES (?, ?, ?, ?)",
+            (key, value, now, now)
+        )
+        overflow = len(self) - self.max_entries
+        if overflow > 0:
+            conn.execute(
+                f"DELETE FROM {self.table} WHERE key IN "
+                f"(SELECT key FROM {self.table} ORDER BY last_access LIMIT ?)", (overflow,)
+            )
+            self.evictions += overflow
+
+    def delete(self, key: str):
+        self._conn().execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+
+    def __len__(self):
+        return self._conn().execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+# --- Cache ---
+
+class ContractCache:
+    """
+    Caches negotiated contracts by (normalized goal, deadline bucket).
+
+    The bucket is the request time truncated to `bucket_sec`, so relative phrases
+    ("by Sunday") only share an entry when asked within the same window. Contracts
+    are stored with their deadline as an offset from the original request and are
+    re-anchored to the current request time on a hit, so a cached contract never
+    carries a stale deadline_utc.
+
+    An entry can't outlive its bucket, so `ttl_sec` defaults to `bucket_sec` and is capped
+    by it; a shorter TTL only matters for entries that must expire within the window.
+    """
+
+    def __init__(self, backend=None, ttl_sec: Optional[float] = None, bucket_sec: int = DEFAULT_BUCKET_SEC):
+        self.backend = backend if backend is not None else MemoryCacheBackend()
+        self.bucket_sec = bucket_sec
+        self.ttl_sec = bucket_sec if ttl_sec is None else min(ttl_sec, bucket_sec)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+
+    def _key(self, goal: str, now: datetime) -> str:
+        bucket = int(now.timestamp() // self.bucket_sec)
+        return f"{normalize_goal(goal)}|{bucket}"
+
+    def get(self, goal: str, now: Optional[datetime] = None) -> Optional[GoalContract]:
+        now = now or datetime.now(timezone.utc)
+        key = self._key(goal, now)
+        entry = self.backend.get(key)
+
+        if entry is not None and time.time() - entry[1] > self.ttl_sec:
+            self.backend.delete(key)
+            entry = None
+            with self._lock:
+                self.expired += 1
+
+        if entry is None:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        record = json.loads(entry[0])
+        contract = GoalContract(**record["contract"])
+        contract.deadline_utc = now + timedelta(seconds=record["deadline_offset_sec"])
+        return contract
+
+    def set(self, goal: str, contract: GoalContract, now: Optional[datetime] = None):
+        now = now or datetime.now(timezone.utc)
+        deadline = contract.deadline_utc
+        if deadline.tzinfo is None:
+            deadline = deadline.replace(tzinfo=timezone.utc)
+        record = {
+            "contract": contract.model_dump(mode="json"),
+            "deadline_offset_sec": (deadline - now).total_seconds(),
+        }
+        self.backend.set(self._key(goal, now), json.dumps(record))
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "entries": len(self.backend),
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "evictions": self.backend.evictions,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
+
+def build_contract_cache_from_env() -> Optional[ContractCache]:
+    """
+    PACT_CONTRACT_CACHE: "memory" (default), "disk" or "off"
+    PACT_CONTRACT_CACHE_TTL_SEC (defaults to, and capped by, the bucket), PACT_CONTRACT_CACHE_SIZE, PACT_CONTRACT_CACHE_BUCKET_SEC, PACT_CONTRACT_CACHE_PATH
+    """
+    mode = os.getenv("PACT_CONTRACT_CACHE", "memory").lower()
+    if mode == "off":
+        return None
+
+    max_entries = int(os.getenv("PACT_CONTRACT_CACHE_SIZE", DEFAULT_MAX_ENTRIES))
+    ttl_sec = os.getenv("PACT_CONTRACT_CACHE_TTL_SEC")
+    if mode == "disk":
+        backend = DiskCacheBackend(os.getenv("PACT_CONTRACT_CACHE_PATH", DEFAULT_DISK_PATH), max_entries)
+    else:
+        backend = MemoryCacheBackend(max_entries)
+
+    return ContractCache(
+        backend,
+        ttl_sec=float(ttl_sec) if ttl_sec else None,
+        bucket_sec=int(os.getenv("PACT_CONTRACT_CACHE_BUCKET_SEC", DEFAULT_BUCKET_SEC))
+    )
@@ -0,0 +1,111 @@
+import os
+import time
+import random
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from firebase_admin import firestore
+
+DEFAULT_SHARDS = 10
+DEFAULT_CACHE_TTL_SEC = 30.0
+DEFAULT_MAX_ENTRIES = 10000
+SHARD_COLLECTION = 'stat_shards'
+
+class ShardedCounters:
+    """
+    Per-user `stats.*` counters spread over N shard documents
+    (users/{uid}/stat_shards/{0..N-1}), so bursts of increments for one user
+    (squads, the reaper) don't contend on the single users/{uid} document.
+
+    Writes pick a random shard; reads sum every shard plus any legacy `stats` map
+    still on the user document, and are cached for `cache_ttl_sec`. Increasing the
+    shard count later is safe since reads sum whatever shards exist.
+
+    Config (env): PACT_STAT_SHARDS, PACT_STAT_CACHE_TTL_SEC
+    """
+
+    def __init__(self, db, num_shards: int = None, cache_ttl_sec: float = None, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.db = db
+        self.num_shards = num_shards or int(os.getenv("PACT_STAT_SHARDS", DEFAULT_SHARDS))
+        self.cache_ttl_sec = cache_ttl_sec if cache_ttl_sec is not None else float(os.getenv("PACT_STAT_CACHE_TTL_SEC", DEFAULT_CACHE_TTL_SEC))
+        self.max_entries = max_entries
+        self._cache: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.increments = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _shard_ref(self, user_id: str, shard: int):
+        return self.db.collection(u'users').document(user_id).collection(SHARD_COLLECTION).document(str(shard))
+
+    def increment(self, user_id: str, field: str, amount: int = 1, writer=None):
+        """
+        Adds `amount` to stats.<field> for `user_id`. With a BatchWriter the write joins
+        its batch instead of being sent immediately.
+        """
+        ref = self._shard_ref(user_id, random.randrange(self.num_shards))
+        data = {field: firestore.Increment(amount)}
+        if writer is not None:
+            writer.set(ref, data, merge=True)
+        else:
+            ref.set(data, merge=True)
+        self.increments += 1
+        self.invalidate(user_id)
+
+    def get(self, user_id: str) -> Dict[str, int]:
+        """Summed stats for `user_id` (cached)."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._cache.get(user_id)
+            if entry and now - entry[1] < self.cache_ttl_sec:
+                self._cache.move_to_end(user_id)
+                self.hits += 1
+                return dict(entry[0])
+            self.misses += 1
+
+        user_ref = self.db.collection(u'users').document(user_id)
+        user_doc = user_ref.get()
+        # Counters written before sharding stay on the user document
+        legacy = (user_doc.to_dict() or {}).get('stats', {}) if user_doc.exists else {}
+        totals: Dict[str, int] = {k: v for k, v in legacy.items() if isinstance(v, (int, float))}
+        for shard in user_ref.collection(SHARD_COLLECTION).stream():
+            for field, value in (shard.to_dict() or {}).items():
+                if isinstance(value, (int, float)):
+                    totals[field] = totals.get(field, 0) + value
+
+        with self._lock:
+            self._cache[user_id] = (totals, time.monotonic())
+            self._cache.move_to_end(user_id)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return dict(totals)
+
+    def totals_by_user(self, field: str) -> Dict[str, int]:
+        """
+        {user_id: summed stats.<field>} for every user with a positive value: one
+        collection-group query over the shards holding it, plus legacy user-document stats.
+        Reads every matching shard, so it is for cold starts (e.g. seeding the leaderboard).
+        """
+        totals: Dict[str, int] = {}
+        for shard in self.db.collection_group(SHARD_COLLECTION).where(field, '>', 0).stream():
+            user_id = shard.reference.parent.parent.id
+            totals[user_id] = totals.get(user_id, 0) + shard.get(field)
+        for doc in self.db.collection(u'users').where(f'stats.{field}', '>', 0).stream():
+            totals[doc.id] = totals.get(doc.id, 0) + doc.get(f'stats.{field}')
+        return totals
+
+    def invalidate(self, user_id: Optional[str] = None):
+        with self._lock:
+            if user_id is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(user_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "shards": self.num_shards,
+            "increments": self.increments,
+            "cached_users": len(self._cache),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
@@ -0,0 +1,176 @@
+import io
+import os
+import hashlib
+import threading
+import mimetypes
+from collections import OrderedDict
+from typing import Any, BinaryIO, Dict, Optional
+from src.core.stage_timings import StageTimings
+
+# Pillow is optional: without it no verifier derivative is produced
+try:
+    from PIL import Image, ImageOps
+    PIL_AVAILABLE = True
+except ImportError:
+    Image = None
+    ImageOps = None
+    PIL_AVAILABLE = False
+
+DEFAULT_MAX_BYTES = 25 * 1024 * 1024
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+DEFAULT_DERIVATIVE_PX = 1024
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024 # Resumable upload chunk; must be a multiple of 256 KiB
+PREFIX = "evidence/sha256"
+KNOWN_HASHES = 10000
+
+class EvidenceTooLarge(ValueError):
+    def __init__(self, max_bytes: int):
+        super().__init__(f"Evidence exceeds the {max_bytes // (1024 * 1024)} MB upload limit")
+        self.max_bytes = max_bytes
+
+def derivative_name(sha256: str, px: int) -> str:
+    """Blob name of the downscaled JPEG the verifier reads for an upload."""
+    return f"{PREFIX}/{sha256}_{px}.jpg"
+
+def _extension(filename: Optional[str], content_type: Optional[str]) -> str:
+    ext = os.path.splitext(filename or "")[1].lower()
+    if not ext and content_type:
+        ext = mimetypes.guess_extension(content_type) or ""
+    return ext if ext.isascii() and len(ext) <= 6 else ""
+
+class EvidenceStore:
+    """
+    Content-addressed evidence uploads.
+
+    The file is read in chunks (memory stays at one chunk regardless of size) while
+    its SHA-256 is computed and the size limit enforced; it is then stored once under
+    evidence/sha256/<hash><ext>. An identical upload reuses the existing object
+    without sending the bytes again. When Pillow is available a downscaled JPEG
+    derivative is stored next to it for the verifier; its decode / resize / encode
+    times are recorded in `timings` (shared with the verifier's image pipeline in the API).
+
+    Blocking (hashing, storage calls): run it off the event loop.
+
+    Config (env): PACT_EVIDENCE_MAX_BYTES, PACT_EVIDENCE_DERIVATIVE_PX (0 disables)
+    """
+
+    def __init__(self, bucket, max_bytes: int = None, chunk_size: int = DEFAULT_CHUNK_SIZE, derivative_px: int = None,
+                 timings: StageTimings = None):
+        self.bucket = bucket
+        self.timings = timings or StageTimings()
+        self.max_bytes = max_bytes or int(os.getenv("PACT_EVIDENCE_MAX_BYTES", DEFAULT_MAX_BYTES))
+        self.chunk_size = chunk_size
+        self.derivative_px = derivative_px if derivative_px is not None else int(os.getenv("PACT_EVIDENCE_DERIVATIVE_PX", DEFAULT_DERIVATIVE_PX))
+        self._known: "OrderedDict[str, Dict[str, Any]]" = OrderedDict() # Blob name -> result, skips exists() calls
+        self._lock = threading.Lock()
+        self.uploads = 0
+        self.deduplicated = 0
+        self.bytes_uploaded = 0
+        self.bytes_received = 0
+
+    @property
+    def url_prefix(self) -> Optional[str]:
+        """Public URL prefix of stored evidence; the verifier only fetches images under it."""
+        return self.bucket.blob(f"{PREFIX}/").public_url if self.bucket is not None else None
+
+    def hash_file(self, fileobj: BinaryIO) -> tuple:
+        """Returns (sha256 hex, size), raising EvidenceTooLarge past max_bytes."""
+        digest = hashlib.sha256()
+        size = 0
+        while True:
+            chunk = fileobj.read(self.chunk_size)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > self.max_bytes:
+                raise EvidenceTooLarge(self.max_bytes)
+            digest.update(chunk)
+        return digest.hexdigest(), size
+
+    def store(self, fileobj: BinaryIO, filename: Optional[str] = None, content_type: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Stores the evidence (or finds the existing copy).
+        Returns {url, sha256, size, deduplicated, verifier_url}.
+        """
+        sha256, size = self.hash_file(fileobj)
+        self.bytes_received += size
+        name = f"{PREFIX}/{sha256}{_extension(filename, content_type)}"
+
+        with self._lock:
+            known = self._known.get(name)
+            if known:
+                self._known.move_to_end(name)
+        blob = self.bucket.blob(name)
+        if known or blob.exists():
+            self.deduplicated += 1
+            result = dict(known or {"url": blob.public_url, "verifier_url": self._existing_derivative(sha256)},
+                          sha256=sha256, size=size, deduplicated=True)
+            self._remember(name, result)
+            return result
+
+        fileobj.seek(0)
+        blob.chunk_size = UPLOAD_CHUNK_SIZE
+        blob.upload_from_file(fileobj, size=size, content_type=content_type)
+        blob.make_public()
+        self.uploads += 1
+        self.bytes_uploaded += size
+
+        fileobj.seek(0)
+        verifier_url = self._store_derivative(fileobj, sha256)
+        result = {"url": blob.public_url, "sha256": sha256, "size": size, "deduplicated": False, "verifier_url": verifier_url}
+        self._remember(name, result)
+        return result
+
+    def _remember(self, name: str, result: Dict[str, Any]):
+        with self._lock:
+            self._known[name] = result
+            self._known.move_to_end(name)
+            while len(self._known) > KNOWN_HASHES:
+                self._known.popitem(last=False)
+
+    # --- Verifier derivative ---
+
+    def _derivative_name(self, sha256: str) -> str:
+        return derivative_name(sha256, self.derivative_px)
+
+    def _existing_derivative(self, sha256: str) -> Optional[str]:
+        if not PIL_AVAILABLE or not self.derivative_px:
+            return None
+        blob = self.bucket.blob(self._derivative_name(sha256))
+        return blob.public_url if blob.exists() else None
+
+    def _store_derivative(self, fileobj: BinaryIO, sha256: str) -> Optional[str]:
+        if not PIL_AVAILABLE or not self.derivative_px:
+            return None
+        try:
+            with Image.open(fileobj) as image:
+                with self.timings.stage("decode"):
+                    # JPEG draft mode decodes at reduced scale directly: far less memory for phone photos
+                    image.draft("RGB", (self.derivative_px, self.derivative_px))
+                    image.load()
+                with self.timings.stage("resize"):
+                    image = ImageOps.exif_transpose(image).convert("RGB")
+                    image.thumbnail((self.derivative_px, self.derivative_px))
+                with self.timings.stage("encode"):
+                    out = io.BytesIO()
+                    image.save(out, format="JPEG", quality=85)
+        except Exception as e:
+            # Not an image (or an unsupported one): the original is still stored
+            print(f"[WARN] Could not build evidence derivative for {sha256}: {e}")
+            return None
+
+        blob = self.bucket.blob(self._derivative_name(sha256))
+        out.seek(0)
+        blob.upload_from_file(out, size=out.getbuffer().nbytes, content_type="image/jpeg")
+        blob.make_public()
+        return blob.public_url
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "uploads": self.uploads,
+            "deduplicated": self.deduplicated,
+            "bytes_received": self.bytes_received,
+            "bytes_uploaded": self.bytes_uploaded,
+            "max_bytes": self.max_bytes,
+            "derivatives": PIL_AVAILABLE and bool(self.derivative_px),
+        }
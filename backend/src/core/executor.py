@@ -0,0 +1,72 @@
+import os
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+DEFAULT_MAX_BLOCKING_CALLS = 16
+
+class BlockingExecutor:
+    """
+    Bounded thread pool for the synchronous SDK calls (Gemini, Firestore) made from async handlers.
+    Keeps the event loop free so cheap endpoints (/health, /feed) stay responsive
+    while slow verifications are in flight.
+
+    Config (env):
+    - PACT_OFFLOAD_BLOCKING: "1" (default) runs calls on the pool, "0" runs them inline (legacy mode).
+    - PACT_MAX_BLOCKING_CALLS: concurrency cap, i.e. pool size (default 16).
+    """
+
+    def __init__(self, max_workers: int = None, enabled: bool = None):
+        self.max_workers = max_workers or int(os.getenv("PACT_MAX_BLOCKING_CALLS", DEFAULT_MAX_BLOCKING_CALLS))
+        if enabled is None:
+            enabled = os.getenv("PACT_OFFLOAD_BLOCKING", "1") != "0"
+        self.enabled = enabled
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="pact-blocking")
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.in_flight = 0
+        self.completed = 0
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        """Runs `func(*args, **kwargs)` on the pool and awaits its result."""
+        if not self.enabled:
+            return func(*args, **kwargs)
+
+        # Copy contextvars so Opik trace context follows the call into the worker thread
+        ctx = contextvars.copy_context()
+        call = functools.partial(ctx.run, self._instrumented, func, *args, **kwargs)
+        with self._lock:
+            self.submitted += 1
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool, call)
+
+    def _instrumented(self, func: Callable, *args, **kwargs) -> Any:
+        with self._lock:
+            self.in_flight += 1
+        try:
+            return func(*args, **kwargs)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+                self.completed += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "max_workers": self.max_workers,
+                "in_flight": self.in_flight,
+                # Submitted but not yet picked up by a worker
+                "queued": self.submitted - self.completed - self.in_flight,
+                "completed": self.completed,
+            }
+
+# Singleton instance
+blocking_executor = BlockingExecutor()
+
+async def run_blocking(func: Callable, *args, **kwargs) -> Any:
+    """Shortcut for `blocking_executor.run(...)`."""
+    return await blocking_executor.run(func, *args, **kwargs)
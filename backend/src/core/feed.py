@@ -0,0 +1,143 @@
+import os
+import time
+import base64
+import datetime
+import threading
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+from firebase_admin import firestore
+from src.core.similarity import as_utc
+
+DEFAULT_CAPACITY = 200
+DEFAULT_REFRESH_SEC = 5.0
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+def encode_cursor(timestamp: datetime.datetime, doc_id: str) -> str:
+    raw = f"{timestamp.isoformat()}|{doc_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime.datetime, str]:
+    padded = cursor + "=" * (-len(cursor) % 4)
+    ts, doc_id = base64.urlsafe_b64decode(padded.encode()).decode().split("|", 1)
+    return datetime.datetime.fromisoformat(ts), doc_id
+
+class FeedCache:
+    """
+    Serves the public feed from an in-memory ring buffer of the newest `capacity` events.
+
+    The buffer is refreshed incrementally (events at or after the newest timestamp held,
+    ordered by (timestamp, doc id), minus those already held, so an event sharing that
+    timestamp isn't skipped) at most every `refresh_sec`, or right after this process
+    writes a feed event.
+    Pages older than the buffer are read from Firestore with a cursor.
+
+    Config (env): PACT_FEED_BUFFER_SIZE, PACT_FEED_REFRESH_SEC
+    """
+
+    def __init__(self, db, capacity: int = None, refresh_sec: float = None):
+        self.db = db
+        self.capacity = capacity or int(os.getenv("PACT_FEED_BUFFER_SIZE", DEFAULT_CAPACITY))
+        self.refresh_sec = refresh_sec if refresh_sec is not None else float(os.getenv("PACT_FEED_REFRESH_SEC", DEFAULT_REFRESH_SEC))
+        self._events: deque = deque(maxlen=self.capacity) # Newest first
+        self._lock = threading.Lock()
+        self._last_refresh = 0.0
+        self._loaded = False
+        self.refreshes = 0
+        self.firestore_pages = 0
+
+    def invalidate(self):
+        """Forces the next read to pick up new events (called after a local feed write)."""
+        self._last_refresh = 0.0
+
+    def _serialize(self, doc) -> Dict[str, Any]:
+        item = doc.to_dict()
+        item["id"] = doc.id
+        timestamp = as_utc(item.get("timestamp"))
+        item["timestamp"] = timestamp.isoformat() if timestamp else None
+        return item
+
+    def refresh(self, force: bool = False):
+        if not force and time.monotonic() - self._last_refresh < self.refresh_sec:
+            return
+
+        with self._lock:
+            if not force and time.monotonic() - self._last_refresh < self.refresh_sec:
+                return # Another thread refreshed while we waited
+
+            query = self.db.collection(u'feed') \
+                .order_by('timestamp', direction=firestore.Query.DESCENDING) \
+                .order_by('__name__', direction=firestore.Query.DESCENDING)
+            newest = self._events[0] if self._events else None
+            if self._loaded and newest:
+                # >=: events written with the same timestamp as the newest held one still arrive
+                query = query.where('timestamp', '>=', as_utc(newest["timestamp"]))
+            fresh = [self._serialize(doc) for doc in query.limit(self.capacity).stream()]
+
+            if len(fresh) >= self.capacity or not self._loaded:
+                # Cold start, or more new events than the buffer holds: replace wholesale
+                self._events = deque(fresh, maxlen=self.capacity)
+            else:
+                known = {e["id"] for e in self._events}
+                new = [item for item in fresh if item["id"] not in known]
+                if new:
+                    merged = sorted(new + list(self._events), key=lambda e: (e["timestamp"] or "", e["id"]), reverse=True)
+                    self._events = deque(merged, maxlen=self.capacity)
+
+            self._loaded = True
+            self._last_refresh = time.monotonic()
+            self.refreshes += 1
+
+    def page(self, cursor: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Returns (events newest-first, next_cursor). `cursor` is the value returned by
+        the previous page; None starts from the newest event.
+        """
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        self.refresh()
+
+        with self._lock:
+            events = list(self._events)
+
+        start = 0
+        if cursor:
+            cursor_ts, cursor_id = decode_cursor(cursor)
+            start = next((i + 1 for i, e in enumerate(events) if e["id"] == cursor_id), None)
+            if start is None:
+                return self._page_from_firestore(cursor_ts, cursor_id, limit)
+
+        items = events[start:start + limit]
+        if len(items) < limit and len(events) == self.capacity:
+            # Buffer exhausted mid-page: continue from Firestore after the last buffered event
+            anchor = items[-1] if items else events[start - 1] if start else None
+            if anchor:
+                more, next_cursor = self._page_from_firestore(as_utc(anchor["timestamp"]), anchor["id"], limit - len(items))
+                return items + more, next_cursor
+
+        next_cursor = None
+        if len(items) == limit:
+            last = items[-1]
+            next_cursor = encode_cursor(as_utc(last["timestamp"]), last["id"])
+        return items, next_cursor
+
+    def _page_from_firestore(self, before: datetime.datetime, before_id: str, limit: int) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        self.firestore_pages += 1
+        # Document id breaks timestamp ties, so events sharing the cursor's timestamp aren't skipped
+        query = self.db.collection(u'feed') \
+            .order_by('timestamp', direction=firestore.Query.DESCENDING) \
+            .order_by('__name__', direction=firestore.Query.DESCENDING) \
+            .start_after({'timestamp': before, '__name__': before_id}) \
+            .limit(limit)
+        items = [self._serialize(doc) for doc in query.stream()]
+        next_cursor = None
+        if len(items) == limit:
+            next_cursor = encode_cursor(as_utc(items[-1]["timestamp"]), items[-1]["id"])
+        return items, next_cursor
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "buffered": len(self._events),
+            "capacity": self.capacity,
+            "refreshes": self.refreshes,
+            "firestore_pages": self.firestore_pages,
+        }
@@ -0,0 +1,225 @@
+import re
+import calendar
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from src.core.schemas import GoalContract, Penalty, ConsequenceType, ActivityType
+
+DEFAULT_MIN_CONFIDENCE = 0.8
+DEFAULT_STAKE_USD = 10.0 # Same defaults as the ContractAgent prompt
+MARATHON_KM = 42.195
+KM_PER_MILE = 1.609344
+
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+RUN_WORDS = r"run|running|ran|jog|jogging|race"
+NUMBER = r"(\d[\d,]*(?:\.\d+)?)"
+PERIOD = r"(?:/|per |a |an |each |every )(day|week|month|night)|\b(daily|weekly|monthly|nightly)\b"
+HABIT_VERBS = {
+    "do", "read", "meditate", "drink", "walk", "eat", "write", "practice", "practise", "study", "code", "sleep",
+    "save", "stretch", "journal", "cycle", "ride", "swim", "lift", "learn", "attend", "call", "cook", "spend",
+    "complete", "finish", "publish", "ship", "exercise", "train", "play", "hike", "climb", "plank",
+}
+HEDGES = re.compile(r"\b(unless|except|maybe|try|trying|if|or|depending|sometimes|roughly|around|ish)\b")
+# Phrases that change what a template would verify; such goals always go to the LLM
+NEGATION = re.compile(r"\b(not|don't|dont|do not|never|won't|cannot|can't|without|avoid)\b")
+COMPARATIVE = re.compile(r"\b(no more than|no less than|more than|less than|fewer than|at most|at least|under|over|up to|sub)\b")
+RECURRENCE = re.compile(r"\b(every|each|daily|weekly|nightly|per|times|twice|streak)\b|\b\d+\s*x\b|\ba (?:day|week|night)\b|/(?:day|week)")
+TIME_LIMIT = re.compile(r"\b\d+(?:\.\d+)?\s*(?:s|sec|secs|seconds?|min|mins|minutes?|h|hr|hrs|hours?)\b|\b\d{1,2}:\d{2}\b|\bpace\b|/\s*(?:km|mi|mile)\b")
+NEGATIVE_TEMPLATES = {"quit", "limit", "restriction_time"} # Already phrased as "no X", "X < N"
+# Matched against the whole goal text: every word is accounted for by the template
+FULL_MATCH_TEMPLATES = {"restriction_time", "quit", "limit", "save_amount", "frequency", "recurring"}
+
+@dataclass
+class ParsedGoal:
+    """A contract built without the LLM, and how sure the parser is about it (0-1)."""
+    contract: Optional[GoalContract]
+    confidence: float
+    template: Optional[str] = None
+    signals: Dict[str, Any] = field(default_factory=dict)
+
+# --- Deadline phrases ---
+
+def _end_of_day(day: datetime) -> datetime:
+    return day.replace(hour=23, minute=59, second=59, microsecond=0)
+
+def _upcoming_weekday(now: datetime, weekday: int) -> datetime:
+    # "by Sunday" on a Sunday means today
+    return _end_of_day(now + timedelta(days=(weekday - now.weekday()) % 7))
+
+def _end_of_month(now: datetime) -> datetime:
+    return _end_of_day(now.replace(day=calendar.monthrange(now.year, now.month)[1]))
+
+def parse_deadline(text: str, now: datetime) -> Tuple[Optional[datetime], Optional[str]]:
+    """Deadline phrase -> (UTC deadline, phrase kind), or (None, None) if the text has none."""
+    if m := re.search(r"\b(?:by|before|until|on)\s+(\d{4}-\d{2}-\d{2})\b", text):
+        try:
+            return _end_of_day(datetime.strptime(m.group(1), "%Y-%m-%d").replace(tzinfo=timezone.utc)), "date"
+        except ValueError:
+            return None, None
+    if m := re.search(r"\b(?:by|before|until|on|this)\s+(" + "|".join(WEEKDAYS) + r")\b", text):
+        return _upcoming_weekday(now, WEEKDAYS.index(m.group(1))), "weekday"
+    if m := re.search(r"\b(?:in|for)\s+(\d+|a|an|one|two|three)\s+(day|week|month)s?\b", text):
+        count = {"a": 1, "an": 1, "one": 1, "two": 2, "three": 3}.get(m.group(1)) or int(m.group(1))
+        days = {"day": 1, "week": 7, "month": 30}[m.group(2)] * count
+        return _end_of_day(now + timedelta(days=days)), "relative"
+    if re.search(r"\b(today|tonight)\b", text):
+        return _end_of_day(now), "today"
+    if re.search(r"\btomorrow\b", text):
+        return _end_of_day(now + timedelta(days=1)), "tomorrow"
+    if re.search(r"\b(this|by the end of the|end of the|by end of) week(end)?\b", text):
+        return _upcoming_weekday(now, 6), "week"
+    if re.search(r"\b(this|by the end of the|end of the|by end of) month\b", text):
+        return _end_of_month(now), "month"
+    return None, None
+
+# --- Penalty preference ---
+
+def parse_penalty(text: str) -> Tuple[Penalty, bool]:
+    """(Penalty, explicit?) following the prompt's rules; the default is a $10 stake burn."""
+    amount = None
+    if m := re.search(r"\$\s?" + NUMBER + r"\s*(?:stake|penalty|donation|on the line)", text) or \
+            re.search(r"\b(?:stake|donate|bet|risk|burn)\s+\$\s?" + NUMBER, text):
+        amount = float(m.group(1).replace(",", ""))
+    if re.search(r"public[\s_]+shame|shame me|tweet (?:it|my failure)", text):
+        return Penalty(type=ConsequenceType.PUBLIC_SHAME, amount_usd=0, destination="Ledger"), True
+    if re.search(r"\bdonat(e|ion)\b|\bcharity\b", text):
+        return Penalty(type=ConsequenceType.DONATION, amount_usd=amount or DEFAULT_STAKE_USD, destination="Ledger"), True
+    if re.search(r"\bstake\b|\bburn\b", text) or amount is not None:
+        return Penalty(type=ConsequenceType.STAKE_BURN, amount_usd=amount or DEFAULT_STAKE_USD, destination="Ledger"), True
+    return Penalty(type=ConsequenceType.STAKE_BURN, amount_usd=DEFAULT_STAKE_USD, destination="Ledger"), False
+
+_PENALTY_CLAUSE = re.compile(
+    r"(?:,|;|\bor\b|\belse\b|\bwith\b|\band\b)?\s*(?:i(?:'ll| will)?\s+)?"
+    r"(?:\$\s?\d[\d,]*(?:\.\d+)?\s*(?:stake|penalty|donation)|(?:stake|donate|bet|risk|burn)\s+\$\s?\d[\d,]*(?:\.\d+)?"
+    r"|public[\s_]+shame|shame me|(?:a\s+)?donation|(?:a\s+)?stake burn)(?:\s+(?:to|for)\s+charity)?\s*(?:if i fail)?"
+)
+_DEADLINE_CLAUSE = re.compile(
+    r"\b(?:by|before|until|on)\s+(?:\d{4}-\d{2}-\d{2}|" + "|".join(WEEKDAYS) + r")\b|\bthis\s+(?:" + "|".join(WEEKDAYS) + r")\b"
+    r"|\b(?:in|for)\s+(?:\d+|a|an|one|two|three)\s+(?:day|week|month)s?\b|\b(?:today|tonight|tomorrow)\b"
+    r"|\b(?:this|by the end of the|end of the|by end of) (?:week(?:end)?|month)\b"
+)
+
+# --- Templates ---
+
+def _distance_km(text: str) -> Optional[float]:
+    if re.search(r"\bhalf[\s-]marathon\b", text):
+        return MARATHON_KM / 2
+    if re.search(r"\bmarathon\b", text):
+        return MARATHON_KM
+    if m := re.search(NUMBER + r"\s*(km|k|kms|kilometers?|kilometres?|mi|miles?)\b", text):
+        value = float(m.group(1).replace(",", ""))
+        return round(value * KM_PER_MILE, 3) if m.group(2).startswith("mi") else value
+    return None
+
+def _match_template(core: str) -> Tuple[Optional[str], Dict[str, Any]]:
+    """The goal shape of the text with deadline and penalty clauses removed."""
+    words = core.split()
+    if not words:
+        return None, {}
+
+    distance = _distance_km(core)
+    if distance and (re.search(r"\b(" + RUN_WORDS + r")\b", core) or re.search(r"\bmarathon\b", core)):
+        return "run_distance", {"distance_km": distance}
+
+    if m := re.fullmatch(r"no (.{2,40}?) (after|before) (\d{1,2})(?::(\d{2}))?\s*(am|pm)?(?: " + PERIOD + r")?", core):
+        return "restriction_time", {"subject": m.group(1), "cutoff": f"{m.group(3)}{(':' + m.group(4)) if m.group(4) else ''}{m.group(5) or ''}"}
+
+    if m := re.fullmatch(r"(?:quit|stop|no more|give up) ([a-z/ ]{2,30})", core):
+        return "quit", {"subject": m.group(1)}
+
+    if m := re.fullmatch(r"([a-z ]{2,30}?)\s*(<|>|<=|>=|under|below|less than|at most|at least|over)\s*" + NUMBER + r"\s*([a-z]{1,8})?\s*(?:" + PERIOD + r")?", core):
+        return "limit", {"subject": m.group(1), "operator": m.group(2), "quantity": m.group(3)}
+
+    if m := re.fullmatch(r"save \$\s?" + NUMBER + r"(?: (?:this|a|per|each|every) (?:week|month|year))?", core):
+        return "save_amount", {"amount": m.group(1)}
+
+    if m := re.fullmatch(r"([a-z]+(?: [a-z]+){0,3}) (\d+)\s*(?:x|times)\s*(?:" + PERIOD + r")", core):
+        return "frequency", {"activity": m.group(1), "times": int(m.group(2))}
+
+    if words[0] in HABIT_VERBS and (m := re.search(NUMBER, core)):
+        rest = core[m.end():].strip()
+        unit_words = re.split(r"\s*(?:/|\bper\b|\ba\b|\ban\b|\beach\b|\bevery\b|\bdaily\b|\bweekly\b|\bmonthly\b)", rest)[0].split()
+        period = re.search(PERIOD, core)
+        if len(unit_words) <= 4 and (period or len(words) <= 6):
+            return "habit_quantity", {"verb": words[0], "quantity": m.group(1), "unit": " ".join(unit_words),
+                                      "period": next((g for g in period.groups() if g), None) if period else None}
+
+    if m := re.fullmatch(r"(daily|weekly|monthly) ([a-z ]{3,30})", core):
+        return "recurring", {"activity": m.group(2), "period": m.group(1)}
+
+    return None, {}
+
+def _unsupported(template: str, core: str) -> Optional[str]:
+    """Why the template would misread the goal, if it would: the contract can't carry the condition."""
+    if template not in NEGATIVE_TEMPLATES and NEGATION.search(core):
+        return "negation"
+    if template == "run_distance":
+        # The contract only holds a distance: a cap, a repeat count or a time goal would be dropped
+        for reason, pattern in (("comparative", COMPARATIVE), ("recurrence", RECURRENCE), ("time_limit", TIME_LIMIT)):
+            if pattern.search(core):
+                return reason
+    return None
+
+def _normalize(text: str) -> str:
+    # Like normalize_goal, but keeps "-" (dates, half-marathon) and "'" (I'll)
+    text = re.sub(r"[^\w\s$<>%/.,:'-]", " ", (text or "").lower())
+    return re.sub(r"\s+", " ", text).strip(" .,:")
+
+def _describe(text: str) -> str:
+    # The user's own wording minus emoji and stray symbols, like the LLM's summaries
+    cleaned = re.sub(r"[^\w\s$<>%/.,:'+-]", " ", text)
+    cleaned = re.sub(r"\s+", " ", cleaned).strip(" .,:")
+    return cleaned[:1].upper() + cleaned[1:] if cleaned else text
+
+def parse_goal(goal_text: str, now: Optional[datetime] = None) -> ParsedGoal:
+    """
+    Deterministic GoalContract for common goal shapes (run a distance, N units per period,
+    "no X after 6pm", quit X, screen time < 2h, save $N, 3x/week, ...), following the same
+    rules as the ContractAgent prompt. Confidence reflects how completely the text was
+    explained by a template; free-form or hedged goals score low and should go to the LLM.
+    Goals with a negation, or a run with a cap, repeat count or time limit, are never
+    fast-pathed: the template would build a contract for a different goal. Neither is
+    a goal whose explicit date has already passed (the LLM is told to pick a valid one).
+    """
+    now = now or datetime.now(timezone.utc)
+    text = _normalize(goal_text)
+    if not text:
+        return ParsedGoal(None, 0.0)
+
+    deadline, deadline_kind = parse_deadline(text, now)
+    penalty, penalty_explicit = parse_penalty(text)
+    core = _DEADLINE_CLAUSE.sub(" ", _PENALTY_CLAUSE.sub(" ", text))
+    core = re.sub(r"\s+", " ", core).strip(" .,:;")
+    template, details = _match_template(core)
+    signals = dict(details, deadline=deadline_kind, penalty_explicit=penalty_explicit, words=len(core.split()))
+    if template and (reason := _unsupported(template, core)):
+        signals["unsupported"] = reason
+        template = None
+    if template and deadline is not None and deadline <= now:
+        signals["unsupported"] = "past_deadline"
+        template = None
+    if not template:
+        return ParsedGoal(None, 0.0, None, signals)
+
+    confidence = 0.7
+    confidence += 0.15 if deadline_kind else 0.1 # The default deadline is what the LLM is told to infer too
+    if template in FULL_MATCH_TEMPLATES or len(core.split()) <= 4:
+        confidence += 0.1 # Nothing in the goal is left unexplained by the template
+    if len(core.split()) > 8:
+        confidence -= 0.3 # Long goals usually carry conditions the template doesn't capture
+    if HEDGES.search(core):
+        confidence -= 0.4
+    if penalty_explicit and "$" in text and penalty.amount_usd == DEFAULT_STAKE_USD and not re.search(r"\$\s?10\b", text):
+        confidence -= 0.3 # A dollar amount we didn't attach to the penalty
+    confidence = round(max(0.0, min(1.0, confidence)), 2)
+
+    running = template == "run_distance"
+    contract = GoalContract(
+        goal_type="running" if running else "general",
+        goal_description=_describe(goal_text),
+        target_distance_km=details["distance_km"] if running else None,
+        allowed_activity_types=[ActivityType.RUN, ActivityType.TREADMILL] if running else [ActivityType.GENERAL],
+        deadline_utc=deadline or _upcoming_weekday(now, 6),
+        penalty=penalty,
+    )
+    return ParsedGoal(contract, confidence, template, signals)
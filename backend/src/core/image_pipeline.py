@@ -0,0 +1,164 @@
+import os
+import re
+import tempfile
+import threading
+from typing import Any, Dict, List, Optional
+import requests
+from requests.adapters import HTTPAdapter
+from src.core.evidence import DEFAULT_DERIVATIVE_PX, derivative_name
+from src.core.stage_timings import StageTimings
+
+# <sha256><ext> (original) or <sha256>_<px>.jpg (derivative) under the evidence prefix
+EVIDENCE_NAME = re.compile(r"([0-9a-f]{64})(?:_\d+\.jpg|\.[A-Za-z0-9]{1,6})?$")
+DEFAULT_CACHE_DIR = os.path.join(tempfile.gettempdir(), "pact_image_cache")
+DEFAULT_CACHE_ENTRIES = 2000
+DEFAULT_FETCH_TIMEOUT_SEC = 10.0
+DEFAULT_POOL_SIZE = 16
+DEFAULT_MAX_DERIVATIVE_BYTES = 4 * 1024 * 1024 # A 1024 px JPEG is ~200 KB
+
+class EvidenceImagePipeline:
+    """
+    Turns evidence image URLs into compact JPEG bytes for the multimodal judge.
+
+    Only evidence stored by EvidenceStore is read: the URL must sit under the evidence
+    bucket's content-addressed prefix (https), and what is fetched is the downscaled,
+    EXIF-oriented derivative the upload already produced, never the original or an
+    arbitrary host. Redirects are not followed. Results are cached on local disk by
+    content hash, so each image is fetched once.
+
+    Without an evidence prefix (no storage bucket) every image is refused and the
+    judge falls back to text.
+
+    Config (env): PACT_EVIDENCE_DERIVATIVE_PX, PACT_IMAGE_CACHE_DIR, PACT_IMAGE_FETCH_TIMEOUT_SEC
+    """
+
+    def __init__(self, evidence_prefix: Optional[str] = None, derivative_px: int = None, cache_dir: str = None,
+                 timings: StageTimings = None, session: requests.Session = None, max_bytes: int = DEFAULT_MAX_DERIVATIVE_BYTES,
+                 cache_entries: int = DEFAULT_CACHE_ENTRIES):
+        self.evidence_prefix = evidence_prefix if evidence_prefix and evidence_prefix.startswith("https://") else None
+        if evidence_prefix and not self.evidence_prefix:
+            print(f"[WARN] Evidence prefix {evidence_prefix} is not https; evidence images disabled")
+        self.derivative_px = derivative_px if derivative_px is not None else int(os.getenv("PACT_EVIDENCE_DERIVATIVE_PX", DEFAULT_DERIVATIVE_PX))
+        self.cache_dir = cache_dir or os.getenv("PACT_IMAGE_CACHE_DIR", DEFAULT_CACHE_DIR)
+        self.timeout = float(os.getenv("PACT_IMAGE_FETCH_TIMEOUT_SEC", DEFAULT_FETCH_TIMEOUT_SEC))
+        self.max_bytes = max_bytes
+        self.cache_entries = cache_entries
+        self.timings = timings or StageTimings()
+        self.session = session or self._pooled_session()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.rejected = 0
+        self.failures = 0
+        self.bytes_fetched = 0
+        self._writes = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.evidence_prefix and self.derivative_px)
+
+    @staticmethod
+    def _pooled_session() -> requests.Session:
+        session = requests.Session()
+        session.mount("https://", HTTPAdapter(pool_connections=DEFAULT_POOL_SIZE, pool_maxsize=DEFAULT_POOL_SIZE))
+        return session
+
+    def _content_hash(self, url: str) -> Optional[str]:
+        """The SHA-256 of a stored evidence object (original or derivative URL), else None."""
+        if not self.enabled or not url.startswith(self.evidence_prefix):
+            return None
+        match = EVIDENCE_NAME.match(url[len(self.evidence_prefix):])
+        return match.group(1) if match else None
+
+    def prepare(self, url: str) -> Optional[Dict[str, Any]]:
+        """Returns {"mime_type", "data"} ready for generate_content, or None if unusable."""
+        sha256 = self._content_hash(url)
+        if sha256 is None:
+            with self._lock:
+                self.rejected += 1
+            if self.enabled:
+                print(f"[WARN] Refusing evidence image outside the evidence bucket: {url}")
+            return None
+
+        name = derivative_name(sha256, self.derivative_px)
+        path = os.path.join(self.cache_dir, os.path.basename(name))
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            with self._lock:
+                self.cache_hits += 1
+            return {"mime_type": "image/jpeg", "data": data}
+        except FileNotFoundError:
+            pass
+
+        with self._lock:
+            self.cache_misses += 1
+        try:
+            with self.timings.stage("fetch"):
+                data = self._fetch(self.evidence_prefix + os.path.basename(name))
+        except Exception as e:
+            # Includes uploads without a derivative (not an image, or stored without Pillow)
+            with self._lock:
+                self.failures += 1
+            print(f"[WARN] Could not fetch evidence image {sha256}: {e}")
+            return None
+
+        self._store(path, data)
+        with self._lock:
+            self.bytes_fetched += len(data)
+        return {"mime_type": "image/jpeg", "data": data}
+
+    def prepare_all(self, urls: List[str]) -> List[Dict[str, Any]]:
+        return [part for part in (self.prepare(url) for url in urls) if part]
+
+    def _fetch(self, url: str) -> bytes:
+        with self.session.get(url, stream=True, timeout=self.timeout, allow_redirects=False) as response:
+            response.raise_for_status()
+            if response.status_code != 200:
+                raise ValueError(f"unexpected HTTP {response.status_code}")
+            buf = bytearray()
+            for chunk in response.iter_content(chunk_size=256 * 1024):
+                buf.extend(chunk)
+                if len(buf) > self.max_bytes:
+                    raise ValueError(f"image larger than {self.max_bytes} bytes")
+            return bytes(buf)
+
+    def _store(self, path: str, data: bytes):
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"[WARN] Could not cache evidence image: {e}")
+            return
+        with self._lock:
+            self._writes += 1
+            prune = self._writes % 100 == 0
+        if prune:
+            self._prune()
+
+    def _prune(self):
+        # Oldest files first once the directory holds more than `cache_entries`
+        entries = [os.path.join(self.cache_dir, name) for name in os.listdir(self.cache_dir) if name.endswith(".jpg")]
+        if len(entries) <= self.cache_entries:
+            return
+        entries.sort(key=lambda p: os.path.getmtime(p))
+        for stale in entries[:len(entries) - self.cache_entries]:
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "derivative_px": self.derivative_px,
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            "rejected": self.rejected,
+            "failures": self.failures,
+            "bytes_fetched": self.bytes_fetched,
+            "stage_timings": self.timings.summary(),
+        }
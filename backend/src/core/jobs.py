@@ -0,0 +1,284 @@
+import os
+import json
+import time
+import uuid
+import random
+import socket
+import sqlite3
+import tempfile
+import threading
+import traceback
+from typing import Any, Callable, Dict, List, Optional
+
+DEFAULT_DB_PATH = os.path.join(tempfile.gettempdir(), "pact_jobs.sqlite3")
+DEFAULT_WORKERS = 4
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_LEASE_SEC = 300.0
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+DEAD = "dead"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    idempotency_key TEXT UNIQUE,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    run_at REAL NOT NULL,
+    enqueued_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    last_error TEXT,
+    lease_owner TEXT,
+    lease_expires REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status_run_at ON jobs (status, run_at);
+"""
+_LEASE_COLUMNS = {"lease_owner": "TEXT", "lease_expires": "REAL"}
+
+class JobQueue:
+    """
+    Durable local job queue (SQLite) for side effects that must not hold up a response.
+    Jobs survive restarts, are retried with exponential backoff and are deduplicated
+    by idempotency key, so enqueueing the same side effect twice runs it once.
+
+    The file is shared by every worker process on the host. A claimed job carries a lease
+    (owner = this queue instance, expiry); only jobs whose lease has expired are taken
+    over, so a process starting up never re-runs another live process's in-flight jobs.
+    A job outliving its lease may still run twice; handlers must be idempotent on the
+    job's idempotency key (see StakeManager.handle_outcome).
+
+    Config (env):
+    - PACT_JOB_DB: SQLite file path (default: <tmp>/pact_jobs.sqlite3)
+    - PACT_JOB_WORKERS: worker threads (default 4)
+    - PACT_JOB_LEASE_SEC: how long a claimed job is reserved for its worker (default 300)
+    """
+
+    def __init__(self, db_path: str = None, workers: int = None, max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+                 base_backoff_sec: float = 1.0, poll_interval_sec: float = 0.2, lease_sec: float = None):
+        self.db_path = db_path or os.getenv("PACT_JOB_DB", DEFAULT_DB_PATH)
+        self.workers = workers or int(os.getenv("PACT_JOB_WORKERS", DEFAULT_WORKERS))
+        self.lease_sec = lease_sec or float(os.getenv("PACT_JOB_LEASE_SEC", DEFAULT_LEASE_SEC))
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.max_attempts = max_attempts
+        self.base_backoff_sec = base_backoff_sec
+        self.poll_interval_sec = poll_interval_sec
+
+        self._handlers: Dict[str, Callable[[Dict[str, Any]], Any]] = {}
+        self._local = threading.local()
+        self._threads: List[threading.Thread] = []
+        self._start_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+
+        conn = self._conn()
+        conn.executescript(_SCHEMA)
+        # Files created before leases existed
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+        for name, kind in _LEASE_COLUMNS.items():
+            if name not in columns:
+                conn.execute(f"ALTER TABLE jobs ADD COLUMN {name} {kind}")
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread; WAL lets workers read while the API thread enqueues
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # --- Producer API ---
+
+    def register(self, kind: str, handler: Callable[[Dict[str, Any]], Any]):
+        self._handlers[kind] = handler
+
+    def enqueue(self, kind: str, payload: Dict[str, Any], idempotency_key: Optional[str] = None,
+                max_attempts: Optional[int] = None, delay_sec: float = 0.0) -> str:
+        """
+        Persists a job and returns its id.
+        If a job with the same idempotency key already exists, returns that job's id instead.
+        """
+        now = time.time()
+        job_id = uuid.uuid4().hex
+        conn = self._conn()
+        cursor = conn.execute(
+            "INSERT OR IGNORE INTO jobs (id, kind, payload, idempotency_key, status, max_attempts, run_at, enqueued_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (job_id, kind, json.dumps(payload, default=str), idempotency_key, PENDING,
+             max_attempts or self.max_attempts, now + delay_sec, now)
+        )
+        if cursor.rowcount == 0:
+            row = conn.execute("SELECT id FROM jobs WHERE idempotency_key = ?", (idempotency_key,)).fetchone()
+            return row["id"]
+
+        self.start()
+        self._wakeup.set()
+        return job_id
+
+    def complete(self, idempotency_keys: List[str]) -> int:
+        """
+        Marks still-pending jobs done without running them (their work happened elsewhere).
+        Returns how many were settled; jobs already claimed by a worker are left alone.
+        """
+        if not idempotency_keys:
+            return 0
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            settled = sum(
+                conn.execute("UPDATE jobs SET status = ?, finished_at = ? WHERE idempotency_key = ? AND status = ?",
+                             (DONE, now, key, PENDING)).rowcount
+                for key in idempotency_keys
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return settled
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    # --- Worker Pool ---
+
+    def start(self):
+        """
+        Starts the worker pool (idempotent); call it at app startup so jobs left pending
+        by a restart run without waiting for a new enqueue. Jobs left 'running' by a crashed
+        process are picked up once their lease expires.
+        """
+        if self._threads:
+            return
+        with self._start_lock:
+            if self._threads:
+                return
+            self._stop.clear()
+            for i in range(self.workers):
+                t = threading.Thread(target=self._worker_loop, name=f"pact-job-worker-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        self._wakeup.set()
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = []
+
+    def _worker_loop(self):
+        while not self._stop.is_set():
+            if not self.work_once():
+                self._wakeup.wait(self.poll_interval_sec)
+                self._wakeup.clear()
+
+    def work_once(self) -> bool:
+        """Claims and runs a single due job. Returns False if nothing was due."""
+        job = self._claim()
+        if not job:
+            return False
+
+        handler = self._handlers.get(job["kind"])
+        try:
+            if handler is None:
+                raise RuntimeError(f"No handler registered for job kind '{job['kind']}'")
+            handler(json.loads(job["payload"]))
+        except Exception as e:
+            print(f"[JobQueue] {job['kind']} ({job['id']}) attempt {job['attempts']} failed: {e}")
+            self._fail(job, "".join(traceback.format_exception_only(type(e), e)).strip())
+        else:
+            self._conn().execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, last_error = NULL, lease_owner = NULL, lease_expires = NULL "
+                "WHERE id = ? AND lease_owner = ?",
+                (DONE, time.time(), job["id"], self.owner)
+            )
+        return True
+
+    def _claim(self) -> Optional[Dict[str, Any]]:
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Due pending jobs, or running ones whose owner's lease ran out (crashed or hung worker)
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE (status = ? AND run_at <= ?) "
+                "OR (status = ? AND (lease_expires IS NULL OR lease_expires <= ?)) ORDER BY run_at LIMIT 1",
+                (PENDING, now, RUNNING, now)
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, started_at = ?, lease_owner = ?, lease_expires = ? "
+                "WHERE id = ?",
+                (RUNNING, now, self.owner, now + self.lease_sec, row["id"])
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        job = dict(row)
+        job["attempts"] += 1
+        return job
+
+    def _fail(self, job: Dict[str, Any], error: str):
+        # Writes are conditional on still holding the lease: a taken-over job belongs to its new owner
+        if job["attempts"] >= job["max_attempts"]:
+            self._conn().execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, last_error = ?, lease_owner = NULL, lease_expires = NULL "
+                "WHERE id = ? AND lease_owner = ?",
+                (DEAD, time.time(), error, job["id"], self.owner)
+            )
+            return
+        # Exponential backoff with jitter
+        backoff = self.base_backoff_sec * (2 ** (job["attempts"] - 1))
+        backoff *= random.uniform(0.5, 1.5)
+        self._conn().execute(
+            "UPDATE jobs SET status = ?, run_at = ?, last_error = ?, lease_owner = NULL, lease_expires = NULL "
+            "WHERE id = ? AND lease_owner = ?",
+            (PENDING, time.time() + backoff, error, job["id"], self.owner)
+        )
+
+    # --- Observability ---
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        depth: jobs waiting to run (delayed: of which not yet due); lag_sec: age of the oldest job that is due but not yet picked up.
+        """
+        conn = self._conn()
+        now = time.time()
+        counts = {status: 0 for status in (PENDING, RUNNING, DONE, DEAD)}
+        for row in conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status"):
+            counts[row["status"]] = row["n"]
+
+        by_kind = {}
+        for row in conn.execute("SELECT kind, COUNT(*) AS n FROM jobs WHERE status = ? GROUP BY kind", (PENDING,)):
+            by_kind[row["kind"]] = row["n"]
+
+        delayed = conn.execute(
+            "SELECT COUNT(*) AS n FROM jobs WHERE status = ? AND run_at > ?", (PENDING, now)
+        ).fetchone()["n"]
+
+        oldest_due = conn.execute(
+            "SELECT MIN(enqueued_at) AS t FROM jobs WHERE status = ? AND run_at <= ?", (PENDING, now)
+        ).fetchone()["t"]
+
+        return {
+            "workers": self.workers,
+            "depth": counts[PENDING],
+            "delayed": delayed,
+            "running": counts[RUNNING],
+            "done": counts[DONE],
+            "dead": counts[DEAD],
+            "depth_by_kind": by_kind,
+            "lag_sec": round(now - oldest_due, 3) if oldest_due else 0.0,
+        }
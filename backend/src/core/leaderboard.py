@@ -0,0 +1,220 @@
+import os
+import json
+import time
+import bisect
+import tempfile
+import datetime
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+DEFAULT_K = 100
+DEFAULT_SNAPSHOT_PATH = os.path.join(tempfile.gettempdir(), "pact_leaderboard.json")
+DEFAULT_SNAPSHOT_INTERVAL_SEC = 30.0
+WINDOWS = ("all", "weekly", "monthly")
+
+class TopKBoard:
+    """
+    Per-user completion counts plus the top-K kept sorted by (-completed, user_id).
+
+    Completion counts only ever increase, so a user outside the top-K can only enter
+    it through their own update: each update is O(K) at worst, reads are O(K), and
+    nothing is ever rescanned.
+    """
+
+    def __init__(self, k: int = DEFAULT_K):
+        self.k = k
+        self.completed: Dict[str, int] = {}
+        self.failed: Dict[str, int] = {}
+        self._top: List[Tuple[int, str]] = [] # Ascending (-score, user_id) == best first
+        self._in_top = set()
+
+    def record(self, user_id: str, completed: int = 0, failed: int = 0):
+        if failed:
+            self.failed[user_id] = self.failed.get(user_id, 0) + failed
+        if completed <= 0:
+            return
+
+        old = self.completed.get(user_id, 0)
+        score = old + completed
+        self.completed[user_id] = score
+
+        if user_id in self._in_top:
+            del self._top[bisect.bisect_left(self._top, (-old, user_id))]
+            bisect.insort(self._top, (-score, user_id))
+        elif len(self._top) < self.k or (-score, user_id) < self._top[-1]:
+            bisect.insort(self._top, (-score, user_id))
+            self._in_top.add(user_id)
+            if len(self._top) > self.k:
+                _, evicted = self._top.pop()
+                self._in_top.discard(evicted)
+
+    def top(self, limit: int) -> List[Tuple[str, int, int]]:
+        """[(user_id, completed, failed)] best first."""
+        return [(uid, -neg, self.failed.get(uid, 0)) for neg, uid in self._top[:limit]]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"completed": self.completed, "failed": self.failed}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], k: int) -> "TopKBoard":
+        board = cls(k)
+        board.failed = dict(data.get("failed", {}))
+        for user_id, score in data.get("completed", {}).items():
+            board.record(user_id, completed=score)
+        return board
+
+def window_ids(at: datetime.datetime) -> Dict[str, str]:
+    year, week, _ = at.isocalendar()
+    return {
+        "all": "all",
+        "weekly": f"weekly:{year}-W{week:02d}",
+        "monthly": f"monthly:{at.year}-{at.month:02d}",
+    }
+
+class Leaderboard:
+    """
+    Incrementally maintained leaderboards (all-time, this week, this month).
+
+    Updated whenever completion stats change (see PostVerificationEffects and the reaper);
+    reads never touch the users collection. State is snapshotted to a local JSON file at
+    most every `snapshot_interval_sec`; with no snapshot, the all-time board is seeded
+    from the sharded stat counters (summed per user, see ShardedCounters.totals_by_user).
+    Every user with stats is seeded, not just the top K, so a later update adds to the
+    user's real total.
+
+    The board is per process: each worker only sees the updates its own job workers ran,
+    and the snapshot is a local file. Run the job queue in a single worker process (or
+    give each worker its own PACT_LEADERBOARD_SNAPSHOT and accept per-worker boards);
+    the weekly and monthly boards start empty after a restart without a snapshot.
+
+    Config (env): PACT_LEADERBOARD_K, PACT_LEADERBOARD_SNAPSHOT
+    """
+
+    def __init__(self, db, profiles, k: int = None, snapshot_path: str = None,
+                 snapshot_interval_sec: float = DEFAULT_SNAPSHOT_INTERVAL_SEC, counters=None):
+        self.db = db
+        self.profiles = profiles
+        self.counters = counters
+        self.k = k or int(os.getenv("PACT_LEADERBOARD_K", DEFAULT_K))
+        self.snapshot_path = snapshot_path or os.getenv("PACT_LEADERBOARD_SNAPSHOT", DEFAULT_SNAPSHOT_PATH)
+        self.snapshot_interval_sec = snapshot_interval_sec
+        self._boards: Dict[str, TopKBoard] = {}
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._dirty = False
+        self._last_snapshot = time.monotonic()
+        self._saving = threading.Event()
+        self.updates = 0
+
+    # --- Persistence ---
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            if os.path.exists(self.snapshot_path):
+                try:
+                    with open(self.snapshot_path, "r") as f:
+                        data = json.load(f)
+                    self._boards = {board_id: TopKBoard.from_dict(board, self.k) for board_id, board in data.items()}
+                except Exception as e:
+                    print(f"[WARN] Failed to load leaderboard snapshot: {e}")
+            elif self.counters is not None:
+                self._seed_from_counters()
+            self._loaded = True
+
+    def _seed_from_counters(self):
+        # users.stats is frozen since counters moved to shards, so rank by the summed shards
+        board = self._boards.setdefault("all", TopKBoard(self.k))
+        try:
+            # Everyone, not just the top K: a user below the cut must rank on their full total later
+            completed = self.counters.totals_by_user('contracts_completed')
+            failed = self.counters.totals_by_user('contracts_failed')
+            for user_id in completed.keys() | failed.keys():
+                board.record(user_id, completed=completed.get(user_id, 0), failed=failed.get(user_id, 0))
+        except Exception as e:
+            print(f"[WARN] Failed to seed leaderboard: {e}")
+
+    def save_snapshot(self):
+        with self._lock:
+            # Shallow copies under the lock; serialization happens outside it
+            state = {board_id: {k: dict(v) for k, v in board.to_dict().items()} for board_id, board in self._boards.items()}
+            self._dirty = False
+            self._last_snapshot = time.monotonic()
+        tmp_path = f"{self.snapshot_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.snapshot_path) # Atomic swap: a crash never leaves a torn snapshot
+
+    def _save_in_background(self):
+        try:
+            self.save_snapshot()
+        except Exception as e:
+            print(f"[WARN] Failed to save leaderboard snapshot: {e}")
+        finally:
+            self._saving.clear()
+
+    # --- Writes ---
+
+    def record(self, user_id: str, completed: int = 0, failed: int = 0, at: Optional[datetime.datetime] = None):
+        """Applies a stats change to every board it falls into."""
+        self._ensure_loaded()
+        at = at or datetime.datetime.now(datetime.timezone.utc)
+        current = window_ids(at)
+
+        with self._lock:
+            for board_id in current.values():
+                board = self._boards.get(board_id)
+                if board is None:
+                    board = self._boards[board_id] = TopKBoard(self.k)
+                    self._prune(current)
+                board.record(user_id, completed=completed, failed=failed)
+            self.updates += 1
+            self._dirty = True
+            due = time.monotonic() - self._last_snapshot > self.snapshot_interval_sec
+
+        if due and not self._saving.is_set():
+            self._saving.set()
+            threading.Thread(target=self._save_in_background, name="pact-leaderboard-snapshot", daemon=True).start()
+
+    def _prune(self, current: Dict[str, str]):
+        # Keep the current and previous window of each kind; older boards are dropped
+        for kind in ("weekly", "monthly"):
+            ids = sorted(b for b in self._boards if b.startswith(f"{kind}:"))
+            for stale in ids[:-2]:
+                if stale != current[kind]:
+                    del self._boards[stale]
+
+    # --- Reads ---
+
+    def top(self, window: str = "all", limit: int = 10, at: Optional[datetime.datetime] = None) -> List[Dict[str, Any]]:
+        if window not in WINDOWS:
+            raise ValueError(f"Unknown leaderboard window '{window}'")
+        self._ensure_loaded()
+        board_id = window_ids(at or datetime.datetime.now(datetime.timezone.utc))[window]
+
+        with self._lock:
+            board = self._boards.get(board_id)
+            rows = board.top(min(limit, self.k)) if board else []
+
+        entries = []
+        for user_id, completed, failed in rows:
+            profile = self.profiles.get(user_id) if self.profiles else {}
+            entries.append({
+                "user_id": user_id,
+                "display_name": profile.get("display_name") or "Anonymous Agent",
+                "photo_url": profile.get("photo_url"),
+                "contracts_completed": completed,
+                "trust_score": round(100 * completed / (completed + failed)) if completed + failed else 0
+            })
+        return entries
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "boards": {board_id: len(board.completed) for board_id, board in self._boards.items()},
+                "updates": self.updates,
+                "dirty": self._dirty,
+            }
@@ -0,0 +1,418 @@
+import os
+import time
+import queue
+import random
+import threading
+import contextvars
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Any, Dict, Iterator, Optional
+import google.generativeai as genai
+from src.core.single_flight import CallCancelled, current_cancel_token
+from src.core.llm_scheduler import LLMScheduler
+from src.core.rate_limit import RateLimitExceeded
+
+DEFAULT_MODEL = "gemini-2.5-flash"
+DEFAULT_CONCURRENCY = 4
+DEFAULT_TIMEOUT_SEC = 30.0
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_BACKOFF_SEC = 1.0
+DEFAULT_BREAKER_THRESHOLD = 5
+DEFAULT_BREAKER_RESET_SEC = 30.0
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+LATENCY_SAMPLES = 500
+CANCEL_POLL_SEC = 0.05 # How often a cancellable call re-checks its token while waiting
+
+class LLMUnavailable(Exception):
+    """
+    The gateway gave up on a call (circuit open, deadline spent or retries exhausted).
+    `retry_after` is the seconds until a retry could succeed, when the gateway knows it.
+    """
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class CircuitOpen(LLMUnavailable):
+    pass
+
+class LLMTimeout(LLMUnavailable):
+    pass
+
+class QuotaExhausted(LLMUnavailable):
+    """No quota for this call within its priority class's queueing deadline."""
+
+def is_retryable(error: Exception) -> bool:
+    """429 / 5xx from the API (google.api_core errors carry the HTTP status in `.code`), or a transport error."""
+    code = getattr(error, "code", None)
+    if isinstance(code, int) and code in RETRYABLE_STATUS:
+        return True
+    return isinstance(error, (ConnectionError, TimeoutError)) or type(error).__name__ in (
+        "ResourceExhausted", "TooManyRequests", "ServiceUnavailable", "InternalServerError", "DeadlineExceeded", "BadGateway"
+    )
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive failures and fails calls fast for `reset_sec`;
+    then lets a single probe through (half-open). The probe's outcome closes or re-opens it.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, threshold: int, reset_sec: float, clock=time.monotonic):
+        self.threshold = threshold
+        self.reset_sec = reset_sec
+        self.clock = clock
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.opens = 0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.OPEN and self.clock() - self.opened_at >= self.reset_sec:
+                self.state = self.HALF_OPEN
+                self._probing = False
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def retry_after(self) -> float:
+        """Seconds until an open breaker lets a probe through."""
+        with self._lock:
+            return max(0.0, self.reset_sec - (self.clock() - self.opened_at)) if self.state == self.OPEN else 0.0
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def release_probe(self):
+        """The admitted call never reached the API; let another one probe."""
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.threshold:
+                if self.state != self.OPEN:
+                    self.opens += 1
+                self.state = self.OPEN
+                self.opened_at = self.clock()
+                self._probing = False
+
+class LLMGateway:
+    """
+    The one place Gemini is called from. Shared by the agents, so the limits are global:
+    - admission against the Gemini quota by priority class (LLMScheduler: interactive before
+      background before eval, each with its own queueing deadline),
+    - at most `concurrency` calls in flight (callers wait for a slot within their deadline),
+    - a deadline per call covering slot waits, retries and the call itself,
+    - jittered exponential retry on 429/5xx and transport errors,
+    - a circuit breaker that fails fast while Gemini is degraded,
+    - per-call latency and token usage (response.usage_metadata), overall and per caller,
+    - streaming calls (generate_stream) under the same limits, with time to first chunk,
+    - cancellation by single-flight (the caller's CancelToken): checked while queueing, backing off and streaming.
+
+    Config (env): GOOGLE_API_KEY, PACT_LLM_MODEL, PACT_LLM_CONCURRENCY, PACT_LLM_TIMEOUT_SEC,
+    PACT_LLM_MAX_RETRIES, PACT_LLM_BACKOFF_SEC, PACT_LLM_BREAKER_THRESHOLD, PACT_LLM_BREAKER_RESET_SEC
+    """
+
+    def __init__(self, api_key: str = None, concurrency: int = None, timeout_sec: float = None, max_retries: int = None,
+                 backoff_sec: float = None, breaker: CircuitBreaker = None, scheduler: LLMScheduler = None):
+        self.api_key = api_key if api_key is not None else os.getenv("GOOGLE_API_KEY")
+        self.default_model = os.getenv("PACT_LLM_MODEL", DEFAULT_MODEL)
+        self.concurrency = concurrency or int(os.getenv("PACT_LLM_CONCURRENCY", DEFAULT_CONCURRENCY))
+        self.timeout_sec = timeout_sec or float(os.getenv("PACT_LLM_TIMEOUT_SEC", DEFAULT_TIMEOUT_SEC))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("PACT_LLM_MAX_RETRIES", DEFAULT_MAX_RETRIES))
+        self.backoff_sec = backoff_sec if backoff_sec is not None else float(os.getenv("PACT_LLM_BACKOFF_SEC", DEFAULT_BACKOFF_SEC))
+        self.breaker = breaker or CircuitBreaker(
+            int(os.getenv("PACT_LLM_BREAKER_THRESHOLD", DEFAULT_BREAKER_THRESHOLD)),
+            float(os.getenv("PACT_LLM_BREAKER_RESET_SEC", DEFAULT_BREAKER_RESET_SEC))
+        )
+        # Without an API key there is no quota to protect (tests, simulations): priorities only
+        self.scheduler = scheduler or LLMScheduler(limits=None if self.api_key else [])
+        if self.api_key:
+            genai.configure(api_key=self.api_key)
+
+        # A slot is released when the call really finishes, even if its caller timed out,
+        # so abandoned calls still count against the cap
+        self._slots = threading.BoundedSemaphore(self.concurrency)
+        self._pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="pact-llm")
+        self._models: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=LATENCY_SAMPLES)
+        self._by_caller: Dict[str, Dict[str, float]] = {}
+        self._counts = {"calls": 0, "succeeded": 0, "failed": 0, "retries": 0, "timeouts": 0, "short_circuited": 0, "cancelled": 0, "throttled": 0,
+                        "prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+
+    @property
+    def available(self) -> bool:
+        return bool(self.api_key)
+
+    def model(self, name: str = None):
+        """Shared GenerativeModel per name (None without an API key)."""
+        if not self.api_key:
+            return None
+        name = name or self.default_model
+        with self._lock:
+            if name not in self._models:
+                self._models[name] = genai.GenerativeModel(name)
+            return self._models[name]
+
+    # --- Calls ---
+
+    def generate(self, model, contents, generation_config: Dict[str, Any] = None, timeout_sec: float = None,
+                 caller: str = "default"):
+        """
+        model.generate_content(contents, generation_config=...) under the gateway's limits.
+        Raises CircuitOpen / LLMTimeout (both LLMUnavailable), or the last API error once
+        retries are exhausted or the error isn't retryable.
+        """
+        self._count(caller, "calls")
+        deadline = None
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                self._count(caller, "short_circuited")
+                raise CircuitOpen("LLM circuit open: Gemini is failing, not calling it for now", self.breaker.retry_after())
+
+            # Queueing for quota has its own per-class deadline; the call's deadline starts once admitted
+            self._admit(caller, deadline)
+            deadline = deadline or time.monotonic() + (timeout_sec or self.timeout_sec)
+            self._acquire_slot(deadline, caller)
+
+            started = time.monotonic()
+            # Copy contextvars so trace context follows the call into the pool
+            ctx = contextvars.copy_context()
+            future = self._pool.submit(ctx.run, model.generate_content, contents, generation_config=generation_config)
+            future.add_done_callback(lambda _: self._slots.release())
+            try:
+                response = self._wait_result(future, deadline, caller)
+            except CallCancelled:
+                raise
+            except FutureTimeout:
+                self.breaker.record_failure()
+                self._count(caller, "timeouts")
+                raise LLMTimeout(f"LLM call exceeded its {timeout_sec or self.timeout_sec:.0f}s deadline")
+            except Exception as e:
+                attempt = self._retry_or_raise(caller, e, attempt, deadline)
+                continue
+
+            self.breaker.record_success()
+            self._record(caller, time.monotonic() - started, response)
+            return response
+
+    def generate_stream(self, model, contents, generation_config: Dict[str, Any] = None, timeout_sec: float = None,
+                        caller: str = "default") -> Iterator[str]:
+        """
+        Like generate(), but with model.generate_content(..., stream=True): yields text chunks as
+        Gemini produces them. The chunks are read on the gateway pool (the slot is held for the
+        whole stream) and handed over through a queue, so the deadline still covers every wait.
+        Failures are retried only until the first chunk has been yielded; after that they raise.
+        Closing the generator early stops reading the stream.
+        """
+        self._count(caller, "calls")
+        self._count(caller, "streams")
+        deadline = None
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                self._count(caller, "short_circuited")
+                raise CircuitOpen("LLM circuit open: Gemini is failing, not calling it for now", self.breaker.retry_after())
+
+            self._admit(caller, deadline)
+            deadline = deadline or time.monotonic() + (timeout_sec or self.timeout_sec)
+            self._acquire_slot(deadline, caller)
+
+            started = time.monotonic()
+            chunks = queue.Queue()
+            cancelled = threading.Event()
+
+            def produce():
+                try:
+                    last = None
+                    for chunk in model.generate_content(contents, generation_config=generation_config, stream=True):
+                        if cancelled.is_set():
+                            return
+                        last = chunk
+                        try:
+                            text = chunk.text
+                        except ValueError:
+                            text = "" # A chunk without parts (e.g. only a finish reason)
+                        chunks.put(("chunk", text))
+                    chunks.put(("end", last))
+                except Exception as e:
+                    chunks.put(("error", e))
+
+            future = self._pool.submit(contextvars.copy_context().run, produce)
+            future.add_done_callback(lambda _: self._slots.release())
+            yielded = False
+            try:
+                while True:
+                    self._raise_if_cancelled(caller)
+                    try:
+                        kind, payload = chunks.get(timeout=self._poll_timeout(deadline))
+                    except queue.Empty:
+                        if time.monotonic() < deadline:
+                            continue
+                        self.breaker.record_failure()
+                        self._count(caller, "timeouts")
+                        raise LLMTimeout(f"LLM stream exceeded its {timeout_sec or self.timeout_sec:.0f}s deadline")
+                    if kind == "error":
+                        raise payload
+                    if kind == "end":
+                        self.breaker.record_success()
+                        self._record(caller, time.monotonic() - started, payload)
+                        return
+                    if payload:
+                        if not yielded:
+                            yielded = True
+                            self._count(caller, "first_chunk_sec", time.monotonic() - started)
+                        yield payload
+            except (LLMTimeout, CallCancelled):
+                raise
+            except GeneratorExit:
+                # The caller stopped reading: neither a success nor a failure of Gemini
+                self.breaker.release_probe()
+                raise
+            except Exception as e:
+                if yielded:
+                    # Part of the answer is already with the caller: a retry would repeat it
+                    self.breaker.record_failure()
+                    self._count(caller, "failed")
+                    raise
+                attempt = self._retry_or_raise(caller, e, attempt, deadline)
+            finally:
+                cancelled.set()
+
+    def _retry_or_raise(self, caller: str, error: Exception, attempt: int, deadline: float) -> int:
+        """Re-raises `error` unless it is retryable within the budget; otherwise backs off and returns the next attempt."""
+        if not is_retryable(error):
+            # A bad request means Gemini answered: it counts as healthy
+            self.breaker.record_success()
+            self._count(caller, "failed")
+            raise error
+        self.breaker.record_failure()
+        backoff = self.backoff_sec * (2 ** attempt) * random.uniform(0.5, 1.5)
+        if attempt >= self.max_retries or time.monotonic() + backoff >= deadline:
+            self._count(caller, "failed")
+            raise error
+        attempt += 1
+        self._count(caller, "retries")
+        print(f"[WARN] LLM call failed ({error}); retry {attempt}/{self.max_retries} in {backoff:.1f}s")
+        token = current_cancel_token()
+        if token:
+            token.wait(backoff)
+            self._raise_if_cancelled(caller)
+        else:
+            time.sleep(backoff)
+        return attempt
+
+    # --- Cancellation (see src/core/single_flight.py) ---
+
+    @staticmethod
+    def _poll_timeout(deadline: float) -> float:
+        remaining = max(0.0, deadline - time.monotonic())
+        return min(remaining, CANCEL_POLL_SEC) if current_cancel_token() else remaining
+
+    def _raise_if_cancelled(self, caller: str):
+        token = current_cancel_token()
+        if token and token.cancelled:
+            self.breaker.release_probe()
+            self._count(caller, "cancelled")
+            raise CallCancelled("LLM call cancelled: nobody is waiting for it any more")
+
+    def _admit(self, caller: str, deadline: Optional[float]):
+        """Quota admission at the caller's priority; a retry also has to fit in what is left of its call deadline."""
+        try:
+            self.scheduler.acquire(
+                budget_sec=None if deadline is None else max(0.0, deadline - time.monotonic()),
+                cancel_token=current_cancel_token()
+            )
+        except CallCancelled:
+            self.breaker.release_probe()
+            self._count(caller, "cancelled")
+            raise
+        except RateLimitExceeded as e:
+            self.breaker.release_probe()
+            self._count(caller, "throttled")
+            raise QuotaExhausted(f"LLM quota exhausted: {e}", e.retry_after)
+
+    def _acquire_slot(self, deadline: float, caller: str):
+        while True:
+            self._raise_if_cancelled(caller)
+            if deadline - time.monotonic() > 0 and self._slots.acquire(timeout=self._poll_timeout(deadline)):
+                return
+            if time.monotonic() >= deadline:
+                self.breaker.release_probe()
+                self._count(caller, "timeouts")
+                raise LLMTimeout("LLM call deadline exceeded waiting for a free slot")
+
+    def _wait_result(self, future, deadline: float, caller: str):
+        # A call already sent can't be interrupted: on cancellation it is abandoned, and its slot frees when it returns
+        while True:
+            try:
+                return future.result(timeout=self._poll_timeout(deadline))
+            except FutureTimeout:
+                self._raise_if_cancelled(caller)
+                if time.monotonic() >= deadline:
+                    raise
+
+    def _count(self, caller: str, field: str, amount: float = 1):
+        with self._lock:
+            if field in self._counts:
+                self._counts[field] += amount
+            per = self._by_caller.setdefault(caller, {"calls": 0, "succeeded": 0, "failed": 0, "retries": 0, "timeouts": 0, "cancelled": 0,
+                                                      "throttled": 0, "short_circuited": 0, "latency_sec": 0.0, "total_tokens": 0,
+                                                      "streams": 0, "first_chunk_sec": 0.0})
+            if field in per:
+                per[field] += amount
+
+    def _record(self, caller: str, latency: float, response):
+        usage = getattr(response, "usage_metadata", None)
+        prompt = getattr(usage, "prompt_token_count", 0) or 0
+        completion = getattr(usage, "candidates_token_count", 0) or 0
+        total = getattr(usage, "total_token_count", 0) or prompt + completion
+        with self._lock:
+            self._latencies.append(latency)
+            self._counts["prompt_tokens"] += prompt
+            self._counts["completion_tokens"] += completion
+        self._count(caller, "succeeded")
+        self._count(caller, "latency_sec", latency)
+        self._count(caller, "total_tokens", total)
+
+    # --- Observability ---
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            latencies = sorted(self._latencies)
+            by_caller = {
+                name: dict({k: v for k, v in per.items() if k not in ("latency_sec", "first_chunk_sec")},
+                           avg_latency_ms=round(per["latency_sec"] / per["succeeded"] * 1000, 1) if per["succeeded"] else 0.0,
+                           avg_first_chunk_ms=round(per["first_chunk_sec"] / per["streams"] * 1000, 1) if per["streams"] else 0.0)
+                for name, per in self._by_caller.items()
+            }
+            counts = dict(self._counts)
+        pct = lambda p: round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 1) if latencies else 0.0
+        return dict(
+            counts,
+            available=self.available,
+            concurrency=self.concurrency,
+            breaker={"state": self.breaker.state, "consecutive_failures": self.breaker.failures, "opens": self.breaker.opens},
+            latency_ms={"p50": pct(0.5), "p95": pct(0.95), "max": round(latencies[-1] * 1000, 1) if latencies else 0.0},
+            by_caller=by_caller,
+            scheduler=self.scheduler.stats(),
+        )
+
+# Singleton instance: every agent shares the same slots, breaker and metrics
+llm_gateway = LLMGateway()
@@ -0,0 +1,187 @@
+import os
+import time
+import heapq
+import itertools
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from src.core.rate_limit import RateLimitExceeded, SharedRateLimiter, TokenBucket, parse_limits
+from src.core.single_flight import CallCancelled, CancelToken
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+EVAL = "eval"
+PRIORITIES = (INTERACTIVE, BACKGROUND, EVAL) # Highest first
+DEFAULT_QUOTA = "15/60" # Gemini free tier: 15 requests per minute
+DEFAULT_MAX_WAIT_SEC = {INTERACTIVE: 8.0, BACKGROUND: 120.0, EVAL: 600.0}
+WAIT_SAMPLES = 500
+CANCEL_POLL_SEC = 0.05 # How often a cancellable waiter re-checks its token
+
+_priority: contextvars.ContextVar = contextvars.ContextVar("pact_llm_priority", default=None)
+_default_priority = os.getenv("PACT_LLM_DEFAULT_PRIORITY", INTERACTIVE)
+
+def current_priority() -> str:
+    """The priority class of LLM calls made from here: the innermost llm_priority(), else the process default."""
+    return _priority.get() or _default_priority
+
+def set_default_priority(priority: str):
+    """Process-wide default (e.g. "eval" for evaluate.py, whose worker threads don't inherit contextvars)."""
+    global _default_priority
+    _check(priority)
+    _default_priority = priority
+
+@contextmanager
+def llm_priority(priority: str):
+    """Runs the block's LLM calls (and anything it hands to run_blocking / the gateway pool) at `priority`."""
+    _check(priority)
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+def _highest(priority: str, cancel_token: Optional[CancelToken]) -> str:
+    """`priority`, raised to the highest among the waiters of the shared call the token belongs to."""
+    if cancel_token is None or not cancel_token.priorities:
+        return priority
+    return min(cancel_token.priorities | {priority}, key=PRIORITIES.index)
+
+def _check(priority: str):
+    if priority not in PRIORITIES:
+        raise ValueError(f"Unknown LLM priority {priority!r} (expected one of {', '.join(PRIORITIES)})")
+
+class LLMScheduler:
+    """
+    Admits LLM calls against the Gemini quota (a token bucket per quota window), highest
+    priority class first and FIFO within a class, so batch work can't starve users:
+    - interactive: /negotiate, /verify; short queueing deadline, fails fast when the quota is spent,
+    - background: webhook auto-verification, batch verification, the reaper,
+    - eval: evaluate.py experiments; waits longest.
+
+    A call shared by several requests (SingleFlight) queues at the highest priority among
+    them, moving up if a higher-priority request joins while it waits.
+
+    A caller whose class deadline would certainly be missed (too many calls queued ahead of
+    it at the quota's steady rate) is rejected at once instead of waiting it out.
+    Rejections raise RateLimitExceeded with a retry_after. Queue wait is recorded per class.
+
+    The bucket is per process by default; PACT_LLM_QUOTA_SHARED=on keeps it in the
+    SharedRateLimiter SQLite table, so API workers and evaluate.py on one host share the quota.
+
+    Config (env): PACT_LLM_QUOTA ("15/60", "" for no limit), PACT_LLM_QUOTA_SHARED,
+    PACT_LLM_DEFAULT_PRIORITY, PACT_LLM_MAX_WAIT_INTERACTIVE_SEC, PACT_LLM_MAX_WAIT_BACKGROUND_SEC,
+    PACT_LLM_MAX_WAIT_EVAL_SEC
+    """
+
+    def __init__(self, limits: Optional[Sequence[Tuple[int, float]]] = None, shared: bool = None,
+                 max_wait_sec: Optional[Dict[str, float]] = None, clock=time.monotonic):
+        self.limits = parse_limits(os.getenv("PACT_LLM_QUOTA", DEFAULT_QUOTA)) if limits is None else list(limits)
+        if shared is None:
+            shared = os.getenv("PACT_LLM_QUOTA_SHARED", "off").lower() in ("1", "on", "true")
+        if not self.limits:
+            self.bucket = None
+        elif shared:
+            self.bucket = SharedRateLimiter("gemini", self.limits)
+        else:
+            self.bucket = TokenBucket(self.limits)
+        self.max_wait_sec = {
+            p: float(os.getenv(f"PACT_LLM_MAX_WAIT_{p.upper()}_SEC", DEFAULT_MAX_WAIT_SEC[p])) for p in PRIORITIES
+        }
+        self.max_wait_sec.update(max_wait_sec or {})
+        # Steady-state seconds per call under the tightest window
+        self.interval = max((window / limit for limit, window in self.limits), default=0.0)
+        self.clock = clock
+
+        self._cond = threading.Condition()
+        self._queue: List[Tuple[int, int]] = [] # (class rank, arrival seq) heap
+        self._seq = itertools.count()
+        self._waits = {p: deque(maxlen=WAIT_SAMPLES) for p in PRIORITIES}
+        self._counts = {p: {"granted": 0, "rejected": 0, "timed_out": 0, "cancelled": 0, "wait_sec": 0.0} for p in PRIORITIES}
+
+    def acquire(self, priority: str = None, budget_sec: float = None, cancel_token: Optional[CancelToken] = None) -> float:
+        """
+        Blocks until the call may go out and returns the seconds it queued. Waits at most the
+        class's max wait (or `budget_sec` if shorter). Raises RateLimitExceeded when that isn't
+        enough, or CallCancelled if `cancel_token` fires while queued.
+        """
+        priority = _highest(priority or current_priority(), cancel_token)
+        _check(priority)
+        budget = self.max_wait_sec[priority] if budget_sec is None else min(budget_sec, self.max_wait_sec[priority])
+        if self.bucket is None:
+            with self._cond:
+                self._record(priority, 0.0)
+            return 0.0
+
+        started = self.clock()
+        ticket = (PRIORITIES.index(priority), next(self._seq))
+        with self._cond:
+            ahead = sum(1 for queued in self._queue if queued < ticket)
+            if ahead * self.interval > budget:
+                self._counts[priority]["rejected"] += 1
+                raise RateLimitExceeded(f"LLM quota: {ahead} calls queued ahead of this {priority} call", ahead * self.interval)
+            heapq.heappush(self._queue, ticket)
+            try:
+                while True:
+                    if cancel_token and cancel_token.cancelled:
+                        self._counts[priority]["cancelled"] += 1
+                        raise CallCancelled("LLM call cancelled while queued for quota")
+                    raised = _highest(priority, cancel_token)
+                    if raised != priority:
+                        # A higher-priority request joined the shared call: move up, keeping the arrival order
+                        self._queue.remove(ticket)
+                        ticket = (PRIORITIES.index(raised), ticket[1])
+                        self._queue.append(ticket)
+                        heapq.heapify(self._queue)
+                        priority = raised
+                    remaining = budget - (self.clock() - started)
+                    if self._queue[0] == ticket:
+                        wait = self.bucket.try_acquire()
+                        if wait == 0.0:
+                            heapq.heappop(self._queue)
+                            waited = self.clock() - started
+                            self._record(priority, waited)
+                            return waited
+                    else:
+                        wait = remaining
+                    if wait > remaining or remaining <= 0:
+                        self._counts[priority]["timed_out"] += 1
+                        raise RateLimitExceeded(f"LLM quota: no slot for this {priority} call within {budget:.0f}s", wait)
+                    self._cond.wait(min(wait, CANCEL_POLL_SEC) if cancel_token else wait)
+            finally:
+                if ticket in self._queue:
+                    self._queue.remove(ticket)
+                    heapq.heapify(self._queue)
+                # The next in line (or a waiter behind a departed one) re-checks
+                self._cond.notify_all()
+
+    def _record(self, priority: str, waited: float):
+        self._counts[priority]["granted"] += 1
+        self._counts[priority]["wait_sec"] += waited
+        self._waits[priority].append(waited)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            queued = {p: sum(1 for rank, _ in self._queue if rank == i) for i, p in enumerate(PRIORITIES)}
+            by_class = {}
+            for p in PRIORITIES:
+                counts = self._counts[p]
+                waits = sorted(self._waits[p])
+                pct = lambda q: round(waits[min(len(waits) - 1, int(q * len(waits)))] * 1000, 1) if waits else 0.0
+                by_class[p] = {
+                    "granted": counts["granted"],
+                    "rejected": counts["rejected"],
+                    "timed_out": counts["timed_out"],
+                    "cancelled": counts["cancelled"],
+                    "queued": queued[p],
+                    "max_wait_sec": self.max_wait_sec[p],
+                    "wait_ms": {
+                        "avg": round(counts["wait_sec"] / counts["granted"] * 1000, 1) if counts["granted"] else 0.0,
+                        "p50": pct(0.5), "p95": pct(0.95), "max": round(waits[-1] * 1000, 1) if waits else 0.0,
+                    },
+                }
+        return {
+            "quota": self.bucket.stats() if self.bucket else None,
+            "by_class": by_class,
+        }
@@ -0,0 +1,100 @@
+import time
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List
+from src.core.single_flight import shielded
+from src.core.llm_scheduler import PRIORITIES, current_priority, llm_priority
+
+class MicroBatcher:
+    """
+    Coalesces calls arriving within `window_sec` of each other into one `flush_fn(items)`
+    call, which must return one result (or Exception instance) per item, in order.
+
+    `submit` blocks the calling thread (callers already run on the blocking executor).
+    The first caller of a window becomes its leader: it waits out the window (or until
+    `max_batch` items are queued) and then runs the flush for everyone, at the highest LLM
+    priority among the batch's callers (an interactive /verify never waits at the priority
+    of the /verify/batch item that happened to lead its window).
+    """
+
+    def __init__(self, flush_fn: Callable[[List[Any]], List[Any]], window_sec: float, max_batch: int):
+        self.flush_fn = flush_fn
+        self.window_sec = window_sec
+        self.max_batch = max(1, max_batch)
+        self._pending: List[tuple] = [] # (item, future, submitted_at, priority)
+        self._cond = threading.Condition()
+        self._leader_active = False
+        self.items = 0
+        self.flushes = 0
+        self.total_wait_sec = 0.0
+        self.max_wait_sec = 0.0
+
+    def submit(self, item: Any) -> Any:
+        future: Future = Future()
+        with self._cond:
+            self._pending.append((item, future, time.monotonic(), current_priority()))
+            if len(self._pending) >= self.max_batch:
+                self._cond.notify_all()
+            leader = not self._leader_active
+            if leader:
+                self._leader_active = True
+
+        if leader:
+            self._lead()
+        result = future.result()
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def _lead(self):
+        deadline = time.monotonic() + self.window_sec
+        with self._cond:
+            while len(self._pending) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch = self._pending[:self.max_batch]
+            self._pending = self._pending[self.max_batch:]
+            # Leftovers (batch was full) start the next window right away with a new leader
+            self._leader_active = False
+            handoff = bool(self._pending)
+
+        if handoff:
+            threading.Thread(target=self._lead_handoff, daemon=True).start()
+
+        started = time.monotonic()
+        waits = [started - submitted_at for _, _, submitted_at, _ in batch]
+        priority = min((p for _, _, _, p in batch), key=PRIORITIES.index)
+        with self._cond:
+            self.items += len(batch)
+            self.flushes += 1
+            self.total_wait_sec += sum(waits)
+            self.max_wait_sec = max(self.max_wait_sec, max(waits))
+
+        try:
+            # The leader's single-flight cancellation must not cancel a flush other callers share
+            with llm_priority(priority):
+                results = shielded(self.flush_fn, [item for item, _, _, _ in batch])
+            if len(results) != len(batch):
+                raise ValueError(f"flush_fn returned {len(results)} results for {len(batch)} items")
+        except Exception as e:
+            results = [e] * len(batch)
+        for (_, future, _, _), result in zip(batch, results):
+            future.set_result(result)
+
+    def _lead_handoff(self):
+        with self._cond:
+            if self._leader_active or not self._pending:
+                return
+            self._leader_active = True
+        self._lead()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "items": self.items,
+            "flushes": self.flushes,
+            "avg_batch_size": round(self.items / self.flushes, 2) if self.flushes else 0.0,
+            "avg_added_latency_ms": round(self.total_wait_sec / self.items * 1000, 2) if self.items else 0.0,
+            "max_added_latency_ms": round(self.max_wait_sec * 1000, 2),
+        }
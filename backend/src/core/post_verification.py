@@ -0,0 +1,147 @@
+import hashlib
+from typing import Any, Dict, Optional
+from firebase_admin import firestore
+from src.core.jobs import JobQueue
+from src.core.profiles import ProfileCache
+from src.core.feed import FeedCache
+from src.core.leaderboard import Leaderboard
+from src.core.counters import ShardedCounters
+from src.core.schemas import GoalContract, VerificationResult, AuditorDecision, AuditorVerdict, VerificationStatus
+
+STATS_JOB = "verification.stats"
+ENFORCE_JOB = "verification.enforce"
+STAKE_JOB = "verification.stake"
+FEED_JOB = "verification.feed"
+
+def _event_id(idempotency_key: str) -> str:
+    # Keys may contain '/', which document ids can't
+    return hashlib.sha256(idempotency_key.encode()).hexdigest()
+
+@firestore.transactional
+def _apply_stats(transaction, marker_ref, counters: ShardedCounters, user_id: str, field: str) -> bool:
+    """Increments the stat and writes its marker together; False if the marker already exists."""
+    if marker_ref.get(transaction=transaction).exists:
+        return False
+    counters.increment(user_id, field, writer=transaction)
+    transaction.set(marker_ref, {"user_id": user_id, "field": field, "created_at": firestore.SERVER_TIMESTAMP})
+    return True
+
+class PostVerificationEffects:
+    """
+    Side effects that follow a verdict (stats, enforcement, stake ledger, public feed).
+    Each one is its own durable job so a flaky write is retried alone, and /verify
+    can respond as soon as the VerificationResult exists.
+
+    Jobs may run more than once (retries, lease takeover), so each handler is idempotent
+    on its job key: stats record a stats_events/{sha256(key)} marker in the same
+    transaction as the increment, the feed item is written to feed/{sha256(key)}, and
+    the stake ledger has its own stake_events marker.
+    """
+
+    def __init__(self, queue: JobQueue, db, adapt_agent, stake_manager, profiles: ProfileCache, feed: FeedCache,
+                 leaderboard: Leaderboard, counters: ShardedCounters):
+        self.queue = queue
+        self.db = db
+        self.adapt_agent = adapt_agent
+        self.stake_manager = stake_manager
+        self.profiles = profiles
+        self.feed = feed
+        self.leaderboard = leaderboard
+        self.counters = counters
+
+        queue.register(STATS_JOB, self._run_stats)
+        queue.register(ENFORCE_JOB, self._run_enforce)
+        queue.register(STAKE_JOB, self._run_stake)
+        queue.register(FEED_JOB, self._run_feed)
+
+    def schedule(
+        self,
+        request_key: str,
+        user_id: Optional[str],
+        contract: GoalContract,
+        verification_result: VerificationResult,
+        auditor_decision: AuditorDecision,
+        text_evidence: Optional[str] = None
+    ) -> Dict[str, str]:
+        """
+        Enqueues the applicable side effects. `request_key` scopes the idempotency keys,
+        so scheduling the same request twice enqueues nothing new.
+        Returns {stage: job_id}.
+        """
+        base = {
+            "user_id": user_id,
+            "contract": contract.model_dump(mode="json"),
+            "verification": verification_result.model_dump(mode="json"),
+        }
+        jobs = {}
+
+        if user_id and verification_result.status in (VerificationStatus.SUCCESS, VerificationStatus.FAILURE):
+            key = f"{request_key}:stats"
+            jobs["stats"] = self.queue.enqueue(STATS_JOB, dict(base, idempotency_key=key), idempotency_key=key)
+
+        if auditor_decision.verdict == AuditorVerdict.ALLOW:
+            payload = dict(base, decision=auditor_decision.model_dump(mode="json"))
+            jobs["enforce"] = self.queue.enqueue(ENFORCE_JOB, payload, idempotency_key=f"{request_key}:enforce")
+
+        if user_id:
+            key = f"{request_key}:stake"
+            # The key travels with the payload so the ledger write itself is idempotent on re-runs
+            jobs["stake"] = self.queue.enqueue(STAKE_JOB, dict(base, idempotency_key=key), idempotency_key=key)
+
+        if user_id and verification_result.status != VerificationStatus.UNCERTAIN and contract.is_public:
+            key = f"{request_key}:feed"
+            payload = dict(base, text_evidence=text_evidence, idempotency_key=key)
+            jobs["feed"] = self.queue.enqueue(FEED_JOB, payload, idempotency_key=key)
+
+        return jobs
+
+    # --- Handlers (run on queue workers) ---
+
+    def _run_stats(self, payload: Dict[str, Any]):
+        succeeded = payload["verification"]["status"] == "SUCCESS"
+        field = 'contracts_completed' if succeeded else 'contracts_failed'
+        key = payload.get("idempotency_key")
+        if key is None:
+            # Enqueued before jobs carried their key
+            self.counters.increment(payload["user_id"], field)
+        else:
+            marker_ref = self.db.collection('stats_events').document(_event_id(key))
+            if not _apply_stats(self.db.transaction(), marker_ref, self.counters, payload["user_id"], field):
+                return # Counted by an earlier run
+            self.counters.invalidate(payload["user_id"])
+        self.leaderboard.record(payload["user_id"], completed=int(succeeded), failed=int(not succeeded))
+
+    def _run_enforce(self, payload: Dict[str, Any]):
+        contract = GoalContract(**payload["contract"])
+        decision = AuditorDecision(**payload["decision"])
+        self.adapt_agent.adapt_and_enforce(contract, decision)
+
+    def _run_stake(self, payload: Dict[str, Any]):
+        verification_result = VerificationResult(**payload["verification"])
+        self.stake_manager.handle_outcome(payload["user_id"], verification_result, idempotency_key=payload.get("idempotency_key"))
+
+    def _run_feed(self, payload: Dict[str, Any]):
+        user_id = payload["user_id"]
+        verification = payload["verification"]
+
+        # Cached profile lookup instead of a users/{id} read per event
+        profile = self.profiles.get(user_id)
+
+        feed_item = {
+            "type": "verification",
+            "user_id": user_id,
+            "user_name": profile.get("display_name") or "Anonymous Agent",
+            "user_photo": profile.get("photo_url"),
+            "goal_description": payload["contract"].get("goal_description"),
+            "status": verification["status"],
+            "timestamp": firestore.SERVER_TIMESTAMP,
+            "evidence_summary": payload.get("text_evidence") or "Evidence verified by AI.",
+            "trust_score_delta": 5 if verification["status"] == "SUCCESS" else -10 # Mock logic
+        }
+        key = payload.get("idempotency_key")
+        if key is None:
+            self.db.collection(u'feed').add(feed_item)
+        else:
+            # Same document on every run: a retry overwrites its own item instead of posting twice
+            self.db.collection(u'feed').document(_event_id(key)).set(feed_item)
+        self.feed.invalidate()
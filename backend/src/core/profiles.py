@@ -0,0 +1,57 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+DEFAULT_TTL_SEC = 300.0
+DEFAULT_MAX_ENTRIES = 10000
+
+class ProfileCache:
+    """
+    Short-TTL cache of public profile fields (display name, photo) keyed by user id.
+    Replaces the `users/{id}.get()` done for every public feed event / shame tweet.
+    Entries can be primed from data we already hold (e.g. the ID token at /commit).
+
+    Config (env): PACT_PROFILE_CACHE_TTL_SEC
+    """
+
+    FIELDS = ("display_name", "photo_url")
+
+    def __init__(self, db, ttl_sec: float = None, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.db = db
+        self.ttl_sec = ttl_sec if ttl_sec is not None else float(os.getenv("PACT_PROFILE_CACHE_TTL_SEC", DEFAULT_TTL_SEC))
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: str) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(user_id)
+            if entry and now - entry[1] < self.ttl_sec:
+                self._data.move_to_end(user_id)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        user_doc = self.db.collection(u'users').document(user_id).get()
+        data = user_doc.to_dict() if user_doc.exists else {}
+        profile = {field: data.get(field) for field in self.FIELDS}
+        self._store(user_id, profile)
+        return profile
+
+    def prime(self, user_id: str, display_name: Optional[str], photo_url: Optional[str]):
+        self._store(user_id, {"display_name": display_name, "photo_url": photo_url})
+
+    def _store(self, user_id: str, profile: Dict[str, Any]):
+        with self._lock:
+            self._data[user_id] = (profile, time.monotonic())
+            self._data.move_to_end(user_id)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"entries": len(self._data), "hits": self.hits, "misses": self.misses}
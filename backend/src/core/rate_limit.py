@@ -0,0 +1,182 @@
+import os
+import time
+import sqlite3
+import tempfile
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+DEFAULT_DB_PATH = os.path.join(tempfile.gettempdir(), "pact_rate_limits.sqlite3")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS buckets (
+    name TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+class RateLimitExceeded(Exception):
+    """No token became available in time (or the upstream answered 429). `retry_after` is in seconds."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+def parse_limits(spec: str) -> List[Tuple[int, float]]:
+    """"100/900,1000/86400" -> [(100, 900.0), (1000, 86400.0)] (requests per window seconds)."""
+    limits = []
+    for part in spec.split(","):
+        if part.strip():
+            count, window = part.split("/")
+            limits.append((int(count), float(window)))
+    return limits
+
+class TokenBucket:
+    """
+    In-process counterpart of SharedRateLimiter (same `limits` and `try_acquire` contract),
+    for quotas one process owns: no SQLite round trip on every request.
+    """
+
+    def __init__(self, limits: Sequence[Tuple[int, float]], clock=time.monotonic):
+        self.limits = list(limits)
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._tokens = [float(limit) for limit, _ in self.limits]
+        self._updated = clock()
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated
+        self._tokens = [min(float(limit), value + elapsed * limit / window)
+                        for (limit, window), value in zip(self.limits, self._tokens)]
+        self._updated = now
+
+    def try_acquire(self, cost: float = 1.0) -> float:
+        """Takes `cost` tokens from every bucket if all have them and returns 0; otherwise returns the wait in seconds."""
+        with self._lock:
+            self._refill(self.clock())
+            wait = max(
+                ((cost - value) * window / limit for (limit, window), value in zip(self.limits, self._tokens) if value < cost),
+                default=0.0
+            )
+            if wait == 0.0:
+                self._tokens = [value - cost for value in self._tokens]
+            return wait
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._refill(self.clock())
+            return {
+                "limits": [f"{limit}/{int(window)}s" for limit, window in self.limits],
+                "available": [round(value, 2) for value in self._tokens],
+            }
+
+class SharedRateLimiter:
+    """
+    Token buckets shared by every worker process on the host (one SQLite row per window).
+
+    Each limit (N requests per W seconds) is a bucket of N tokens refilled at N/W per
+    second; a request takes one token from every bucket atomically (BEGIN IMMEDIATE),
+    so 100/15min and a daily quota are enforced together. `sync` lowers the local
+    buckets to what the upstream reports as remaining, which keeps several hosts
+    (or usage from elsewhere) honest.
+
+    Config (env): PACT_RATE_LIMIT_DB
+    """
+
+    def __init__(self, name: str, limits: Sequence[Tuple[int, float]], db_path: str = None):
+        self.name = name
+        self.limits = list(limits)
+        self.db_path = db_path or os.getenv("PACT_RATE_LIMIT_DB", DEFAULT_DB_PATH)
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self.granted = 0
+        self.waited_sec = 0.0
+        self.denied = 0
+        self._conn().executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _key(self, window: float) -> str:
+        return f"{self.name}:{int(window)}"
+
+    def _refilled(self, conn, now: float) -> List[float]:
+        tokens = []
+        for limit, window in self.limits:
+            row = conn.execute("SELECT tokens, updated_at FROM buckets WHERE name = ?", (self._key(window),)).fetchone()
+            if row is None:
+                tokens.append(float(limit))
+            else:
+                tokens.append(min(float(limit), row[0] + (now - row[1]) * limit / window))
+        return tokens
+
+    def _store(self, conn, tokens: List[float], now: float):
+        for (limit, window), value in zip(self.limits, tokens):
+            conn.execute("INSERT OR REPLACE INTO buckets (name, tokens, updated_at) VALUES (?, ?, ?)",
+                         (self._key(window), value, now))
+
+    def try_acquire(self, cost: float = 1.0) -> float:
+        """Takes `cost` tokens from every bucket if all have them and returns 0; otherwise returns the wait in seconds."""
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            tokens = self._refilled(conn, now)
+            wait = max(
+                ((cost - value) * window / limit for (limit, window), value in zip(self.limits, tokens) if value < cost),
+                default=0.0
+            )
+            if wait == 0.0:
+                self._store(conn, [value - cost for value in tokens], now)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return wait
+
+    def acquire(self, cost: float = 1.0, timeout: float = 0.0):
+        """Blocks up to `timeout` seconds for tokens; raises RateLimitExceeded if that isn't enough."""
+        started = time.monotonic()
+        while True:
+            wait = self.try_acquire(cost)
+            if wait == 0.0:
+                with self._stats_lock:
+                    self.granted += 1
+                    self.waited_sec += time.monotonic() - started
+                return
+            remaining = timeout - (time.monotonic() - started)
+            if wait > remaining:
+                with self._stats_lock:
+                    self.denied += 1
+                raise RateLimitExceeded(f"Rate limit '{self.name}' exhausted; next token in {wait:.1f}s", wait)
+            time.sleep(wait)
+
+    def sync(self, remaining: Sequence[Optional[float]]):
+        """Caps each bucket at the upstream's reported remaining requests (None = unknown), one per limit."""
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            tokens = self._refilled(conn, now)
+            self._store(conn, [value if r is None else min(value, max(0.0, float(r)))
+                               for value, r in zip(tokens, remaining)], now)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def stats(self) -> Dict[str, Any]:
+        conn = self._conn()
+        tokens = self._refilled(conn, time.time())
+        return {
+            "limits": [f"{limit}/{int(window)}s" for limit, window in self.limits],
+            "available": [round(value, 2) for value in tokens],
+            "granted": self.granted,
+            "denied": self.denied,
+            "avg_wait_ms": round(self.waited_sec / self.granted * 1000, 2) if self.granted else 0.0,
+        }
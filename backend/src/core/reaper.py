@@ -0,0 +1,367 @@
+import os
+import time
+import datetime
+import threading
+import contextvars
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Union
+from firebase_admin import firestore
+from src.core.schemas import GoalContract, VerificationResult
+from src.core.similarity import as_utc, contract_index_fields
+from src.core.batch_writer import BatchWriter
+from src.core.counters import ShardedCounters
+from src.core.llm_scheduler import llm_priority, BACKGROUND
+
+DEFAULT_GRACE = datetime.timedelta(hours=1)
+DEFAULT_PAGE_SIZE = 100
+DEFAULT_TIME_BUDGET_SEC = 45.0 # Stay under the 60s serverless limit
+DEFAULT_WORKERS = 8
+DEFAULT_CLAIM_LEASE_SEC = 600.0 # Well past any tick's time budget
+SKIPPED = object()
+CLAIMED_ELSEWHERE = object()
+CHECKPOINT_DOC = ('system', 'reaper_checkpoint')
+LEGACY_DOC = ('system', 'reaper_legacy_backfill')
+
+class Reaper:
+    """
+    "The Reaper": fails Active contracts whose deadline (+ grace) has passed.
+
+    Only expired contracts are read: the query is a range on the native `deadline_at`
+    timestamp, ordered and paged with cursors. Each tick stops cleanly once its time
+    budget is spent and saves a checkpoint, so the next tick resumes where it left off.
+
+    Per-contract enforcement runs on a bounded worker pool; status flips and stats
+    increments (sharded, see src/core/counters.py) are grouped into WriteBatches of
+    up to 500 writes.
+
+    Enforcement (stake burn, tweet, Adapt) is at most once per contract: a worker first
+    claims the contract with a transactional Active -> Reaping flip, and only the claim's
+    winner enforces. The batched Reaping -> Failed write follows. If that write is lost
+    (failed commit, crash), the claim is not re-enforced; once it is older than the claim
+    lease, a later tick just marks it Failed and counts it.
+
+    Contracts written before `deadline_at` existed aren't matched by that range, so until
+    it has covered them all, each tick first pages through Active contracts (by document
+    id, resuming from its own checkpoint) and adds the index fields to those missing them
+    (as scripts/backfill_contract_index.py does); the expired query then picks them up.
+
+    Config (env): REAPER_PAGE_SIZE, REAPER_TIME_BUDGET_SEC, REAPER_WORKERS, REAPER_CLAIM_LEASE_SEC
+    """
+
+    def __init__(self, db, detect_agent, adapt_agent, stake_manager, twitter_client, profiles,
+                 grace: datetime.timedelta = DEFAULT_GRACE, page_size: int = None, time_budget_sec: float = None,
+                 workers: int = None, leaderboard=None, counters: ShardedCounters = None, claim_lease_sec: float = None):
+        self.db = db
+        self.detect_agent = detect_agent
+        self.adapt_agent = adapt_agent
+        self.stake_manager = stake_manager
+        self.twitter_client = twitter_client
+        self.profiles = profiles
+        self.leaderboard = leaderboard
+        self.counters = counters or ShardedCounters(db)
+        self.grace = grace
+        self.page_size = page_size or int(os.getenv("REAPER_PAGE_SIZE", DEFAULT_PAGE_SIZE))
+        self.time_budget_sec = time_budget_sec or float(os.getenv("REAPER_TIME_BUDGET_SEC", DEFAULT_TIME_BUDGET_SEC))
+        self.workers = workers or int(os.getenv("REAPER_WORKERS", DEFAULT_WORKERS))
+        self.claim_lease = datetime.timedelta(seconds=claim_lease_sec or float(os.getenv("REAPER_CLAIM_LEASE_SEC", DEFAULT_CLAIM_LEASE_SEC)))
+        self._timings_lock = threading.Lock()
+
+    # --- Checkpoint ---
+
+    def _checkpoint_ref(self):
+        return self.db.collection(CHECKPOINT_DOC[0]).document(CHECKPOINT_DOC[1])
+
+    def _load_cursor(self):
+        snapshot = self._checkpoint_ref().get()
+        if not snapshot.exists:
+            return None
+        data = snapshot.to_dict() or {}
+        doc_id = data.get('last_contract_id')
+        if not doc_id:
+            return None
+        # A snapshot cursor breaks deadline ties by document id; fall back to the raw value if it's gone
+        last_doc = self.db.collection('contracts').document(doc_id).get()
+        if last_doc.exists:
+            return last_doc
+        return {'deadline_at': data.get('last_deadline_at')}
+
+    def _save_cursor(self, last_doc):
+        if last_doc is None:
+            self._checkpoint_ref().set({'last_contract_id': None, 'last_deadline_at': None, 'updated_at': firestore.SERVER_TIMESTAMP})
+            return
+        self._checkpoint_ref().set({
+            'last_contract_id': last_doc.id,
+            'last_deadline_at': last_doc.to_dict().get('deadline_at'),
+            'updated_at': firestore.SERVER_TIMESTAMP
+        })
+
+    # --- Legacy contracts ---
+
+    def _backfill_legacy(self, writer: BatchWriter, out_of_time) -> int:
+        """Adds deadline_at (and the duplicate-index fields) to Active contracts without it; returns how many."""
+        ref = self.db.collection(LEGACY_DOC[0]).document(LEGACY_DOC[1])
+        snapshot = ref.get()
+        state = (snapshot.to_dict() or {}) if snapshot.exists else {}
+        if state.get('complete'):
+            return 0
+
+        cursor_id = state.get('last_contract_id')
+        backfilled = 0
+        complete = False
+        while not out_of_time():
+            query = self.db.collection('contracts') \
+                .where('status', '==', 'Active') \
+                .order_by('__name__') \
+                .limit(self.page_size)
+            if cursor_id:
+                query = query.start_after({'__name__': cursor_id})
+            docs = list(query.stream())
+            for doc in docs:
+                data = doc.to_dict()
+                if data.get('deadline_at') is not None:
+                    continue
+                fields = contract_index_fields(data.get('goal_description'), data.get('deadline_utc'))
+                if fields['deadline_at'] is None:
+                    print(f"[WARN] Reaper: contract {doc.id} has an unparseable deadline_utc {data.get('deadline_utc')!r}")
+                    continue
+                writer.update(doc.reference, fields)
+                backfilled += 1
+            if docs:
+                cursor_id = docs[-1].id
+            if len(docs) < self.page_size:
+                complete = True
+                break
+
+        writer.flush() # Fields land before the checkpoint moves past them
+        ref.set({'last_contract_id': cursor_id, 'complete': complete, 'updated_at': firestore.SERVER_TIMESTAMP})
+        return backfilled
+
+    # --- Claims ---
+
+    def _claim(self, contract_id: str, claimed_at: datetime.datetime) -> bool:
+        """Active -> Reaping in a transaction; False if the contract was completed, failed or claimed meanwhile."""
+        return _claim_contract(self.db.transaction(), self.db.collection('contracts').document(contract_id), claimed_at)
+
+    def _release(self, contract_id: str):
+        # Enforcement failed before anything irreversible: hand it back to the next pass
+        self.db.collection('contracts').document(contract_id).update({'status': 'Active', 'reaping_at': None})
+
+    def _stale_claims(self, now: datetime.datetime):
+        query = self.db.collection('contracts') \
+            .where('status', '==', 'Reaping') \
+            .where('reaping_at', '<', now - self.claim_lease) \
+            .limit(self.page_size)
+        return list(query.stream())
+
+    # --- Run ---
+
+    def _expired_page(self, cutoff: datetime.datetime, cursor):
+        query = self.db.collection('contracts') \
+            .where('status', '==', 'Active') \
+            .where('deadline_at', '<', cutoff) \
+            .order_by('deadline_at') \
+            .limit(self.page_size)
+        if cursor is not None:
+            query = query.start_after(cursor)
+        return list(query.stream())
+
+    @contextmanager
+    def _stage(self, timings: Dict[str, List[float]], name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._timings_lock:
+                timings.setdefault(name, []).append(elapsed)
+
+    def run(self, now: Optional[datetime.datetime] = None) -> Dict[str, Any]:
+        # Enforcement is background work: any LLM call it makes yields quota to interactive requests
+        with llm_priority(BACKGROUND):
+            return self._run(now)
+
+    def _run(self, now: Optional[datetime.datetime]) -> Dict[str, Any]:
+        started = time.monotonic()
+        now_utc = now or datetime.datetime.now(datetime.timezone.utc)
+        cutoff = now_utc - self.grace
+        timings: Dict[str, List[float]] = {}
+        out_of_time = lambda: time.monotonic() - started > self.time_budget_sec
+
+        cursor = self._load_cursor()
+        resumed = cursor is not None
+        results: List[str] = []
+        errors: List[str] = []
+        complete = False
+        last_doc = None
+        pages = 0
+        writer = BatchWriter(self.db)
+        failed_users: List[str] = [] # Leaderboard updates, applied once their batch is committed
+
+        def mark_failed(doc_id: str, user_id: Optional[str]):
+            # Plain writes go into WriteBatches instead of one round trip each
+            writer.update(self.db.collection('contracts').document(doc_id), {
+                'status': 'Failed',
+                'reaped_at': firestore.SERVER_TIMESTAMP
+            })
+            if user_id:
+                self.counters.increment(user_id, 'contracts_failed', writer=writer)
+                failed_users.append(user_id)
+            results.append(f"Reaped {doc_id} for user {user_id}")
+
+        def commit():
+            with self._stage(timings, "batch_commit"):
+                writer.flush()
+            if self.leaderboard:
+                for user_id in failed_users:
+                    self.leaderboard.record(user_id, failed=1)
+            failed_users.clear()
+
+        # Claims whose Failed write never landed were already enforced: finish them without re-enforcing
+        for doc in self._stale_claims(now_utc):
+            print(f"[WARN] Reaper: finishing stale claim on {doc.id} without re-enforcing")
+            mark_failed(doc.id, doc.to_dict().get('user_id'))
+        commit()
+
+        with self._stage(timings, "legacy_backfill"):
+            legacy_backfilled = self._backfill_legacy(writer, out_of_time)
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="pact-reaper") as pool:
+            while not out_of_time():
+                with self._stage(timings, "query"):
+                    docs = self._expired_page(cutoff, cursor)
+                pages += 1
+
+                # Enforcement (claim, Detect, Adapt, stake tx, tweet) runs concurrently per contract;
+                # workers skip contracts they pick up after the budget is spent.
+                # Each task gets a copy of the context so the priority class follows it into the pool
+                futures = [pool.submit(contextvars.copy_context().run, self._enforce, doc.id, doc.to_dict(), timings, out_of_time, now_utc)
+                           for doc in docs]
+
+                stopped = False
+                for doc, future in zip(docs, futures):
+                    try:
+                        outcome = future.result()
+                    except Exception as e:
+                        # Claim released, so it is Active again and retried on the next pass
+                        print(f"[Reaper] Failed to reap {doc.id}: {e}")
+                        errors.append(f"{doc.id}: {e}")
+                        outcome = None
+
+                    if outcome is SKIPPED:
+                        stopped = True
+                        continue
+                    if isinstance(outcome, dict):
+                        # Enforced, so its Failed write is always recorded, even past a skipped contract
+                        mark_failed(doc.id, outcome["user_id"])
+                    if not stopped:
+                        last_doc = doc # Cursor stays before the first skipped contract
+                        cursor = doc
+
+                commit()
+
+                if stopped or out_of_time():
+                    break
+                if len(docs) < self.page_size:
+                    complete = True
+                    break
+
+        # Finished the expired range -> next tick starts from the beginning again
+        self._save_cursor(None if complete else last_doc)
+
+        elapsed = time.monotonic() - started
+        return {
+            "status": "success",
+            "processed": len(results),
+            "details": results,
+            "errors": errors,
+            "complete": complete,
+            "resumed_from_checkpoint": resumed,
+            "legacy_backfilled": legacy_backfilled,
+            "pages": pages,
+            "workers": self.workers,
+            "batch_commits": writer.commits,
+            "elapsed_sec": round(elapsed, 3),
+            "throughput_per_sec": round(len(results) / elapsed, 2) if elapsed > 0 else 0.0,
+            "stage_timings": {
+                name: {
+                    "count": len(samples),
+                    "total_sec": round(sum(samples), 4),
+                    "avg_ms": round(sum(samples) / len(samples) * 1000, 2)
+                }
+                for name, samples in timings.items()
+            }
+        }
+
+    def _enforce(self, contract_id: str, data: Dict[str, Any], timings: Dict[str, List[float]], out_of_time,
+                 now: datetime.datetime) -> Union[Dict[str, Any], object]:
+        """
+        Claims the contract and runs the per-contract enforcement steps. Returns
+        {"user_id": ...} once enforced, CLAIMED_ELSEWHERE if it was no longer Active, or
+        SKIPPED if the time budget ran out first. The Failed status flip and stats increment
+        are left to the caller's batch.
+        """
+        if out_of_time():
+            return SKIPPED
+        with self._stage(timings, "claim"):
+            if not self._claim(contract_id, now):
+                return CLAIMED_ELSEWHERE
+        try:
+            return self._run_enforcement(contract_id, data, timings)
+        except Exception:
+            self._release(contract_id)
+            raise
+
+    def _run_enforcement(self, contract_id: str, data: Dict[str, Any], timings: Dict[str, List[float]]) -> Dict[str, Any]:
+        deadline = as_utc(data.get('deadline_at') or data.get('deadline_utc'))
+        print(f"[Reaper] Reaping Contract {contract_id} (Deadline: {deadline})")
+
+        # 1. Simulate Failure
+        contract = GoalContract(**data)
+        verification_result = VerificationResult(
+            status="FAILURE",
+            confidence=1.0,
+            failure_reason="Deadline exceeded without verification. Auto-Reaped.",
+            evidence=None
+        )
+
+        # 2. Enforce
+        # Detect
+        with self._stage(timings, "detect"):
+            auditor_decision = self.detect_agent.evaluate(contract, verification_result)
+
+        # Adapt
+        if auditor_decision.verdict == "ALLOW_ENFORCEMENT":
+            with self._stage(timings, "adapt"):
+                self.adapt_agent.adapt_and_enforce(contract, auditor_decision)
+
+        # Stake Burn
+        user_id = data.get('user_id')
+        if user_id:
+            with self._stage(timings, "stake"):
+                self.stake_manager.handle_outcome(user_id, verification_result, idempotency_key=f"reaper:{contract_id}")
+
+            # 3. Public Shaming (X/Twitter)
+            try:
+                # Fetch user name for the tweet (cached profile)
+                with self._stage(timings, "user_read"):
+                    profile = self.profiles.get(user_id)
+                user_name = profile.get('display_name') or 'A PACT User'
+
+                shame_message = f"🚨 SHAME ALERT 🚨\n\n{user_name} just failed their PACT: \"{contract.goal_description}\"\n\nThey didn't verify in time and lost their stake! 💸\n\n#PACT #Accountability #PublicShaming"
+
+                # Post Tweet
+                with self._stage(timings, "tweet"):
+                    self.twitter_client.post_shame_tweet(shame_message)
+            except Exception as e:
+                print(f"Shaming Error: {e}")
+
+        return {"user_id": user_id}
+
+@firestore.transactional
+def _claim_contract(transaction, ref, claimed_at: datetime.datetime) -> bool:
+    snapshot = ref.get(transaction=transaction)
+    if not snapshot.exists or snapshot.get('status') != 'Active':
+        return False
+    transaction.update(ref, {'status': 'Reaping', 'reaping_at': claimed_at})
+    return True
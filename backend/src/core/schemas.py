@@ -46,6 +46,7 @@ class GoalContract(BaseModel):
     confidence_required: float = Field(0.95, description="Minimum verification confidence required (0.0 - 1.0)")
     is_public: bool = Field(True, description="Whether this pact is visible in the public feed")
     penalty: Penalty
+    created_at: Optional[datetime] = Field(None, description="When the pact was signed (set when stored)")
 
 # --- Verifier Schemas ---
 
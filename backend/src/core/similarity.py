@@ -0,0 +1,110 @@
+import re
+import zlib
+import random
+import difflib
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+# Duplicate-pact semantics (unchanged from the original /commit scan):
+# same text, or > 80% similar with identical numbers, due within 12 hours of each other.
+SIMILARITY_THRESHOLD = 0.8
+DUPLICATE_WINDOW = timedelta(hours=12)
+
+NUM_PERM = 32
+SHINGLE_SIZE = 3
+_MERSENNE_PRIME = (1 << 61) - 1
+_rng = random.Random(20240101) # Fixed seed: signatures are persisted and must be stable across processes
+_PERMUTATIONS = [(_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME)) for _ in range(NUM_PERM)]
+
+def normalize_goal_text(goal: Optional[str]) -> str:
+    return (goal or "").strip().lower()
+
+def number_fingerprint(goal: str) -> str:
+    """Sorted, de-duplicated numbers in the goal ("run 5km 3x" -> "3,5"). Empty if none."""
+    return ",".join(sorted(set(re.findall(r'\d+', goal))))
+
+def shingles(text: str, k: int = SHINGLE_SIZE) -> set:
+    if len(text) <= k:
+        return {text}
+    return {text[i:i + k] for i in range(len(text) - k + 1)}
+
+def minhash_signature(text: str) -> List[int]:
+    """MinHash over character shingles. Uses crc32, not hash(), so values are stable across processes."""
+    hashes = [zlib.crc32(s.encode("utf-8")) for s in shingles(text)]
+    return [min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in _PERMUTATIONS]
+
+def estimate_similarity(sig_a: List[int], sig_b: List[int]) -> float:
+    """Estimated Jaccard similarity of the two shingle sets."""
+    if not sig_a or not sig_b:
+        return 0.0
+    return sum(1 for a, b in zip(sig_a, sig_b) if a == b) / len(sig_a)
+
+def is_duplicate_goal(new_goal: str, existing_goal: str) -> bool:
+    """Exact match, or fuzzy match (> 80%) with identical numbers ("Run 5km" must not match "Run 10km")."""
+    if new_goal == existing_goal:
+        return True
+    if number_fingerprint(new_goal) != number_fingerprint(existing_goal):
+        return False
+    matcher = difflib.SequenceMatcher(None, existing_goal, new_goal)
+    # quick ratios are upper bounds of ratio(), so they only skip work
+    return (matcher.real_quick_ratio() > SIMILARITY_THRESHOLD
+            and matcher.quick_ratio() > SIMILARITY_THRESHOLD
+            and matcher.ratio() > SIMILARITY_THRESHOLD)
+
+def as_utc(value: Any) -> Optional[datetime]:
+    """Coerces a Firestore Timestamp, datetime or ISO string into an aware UTC datetime."""
+    if hasattr(value, 'to_datetime'):
+        value = value.to_datetime()
+    elif isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            return None
+    if not isinstance(value, datetime):
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value
+
+def contract_index_fields(goal_description: Optional[str], deadline: datetime) -> Dict[str, Any]:
+    """
+    Fields stored with every contract so duplicate detection is an index lookup.
+    Firestore composite index: user_id, status, dup_numbers, deadline_at.
+    """
+    goal = normalize_goal_text(goal_description)
+    return {
+        "dup_goal": goal,
+        "dup_numbers": number_fingerprint(goal),
+        "dup_signature": minhash_signature(goal),
+        "deadline_at": as_utc(deadline),
+    }
+
+def find_duplicate(goal_description: Optional[str], deadline: datetime, candidates: Iterable[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Returns the first candidate contract that duplicates the new goal, or None.
+
+    `candidates` should already be narrowed by the index query (same user, Active,
+    same number fingerprint, deadline within the window); the checks are repeated
+    here so the result is correct for any input. Candidates are confirmed in order
+    of MinHash similarity, so a real duplicate is usually found on the first compare.
+    """
+    new_goal = normalize_goal_text(goal_description)
+    new_deadline = as_utc(deadline)
+    new_signature = minhash_signature(new_goal)
+
+    scored = []
+    for existing in candidates:
+        existing_deadline = as_utc(existing.get('deadline_at') or existing.get('deadline_utc'))
+        if not existing_deadline or abs((new_deadline - existing_deadline).total_seconds()) >= DUPLICATE_WINDOW.total_seconds():
+            continue
+        existing_goal = existing.get('dup_goal')
+        if existing_goal is None:
+            existing_goal = normalize_goal_text(existing.get('goal_description'))
+        signature = existing.get('dup_signature') or minhash_signature(existing_goal)
+        scored.append((estimate_similarity(new_signature, signature), existing_goal, existing))
+
+    scored.sort(key=lambda item: item[0], reverse=True)
+    for _, existing_goal, existing in scored:
+        if is_duplicate_goal(new_goal, existing_goal):
+            return existing
+    return None
@@ -0,0 +1,151 @@
+import os
+import asyncio
+import threading
+import contextvars
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+from src.core.executor import run_blocking
+
+DEFAULT_POLL_SEC = 0.25
+
+class CallCancelled(Exception):
+    """Every caller waiting for this call went away, so the work was abandoned."""
+
+class ClientDisconnected(Exception):
+    """The client went away before the shared call finished."""
+
+class CancelToken:
+    """
+    Set once the last waiter of a flight leaves; blocking code polls it at safe points.
+    Also carries the LLM priorities of the flight's waiters, so the shared call queues
+    for quota at the highest of them (see LLMScheduler.acquire).
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self.priorities: Set[str] = set()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def wait(self, timeout: float) -> bool:
+        """Sleeps up to `timeout`, waking early (True) on cancellation."""
+        return self._event.wait(timeout)
+
+_cancel_token: contextvars.ContextVar = contextvars.ContextVar("pact_cancel_token", default=None)
+
+def current_cancel_token() -> Optional[CancelToken]:
+    """The token of the flight this code runs for (None outside a flight)."""
+    return _cancel_token.get()
+
+def shielded(func: Callable, *args, **kwargs) -> Any:
+    """Runs `func` without the caller's token, for work shared beyond this flight (e.g. a micro-batch flush)."""
+    reset = _cancel_token.set(None)
+    try:
+        return func(*args, **kwargs)
+    finally:
+        _cancel_token.reset(reset)
+
+class _Flight:
+    __slots__ = ("task", "token", "waiters")
+
+    def __init__(self, task: asyncio.Future, token: CancelToken):
+        self.task = task
+        self.token = token
+        self.waiters = 0
+
+class SingleFlight:
+    """
+    Collapses identical concurrent requests (same key) onto one blocking call on the executor:
+    a re-submitted GoalInput or a burst of users negotiating the same goal pay for one Gemini call.
+
+    Waiters watch their client (`is_disconnected`, e.g. Starlette's request.is_disconnected);
+    one that goes away stops waiting without affecting the others. The call queues for LLM
+    quota at the highest priority among its waiters, not just the first caller's. When the last waiter has
+    gone, the call's CancelToken is set. The LLM gateway checks it (via contextvars) while
+    queueing for a slot, while backing off and between stream chunks, so the call stops and
+    its concurrency slot is given back. A non-streamed call already on the wire can't be
+    interrupted; it is abandoned and its slot frees when Gemini answers.
+
+    Runs on the event loop (no locks needed). Config (env): PACT_SINGLE_FLIGHT ("on"/"off"),
+    PACT_DISCONNECT_POLL_SEC
+    """
+
+    def __init__(self, enabled: bool = None, poll_sec: float = None):
+        if enabled is None:
+            enabled = os.getenv("PACT_SINGLE_FLIGHT", "on").lower() not in ("0", "off", "false")
+        self.enabled = enabled
+        self.poll_sec = poll_sec or float(os.getenv("PACT_DISCONNECT_POLL_SEC", DEFAULT_POLL_SEC))
+        self._flights: Dict[str, _Flight] = {}
+        self._counts = {"calls": 0, "coalesced": 0, "completed": 0, "cancelled": 0, "abandoned_waiters": 0}
+
+    async def run(self, key: str, func: Callable, *args, is_disconnected: Callable[[], Awaitable[bool]] = None, **kwargs) -> Any:
+        """
+        `func(*args, **kwargs)` on the blocking executor, shared with concurrent callers of the
+        same key. Raises ClientDisconnected if this caller's client went away first.
+        """
+        if not self.enabled:
+            return await run_blocking(func, *args, **kwargs)
+        from src.core.llm_scheduler import current_priority # llm_scheduler imports this module
+
+        flight = self._flights.get(key)
+        if flight is None or flight.token.cancelled:
+            flight = self._start(key, func, args, kwargs)
+        else:
+            self._counts["coalesced"] += 1
+        # A joiner with a higher priority raises the shared call's (as a micro-batch flush does)
+        flight.token.priorities.add(current_priority())
+        flight.waiters += 1
+
+        finished = False
+        try:
+            while True:
+                done, _ = await asyncio.wait({flight.task}, timeout=self.poll_sec if is_disconnected else None)
+                if done:
+                    finished = True
+                    return flight.task.result()
+                if await is_disconnected():
+                    raise ClientDisconnected("Client disconnected while waiting for the call")
+        finally:
+            # Also reached when the handler itself is cancelled; asyncio.wait never cancels the shared task
+            flight.waiters -= 1
+            if not finished:
+                self._counts["abandoned_waiters"] += 1
+                if flight.waiters == 0 and not flight.task.done():
+                    flight.token.cancel()
+                    self._counts["cancelled"] += 1
+                    if self._flights.get(key) is flight:
+                        del self._flights[key]
+
+    def _start(self, key: str, func: Callable, args, kwargs) -> _Flight:
+        token = CancelToken()
+
+        async def lead():
+            # The task has its own context copy; run_blocking carries it (and the token) to the worker thread
+            _cancel_token.set(token)
+            return await run_blocking(func, *args, **kwargs)
+
+        flight = _Flight(asyncio.ensure_future(lead()), token)
+        self._flights[key] = flight
+        self._counts["calls"] += 1
+        flight.task.add_done_callback(lambda task: self._finish(key, flight))
+        return flight
+
+    def _finish(self, key: str, flight: _Flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        if not flight.task.cancelled():
+            flight.task.exception() # Retrieved, so an abandoned flight's error isn't logged as unhandled
+        if not flight.token.cancelled:
+            self._counts["completed"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(
+            self._counts,
+            enabled=self.enabled,
+            in_flight=len(self._flights),
+            waiting=sum(f.waiters for f in self._flights.values()),
+        )
@@ -0,0 +1,33 @@
+import time
+import threading
+from contextlib import contextmanager
+from typing import Dict, List
+
+class StageTimings:
+    """Thread-safe per-stage latency totals (count, total, max)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages: Dict[str, List[float]] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name: str, elapsed: float):
+        with self._lock:
+            entry = self._stages.setdefault(name, [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += elapsed
+            entry[2] = max(entry[2], elapsed)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {
+                name: {"count": count, "avg_ms": round(total / count * 1000, 2), "max_ms": round(peak * 1000, 2)}
+                for name, (count, total, peak) in self._stages.items()
+            }
@@ -1,3 +1,4 @@
+import hashlib
 import datetime
 from typing import Dict, Any, Optional, Tuple
 from firebase_admin import firestore
@@ -12,25 +13,39 @@ class StakeManager:
     def __init__(self, db_client):
         self.db = db_client
 
-    def handle_outcome(self, user_id: str, verification_result: VerificationResult):
+    def handle_outcome(self, user_id: str, verification_result: VerificationResult, idempotency_key: Optional[str] = None):
         """
         Main entry point for Stake Accumulation.
         Integrates verification result with stake Ledger.
+
+        With an `idempotency_key` (a job's key, "reaper:<contract_id>"), the ledger event is
+        written under that key in the same transaction, so a retried or re-run call returns
+        the first call's result instead of earning or burning twice.
         """
-        confidence = verification_result.confidence_score
+        confidence = verification_result.confidence
         is_success = (verification_result.status == "SUCCESS")
         
-        # We wrap the transaction logic
+        # We wrap the transaction logic (wrapped here so the bound method gets `self`)
         transaction = self.db.transaction()
-        result = self._process_stake_transaction(transaction, user_id, is_success, confidence)
+        process = firestore.transactional(self._process_stake_transaction)
+        result = process(transaction, user_id, is_success, confidence, idempotency_key)
         
         # Post-transaction observability
-        self._log_observability(user_id, result, verification_result)
+        if not result.get("duplicate"):
+            self._log_observability(user_id, result, verification_result)
         
         return result
 
-    @firestore.transactional
-    def _process_stake_transaction(self, transaction, user_id: str, is_success: bool, confidence: float) -> Dict[str, Any]:
+    def _process_stake_transaction(self, transaction, user_id: str, is_success: bool, confidence: float,
+                                   idempotency_key: Optional[str] = None) -> Dict[str, Any]:
+        # 0. Already applied? (all reads happen before any write in a transaction)
+        event_ref = self._event_ref(idempotency_key)
+        if idempotency_key:
+            applied = event_ref.get(transaction=transaction)
+            if applied.exists:
+                event = applied.to_dict()
+                return {"action": event.get("event_type"), "amount": event.get("amount", 0), "duplicate": True}
+
         # 1. Read Current Ledger
         doc_ref = self.db.collection('stake_ledgers').document(user_id)
         snapshot = doc_ref.get(transaction=transaction)
@@ -61,7 +76,7 @@ class StakeManager:
                 'updated_at': firestore.SERVER_TIMESTAMP
             }, merge=True)
             
-            self._append_event(transaction, user_id, "EARN", STAKE_REWARD, "Verified Success", confidence)
+            self._append_event(transaction, event_ref, user_id, "EARN", STAKE_REWARD, "Verified Success", confidence, idempotency_key=idempotency_key)
             
             return {"action": "EARN", "amount": STAKE_REWARD, "new_balance": new_balance}
 
@@ -81,12 +96,12 @@ class StakeManager:
                     'updated_at': firestore.SERVER_TIMESTAMP
                 }, merge=True)
                 
-                self._append_event(transaction, user_id, "BURN", STAKE_PENALTY, reason, confidence, verdict)
+                self._append_event(transaction, event_ref, user_id, "BURN", STAKE_PENALTY, reason, confidence, verdict, idempotency_key)
                 return {"action": "BURN", "amount": STAKE_PENALTY, "new_balance": new_balance, "reason": reason}
             
             else:
                 # BLOCKED
-                self._append_event(transaction, user_id, "BLOCKED", 0, reason, confidence, verdict)
+                self._append_event(transaction, event_ref, user_id, "BLOCKED", 0, reason, confidence, verdict, idempotency_key)
                 return {"action": "BLOCKED", "amount": 0, "reason": reason, "current_balance": current_balance}
 
     def _evaluate_burn_gate(self, current_balance: float, confidence: float) -> Tuple[str, str]:
@@ -109,17 +124,25 @@ class StakeManager:
             
         return "ALLOW_BURN", "Governance Checks Passed"
 
+    def _event_ref(self, idempotency_key: Optional[str]):
+        events = self.db.collection('stake_events')
+        if not idempotency_key:
+            return events.document()
+        # Keys may contain '/', which document ids can't
+        return events.document(hashlib.sha256(idempotency_key.encode()).hexdigest())
+
     def _append_event(
         self, 
         transaction, 
+        event_ref,
         user_id: str, 
         event_type: str, 
         amount: float, 
         reason: str,
         confidence: float,
-        opik_verdict: str = None
+        opik_verdict: str = None,
+        idempotency_key: Optional[str] = None
     ):
-        event_ref = self.db.collection('stake_events').document()
         transaction.set(event_ref, {
             "user_id": user_id,
             "event_type": event_type,
@@ -127,6 +150,7 @@ class StakeManager:
             "reason": reason,
             "verification_confidence": confidence,
             "opik_verdict": opik_verdict,
+            "idempotency_key": idempotency_key,
             "created_at": firestore.SERVER_TIMESTAMP
         })
 
@@ -0,0 +1,117 @@
+from typing import Any, Dict, List, Optional, Sequence, Union
+import numpy as np
+from src.core.activity_streams import ActivityStreams
+
+# Thresholds for the treadmill anti-cheat checks
+MIN_POINTS = 10
+FLAT_STDEV_BPM = 2.0        # Whole-activity stdev below this: a "flat" HR trace
+ROLLING_WINDOW_SEC = 60.0
+FLAT_WINDOW_STDEV_BPM = 0.5 # A window this steady is a flat segment...
+MIN_FLAT_SEC = 300.0        # ...and one lasting this long is suspicious
+SPIKE_BPM_PER_SEC = 15.0    # Faster HR jumps are sensor artefacts or injected data
+MAX_SPIKE_FRACTION = 0.01
+HR_RANGE = (30.0, 230.0)
+MIN_VELOCITY_STDEV = 0.3    # m/s; below this pace barely changes and correlation means nothing
+MIN_HR_PACE_CORR = -0.2
+
+def streams_to_arrays(points: Sequence[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+    """List of per-sample dicts (time, heartrate, velocity_smooth, ...) -> one float array per field."""
+    if not points:
+        return {}
+    arrays = {}
+    for field in points[0].keys():
+        arrays[field] = np.fromiter((p.get(field, np.nan) for p in points), dtype=np.float64, count=len(points))
+    return arrays
+
+def _rolling_stdev(values: np.ndarray, window: int) -> np.ndarray:
+    # Sliding-window sample stdev from cumulative sums: O(n), no Python loop
+    s1 = np.concatenate(([0.0], np.cumsum(values)))
+    s2 = np.concatenate(([0.0], np.cumsum(values * values)))
+    total = s1[window:] - s1[:-window]
+    total_sq = s2[window:] - s2[:-window]
+    var = (total_sq - total * total / window) / (window - 1)
+    return np.sqrt(np.clip(var, 0.0, None))
+
+def _runs(mask: np.ndarray):
+    """(start, end) index pairs of consecutive True runs."""
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+def analyze_hr_stream(time: np.ndarray, heartrate: np.ndarray, velocity: Optional[np.ndarray] = None) -> Dict[str, Any]:
+    """
+    Heart-rate stream anti-cheat analytics over the full stream:
+    overall and rolling-window variability, flat segments, spikes and (when a velocity
+    stream is present) HR/pace correlation. Returns the metrics plus `flags`, a list of
+    human-readable failure reasons (empty when nothing looks wrong).
+    """
+    report: Dict[str, Any] = {"points": int(len(heartrate)), "flags": []}
+    valid = np.isfinite(heartrate) & np.isfinite(time)
+    hr = heartrate[valid]
+    t = time[valid]
+    if len(hr) <= MIN_POINTS:
+        return report
+
+    flags: List[str] = report["flags"]
+
+    # 1. Overall variability (the original check)
+    stdev = float(np.std(hr, ddof=1))
+    report["hr_stdev"] = round(stdev, 3)
+    if stdev < FLAT_STDEV_BPM:
+        flags.append(f"HR Variability suspicious (stdev={stdev:.2f})")
+
+    # 2. Rolling variability and flat segments
+    dt = np.diff(t)
+    sample_sec = float(np.median(dt)) if len(dt) else 1.0
+    sample_sec = sample_sec if sample_sec > 0 else 1.0
+    window = int(min(len(hr), max(3, round(ROLLING_WINDOW_SEC / sample_sec))))
+    rolling = _rolling_stdev(hr, window)
+    report["rolling_window_points"] = window
+    report["rolling_stdev_min"] = round(float(rolling.min()), 3)
+    report["rolling_stdev_median"] = round(float(np.median(rolling)), 3)
+
+    flat = rolling < FLAT_WINDOW_STDEV_BPM
+    starts, ends = _runs(flat)
+    # A run of k flat windows covers samples [start, end - 1 + window)
+    durations = t[np.minimum(ends - 1 + window - 1, len(t) - 1)] - t[starts] if len(starts) else np.array([])
+    longest = float(durations.max()) if len(durations) else 0.0
+    report["flat_segments"] = int(np.count_nonzero(durations >= MIN_FLAT_SEC))
+    report["longest_flat_sec"] = round(longest, 1)
+    if stdev >= FLAT_STDEV_BPM and longest >= MIN_FLAT_SEC:
+        flags.append(f"HR flat for {longest / 60:.1f} min (rolling stdev < {FLAT_WINDOW_STDEV_BPM} bpm)")
+
+    # 3. Spikes: implausible jumps or out-of-range values
+    rate = np.abs(np.diff(hr)) / np.where(dt > 0, dt, sample_sec)
+    spikes = int(np.count_nonzero(rate > SPIKE_BPM_PER_SEC) + np.count_nonzero((hr < HR_RANGE[0]) | (hr > HR_RANGE[1])))
+    report["spikes"] = spikes
+    if spikes > max(5, MAX_SPIKE_FRACTION * len(hr)):
+        flags.append(f"HR stream has {spikes} implausible spikes")
+
+    # 4. HR should follow pace (when pace actually varies)
+    if velocity is not None:
+        v = velocity[valid]
+        ok = np.isfinite(v)
+        if np.count_nonzero(ok) > window and float(np.std(v[ok])) >= MIN_VELOCITY_STDEV:
+            # Smooth both with the rolling window first: HR lags effort by tens of seconds
+            kernel = np.ones(window) / window
+            hr_smooth = np.convolve(hr[ok], kernel, mode="valid")
+            v_smooth = np.convolve(v[ok], kernel, mode="valid")
+            if np.std(hr_smooth) > 0 and np.std(v_smooth) > 0:
+                corr = float(np.corrcoef(hr_smooth, v_smooth)[0, 1])
+                report["hr_pace_corr"] = round(corr, 3)
+                if corr < MIN_HR_PACE_CORR:
+                    flags.append(f"HR does not follow pace (corr={corr:.2f})")
+
+    return report
+
+def analyze_streams(streams: Union[ActivityStreams, Sequence[Dict[str, Any]]]) -> Dict[str, Any]:
+    """analyze_hr_stream over ActivityStreams (or a legacy list of per-sample dicts)."""
+    arrays = streams if isinstance(streams, ActivityStreams) else streams_to_arrays(streams)
+    if "heartrate" not in arrays:
+        return {"points": len(streams), "flags": []}
+    time = arrays["time"] if "time" in arrays else np.arange(len(streams))
+    velocity = arrays["velocity_smooth"] if "velocity_smooth" in arrays else None
+    return analyze_hr_stream(
+        time.astype(np.float64),
+        arrays["heartrate"].astype(np.float64),
+        velocity.astype(np.float64) if velocity is not None else None
+    )
@@ -0,0 +1,95 @@
+import json
+from typing import Any, AsyncIterator, Dict, Iterator, List, Tuple
+from fastapi.encoders import jsonable_encoder
+from src.core.executor import run_blocking
+
+def sse_event(event: str, data: Any) -> str:
+    """One server-sent event (text/event-stream) with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data))}\n\n"
+
+async def stream_sse(events: Iterator[Tuple[str, Any]]) -> AsyncIterator[str]:
+    """
+    Formats (event, data) pairs from a blocking generator as SSE, pulling each one on the
+    blocking executor so the event loop never waits on Gemini. If the client disconnects,
+    the generator is closed, which stops the upstream stream.
+    """
+    end = object()
+    try:
+        while (item := await run_blocking(next, events, end)) is not end:
+            yield sse_event(*item)
+    finally:
+        try:
+            events.close()
+        except ValueError:
+            pass # Still running on the executor; it is closed when collected
+
+class IncrementalJSONParser:
+    """
+    Parses a JSON object as it streams in and reports each top-level member as soon as
+    its value is complete ("goal_description", then "deadline_utc", ...), without waiting
+    for the closing brace. Nested values (e.g. "penalty") are reported whole.
+
+    Scans each character once, tracking string/escape state and nesting depth; a member
+    ends at a ',' or the closing '}' at depth 1. Text before the first '{' (a stray
+    markdown fence) is skipped.
+    """
+
+    def __init__(self):
+        self._member: List[str] = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self.done = False
+        self.fields: Dict[str, Any] = {}
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """Consumes a chunk and returns the (key, value) members it completed, in order."""
+        completed = []
+        for ch in chunk:
+            if self.done:
+                break
+            if self._in_string:
+                self._member.append(ch)
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+
+            if self._depth == 0:
+                if ch == "{":
+                    self._depth = 1
+                continue
+            if ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._complete(completed)
+                    self.done = True
+                    continue
+            elif ch == "," and self._depth == 1:
+                self._complete(completed)
+                continue
+            self._member.append(ch)
+        return completed
+
+    def _complete(self, completed: List[Tuple[str, Any]]):
+        text = "".join(self._member).strip()
+        self._member = []
+        if not text:
+            return
+        # A single "key": value member is itself a valid object body
+        key, value = next(iter(json.loads("{" + text + "}").items()))
+        self.fields[key] = value
+        completed.append((key, value))
+
+    def result(self) -> Dict[str, Any]:
+        """The whole object; raises ValueError if the stream ended before it was closed."""
+        if not self.done:
+            raise ValueError("JSON stream ended before the object was complete")
+        return dict(self.fields)
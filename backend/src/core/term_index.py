@@ -0,0 +1,182 @@
+import os
+import re
+import json
+import zlib
+import hashlib
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+
+DEFAULT_DIM = 512
+DEFAULT_TOP_K = 4
+DEFAULT_MIN_SCORE = 0.12 # Below this nothing in the KB is really about the goal: use the fallback category
+RELATIVE_CUTOFF = 0.7 # Terms scoring under 70% of the best hit are noise for this goal
+FALLBACK_CATEGORY = "general"
+CHAR_NGRAMS = (3, 4)
+STOP_WORDS = {
+    "a", "an", "the", "and", "or", "of", "to", "in", "on", "for", "by", "at", "with", "my", "i", "is", "be", "must",
+    "per", "this", "that", "from", "as", "if", "it", "day", "week", "month", "every", "each",
+}
+INDEX_VERSION = 1
+
+class HashingEmbedder:
+    """
+    Local, dependency-free text embedding: word unigrams/bigrams plus character n-grams of each
+    word ("running" shares "run" with "run 5km"), feature-hashed into `dim` signed buckets with
+    sublinear term weights, L2-normalized. crc32, not hash(), so vectors are stable across
+    processes and the offline index matches the query side.
+    """
+
+    def __init__(self, dim: int = DEFAULT_DIM):
+        self.dim = dim
+
+    @staticmethod
+    def features(text: str) -> List[str]:
+        words = [w for w in re.findall(r"[a-z0-9]+", (text or "").lower()) if w not in STOP_WORDS]
+        feats = [f"w:{w}" for w in words]
+        feats += [f"b:{a}_{b}" for a, b in zip(words, words[1:])]
+        for w in words:
+            if w.isdigit():
+                continue
+            padded = f"<{w}>"
+            for n in CHAR_NGRAMS:
+                feats += [f"c:{padded[i:i + n]}" for i in range(len(padded) - n + 1)]
+        return feats
+
+    def embed(self, text: str) -> np.ndarray:
+        counts: Dict[int, float] = {}
+        for feat in self.features(text):
+            h = zlib.crc32(feat.encode("utf-8"))
+            bucket, sign = h % self.dim, 1.0 if (h >> 31) & 1 else -1.0
+            counts[bucket] = counts.get(bucket, 0.0) + sign
+        vec = np.zeros(self.dim, dtype=np.float32)
+        if counts:
+            buckets = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+            values = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+            vec[buckets] = np.sign(values) * (1.0 + np.log(np.abs(values) + 1e-9).clip(min=0)) # Sublinear tf
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def embed_many(self, texts: List[str]) -> np.ndarray:
+        return np.vstack([self.embed(t) for t in texts]) if texts else np.zeros((0, self.dim), dtype=np.float32)
+
+def kb_fingerprint(knowledge_base: Dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps(knowledge_base, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+def _render(category: str, rendered_terms: List[str], risk_factors: str) -> str:
+    # Same block the keyword retriever used to build; terms are already JSON-encoded
+    return f"""
+        [RAG CONTEXT RETRIEVED]
+        CATEGORY: {category.upper()}
+        STANDARD TERMS: [{", ".join(rendered_terms)}]
+        KNOWN RISK FACTORS: {risk_factors or 'None'}
+        (Use these to inform the 'terms' array in the contract)
+        """
+
+class TermIndex:
+    """
+    Vector index over standard_terms.json: one row per term, embedded together with its category
+    name, description and keywords. Compiled offline (scripts/build_term_index.py) into
+    `<kb>.index.npy` (float32 matrix, memory-mapped at load) and `<kb>.index.json` (rows,
+    categories and pre-rendered snippets). Retrieval is one matrix-vector product plus a top-k
+    argpartition; matching terms are grouped by category into the prompt context.
+    """
+
+    def __init__(self, matrix: np.ndarray, meta: Dict[str, Any], embedder: Optional[HashingEmbedder] = None):
+        self.matrix = matrix
+        self.meta = meta
+        self.rows: List[Dict[str, Any]] = meta["rows"]
+        self.categories: Dict[str, Dict[str, Any]] = meta["categories"]
+        self.embedder = embedder or HashingEmbedder(meta["dim"])
+
+    # --- Build / load ---
+
+    @classmethod
+    def build(cls, knowledge_base: Dict[str, Any], dim: int = DEFAULT_DIM) -> "TermIndex":
+        embedder = HashingEmbedder(dim)
+        rows, texts, categories = [], [], {}
+        for name, entry in knowledge_base.items():
+            terms = entry.get("terms", [])
+            categories[name] = {
+                "risk_factors": entry.get("risk_factors", "None"),
+                "terms": terms,
+                "snippet": _render(name, [json.dumps(t) for t in terms], entry.get("risk_factors")),
+            }
+            for term in terms:
+                rows.append({"category": name, "term": term, "snippet": json.dumps(term)})
+                texts.append(f"{name} {entry.get('description', '')} {entry.get('keywords', '')} {term}")
+        meta = {"version": INDEX_VERSION, "dim": dim, "source": kb_fingerprint(knowledge_base),
+                "rows": rows, "categories": categories}
+        return cls(embedder.embed_many(texts), meta, embedder)
+
+    @staticmethod
+    def paths(kb_path: str) -> Tuple[str, str]:
+        base = os.path.splitext(kb_path)[0]
+        return f"{base}.index.npy", f"{base}.index.json"
+
+    def save(self, kb_path: str):
+        matrix_path, meta_path = self.paths(kb_path)
+        np.save(matrix_path, np.ascontiguousarray(self.matrix, dtype=np.float32))
+        with open(meta_path, "w") as f:
+            json.dump(self.meta, f, indent=1)
+
+    @classmethod
+    def load(cls, kb_path: str, mmap: bool = True) -> Optional["TermIndex"]:
+        """The compiled index, or None if it is missing or was built from a different KB."""
+        matrix_path, meta_path = cls.paths(kb_path)
+        if not (os.path.exists(matrix_path) and os.path.exists(meta_path)):
+            return None
+        with open(meta_path) as f:
+            meta = json.load(f)
+        with open(kb_path) as f:
+            if meta.get("version") != INDEX_VERSION or meta.get("source") != kb_fingerprint(json.load(f)):
+                return None
+        matrix = np.load(matrix_path, mmap_mode="r" if mmap else None)
+        return cls(matrix, meta)
+
+    @classmethod
+    def load_or_build(cls, kb_path: str) -> "TermIndex":
+        index = cls.load(kb_path)
+        if index is None:
+            print(f"[WARN] Term index for {os.path.basename(kb_path)} missing or stale; building in memory. "
+                  f"Run scripts/build_term_index.py to precompute it.")
+            with open(kb_path) as f:
+                index = cls.build(json.load(f))
+        return index
+
+    # --- Retrieval ---
+
+    def search(self, query: str, k: int = DEFAULT_TOP_K) -> List[Tuple[float, Dict[str, Any]]]:
+        """Top-k rows by cosine similarity (rows and query are unit vectors), best first."""
+        if not self.rows:
+            return []
+        scores = self.matrix @ self.embedder.embed(query)
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(float(scores[i]), self.rows[i]) for i in top]
+
+    def context(self, query: str, k: int = DEFAULT_TOP_K, min_score: float = DEFAULT_MIN_SCORE) -> str:
+        """Prompt context for a goal: matching terms grouped by category, best category first."""
+        hits = self.search(query, k)
+        floor = max(min_score, hits[0][0] * RELATIVE_CUTOFF) if hits else min_score
+        hits = [(score, row) for score, row in hits if score >= floor]
+        if not hits:
+            fallback = self.categories.get(FALLBACK_CATEGORY)
+            return fallback["snippet"] if fallback else ""
+
+        grouped: Dict[str, List[str]] = {}
+        for _, row in hits:
+            grouped.setdefault(row["category"], []).append(row["snippet"])
+        blocks = []
+        for name, terms in grouped.items():
+            category = self.categories[name]
+            # Whole category matched: reuse its pre-rendered snippet
+            if len(terms) == len(category["terms"]):
+                blocks.append(category["snippet"])
+            else:
+                blocks.append(_render(name, terms, category["risk_factors"]))
+        return "".join(blocks)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"rows": len(self.rows), "categories": len(self.categories), "dim": int(self.matrix.shape[1]),
+                "memory_mapped": isinstance(self.matrix, np.memmap)}
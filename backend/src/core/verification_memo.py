@@ -0,0 +1,136 @@
+import os
+import re
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional, Tuple
+from src.core.schemas import GoalContract, Evidence
+from src.core.contract_cache import MemoryCacheBackend, DiskCacheBackend
+
+DEFAULT_TTL_SEC = 600.0
+DEFAULT_MAX_ENTRIES = 4096
+DEFAULT_DISK_PATH = os.path.join(tempfile.gettempdir(), "pact_verification_memo.sqlite3")
+CONTENT_HASH = re.compile(r"/sha256/([0-9a-f]{64})")
+
+def _image_identity(url: str) -> str:
+    # Content-addressed uploads (see src/core/evidence.py) are keyed by hash, not by URL form
+    match = CONTENT_HASH.search(url)
+    return f"sha256:{match.group(1)}" if match else url.strip()
+
+def verification_key(contract: GoalContract, activity_id: Optional[str] = None, evidence: Optional[Evidence] = None,
+                     user_id: Optional[str] = None) -> str:
+    """
+    Stable hash of what a verdict depends on: the user (whose activities are read), the
+    contract, the activity id and the evidence content. Evidence.start_time is excluded
+    (it is the request time for generic evidence, so every retry would otherwise miss).
+    """
+    material = {
+        "user_id": user_id,
+        "contract": contract.model_dump(mode="json"),
+        "activity_id": activity_id,
+        "evidence": None,
+    }
+    if evidence is not None:
+        material["evidence"] = {
+            "activity_id": evidence.activity_id,
+            "activity_type": evidence.activity_type,
+            "text": (evidence.text_evidence or "").strip(),
+            "images": sorted(_image_identity(url) for url in evidence.image_urls),
+        }
+    canonical = json.dumps(material, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+class ResultMemo:
+    """
+    TTL memo of JSON-serializable results, on the same LRU backends as the contract cache.
+
+    `get_or_compute` also collapses concurrent misses for the same key: a double-tap
+    that arrives while the first request is still being judged waits for that result
+    instead of paying for a second judgement.
+    """
+
+    def __init__(self, backend=None, ttl_sec: float = DEFAULT_TTL_SEC):
+        self.backend = backend if backend is not None else MemoryCacheBackend(DEFAULT_MAX_ENTRIES)
+        self.ttl_sec = ttl_sec
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.joined = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self.backend.get(key)
+        if entry is None:
+            return None
+        if time.time() - entry[1] > self.ttl_sec:
+            self.backend.delete(key)
+            return None
+        return json.loads(entry[0])
+
+    def set(self, key: str, value: Any):
+        self.backend.set(key, json.dumps(value))
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any], store_if: Callable[[Any], bool] = lambda _: True) -> Tuple[Any, bool]:
+        """Returns (value, from_memo). `store_if` decides whether a fresh value is kept."""
+        cached = self.get(key)
+        if cached is not None:
+            with self._lock:
+                self.hits += 1
+            return cached, True
+
+        with self._lock:
+            pending = self._in_flight.get(key)
+            if pending is None:
+                pending = self._in_flight[key] = Future()
+                owner = True
+                self.misses += 1
+            else:
+                owner = False
+                self.joined += 1
+
+        if not owner:
+            return pending.result(), True
+
+        try:
+            value = compute()
+        except Exception as e:
+            pending.set_exception(e)
+            raise
+        else:
+            if store_if(value):
+                self.set(key, value)
+            pending.set_result(value)
+            return value, False
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "entries": len(self.backend),
+            "hits": self.hits,
+            "joined_in_flight": self.joined,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
+
+def build_memo_from_env(prefix: str, table: str, default_ttl_sec: float = DEFAULT_TTL_SEC) -> Optional[ResultMemo]:
+    """
+    <prefix>: "memory" (default), "disk" or "off"
+    <prefix>_TTL_SEC, <prefix>_SIZE, <prefix>_PATH
+    """
+    mode = os.getenv(prefix, "memory").lower()
+    if mode == "off":
+        return None
+
+    max_entries = int(os.getenv(f"{prefix}_SIZE", DEFAULT_MAX_ENTRIES))
+    if mode == "disk":
+        backend = DiskCacheBackend(os.getenv(f"{prefix}_PATH", DEFAULT_DISK_PATH), max_entries, table=table)
+    else:
+        backend = MemoryCacheBackend(max_entries)
+    return ResultMemo(backend, ttl_sec=float(os.getenv(f"{prefix}_TTL_SEC", default_ttl_sec)))
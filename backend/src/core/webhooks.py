@@ -0,0 +1,282 @@
+import os
+import time
+import threading
+from collections import OrderedDict, deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+DEFAULT_COALESCE_SEC = 2.0
+DEFAULT_MAX_DELAY_SEC = 30.0
+DEFAULT_MAX_PENDING = 10_000
+DEFAULT_WORKERS = 4
+DEFAULT_DEDUPE_ENTRIES = 100_000
+DEFAULT_RECOVERY_SEC = 300.0
+JOURNAL_KIND = "strava_event"
+
+ACCEPTED = "accepted"
+COALESCED = "coalesced"
+DUPLICATE = "duplicate"
+IGNORED = "ignored"
+DEFERRED = "deferred"
+
+class IngestQueueFull(Exception):
+    """Raised when the in-memory pipeline is at capacity and there is no journal to spill to."""
+
+class _Pending:
+    __slots__ = ("activity_ids", "first_seen", "last_seen")
+
+    def __init__(self, now: float):
+        self.activity_ids: Dict[str, List[str]] = {} # Ordered: activity id -> journal keys of its events
+        self.first_seen = now
+        self.last_seen = now
+
+def event_key(event: Dict[str, Any]) -> Tuple:
+    """Identity of a delivery; Strava re-sends the exact same payload when it retries."""
+    return (event.get("object_type"), event.get("aspect_type"), str(event.get("object_id")),
+            str(event.get("owner_id")), event.get("event_time"))
+
+def journal_key(key: Tuple) -> str:
+    return "strava-event:" + ":".join(str(part) for part in key)
+
+class WebhookIngestor:
+    """
+    Strava webhook events -> per-athlete batches of activity ids -> `sink(owner_id, activity_ids)`.
+
+    - Redeliveries are dropped (LRU of recent event keys).
+    - Events for the same athlete are coalesced until they go quiet for `coalesce_sec`
+      (or `max_delay_sec` after the first one), so an upload followed by title/type edits
+      is verified once. A delete removes the activity from the pending batch.
+    - The sink runs on a small worker pool. Athletes waiting (pending or in flight) are
+      bounded by `max_pending`. Events for an athlete already pending are always absorbed,
+      since they cost nothing.
+
+    With a `journal` (JobQueue) every accepted event is persisted before it is acknowledged,
+    as a delayed job that runs the sink for that one activity. A batch that reaches the sink
+    settles its events' jobs; events lost from memory (restart, crash, sink error) run from
+    the journal once `max_delay_sec + recovery_sec` has passed. A new athlete beyond
+    `max_pending` goes straight to the journal (due now, not coalesced) rather than being
+    refused: Strava only redelivers a handful of times. Without a journal that case raises
+    IngestQueueFull.
+
+    Config (env): PACT_WEBHOOK_COALESCE_SEC, PACT_WEBHOOK_MAX_DELAY_SEC, PACT_WEBHOOK_MAX_PENDING, PACT_WEBHOOK_WORKERS,
+    PACT_WEBHOOK_RECOVERY_SEC
+    """
+
+    def __init__(self, sink: Callable[[str, List[str]], Any], coalesce_sec: float = None, max_delay_sec: float = None,
+                 max_pending: int = None, workers: int = None, dedupe_entries: int = DEFAULT_DEDUPE_ENTRIES,
+                 clock: Callable[[], float] = time.monotonic, journal=None, recovery_sec: float = None):
+        self.sink = sink
+        self.clock = clock
+        self.coalesce_sec = coalesce_sec if coalesce_sec is not None else float(os.getenv("PACT_WEBHOOK_COALESCE_SEC", DEFAULT_COALESCE_SEC))
+        self.max_delay_sec = max_delay_sec if max_delay_sec is not None else float(os.getenv("PACT_WEBHOOK_MAX_DELAY_SEC", DEFAULT_MAX_DELAY_SEC))
+        self.max_pending = max_pending or int(os.getenv("PACT_WEBHOOK_MAX_PENDING", DEFAULT_MAX_PENDING))
+        self.workers = workers or int(os.getenv("PACT_WEBHOOK_WORKERS", DEFAULT_WORKERS))
+        self.dedupe_entries = dedupe_entries
+        self.recovery_sec = recovery_sec if recovery_sec is not None else float(os.getenv("PACT_WEBHOOK_RECOVERY_SEC", DEFAULT_RECOVERY_SEC))
+        self.journal = journal
+        if journal is not None:
+            journal.register(JOURNAL_KIND, self._replay)
+
+        self._lock = threading.Lock()
+        self._ready_cv = threading.Condition(self._lock)
+        self._idle_cv = threading.Condition(self._lock)
+        self._seen: "OrderedDict[Tuple, None]" = OrderedDict()
+        self._pending: Dict[str, _Pending] = {}
+        self._ready: Deque[Tuple[str, _Pending]] = deque()
+        self._running = 0
+        self._threads: List[threading.Thread] = []
+        self._stop = threading.Event()
+
+        self._counts = {"received": 0, ACCEPTED: 0, COALESCED: 0, DUPLICATE: 0, IGNORED: 0, DEFERRED: 0, "rejected": 0,
+                        "batches": 0, "activities": 0, "sink_errors": 0, "replayed": 0}
+        self._delay_total = 0.0
+        self._delay_max = 0.0
+
+    # --- Ingestion ---
+
+    def handle(self, event: Dict[str, Any]) -> str:
+        """
+        Takes one webhook event. Returns accepted | coalesced | duplicate | ignored | deferred,
+        or raises IngestQueueFull (no journal only). Never blocks on verification; with a
+        journal it does one local SQLite write, so call it off the event loop.
+        """
+        now = self.clock()
+        owner = str(event.get("owner_id"))
+        activity_id = str(event.get("object_id"))
+        aspect = event.get("aspect_type")
+        key = event_key(event)
+
+        with self._lock:
+            self._counts["received"] += 1
+            if key in self._seen:
+                self._seen.move_to_end(key)
+                self._counts[DUPLICATE] += 1
+                return DUPLICATE
+
+            pending = self._pending.get(owner)
+            if event.get("object_type") == "athlete":
+                # Deauthorization: nothing of theirs should be verified any more
+                if (event.get("updates") or {}).get("authorized") == "false" and owner in self._pending:
+                    self._settle([k for keys in self._pending.pop(owner).activity_ids.values() for k in keys])
+                return self._remember(key, IGNORED)
+
+            if event.get("object_type") != "activity" or aspect not in ("create", "update", "delete"):
+                return self._remember(key, IGNORED)
+
+            if aspect == "delete":
+                if pending and activity_id in pending.activity_ids:
+                    self._settle(pending.activity_ids.pop(activity_id))
+                    if not pending.activity_ids:
+                        del self._pending[owner]
+                return self._remember(key, IGNORED)
+
+            full = pending is None and len(self._pending) + len(self._ready) + self._running >= self.max_pending
+            if full and self.journal is None:
+                self._counts["rejected"] += 1
+                raise IngestQueueFull(f"Webhook pipeline at capacity ({self.max_pending} athletes waiting)")
+
+            # Persisted before it is acknowledged; due now if it can't wait in memory
+            keys = []
+            if self.journal is not None:
+                keys.append(journal_key(key))
+                self.journal.enqueue(JOURNAL_KIND, {"owner_id": owner, "activity_id": activity_id}, idempotency_key=keys[0],
+                                     delay_sec=0.0 if full else self.max_delay_sec + self.recovery_sec)
+            if full:
+                return self._remember(key, DEFERRED)
+
+            if pending is None:
+                pending = self._pending[owner] = _Pending(now)
+                outcome = ACCEPTED
+            else:
+                outcome = COALESCED
+            pending.activity_ids.setdefault(activity_id, []).extend(keys)
+            pending.last_seen = now
+            self._remember(key, outcome)
+
+        self.start()
+        return outcome
+
+    def _remember(self, key: Tuple, outcome: str) -> str:
+        self._seen[key] = None
+        if len(self._seen) > self.dedupe_entries:
+            self._seen.popitem(last=False)
+        self._counts[outcome] += 1
+        return outcome
+
+    def _settle(self, keys: List[str]):
+        # The journaled copies of events that were handled (or dropped) in memory
+        if self.journal is not None and keys:
+            self.journal.complete(keys)
+
+    def _replay(self, payload: Dict[str, Any]):
+        """Journal job: an event that never reached the sink from memory (or was queued past capacity)."""
+        self.sink(payload["owner_id"], [payload["activity_id"]])
+        with self._lock:
+            self._counts["replayed"] += 1
+
+    # --- Dispatch ---
+
+    def flush(self, force: bool = False) -> int:
+        """Moves batches whose coalescing window has closed (all of them with force) to the workers."""
+        with self._lock:
+            return self._flush_locked(self.clock(), force)
+
+    def _flush_locked(self, now: float, force: bool) -> int:
+        due = [
+            owner for owner, p in self._pending.items()
+            if force or now - p.last_seen >= self.coalesce_sec or now - p.first_seen >= self.max_delay_sec
+        ]
+        for owner in due:
+            self._ready.append((owner, self._pending.pop(owner)))
+        if due:
+            self._ready_cv.notify_all()
+        return len(due)
+
+    def start(self):
+        """Starts the flusher and worker threads (idempotent)."""
+        if self._threads:
+            return
+        with self._lock:
+            if self._threads:
+                return
+            self._stop.clear()
+            self._threads.append(threading.Thread(target=self._flush_loop, name="pact-webhook-flush", daemon=True))
+            for i in range(self.workers):
+                self._threads.append(threading.Thread(target=self._worker_loop, name=f"pact-webhook-worker-{i}", daemon=True))
+            for t in self._threads:
+                t.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        with self._lock:
+            self._ready_cv.notify_all()
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = []
+
+    def drain(self, timeout: float = 30.0) -> bool:
+        """Flushes everything pending and waits for the workers to finish it. Returns False on timeout."""
+        self.start()
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            while True:
+                self._flush_locked(self.clock(), force=True)
+                if not self._ready and not self._running:
+                    return True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._idle_cv.wait(min(remaining, 0.05))
+
+    def _flush_loop(self):
+        interval = max(0.01, min(self.coalesce_sec / 4, 0.5))
+        while not self._stop.wait(interval):
+            self.flush()
+
+    def _worker_loop(self):
+        while True:
+            with self._lock:
+                while not self._ready and not self._stop.is_set():
+                    self._ready_cv.wait(0.5)
+                if self._stop.is_set():
+                    return
+                owner, pending = self._ready.popleft()
+                self._running += 1
+
+            delay = self.clock() - pending.first_seen
+            try:
+                self.sink(owner, list(pending.activity_ids))
+                failed = False
+            except Exception as e:
+                # Left in the journal: replayed once its recovery delay has passed
+                print(f"[WARN] Webhook sink failed for athlete {owner}: {e}")
+                failed = True
+            if not failed:
+                try:
+                    self._settle([k for keys in pending.activity_ids.values() for k in keys])
+                except Exception as e:
+                    print(f"[WARN] Could not settle journaled webhook events for athlete {owner}: {e}")
+
+            with self._lock:
+                self._running -= 1
+                self._counts["batches"] += 1
+                self._counts["activities"] += len(pending.activity_ids)
+                self._counts["sink_errors"] += int(failed)
+                self._delay_total += delay
+                self._delay_max = max(self._delay_max, delay)
+                self._idle_cv.notify_all()
+
+    # --- Observability ---
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            batches = self._counts["batches"]
+            return dict(
+                self._counts,
+                pending=len(self._pending),
+                queued=len(self._ready),
+                running=self._running,
+                capacity=self.max_pending,
+                events_per_batch=round((self._counts[ACCEPTED] + self._counts[COALESCED]) / batches, 2) if batches else 0.0,
+                avg_dispatch_delay_ms=round(self._delay_total / batches * 1000, 2) if batches else 0.0,
+                max_dispatch_delay_ms=round(self._delay_max * 1000, 2),
+            )
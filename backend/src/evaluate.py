@@ -9,6 +9,7 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/..")
 
 from src.agents.contract import ContractAgent
 from src.core.schemas import GoalContract
+from src.core.llm_scheduler import set_default_priority, EVAL
 try:
     import opik
     from opik import Opik, track
@@ -71,6 +72,8 @@ def eval_contract_task(item):
 
 def run_evaluation():
     print("🚀 Starting PACT Evaluation Pipeline...")
+    # Experiments share the Gemini quota with the API: they go last (PACT_LLM_QUOTA_SHARED=on to share it across processes)
+    set_default_priority(EVAL)
     
     # Check for API Keys
     if not os.getenv("GOOGLE_API_KEY"):
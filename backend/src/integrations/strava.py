@@ -0,0 +1,316 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+import requests
+from requests.adapters import HTTPAdapter
+from src.core.activity_streams import ActivityStreams
+from src.core.rate_limit import SharedRateLimiter, RateLimitExceeded, parse_limits
+
+DEFAULT_BASE_URL = "https://www.strava.com/api/v3"
+DEFAULT_TOKEN_URL = "https://www.strava.com/oauth/token"
+DEFAULT_LIMITS = "100/900,1000/86400" # Strava: 100 requests per 15 minutes, 1000 per day
+DEFAULT_SUMMARY_TTL_SEC = 300
+DEFAULT_SUMMARY_ENTRIES = 5000
+DEFAULT_TIMEOUT_SEC = 10.0
+DEFAULT_POOL_SIZE = 16
+DEFAULT_LIMIT_WAIT_SEC = 5.0
+DEFAULT_CLIENTS = 1000
+REFRESH_MARGIN_SEC = 300 # Refresh an access token this long before it expires
+STREAM_KEYS = "time,distance,heartrate,velocity_smooth,cadence,altitude,moving"
+
+class StravaNotLinked(LookupError):
+    """The user has no Strava authorization on record."""
+
+def _shared_limiter() -> SharedRateLimiter:
+    # Strava's limits are per application: one bucket for every athlete and worker on the host
+    return SharedRateLimiter("strava", parse_limits(os.getenv("STRAVA_RATE_LIMITS", DEFAULT_LIMITS)))
+
+class StravaClient:
+    """
+    Strava API v3 client for one athlete, with the same interface as StravaMockClient
+    (get_activity, get_activity_streams, list_activities).
+
+    - The access token is the athlete's own: a fixed `access_token`, or `token_provider(force_refresh)`
+      (see StravaAccounts), asked again with force_refresh=True after a 401.
+    - Keep-alive connections from one pooled requests.Session.
+    - Every request takes a token from a SharedRateLimiter (all workers on the host),
+      which is also synced from Strava's X-RateLimit-Limit / X-RateLimit-Usage headers.
+      A 429 raises RateLimitExceeded with the time until the 15-minute window rolls over.
+    - Activity summaries are cached for STRAVA_SUMMARY_TTL_SEC, then revalidated with
+      If-None-Match (a 304 only refreshes the timestamp).
+    - Streams are fetched as asked; callers cache them (VerifyAgent's StreamCache).
+
+    Config (env): STRAVA_API_BASE_URL, STRAVA_RATE_LIMITS ("100/900,1000/86400"),
+    STRAVA_SUMMARY_TTL_SEC, STRAVA_RATE_LIMIT_WAIT_SEC
+    """
+
+    def __init__(self, access_token: str = None, base_url: str = None, session: requests.Session = None,
+                 limiter: SharedRateLimiter = None, summary_ttl_sec: float = None,
+                 summary_entries: int = DEFAULT_SUMMARY_ENTRIES, timeout: float = DEFAULT_TIMEOUT_SEC,
+                 token_provider: Callable[[bool], str] = None):
+        self.token_provider = token_provider or (lambda force_refresh=False: access_token)
+        self.refreshable = token_provider is not None
+        self.base_url = (base_url or os.getenv("STRAVA_API_BASE_URL", DEFAULT_BASE_URL)).rstrip("/")
+        self.session = session or self._pooled_session()
+        self.limiter = limiter or _shared_limiter()
+        self.summary_ttl_sec = summary_ttl_sec if summary_ttl_sec is not None else float(os.getenv("STRAVA_SUMMARY_TTL_SEC", DEFAULT_SUMMARY_TTL_SEC))
+        self.summary_entries = summary_entries
+        self.limit_wait_sec = float(os.getenv("STRAVA_RATE_LIMIT_WAIT_SEC", DEFAULT_LIMIT_WAIT_SEC))
+        self.timeout = timeout
+
+        self._summaries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.not_modified = 0
+        self.summary_hits = 0
+        self.throttled = 0
+
+    @staticmethod
+    def _pooled_session() -> requests.Session:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=DEFAULT_POOL_SIZE, pool_maxsize=DEFAULT_POOL_SIZE)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    # --- HTTP ---
+
+    def _get(self, path: str, params: Dict[str, Any] = None, etag: str = None) -> requests.Response:
+        response = self._send(path, params, etag, force_refresh=False)
+        if response.status_code == 401 and self.refreshable:
+            # Revoked or expired early: one retry with a freshly refreshed token
+            response = self._send(path, params, etag, force_refresh=True)
+
+        if response.status_code == 429:
+            with self._lock:
+                self.throttled += 1
+            now = time.time()
+            raise RateLimitExceeded("Strava rate limit exceeded (429)", 900 - now % 900)
+        if response.status_code != 304:
+            response.raise_for_status()
+        return response
+
+    def _send(self, path: str, params: Optional[Dict[str, Any]], etag: Optional[str], force_refresh: bool) -> requests.Response:
+        headers = {"Authorization": f"Bearer {self.token_provider(force_refresh)}"}
+        if etag:
+            headers["If-None-Match"] = etag
+        self.limiter.acquire(timeout=self.limit_wait_sec)
+        response = self.session.get(f"{self.base_url}{path}", params=params, headers=headers, timeout=self.timeout)
+        with self._lock:
+            self.requests += 1
+        self._sync_limits(response)
+        return response
+
+    def _sync_limits(self, response: requests.Response):
+        limit = response.headers.get("X-RateLimit-Limit")
+        usage = response.headers.get("X-RateLimit-Usage")
+        if not limit or not usage:
+            return
+        try:
+            remaining = [int(l) - int(u) for l, u in zip(limit.split(","), usage.split(","))]
+        except ValueError:
+            return
+        self.limiter.sync(remaining)
+
+    # --- Mock-compatible interface ---
+
+    def get_activity(self, activity_id: str) -> Dict[str, Any]:
+        key = str(activity_id)
+        with self._lock:
+            entry = self._summaries.get(key)
+            if entry and time.monotonic() - entry["fetched_at"] < self.summary_ttl_sec:
+                self._summaries.move_to_end(key)
+                self.summary_hits += 1
+                return entry["data"]
+
+        response = self._get(f"/activities/{key}", etag=entry["etag"] if entry else None)
+        with self._lock:
+            if response.status_code == 304 and entry:
+                self.not_modified += 1
+                data = entry["data"]
+            else:
+                data = response.json()
+            self._summaries[key] = {"data": data, "etag": response.headers.get("ETag") or (entry or {}).get("etag"),
+                                    "fetched_at": time.monotonic()}
+            self._summaries.move_to_end(key)
+            while len(self._summaries) > self.summary_entries:
+                self._summaries.popitem(last=False)
+        return data
+
+    def get_activity_streams(self, activity_id: str) -> ActivityStreams:
+        key = str(activity_id)
+        return ActivityStreams.from_strava(
+            self._get(f"/activities/{key}/streams", params={"keys": STREAM_KEYS, "key_by_type": "true"}).json(), key
+        )
+
+    def list_activities(self, after: Optional[int] = None, before: Optional[int] = None, per_page: int = 200,
+                        max_pages: int = 50) -> List[Dict[str, Any]]:
+        """The athlete's activity summaries (GET /athlete/activities), all pages."""
+        activities = []
+        for page in range(1, max_pages + 1):
+            params = {"per_page": per_page, "page": page}
+            if after is not None:
+                params["after"] = int(after)
+            if before is not None:
+                params["before"] = int(before)
+            batch = self._get("/athlete/activities", params=params).json()
+            activities.extend(batch)
+            if len(batch) < per_page:
+                break
+        return activities
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "summary_cache_hits": self.summary_hits,
+            "not_modified": self.not_modified,
+            "throttled": self.throttled,
+            "rate_limit": self.limiter.stats(),
+        }
+
+class StravaAccounts:
+    """
+    Per-user StravaClients. A Strava access token only reads its own athlete's activities,
+    so each user's requests carry their own OAuth token, stored on the user record:
+
+        users/{uid}.strava_auth = {access_token, refresh_token, expires_at (epoch sec)}
+        users/{uid}.strava_athlete_id = the Strava athlete id (webhook events -> user, see AutoVerifier)
+
+    Both are written by `link` when the user connects Strava (OAuth code exchange).
+
+    A token within REFRESH_MARGIN_SEC of expiry (or rejected with a 401) is refreshed
+    with the refresh token and written back; refreshes for one user are serialized, since
+    Strava rotates the refresh token. Clients are kept in an LRU; all of them share one
+    pooled session and the app-wide rate limiter.
+
+    Config (env): STRAVA_CLIENT_ID, STRAVA_CLIENT_SECRET, STRAVA_OAUTH_URL, PACT_STRAVA_CLIENTS
+    """
+
+    def __init__(self, db, client_id: str = None, client_secret: str = None, base_url: str = None, token_url: str = None,
+                 session: requests.Session = None, limiter: SharedRateLimiter = None, max_clients: int = None,
+                 clock: Callable[[], float] = time.time, **client_kwargs):
+        self.db = db
+        self.client_id = client_id or os.getenv("STRAVA_CLIENT_ID")
+        self.client_secret = client_secret or os.getenv("STRAVA_CLIENT_SECRET")
+        self.base_url = base_url
+        self.token_url = token_url or os.getenv("STRAVA_OAUTH_URL", DEFAULT_TOKEN_URL)
+        self.session = session or StravaClient._pooled_session()
+        self.limiter = limiter or _shared_limiter()
+        self.max_clients = max_clients or int(os.getenv("PACT_STRAVA_CLIENTS", DEFAULT_CLIENTS))
+        self.clock = clock
+        self.client_kwargs = client_kwargs
+
+        self._clients: "OrderedDict[str, StravaClient]" = OrderedDict()
+        self._auth: Dict[str, Dict[str, Any]] = {}
+        self._refresh_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self.refreshes = 0
+
+    @staticmethod
+    def configured() -> bool:
+        return bool(os.getenv("STRAVA_CLIENT_ID") and os.getenv("STRAVA_CLIENT_SECRET"))
+
+    def client(self, user_id: str) -> StravaClient:
+        with self._lock:
+            client = self._clients.get(user_id)
+            if client is not None:
+                self._clients.move_to_end(user_id)
+                return client
+            client = self._clients[user_id] = StravaClient(
+                base_url=self.base_url, session=self.session, limiter=self.limiter,
+                token_provider=lambda force_refresh=False: self.access_token(user_id, force_refresh),
+                **self.client_kwargs
+            )
+            while len(self._clients) > self.max_clients:
+                evicted, _ = self._clients.popitem(last=False)
+                self._auth.pop(evicted, None)
+            return client
+
+    def access_token(self, user_id: str, force_refresh: bool = False) -> str:
+        with self._lock:
+            auth = self._auth.get(user_id)
+            lock = self._refresh_locks.setdefault(user_id, threading.Lock())
+        if auth and not force_refresh and not self._expiring(auth):
+            return auth["access_token"]
+
+        with lock:
+            # Re-read: another request (or worker process) may have refreshed it meanwhile
+            stored = self._load(user_id)
+            if force_refresh and auth and stored["access_token"] != auth["access_token"]:
+                force_refresh = False
+            if force_refresh or self._expiring(stored):
+                stored = self._refresh(user_id, stored)
+            with self._lock:
+                self._auth[user_id] = stored
+            return stored["access_token"]
+
+    def link(self, user_id: str, code: str) -> str:
+        """
+        Exchanges the authorization `code` from Strava's OAuth redirect for the user's tokens
+        and stores them together with the athlete id. Returns the athlete id.
+        """
+        if not self.client_id or not self.client_secret:
+            raise StravaNotLinked("Strava OAuth client is not configured")
+        response = self.session.post(self.token_url, data={
+            "client_id": self.client_id,
+            "client_secret": self.client_secret,
+            "grant_type": "authorization_code",
+            "code": code,
+        }, timeout=DEFAULT_TIMEOUT_SEC)
+        response.raise_for_status()
+        body = response.json()
+        auth = {
+            "access_token": body["access_token"],
+            "refresh_token": body["refresh_token"],
+            "expires_at": body["expires_at"],
+        }
+        athlete_id = str(body["athlete"]["id"])
+        self._user_ref(user_id).set({'strava_auth': auth, 'strava_athlete_id': athlete_id}, merge=True)
+        with self._lock:
+            self._auth[user_id] = auth
+        return athlete_id
+
+    def _expiring(self, auth: Dict[str, Any]) -> bool:
+        return float(auth.get("expires_at") or 0) - self.clock() < REFRESH_MARGIN_SEC
+
+    def _user_ref(self, user_id: str):
+        return self.db.collection('users').document(user_id)
+
+    def _load(self, user_id: str) -> Dict[str, Any]:
+        auth = self._user_ref(user_id).get().get('strava_auth') if self.db else None
+        if not auth or not auth.get("access_token"):
+            raise StravaNotLinked(f"User {user_id} has not connected Strava")
+        return auth
+
+    def _refresh(self, user_id: str, auth: Dict[str, Any]) -> Dict[str, Any]:
+        if not auth.get("refresh_token") or not self.client_id or not self.client_secret:
+            raise StravaNotLinked(f"Strava authorization for user {user_id} expired and can't be refreshed")
+        response = self.session.post(self.token_url, data={
+            "client_id": self.client_id,
+            "client_secret": self.client_secret,
+            "grant_type": "refresh_token",
+            "refresh_token": auth["refresh_token"],
+        }, timeout=DEFAULT_TIMEOUT_SEC)
+        response.raise_for_status()
+        body = response.json()
+        refreshed = {
+            "access_token": body["access_token"],
+            "refresh_token": body.get("refresh_token", auth["refresh_token"]),
+            "expires_at": body["expires_at"],
+        }
+        self._user_ref(user_id).update({'strava_auth': refreshed})
+        with self._lock:
+            self.refreshes += 1
+        return refreshed
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            clients = list(self._clients.values())
+        totals = {"requests": 0, "summary_cache_hits": 0, "not_modified": 0, "throttled": 0}
+        for client in clients:
+            stats = client.stats()
+            for name in totals:
+                totals[name] += stats[name]
+        return dict(totals, clients=len(clients), token_refreshes=self.refreshes, rate_limit=self.limiter.stats())
@@ -1,5 +1,7 @@
 from datetime import datetime, timedelta, timezone
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
+import numpy as np
+from src.core.activity_streams import ActivityStreams
 
 class StravaMockClient:
     """
@@ -77,16 +79,31 @@ class StravaMockClient:
 
         return base_activity
 
-    def get_activity_streams(self, activity_id: str) -> List[Dict[str, Any]]:
+    def list_activities(self, after: Optional[int] = None, before: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Simulates the athlete's activity list (GET /athlete/activities), one summary
+        per mock scenario above; after/before are epoch bounds on start_date, as on Strava.
+        """
+        activities = []
+        for activity_id in ("run_valid_outdoor", "run_short", "run_late", "treadmill_valid",
+                            "treadmill_cheat", "treadmill_no_hr", "run_superhuman"):
+            activity = self.get_activity(activity_id)
+            started = datetime.fromisoformat(activity["start_date"].replace("Z", "+00:00")).timestamp()
+            if (after is None or started > after) and (before is None or started < before):
+                activities.append(activity)
+        return activities
+
+    def get_activity_streams(self, activity_id: str) -> ActivityStreams:
         """
         Mock Heart Rate Stream.
-        Returns list of points {time, heartrate}
+        Returns columnar ActivityStreams (time, heartrate)
         """
+        time = np.arange(0, 1500, 10)
         if activity_id == "treadmill_cheat":
             # Flat line
-            return [{"heartrate": 80, "time": i} for i in range(0, 1500, 10)]
+            return ActivityStreams.from_columns({"time": time, "heartrate": np.full(len(time), 80)}, activity_id)
         elif activity_id == "treadmill_valid":
             # Normal variance
-            import random
-            return [{"heartrate": 140 + random.randint(-10, 20), "time": i} for i in range(0, 1500, 10)]
-        return []
+            heartrate = 140 + np.random.randint(-10, 21, len(time))
+            return ActivityStreams.from_columns({"time": time, "heartrate": heartrate}, activity_id)
+        return ActivityStreams({}, activity_id)
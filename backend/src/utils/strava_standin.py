@@ -0,0 +1,242 @@
+import re
+import json
+import time
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Set, Tuple
+from urllib.parse import urlparse, parse_qs
+import numpy as np
+from src.utils.strava_mock import StravaMockClient
+
+class StravaStandIn:
+    """
+    Local HTTP stand-in for the Strava API v3 (tests and benchmarks), backed by
+    StravaMockClient data:
+    - GET /api/v3/activities/{id} (with ETag / If-None-Match -> 304)
+    - GET /api/v3/activities/{id}/streams?key_by_type=true
+    - GET /api/v3/athlete/activities?page=&per_page=
+    - POST /oauth/token (grant_type=refresh_token rotates the refresh token;
+      grant_type=authorization_code exchanges one of `codes` {code: athlete id}, once)
+    With `access_tokens` given, only those bearer tokens (plus ones it issued) are accepted;
+    anything else gets a 401. Enforces Strava-style fixed windows (per 15 minutes and per day) and reports them in
+    X-RateLimit-Limit / X-RateLimit-Usage, answering 429 when exceeded. Speaks HTTP/1.1
+    keep-alive and counts TCP connections, so connection pooling is observable.
+    """
+
+    def __init__(self, limits: Tuple[int, int] = (100, 1000), latency_ms: float = 0.0, activities: int = 50,
+                 stream_points: int = 3600, access_tokens: Optional[Set[str]] = None, refresh_tokens: Optional[Set[str]] = None,
+                 codes: Optional[Dict[str, int]] = None):
+        self.limits = limits
+        self.latency_ms = latency_ms
+        self.activities = activities
+        self.stream_points = stream_points
+        self.mock = StravaMockClient()
+        self.access_tokens = set(access_tokens) if access_tokens is not None else None
+        self.refresh_tokens = set(refresh_tokens or ())
+        self.codes = dict(codes or {})
+        self._issued = 0
+        self.requests = 0
+        self.connections = 0
+        self.not_modified = 0
+        self.throttled = 0
+        self.by_path: Dict[str, int] = {}
+        self._usage = [0, 0]
+        self._windows = [None, None]
+        self._lock = threading.Lock()
+        self._summaries: Dict[str, bytes] = {}
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    # --- Data ---
+
+    def summary(self, activity_id: str) -> bytes:
+        # Frozen on first request so the ETag is stable (the mock stamps "now" into start_date)
+        with self._lock:
+            if activity_id not in self._summaries:
+                self._summaries[activity_id] = json.dumps(self.mock.get_activity(activity_id)).encode()
+            return self._summaries[activity_id]
+
+    def update_activity(self, activity_id: str, **fields):
+        """Simulates an edit on Strava (changes the body and so the ETag)."""
+        data = json.loads(self.summary(activity_id))
+        data.update(fields)
+        with self._lock:
+            self._summaries[activity_id] = json.dumps(data).encode()
+
+    def streams(self, activity_id: str) -> bytes:
+        streams = self.mock.get_activity_streams(activity_id)
+        if len(streams):
+            columns = {name: streams[name].tolist() for name in streams.channels}
+        else:
+            rng = np.random.default_rng(abs(hash(activity_id)) % (2 ** 32))
+            time_s = np.arange(self.stream_points)
+            columns = {
+                "time": time_s.tolist(),
+                "heartrate": (140 + 10 * np.sin(time_s / 300) + rng.normal(0, 3, len(time_s))).round(1).tolist(),
+                "velocity_smooth": (3.2 + rng.normal(0, 0.2, len(time_s))).round(2).tolist(),
+                "distance": np.cumsum(np.full(len(time_s), 3.2)).round(1).tolist(),
+            }
+        return json.dumps({name: {"data": data, "series_type": "time", "original_size": len(data), "resolution": "high"}
+                           for name, data in columns.items()}).encode()
+
+    def activity_list(self, page: int, per_page: int) -> bytes:
+        start = (page - 1) * per_page
+        rows = []
+        for i in range(start, min(start + per_page, self.activities)):
+            row = json.loads(self.summary(f"standin_{i}"))
+            row["id"] = f"standin_{i}"
+            rows.append(row)
+        return json.dumps(rows).encode()
+
+    # --- OAuth ---
+
+    def authorized(self, header: str) -> bool:
+        if not header.startswith("Bearer "):
+            return False
+        with self._lock:
+            return self.access_tokens is None or header[len("Bearer "):] in self.access_tokens
+
+    def revoke(self, access_token: str):
+        with self._lock:
+            if self.access_tokens is not None:
+                self.access_tokens.discard(access_token)
+
+    def refresh(self, refresh_token: str) -> Optional[bytes]:
+        with self._lock:
+            if refresh_token not in self.refresh_tokens:
+                return None
+            self.refresh_tokens.discard(refresh_token)
+            return json.dumps(self._issue()).encode()
+
+    def authorize(self, code: str) -> Optional[bytes]:
+        with self._lock:
+            athlete_id = self.codes.pop(code, None)
+            if athlete_id is None:
+                return None
+            return json.dumps(dict(self._issue(), athlete={"id": athlete_id})).encode()
+
+    def _issue(self) -> Dict[str, Any]:
+        # Caller holds _lock
+        self._issued += 1
+        access, rotated = f"access_{self._issued}", f"refresh_{self._issued}"
+        self.refresh_tokens.add(rotated)
+        if self.access_tokens is not None:
+            self.access_tokens.add(access)
+        self.by_path["oauth_token"] = self.by_path.get("oauth_token", 0) + 1
+        return {"token_type": "Bearer", "access_token": access, "refresh_token": rotated,
+                "expires_at": int(time.time()) + 6 * 3600, "expires_in": 6 * 3600}
+
+    # --- Rate limits ---
+
+    def _take(self) -> bool:
+        now = time.time()
+        windows = [int(now // 900), int(now // 86400)]
+        with self._lock:
+            for i, window in enumerate(windows):
+                if self._windows[i] != window:
+                    self._windows[i] = window
+                    self._usage[i] = 0
+            self.requests += 1
+            if any(used >= limit for used, limit in zip(self._usage, self.limits)):
+                self.throttled += 1
+                return False
+            self._usage = [used + 1 for used in self._usage]
+            return True
+
+    def rate_headers(self) -> Dict[str, str]:
+        with self._lock:
+            return {"X-RateLimit-Limit": ",".join(map(str, self.limits)), "X-RateLimit-Usage": ",".join(map(str, self._usage))}
+
+    # --- Server ---
+
+    def start(self) -> str:
+        """Starts serving on an ephemeral localhost port; returns the API base URL."""
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                with standin._lock:
+                    standin.connections += 1
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status: int, body: bytes = b"", headers: Dict[str, str] = None):
+                self.send_response(status)
+                for name, value in dict(standin.rate_headers(), **(headers or {})).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                query = parse_qs(url.query)
+                if not standin.authorized(self.headers.get("Authorization", "")):
+                    return self._send(401, b'{"message": "Authorization Error"}')
+                if not standin._take():
+                    return self._send(429, b'{"message": "Rate Limit Exceeded"}')
+                if standin.latency_ms:
+                    time.sleep(standin.latency_ms / 1000.0)
+
+                if m := re.fullmatch(r"/api/v3/activities/([\w-]+)/streams", url.path):
+                    route, body = "streams", standin.streams(m.group(1))
+                elif m := re.fullmatch(r"/api/v3/activities/([\w-]+)", url.path):
+                    route, body = "activity", standin.summary(m.group(1))
+                    etag = '"' + hashlib.sha256(body).hexdigest()[:16] + '"'
+                    if self.headers.get("If-None-Match") == etag:
+                        with standin._lock:
+                            standin.not_modified += 1
+                            standin.by_path["activity_304"] = standin.by_path.get("activity_304", 0) + 1
+                        return self._send(304, headers={"ETag": etag})
+                    with standin._lock:
+                        standin.by_path[route] = standin.by_path.get(route, 0) + 1
+                    return self._send(200, body, {"ETag": etag})
+                elif url.path == "/api/v3/athlete/activities":
+                    route = "athlete_activities"
+                    body = standin.activity_list(int(query.get("page", ["1"])[0]), int(query.get("per_page", ["30"])[0]))
+                else:
+                    return self._send(404, b'{"message": "Record Not Found"}')
+                with standin._lock:
+                    standin.by_path[route] = standin.by_path.get(route, 0) + 1
+                self._send(200, body)
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0)).decode()
+                form = {k: v[0] for k, v in parse_qs(body).items()}
+                grant = form.get("grant_type")
+                if urlparse(self.path).path != "/oauth/token" or grant not in ("refresh_token", "authorization_code"):
+                    return self._send(404, b'{"message": "Record Not Found"}')
+                field = "refresh_token" if grant == "refresh_token" else "code"
+                issued = standin.refresh(form.get(field, "")) if grant == "refresh_token" else standin.authorize(form.get(field, ""))
+                if issued is None:
+                    return self._send(400, json.dumps({"message": "Bad Request", "errors": [{"field": field, "code": "invalid"}]}).encode())
+                self._send(200, issued)
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="strava-standin", daemon=True).start()
+        self.token_url = f"http://127.0.0.1:{self._server.server_address[1]}/oauth/token"
+        return f"http://127.0.0.1:{self._server.server_address[1]}/api/v3"
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "StravaStandIn":
+        self.base_url = self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"requests": self.requests, "connections": self.connections, "not_modified": self.not_modified,
+                    "throttled": self.throttled, "by_path": dict(self.by_path), "usage": list(self._usage)}
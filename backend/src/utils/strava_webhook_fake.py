@@ -0,0 +1,67 @@
+import random
+import time
+from typing import Any, Dict, Iterator
+
+class StravaWebhookFake:
+    """
+    Local stand-in for Strava's push subscription: generates webhook event payloads
+    shaped like the real ones (object_type, object_id, aspect_type, owner_id,
+    subscription_id, event_time, updates), including the traffic patterns the
+    ingestion pipeline has to absorb:
+    - an activity upload followed by a few quick edits (title, type, privacy),
+    - redeliveries of the same event (Strava retries when it doesn't see a 200 fast enough),
+    - deletes, and the occasional athlete deauthorization.
+    Deterministic for a given seed.
+    """
+
+    def __init__(self, athletes: int = 5_000, seed: int = 1, subscription_id: int = 1,
+                 edit_rate: float = 0.6, retry_rate: float = 0.05, delete_rate: float = 0.02, deauth_rate: float = 0.001):
+        self.athletes = athletes
+        self.subscription_id = subscription_id
+        self.edit_rate = edit_rate
+        self.retry_rate = retry_rate
+        self.delete_rate = delete_rate
+        self.deauth_rate = deauth_rate
+        self._rng = random.Random(seed)
+        self._next_activity = 10_000_000_000
+
+    def _event(self, object_type: str, object_id: int, aspect: str, owner_id: int, event_time: int, updates=None) -> Dict[str, Any]:
+        return {
+            "object_type": object_type,
+            "object_id": object_id,
+            "aspect_type": aspect,
+            "owner_id": owner_id,
+            "subscription_id": self.subscription_id,
+            "event_time": event_time,
+            "updates": updates or {},
+        }
+
+    def events(self, count: int, start_time: int = None) -> Iterator[Dict[str, Any]]:
+        """Yields `count` events in delivery order."""
+        rng = self._rng
+        clock = start_time or int(time.time())
+        emitted = 0
+        while emitted < count:
+            owner = rng.randrange(1, self.athletes + 1)
+            clock += rng.randrange(0, 2)
+
+            if rng.random() < self.deauth_rate:
+                burst = [self._event("athlete", owner, "update", owner, clock, {"authorized": "false"})]
+            else:
+                self._next_activity += 1
+                activity = self._next_activity
+                burst = [self._event("activity", activity, "create", owner, clock)]
+                edit_time = clock
+                while rng.random() < self.edit_rate and len(burst) < 4:
+                    edit_time += rng.randrange(1, 30)
+                    burst.append(self._event("activity", activity, "update", owner, edit_time,
+                                             rng.choice([{"title": "Morning Run"}, {"type": "Run"}, {"private": "false"}])))
+                if rng.random() < self.delete_rate:
+                    burst.append(self._event("activity", activity, "delete", owner, edit_time + 60))
+
+            for event in burst:
+                for _ in range(2 if rng.random() < self.retry_rate else 1):
+                    yield event
+                    emitted += 1
+                    if emitted >= count:
+                        return
@@ -0,0 +1,297 @@
+"""
+Minimal in-memory stand-in for the Firestore client surface used by the backend
+(collections, collection groups, documents, where/order_by/limit/start_after queries,
+Increment, batches, transactions).
+"""
+import datetime
+import itertools
+from firebase_admin import firestore
+
+_ids = itertools.count(1)
+
+def _resolve(value, current):
+    if isinstance(value, firestore.Increment):
+        return (current or 0) + value.value
+    if value is firestore.SERVER_TIMESTAMP:
+        return datetime.datetime.now(datetime.timezone.utc)
+    return value
+
+def _merge(doc, data):
+    for key, value in data.items():
+        if isinstance(value, dict) and isinstance(doc.get(key), dict):
+            doc[key] = dict(doc[key])
+            _merge(doc[key], value)
+        elif isinstance(value, dict):
+            doc[key] = {}
+            _merge(doc[key], value)
+        else:
+            doc[key] = _resolve(value, doc.get(key))
+
+def _get_path(data, path):
+    for part in path.split('.'):
+        if not isinstance(data, dict) or part not in data:
+            return None
+        data = data[part]
+    return data
+
+def _set_path(data, path, value):
+    parts = path.split('.')
+    for part in parts[:-1]:
+        data = data.setdefault(part, {})
+    data[parts[-1]] = _resolve(value, data.get(parts[-1]))
+
+class FakeSnapshot:
+    def __init__(self, ref, data):
+        self.reference = ref
+        self.id = ref.id
+        self._data = data
+
+    @property
+    def exists(self):
+        return self._data is not None
+
+    def to_dict(self):
+        return dict(self._data) if self._data is not None else None
+
+    def get(self, path):
+        return _get_path(self._data, path)
+
+class FakeDocument:
+    def __init__(self, db, collection, doc_id):
+        self._db = db
+        self._collection = collection
+        self.id = doc_id
+
+    @property
+    def _store(self):
+        return self._db._data.setdefault(self._collection, {})
+
+    def collection(self, name):
+        return FakeCollection(self._db, f"{self._collection}/{self.id}/{name}")
+
+    @property
+    def parent(self):
+        return FakeCollection(self._db, self._collection)
+
+    def get(self, transaction=None):
+        data = self._store.get(self.id)
+        return FakeSnapshot(self, dict(data) if data is not None else None)
+
+    def set(self, data, merge=False):
+        doc = dict(self._store.get(self.id) or {}) if merge else {}
+        _merge(doc, data)
+        self._store[self.id] = doc
+        self._db.writes += 1
+
+    def update(self, data):
+        if self.id not in self._store:
+            raise KeyError(f"No document to update: {self._collection}/{self.id}")
+        doc = self._store[self.id]
+        for path, value in data.items():
+            _set_path(doc, path, value)
+        self._db.writes += 1
+
+class FakeQuery:
+    def __init__(self, db, collection, filters=(), orders=(), limit_n=None, cursor=None):
+        self._db = db
+        self._collection = collection
+        self._filters = list(filters)
+        self._orders = list(orders)
+        self._limit = limit_n
+        self._cursor = cursor
+
+    def _copy(self, **kwargs):
+        args = dict(filters=self._filters, orders=self._orders, limit_n=self._limit, cursor=self._cursor)
+        args.update(kwargs)
+        return FakeQuery(self._db, self._collection, **args)
+
+    def where(self, field, op, value):
+        return self._copy(filters=self._filters + [(field, op, value)])
+
+    def order_by(self, field, direction="ASCENDING"):
+        return self._copy(orders=self._orders + [(field, direction)])
+
+    def limit(self, n):
+        return self._copy(limit_n=n)
+
+    def start_after(self, cursor):
+        return self._copy(cursor=cursor)
+
+    def _matches(self, data):
+        for field, op, value in self._filters:
+            actual = _get_path(data, field)
+            if op == '==' and actual != value:
+                return False
+            if op in ('<', '>', '<=', '>=') and actual is None:
+                return False
+            if op == '<' and not actual < value:
+                return False
+            if op == '>' and not actual > value:
+                return False
+            if op == '<=' and not actual <= value:
+                return False
+            if op == '>=' and not actual >= value:
+                return False
+            if op == 'in' and actual not in value:
+                return False
+        return True
+
+    def _sort_key(self, doc_id, data):
+        return tuple(doc_id if f == '__name__' else _get_path(data, f) for f, _ in self._orders) + (doc_id,)
+
+    def _stores(self):
+        return [(self._collection, self._db._data.get(self._collection, {}))]
+
+    def stream(self):
+        self._db.queries += 1
+        rows = [(doc_id, data, path) for path, store in self._stores() for doc_id, data in store.items() if self._matches(data)]
+        descending = any(d == "DESCENDING" or d == firestore.Query.DESCENDING for _, d in self._orders)
+        rows.sort(key=lambda r: self._sort_key(r[0], r[1]), reverse=descending)
+
+        if self._cursor is not None:
+            if isinstance(self._cursor, FakeSnapshot):
+                cursor_key = self._sort_key(self._cursor.id, self._cursor._data)
+            else:
+                cursor_key = tuple(self._cursor.get(f) for f, _ in self._orders)
+            def after(row):
+                key = self._sort_key(row[0], row[1])[:len(cursor_key)]
+                return key < cursor_key if descending else key > cursor_key
+            rows = [r for r in rows if after(r)]
+
+        if self._limit is not None:
+            rows = rows[:self._limit]
+        for doc_id, data, path in rows:
+            self._db.reads += 1
+            yield FakeSnapshot(FakeDocument(self._db, path, doc_id), dict(data))
+
+    def get(self):
+        return list(self.stream())
+
+class FakeCollectionGroup(FakeQuery):
+    """Every collection named `name`, at any depth (db.collection_group)."""
+
+    def _copy(self, **kwargs):
+        query = super()._copy(**kwargs)
+        query.__class__ = FakeCollectionGroup
+        return query
+
+    def _stores(self):
+        return [(path, store) for path, store in self._db._data.items() if path.split('/')[-1] == self._collection]
+
+class FakeCollection(FakeQuery):
+    def __init__(self, db, name):
+        super().__init__(db, name)
+
+    @property
+    def id(self):
+        return self._collection.split('/')[-1]
+
+    @property
+    def parent(self):
+        parts = self._collection.split('/')
+        return FakeDocument(self._db, '/'.join(parts[:-2]), parts[-2]) if len(parts) > 1 else None
+
+    def document(self, doc_id=None):
+        return FakeDocument(self._db, self._collection, doc_id or f"doc{next(_ids)}")
+
+    def add(self, data):
+        ref = self.document()
+        ref.set(data)
+        return None, ref
+
+class FakeBatch:
+    def __init__(self, db):
+        self._db = db
+        self._ops = []
+
+    def set(self, ref, data, merge=False):
+        self._ops.append(lambda: ref.set(data, merge=merge))
+
+    def update(self, ref, data):
+        self._ops.append(lambda: ref.update(data))
+
+    def __len__(self):
+        return len(self._ops)
+
+    def commit(self):
+        for op in self._ops:
+            op()
+        self._db.batch_commits += 1
+        self._ops = []
+
+class FakeTransaction(FakeBatch):
+    """Buffers writes until commit; enough of the Transaction surface for @firestore.transactional."""
+
+    _max_attempts = 1
+    _read_only = False
+    _id = b"fake-txn"
+
+    def _clean_up(self):
+        self._ops = []
+
+    def _begin(self, retry_id=None):
+        pass
+
+    def _commit(self):
+        self.commit()
+        self._db.transactions += 1
+
+    def _rollback(self):
+        self._ops = []
+
+class FakeFirestore:
+    def __init__(self):
+        self._data = {}
+        self.reads = 0
+        self.writes = 0
+        self.queries = 0
+        self.batch_commits = 0
+        self.transactions = 0
+
+    def collection(self, name):
+        return FakeCollection(self, name)
+
+    def collection_group(self, name):
+        return FakeCollectionGroup(self, name)
+
+    def batch(self):
+        return FakeBatch(self)
+
+    def transaction(self):
+        return FakeTransaction(self)
+
+class FakeBlob:
+    def __init__(self, bucket, name):
+        self._bucket = bucket
+        self.name = name
+        self.chunk_size = None
+
+    @property
+    def public_url(self):
+        return f"https://storage.example/{self.name}"
+
+    def exists(self):
+        return self.name in self._bucket.objects
+
+    def upload_from_file(self, fileobj, size=None, content_type=None):
+        data = bytearray()
+        while True:
+            chunk = fileobj.read(self.chunk_size or 1024 * 1024)
+            if not chunk:
+                break
+            data.extend(chunk)
+        self._bucket.objects[self.name] = (bytes(data), content_type)
+        self._bucket.uploads += 1
+
+    def make_public(self):
+        pass
+
+class FakeBucket:
+    """In-memory stand-in for a Cloud Storage bucket (blob, exists, upload_from_file)."""
+
+    def __init__(self):
+        self.objects = {}
+        self.uploads = 0
+
+    def blob(self, name):
+        return FakeBlob(self, name)
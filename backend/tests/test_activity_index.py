@@ -0,0 +1,163 @@
+import time
+import numpy as np
+from datetime import datetime, timedelta, timezone
+from src.agents.verify import VerifyAgent
+from src.core.activity_index import ActivityIndex
+from src.core.schemas import GoalContract, Penalty, ConsequenceType, VerificationStatus, ActivityType
+
+T0 = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+def contract(km=5.0, deadline=T0 + timedelta(days=7), min_hr=None, created_at=None, types=None):
+    return GoalContract(
+        target_distance_km=km,
+        allowed_activity_types=types or [ActivityType.RUN, ActivityType.TREADMILL],
+        deadline_utc=deadline,
+        min_heart_rate_avg=min_hr,
+        created_at=created_at,
+        penalty=Penalty(type=ConsequenceType.DONATION, amount_usd=10)
+    )
+
+def activity(id, day, km=5.0, minutes=25, **extra):
+    row = {"id": id, "type": "Run", "start_date": (T0 + timedelta(days=day)).isoformat(), "distance": km * 1000, "elapsed_time": minutes * 60,
+           "has_heartrate": True, "average_heartrate": 145.0, "manual": False}
+    row.update(extra)
+    return row
+
+def test_window_is_inclusive_and_sorted():
+    index = ActivityIndex([activity("c", 3), activity("a", 1), activity("b", 2)])
+    assert index.ids == ["a", "b", "c"]
+    window = index.window(T0 + timedelta(days=1), T0 + timedelta(days=2))
+    assert index.ids[window] == ["a", "b"]
+    assert index.ids[index.window(T0 + timedelta(days=10), T0 + timedelta(days=11))] == []
+
+def test_rules_and_best_match():
+    index = ActivityIndex([
+        activity("short", 1, km=4.0),
+        activity("ok", 2),
+        activity("longer", 3, km=8.0, minutes=45),
+        activity("superhuman", 4, km=10.0, minutes=20),
+        activity("manual", 5, km=12.0, minutes=70, manual=True),
+        activity("treadmill_no_hr", 5, km=9.0, minutes=50, trainer=True, has_heartrate=False),
+        activity("late", 9, km=20.0, minutes=120),
+    ])
+    scan = index.evaluate(contract(), T0, T0 + timedelta(days=7))
+    assert scan["candidates"] == 6
+    assert scan["qualifying"] == ["longer", "ok"]
+
+def test_treadmill_min_hr_and_closest_reasons():
+    index = ActivityIndex([
+        activity("low_hr", 1, trainer=True, average_heartrate=100.0),
+        activity("short", 2, km=4.0),
+    ])
+    scan = index.evaluate(contract(min_hr=130.0), T0, T0 + timedelta(days=7))
+    assert scan["qualifying"] == []
+    assert scan["closest"]["id"] == "low_hr"
+    assert "heart rate" in scan["closest"]["reasons"][0]
+    assert index.evaluate(contract(), T0 + timedelta(days=30), T0 + timedelta(days=31))["closest"] is None
+
+def test_scan_scales_to_10k_activities():
+    rng = np.random.default_rng(0)
+    rows = [activity(f"a{i}", float(d), km=float(k), minutes=float(k) * 6)
+            for i, (d, k) in enumerate(zip(rng.uniform(-365, 0, 10_000), rng.uniform(2, 15, 10_000)))]
+    rows.append(activity("target", 0.5, km=30.0, minutes=180))
+    index = ActivityIndex(rows)
+    start = time.perf_counter()
+    scan = index.evaluate(contract(km=25.0), T0 - timedelta(days=30), T0 + timedelta(days=1))
+    assert time.perf_counter() - start < 0.05
+    assert scan["qualifying"] == ["target"]
+
+def test_verify_without_activity_id_scans_history():
+    agent = VerifyAgent(memo=False)
+    result = agent.verify(contract(deadline=datetime.now(timezone.utc) + timedelta(days=1), min_hr=130.0))
+    assert result.status == VerificationStatus.SUCCESS
+    assert result.evidence.activity_id in ("run_valid_outdoor", "treadmill_valid")
+
+    result = agent.verify(contract(km=42.0, deadline=datetime.now(timezone.utc) + timedelta(days=1)))
+    assert result.status == VerificationStatus.FAILURE
+    assert "No qualifying activity" in result.failure_reason
+
+class CountingClient:
+    """Same activity list for everyone; counts list calls."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.list_calls = 0
+        self.windows = []
+
+    def list_activities(self, after=None, before=None):
+        self.list_calls += 1
+        self.windows.append((after, before))
+        return [row for row in self.rows
+                if (after is None or datetime.fromisoformat(row["start_date"]).timestamp() > after)
+                and (before is None or datetime.fromisoformat(row["start_date"]).timestamp() < before)]
+
+    def get_activity(self, activity_id):
+        return next(row for row in self.rows if row["id"] == activity_id)
+
+def test_history_index_is_per_user_and_window_starts_at_signing():
+    now = datetime.now(timezone.utc)
+    client = CountingClient([{"id": "before", "type": "Run", "start_date": (now - timedelta(days=2)).isoformat(), "distance": 6000.0,
+                              "elapsed_time": 1800, "has_heartrate": True, "average_heartrate": 145.0, "manual": False}])
+    agent = VerifyAgent(strava_client=client, memo=False)
+    deadline = now + timedelta(days=1)
+
+    assert agent.verify(contract(deadline=deadline), user_id="u1").status == VerificationStatus.SUCCESS # Lookback fallback
+    agent.verify(contract(deadline=deadline), user_id="u1")
+    agent.verify(contract(deadline=deadline), user_id="u2")
+    assert client.list_calls == 2 # One index per user, reused within the TTL
+
+    # The run predates the pact: it can't satisfy it
+    result = agent.verify(contract(deadline=deadline, created_at=now - timedelta(days=1)), user_id="u1")
+    assert result.status == VerificationStatus.FAILURE
+    assert "No activities between" in result.failure_reason
+
+def test_only_allowed_activity_types_count():
+    index = ActivityIndex([
+        activity("ride", 1, km=40.0, minutes=200, type="Ride"),
+        activity("walk", 2, km=6.0, minutes=70, type="Walk"),
+        activity("treadmill", 3, trainer=True),
+        activity("outdoor", 4, sport_type="TrailRun"),
+    ])
+    window = (T0, T0 + timedelta(days=7))
+    assert index.evaluate(contract(), *window)["qualifying"] == ["treadmill", "outdoor"]
+    assert index.evaluate(contract(types=[ActivityType.RUN]), *window)["qualifying"] == ["outdoor"]
+    assert index.evaluate(contract(types=[ActivityType.TREADMILL]), *window)["qualifying"] == ["treadmill"]
+    assert index.evaluate(contract(types=[ActivityType.GENERAL]), *window)["qualifying"] == ["treadmill", "outdoor"]
+
+    rides = ActivityIndex([activity("ride", 1, km=40.0, minutes=200, type="Ride")])
+    scan = rides.evaluate(contract(), *window)
+    assert scan["qualifying"] == []
+    assert scan["closest"]["reasons"] == ["Activity type Ride is not allowed"]
+
+    # A single activity is held to the same rule
+    client = CountingClient([activity("ride", 1, km=40.0, minutes=200, type="Ride")])
+    result = VerifyAgent(strava_client=client, memo=False).verify(contract(), activity_id="ride")
+    assert result.status == VerificationStatus.FAILURE
+    assert "Activity type Ride is not allowed" in result.failure_reason
+
+def test_history_index_fetches_only_the_missing_window():
+    now = datetime.now(timezone.utc)
+    rows = [{"id": f"r{d}", "type": "Run", "start_date": (now - timedelta(days=d)).isoformat(), "distance": 6000.0,
+             "elapsed_time": 1800, "has_heartrate": True, "average_heartrate": 145.0, "manual": False} for d in (1, 5, 20)]
+    client = CountingClient(rows)
+    agent = VerifyAgent(strava_client=client, memo=False)
+    deadline = now + timedelta(days=1)
+
+    signed = now - timedelta(days=3)
+    assert agent.verify(contract(deadline=deadline, created_at=signed), user_id="u1").evidence.activity_id == "r1"
+    assert client.windows == [(int(signed.timestamp()) - 1, None)] # Bounded by the signing time, not the whole history
+
+    agent.verify(contract(deadline=deadline, created_at=now - timedelta(days=2)), user_id="u1")
+    assert client.list_calls == 1 # Narrower window: served from the cached index
+
+    earlier = now - timedelta(days=10)
+    agent.verify(contract(deadline=deadline, created_at=earlier), user_id="u1")
+    assert client.windows[1] == (int(earlier.timestamp()) - 1, int(signed.timestamp())) # Only the gap
+    assert sorted(agent._indexes["u1"][0]) == ["r1", "r5"]
+
+    # Stale: only recent activities are re-read, and merged with what is cached
+    agent.index_ttl_sec = 0
+    client.rows.append(dict(rows[0], id="new", start_date=now.isoformat()))
+    agent.verify(contract(deadline=deadline, created_at=earlier), user_id="u1")
+    assert client.windows[2] == (int((now - timedelta(days=1)).timestamp()) - 86400, None)
+    assert sorted(agent._indexes["u1"][0]) == ["new", "r1", "r5"]
@@ -0,0 +1,48 @@
+import numpy as np
+from src.core.activity_streams import ActivityStreams, StreamCache
+from src.core.stream_analytics import analyze_streams
+
+def sample_streams(n=1000):
+    t = np.arange(n)
+    return ActivityStreams.from_columns({
+        "time": t,
+        "heartrate": 140 + 10 * np.sin(t / 50.0),
+        "distance": t * 2.8,
+        "cadence": np.full(n, 172),
+    }, "a1")
+
+def test_typed_columns_and_zero_copy_slices():
+    streams = sample_streams()
+    assert streams["time"].dtype == np.int32 and streams["heartrate"].dtype == np.float32
+    assert streams.nbytes == 1000 * 4 * 4
+
+    window = streams.between(100, 200)
+    assert len(window) == 100 and window["time"][0] == 100
+    assert np.shares_memory(window["heartrate"], streams["heartrate"])
+
+def test_from_strava_and_points():
+    payload = {"time": {"data": [0, 1, 2]}, "heartrate": {"data": [120, 121, 125]}, "latlng": {"data": [[1, 2]] * 3}}
+    streams = ActivityStreams.from_strava(payload)
+    assert sorted(streams.channels) == ["heartrate", "time"]
+    listed = ActivityStreams.from_strava([{"type": "time", "data": [0, 1, 2]}, {"type": "heartrate", "data": [120, 121, 125]}])
+    assert np.array_equal(listed["heartrate"], streams["heartrate"])
+    assert ActivityStreams.from_points(streams.to_points())["heartrate"].tolist() == [120, 121, 125]
+
+def test_disk_roundtrip_is_memory_mapped(tmp_path):
+    cache = StreamCache(str(tmp_path))
+    fetches = []
+
+    def fetch():
+        fetches.append(1)
+        return sample_streams()
+
+    first = cache.get_or_fetch("a1", fetch)
+    second = cache.get_or_fetch("a1", fetch)
+
+    assert len(fetches) == 1
+    assert isinstance(second["heartrate"], np.memmap)
+    for name in first.channels:
+        assert np.array_equal(first[name], second[name])
+        assert second[name].dtype == first[name].dtype
+    assert analyze_streams(second) == analyze_streams(first)
+    assert cache.stats()["hits"] == 1
@@ -0,0 +1,46 @@
+import json
+import asyncio
+from src.core.batch_verify import stream_batch
+
+async def collect(items, run_one, concurrency):
+    return [json.loads(line) async for line in stream_batch(items, run_one, concurrency)]
+
+def test_streams_in_completion_order_with_bounded_concurrency():
+    in_flight = 0
+    peak = 0
+
+    async def run_one(delay):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(delay)
+        in_flight -= 1
+        if delay == 0.02:
+            raise ValueError("bad evidence")
+        return {"slept": delay}
+
+    lines = asyncio.run(collect([0.3, 0.01, 0.02, 0.03, 0.01], run_one, concurrency=2))
+
+    assert peak == 2
+    assert len(lines) == 5
+    assert lines[0] == {"index": 1, "status": "ok", "result": {"slept": 0.01}}
+    assert lines[-1]["index"] == 0 # The slowest item comes last, not first
+    assert [l for l in lines if l["status"] == "error"] == [{"index": 2, "status": "error", "error": "bad evidence"}]
+
+def test_abandoned_stream_cancels_pending_items():
+    started = []
+
+    async def run_one(i):
+        started.append(i)
+        await asyncio.sleep(0.01 if i == 0 else 1)
+        return i
+
+    async def main():
+        stream = stream_batch(list(range(10)), run_one, concurrency=2)
+        first = await stream.__anext__()
+        await stream.aclose()
+        await asyncio.sleep(0.05)
+        return json.loads(first)
+
+    assert asyncio.run(main())["index"] == 0
+    assert len(started) <= 3
@@ -0,0 +1,67 @@
+import time
+from datetime import datetime, timedelta, timezone
+from src.core.contract_cache import ContractCache, MemoryCacheBackend, DiskCacheBackend, normalize_goal
+from src.core.schemas import GoalContract, Penalty, ConsequenceType
+
+def make_contract(now, hours=48):
+    return GoalContract(
+        goal_description="Meditate 10min daily",
+        deadline_utc=now + timedelta(hours=hours),
+        penalty=Penalty(type=ConsequenceType.STAKE_BURN, amount_usd=10)
+    )
+
+def test_normalize_goal():
+    assert normalize_goal("🧘 Meditate  10min Daily!") == "meditate 10min daily"
+    assert normalize_goal("📵 Screen time < 2h/day") != normalize_goal("Screen time > 2h/day")
+
+def test_hit_reanchors_deadline():
+    cache = ContractCache(MemoryCacheBackend(), bucket_sec=3600)
+    t0 = datetime(2026, 1, 5, 10, 0, tzinfo=timezone.utc)
+    cache.set("🧘 Meditate 10min daily", make_contract(t0), now=t0)
+
+    t1 = t0 + timedelta(minutes=30)
+    hit = cache.get("meditate 10min daily", now=t1)
+    assert hit is not None
+    assert hit.deadline_utc == t1 + timedelta(hours=48)
+    assert cache.stats()["hits"] == 1
+
+def test_other_bucket_misses():
+    cache = ContractCache(MemoryCacheBackend(), bucket_sec=3600)
+    t0 = datetime(2026, 1, 5, 10, 0, tzinfo=timezone.utc)
+    cache.set("Run 5km", make_contract(t0), now=t0)
+    assert cache.get("Run 5km", now=t0 + timedelta(hours=2)) is None
+    assert cache.stats()["misses"] == 1
+
+def test_ttl_expiry():
+    cache = ContractCache(MemoryCacheBackend(), ttl_sec=0.01)
+    cache.set("Run 5km", make_contract(datetime.now(timezone.utc)))
+    time.sleep(0.02)
+    assert cache.get("Run 5km") is None
+    assert cache.stats()["expired"] == 1
+
+def test_lru_eviction_memory():
+    backend = MemoryCacheBackend(max_entries=2)
+    backend.set("a", "1")
+    backend.set("b", "2")
+    backend.get("a")
+    backend.set("c", "3")
+    assert backend.get("b") is None
+    assert backend.get("a") is not None
+    assert backend.evictions == 1
+
+def test_lru_eviction_disk(tmp_path):
+    backend = DiskCacheBackend(str(tmp_path / "cache.sqlite3"), max_entries=2)
+    backend.set("a", "1")
+    time.sleep(0.001)
+    backend.set("b", "2")
+    time.sleep(0.001)
+    backend.get("a")
+    backend.set("c", "3")
+    assert backend.get("b") is None
+    assert backend.get("a")[0] == "1"
+    assert len(backend) == 2
+
+def test_ttl_capped_by_bucket():
+    assert ContractCache(MemoryCacheBackend(), bucket_sec=3600).ttl_sec == 3600
+    assert ContractCache(MemoryCacheBackend(), ttl_sec=6 * 3600, bucket_sec=3600).ttl_sec == 3600
+    assert ContractCache(MemoryCacheBackend(), ttl_sec=60, bucket_sec=3600).ttl_sec == 60
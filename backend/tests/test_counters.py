@@ -0,0 +1,39 @@
+from fakes import FakeFirestore
+from src.core.counters import ShardedCounters
+from src.core.batch_writer import BatchWriter
+
+def test_increments_spread_over_shards_and_sum():
+    db = FakeFirestore()
+    counters = ShardedCounters(db, num_shards=4)
+    for _ in range(40):
+        counters.increment("u1", "contracts_completed")
+    counters.increment("u1", "contracts_failed", amount=2)
+
+    shards = list(db.collection('users').document('u1').collection('stat_shards').stream())
+    assert 1 < len(shards) <= 4
+    assert counters.get("u1") == {"contracts_completed": 40, "contracts_failed": 2}
+
+def test_includes_legacy_stats_and_caches_reads():
+    db = FakeFirestore()
+    db.collection('users').document('u1').set({'display_name': 'Ann', 'stats': {'contracts_completed': 5}})
+    counters = ShardedCounters(db, num_shards=2, cache_ttl_sec=60)
+    counters.increment("u1", "contracts_completed")
+
+    assert counters.get("u1")["contracts_completed"] == 6
+    reads = db.reads
+    assert counters.get("u1")["contracts_completed"] == 6
+    assert db.reads == reads # Served from cache
+
+    counters.increment("u1", "contracts_completed") # Invalidates
+    assert counters.get("u1")["contracts_completed"] == 7
+
+def test_batched_increments():
+    db = FakeFirestore()
+    counters = ShardedCounters(db, num_shards=3)
+    writer = BatchWriter(db)
+    for _ in range(5):
+        counters.increment("u1", "contracts_failed", writer=writer)
+    assert counters.get("u1") == {}
+    writer.flush()
+    counters.invalidate()
+    assert counters.get("u1") == {"contracts_failed": 5}
@@ -0,0 +1,48 @@
+import io
+import pytest
+from fakes import FakeBucket
+from src.core.evidence import EvidenceStore, EvidenceTooLarge, PIL_AVAILABLE
+
+def jpeg_bytes(size=(3000, 2000)):
+    from PIL import Image
+    out = io.BytesIO()
+    Image.new("RGB", size, (200, 30, 30)).save(out, format="JPEG")
+    return out.getvalue()
+
+def test_identical_content_is_stored_once():
+    bucket = FakeBucket()
+    store = EvidenceStore(bucket, derivative_px=0, chunk_size=7)
+    data = b"proof-of-run" * 100
+
+    first = store.store(io.BytesIO(data), "run.png", "image/png")
+    second = store.store(io.BytesIO(data), "other-name.png", "image/png")
+
+    assert first["url"] == second["url"]
+    assert first["url"].endswith(f"evidence/sha256/{first['sha256']}.png")
+    assert not first["deduplicated"] and second["deduplicated"]
+    assert bucket.uploads == 1
+    assert bucket.objects[f"evidence/sha256/{first['sha256']}.png"][0] == data
+
+def test_dedup_survives_restart():
+    bucket = FakeBucket()
+    EvidenceStore(bucket, derivative_px=0).store(io.BytesIO(b"abc"), "a.jpg")
+    result = EvidenceStore(bucket, derivative_px=0).store(io.BytesIO(b"abc"), "a.jpg")
+    assert result["deduplicated"] and bucket.uploads == 1
+
+def test_rejects_oversized_upload():
+    store = EvidenceStore(FakeBucket(), max_bytes=10, chunk_size=4, derivative_px=0)
+    with pytest.raises(EvidenceTooLarge):
+        store.store(io.BytesIO(b"x" * 11), "big.jpg")
+
+@pytest.mark.skipif(not PIL_AVAILABLE, reason="Pillow not installed")
+def test_builds_downscaled_derivative():
+    from PIL import Image
+    bucket = FakeBucket()
+    result = EvidenceStore(bucket, derivative_px=512).store(io.BytesIO(jpeg_bytes()), "photo.jpg", "image/jpeg")
+
+    name = result["verifier_url"].split("storage.example/")[1]
+    with Image.open(io.BytesIO(bucket.objects[name][0])) as image:
+        assert max(image.size) == 512
+
+    # Not an image: stored anyway, no derivative
+    assert EvidenceStore(bucket, derivative_px=512).store(io.BytesIO(b"not an image"), "x.jpg")["verifier_url"] is None
@@ -0,0 +1,81 @@
+import datetime
+from fakes import FakeFirestore
+from src.core.feed import FeedCache
+
+T0 = datetime.datetime(2026, 3, 1, 12, 0, tzinfo=datetime.timezone.utc)
+
+def add_event(db, i):
+    db.collection('feed').document(f"e{i:03d}").set({
+        "type": "verification",
+        "goal_description": f"Goal {i}",
+        "timestamp": T0 + datetime.timedelta(minutes=i),
+    })
+
+def test_pages_from_buffer_then_firestore():
+    db = FakeFirestore()
+    for i in range(30):
+        add_event(db, i)
+    feed = FeedCache(db, capacity=10, refresh_sec=60)
+
+    seen, cursor = [], None
+    while True:
+        items, cursor = feed.page(cursor, limit=4)
+        seen.extend(item["id"] for item in items)
+        if not cursor:
+            break
+
+    assert seen == [f"e{i:03d}" for i in reversed(range(30))]
+    assert feed.firestore_pages > 0
+
+def test_incremental_refresh_serves_from_memory():
+    db = FakeFirestore()
+    for i in range(5):
+        add_event(db, i)
+    feed = FeedCache(db, capacity=10, refresh_sec=60)
+
+    first, _ = feed.page(limit=3)
+    assert first[0]["id"] == "e004"
+
+    add_event(db, 5)
+    cached, _ = feed.page(limit=3)
+    assert cached[0]["id"] == "e004" # Within refresh window, no Firestore read
+
+    reads_before = db.reads
+    feed.invalidate()
+    fresh, _ = feed.page(limit=3)
+    assert fresh[0]["id"] == "e005"
+    assert db.reads - reads_before == 2 # Only the new event, plus the newest held one (>= boundary)
+
+def test_firestore_pages_keep_events_sharing_a_timestamp():
+    db = FakeFirestore()
+    for i in range(12):
+        db.collection('feed').document(f"e{i:03d}").set({
+            "type": "verification",
+            "timestamp": T0 + datetime.timedelta(minutes=i // 4), # Four events per timestamp
+        })
+    feed = FeedCache(db, capacity=3, refresh_sec=60)
+
+    seen, cursor = [], None
+    while True:
+        items, cursor = feed.page(cursor, limit=3)
+        seen.extend(item["id"] for item in items)
+        if not cursor:
+            break
+
+    assert sorted(seen) == [f"e{i:03d}" for i in range(12)]
+    assert len(seen) == 12
+
+def test_refresh_picks_up_events_sharing_the_newest_timestamp():
+    db = FakeFirestore()
+    db.collection('feed').document("b").set({"type": "verification", "timestamp": T0})
+    feed = FeedCache(db, capacity=10, refresh_sec=60)
+    assert [e["id"] for e in feed.page()[0]] == ["b"]
+
+    # Written in the same instant as the newest buffered event, on either side of its id
+    db.collection('feed').document("a").set({"type": "verification", "timestamp": T0})
+    db.collection('feed').document("c").set({"type": "verification", "timestamp": T0})
+    feed.invalidate()
+    assert [e["id"] for e in feed.page()[0]] == ["c", "b", "a"]
+
+    feed.invalidate()
+    assert [e["id"] for e in feed.page()[0]] == ["c", "b", "a"] # Already held: not added twice
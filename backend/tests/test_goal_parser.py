@@ -0,0 +1,82 @@
+from datetime import datetime, timezone
+from src.agents.contract import ContractAgent
+from src.core.goal_parser import parse_goal, parse_deadline
+from src.core.llm_gateway import LLMGateway
+from src.core.schemas import ConsequenceType, ActivityType
+
+NOW = datetime(2026, 10, 14, 12, 0, tzinfo=timezone.utc) # A Wednesday
+
+def test_running_goals():
+    parsed = parse_goal("🏃 Run 5km by Sunday", NOW)
+    assert parsed.template == "run_distance" and parsed.confidence >= 0.9
+    contract = parsed.contract
+    assert contract.goal_type == "running" and contract.target_distance_km == 5.0
+    assert ActivityType.RUN in contract.allowed_activity_types
+    assert contract.deadline_utc == datetime(2026, 10, 18, 23, 59, 59, tzinfo=timezone.utc)
+
+    assert parse_goal("Run 10 miles this week", NOW).contract.target_distance_km == 16.093
+    assert parse_goal("Run a half-marathon by 2026-11-01", NOW).contract.deadline_utc.date().isoformat() == "2026-11-01"
+
+def test_general_templates_and_defaults():
+    for goal, template in (("Read 30 pages/day", "habit_quantity"), ("🛑 No work after 6 PM", "restriction_time"),
+                           ("📵 Screen time < 2h/day", "limit"), ("🚭 Quit smoking/vaping", "quit"),
+                           ("💰 Save $500 this month", "save_amount"), ("Go to the gym 4 times a week", "frequency")):
+        parsed = parse_goal(goal, NOW)
+        assert parsed.template == template, goal
+        assert parsed.contract.goal_type == "general" and parsed.contract.target_distance_km is None
+        assert parsed.contract.penalty.type == ConsequenceType.STAKE_BURN and parsed.contract.penalty.amount_usd == 10
+    # No deadline phrase -> end of the upcoming Sunday, like the prompt's rule
+    assert parse_goal("Read 30 pages/day", NOW).contract.deadline_utc.weekday() == 6
+    assert parse_goal("Save $500 this month", NOW).contract.deadline_utc.day == 31
+
+def test_deadline_phrases_and_penalties():
+    assert parse_deadline("run 3k tomorrow", NOW)[1] == "tomorrow"
+    assert parse_deadline("do it in 2 weeks", NOW)[0].day == 28
+    assert parse_deadline("whenever", NOW) == (None, None)
+
+    shame = parse_goal("Run 10km by Friday, public shame if I fail", NOW).contract.penalty
+    assert shame.type == ConsequenceType.PUBLIC_SHAME and shame.amount_usd == 0
+    donation = parse_goal("Do 50 pushups every day for a month, or I'll donate $20", NOW)
+    assert donation.contract.penalty.type == ConsequenceType.DONATION and donation.contract.penalty.amount_usd == 20
+    assert donation.confidence >= 0.8
+    assert parse_goal("Jog 3k tomorrow with $25 stake", NOW).contract.penalty.amount_usd == 25
+
+def test_free_form_goals_have_low_confidence():
+    assert parse_goal("Learn a new skill", NOW).confidence == 0.0
+    assert parse_goal("I want to maybe get fitter unless work gets busy", NOW).confidence < 0.8
+    assert parse_goal("Read 30 pages a day unless I am travelling", NOW).confidence < 0.8
+
+def test_conditions_the_templates_cant_carry_go_to_the_llm():
+    for goal, reason in (("Don't run more than 5km this week", "negation"),
+                         ("Never run less than 10k by Friday", "negation"),
+                         ("Run no more than 20km this week", "comparative"),
+                         ("Run 5km every day for a week", "recurrence"),
+                         ("Run 3 miles 4 times a week", "recurrence"),
+                         ("Run 5km in 25 minutes", "time_limit"),
+                         ("Run a marathon in under 4 hours", "comparative"),
+                         ("Run 10k at 5:30/km pace", "time_limit"),
+                         ("Meditate 10 min daily, never on weekends", "negation")):
+        parsed = parse_goal(goal, NOW)
+        assert parsed.contract is None and parsed.confidence == 0.0, goal
+        assert parsed.signals["unsupported"] == reason, goal
+
+    # Templates that are negative by design keep their wording
+    assert parse_goal("Screen time less than 2h/day", NOW).template == "limit"
+    assert parse_goal("No work after 6 PM", NOW).template == "restriction_time"
+
+def test_agent_fast_path_skips_llm():
+    agent = ContractAgent(cache=False, llm=LLMGateway(api_key=""))
+    contract = agent.negotiate("Run 5km by Sunday")
+    assert contract.target_distance_km == 5.0
+    assert agent.negotiate("Plan a weekend trip") is None # Falls through to the LLM (not configured here)
+    stats = agent.fast_path_stats()
+    assert stats["attempts"] == 2 and stats["hits"] == 1 and stats["by_template"] == {"run_distance": 1}
+    assert stats["est_llm_sec_saved"] > 0
+
+def test_past_dates_and_partially_explained_goals_score_lower():
+    past = parse_goal("Run 5km by 2026-10-01", NOW)
+    assert past.contract is None and past.confidence == 0.0
+    assert past.signals["unsupported"] == "past_deadline"
+
+    # Same template; the extra words aren't part of what it matched
+    assert parse_goal("Run 5km by Sunday", NOW).confidence > parse_goal("Run 5km around the lake by Sunday", NOW).confidence
@@ -0,0 +1,101 @@
+import io
+import pytest
+import requests
+from src.core.evidence import PIL_AVAILABLE, EvidenceStore
+from src.core.image_pipeline import EvidenceImagePipeline
+from src.core.stage_timings import StageTimings
+from fakes import FakeBucket
+
+pytestmark = pytest.mark.skipif(not PIL_AVAILABLE, reason="Pillow not installed")
+
+def phone_photo() -> bytes:
+    from PIL import Image
+    image = Image.new("RGB", (4000, 3000), (20, 120, 60))
+    exif = image.getexif()
+    exif[0x0112] = 6 # Orientation: rotate 90° CW to display
+    out = io.BytesIO()
+    image.save(out, format="JPEG", exif=exif)
+    return out.getvalue()
+
+class FakeResponse:
+    def __init__(self, status_code, body=b""):
+        self.status_code = status_code
+        self._body = body
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code}")
+
+    def iter_content(self, chunk_size):
+        for i in range(0, len(self._body), chunk_size):
+            yield self._body[i:i + chunk_size]
+
+class BucketSession:
+    """Serves the fake bucket's public URLs; records every URL requested."""
+
+    def __init__(self, bucket):
+        self.bucket = bucket
+        self.hits = []
+
+    def get(self, url, stream=False, timeout=None, allow_redirects=True):
+        assert allow_redirects is False
+        self.hits.append(url)
+        name = url[len("https://storage.example/"):]
+        if name not in self.bucket.objects:
+            return FakeResponse(404)
+        return FakeResponse(200, self.bucket.objects[name][0])
+
+@pytest.fixture
+def stored():
+    bucket = FakeBucket()
+    store = EvidenceStore(bucket, derivative_px=512, timings=StageTimings())
+    result = store.store(io.BytesIO(phone_photo()), "photo.jpg", "image/jpeg")
+    return store, BucketSession(bucket), result
+
+def test_reads_the_stored_derivative_and_caches(stored, tmp_path):
+    from PIL import Image
+    store, session, result = stored
+    pipeline = EvidenceImagePipeline(store.url_prefix, derivative_px=512, cache_dir=str(tmp_path),
+                                     timings=store.timings, session=session)
+
+    part = pipeline.prepare(result["url"])
+    with Image.open(io.BytesIO(part["data"])) as image:
+        assert image.size == (384, 512) # Portrait after EXIF rotation at upload, long edge capped
+    assert session.hits == [result["verifier_url"]] # The derivative, never the original
+
+    again = EvidenceImagePipeline(store.url_prefix, derivative_px=512, cache_dir=str(tmp_path), session=session)
+    assert again.prepare(result["verifier_url"])["data"] == part["data"]
+    assert len(session.hits) == 1 # Second pipeline served from the disk cache
+    # Upload-side derivative stages are reported with the fetch when the timings are shared
+    assert {"decode", "resize", "encode", "fetch"} <= set(pipeline.stats()["stage_timings"])
+
+def test_urls_outside_the_evidence_bucket_are_refused(stored, tmp_path):
+    store, session, result = stored
+    pipeline = EvidenceImagePipeline(store.url_prefix, derivative_px=512, cache_dir=str(tmp_path), session=session)
+    sha = result["sha256"]
+    for url in ("http://169.254.169.254/latest/meta-data/",
+                "http://127.0.0.1:8080/photo.jpg",
+                f"http://storage.example/evidence/sha256/{sha}.jpg",
+                f"https://storage.example/evidence/sha256/../../admin/{sha}.jpg",
+                f"https://storage.example/evidence/sha256/{sha}.jpg?redirect=http://10.0.0.1/",
+                f"https://storage.example.attacker.net/evidence/sha256/{sha}.jpg",
+                "https://storage.example/other/photo.jpg"):
+        assert pipeline.prepare(url) is None, url
+    assert session.hits == []
+    assert pipeline.stats()["rejected"] == 7
+
+    # No storage bucket configured: nothing is fetched at all
+    assert EvidenceImagePipeline(None, cache_dir=str(tmp_path), session=session).prepare(result["url"]) is None
+    assert session.hits == []
+
+def test_missing_derivatives_are_skipped(stored, tmp_path):
+    store, session, _ = stored
+    pipeline = EvidenceImagePipeline(store.url_prefix, derivative_px=512, cache_dir=str(tmp_path), session=session)
+    assert pipeline.prepare_all([f"{store.url_prefix}{'0' * 64}.pdf"]) == []
+    assert pipeline.stats()["failures"] == 1
@@ -0,0 +1,86 @@
+import pytest
+from src.core.jobs import JobQueue
+
+@pytest.fixture
+def queue(tmp_path):
+    q = JobQueue(db_path=str(tmp_path / "jobs.sqlite3"), workers=1, base_backoff_sec=0.0)
+    # Tests drive the queue with work_once(); keep the worker pool from starting
+    q.start = lambda: None
+    return q
+
+def test_enqueue_and_run(queue):
+    seen = []
+    queue.register("echo", lambda payload: seen.append(payload["n"]))
+    job_id = queue.enqueue("echo", {"n": 1})
+
+    assert queue.metrics()["depth"] == 1
+    assert queue.work_once()
+    assert seen == [1]
+    assert queue.get(job_id)["status"] == "done"
+    assert queue.metrics()["depth"] == 0
+
+def test_idempotency_key_dedupes(queue):
+    seen = []
+    queue.register("echo", lambda payload: seen.append(payload["n"]))
+    first = queue.enqueue("echo", {"n": 1}, idempotency_key="req-1:stats")
+    second = queue.enqueue("echo", {"n": 2}, idempotency_key="req-1:stats")
+
+    assert first == second
+    while queue.work_once():
+        pass
+    assert seen == [1]
+
+def test_retries_then_dead(queue):
+    attempts = []
+    def flaky(payload):
+        attempts.append(1)
+        raise RuntimeError("firestore unavailable")
+    queue.register("flaky", flaky)
+    job_id = queue.enqueue("flaky", {}, max_attempts=3)
+
+    while queue.work_once():
+        pass
+    job = queue.get(job_id)
+    assert len(attempts) == 3
+    assert job["status"] == "dead"
+    assert "firestore unavailable" in job["last_error"]
+    assert queue.metrics()["dead"] == 1
+
+def test_recovers_after_transient_failure(queue):
+    attempts = []
+    def flaky(payload):
+        attempts.append(1)
+        if len(attempts) < 2:
+            raise RuntimeError("transient")
+    queue.register("flaky", flaky)
+    job_id = queue.enqueue("flaky", {})
+
+    while queue.work_once():
+        pass
+    assert queue.get(job_id)["status"] == "done"
+    assert len(attempts) == 2
+
+def test_running_jobs_of_a_live_process_are_not_rerun(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    first = JobQueue(db_path=path, workers=1, lease_sec=60)
+    first.start = lambda: None
+    seen = []
+    first.register("echo", lambda payload: seen.append(("first", payload["n"])))
+    job_id = first.enqueue("echo", {"n": 1})
+    assert first._claim()["id"] == job_id # In flight in the first process
+
+    # A second worker process on the same host starts up
+    second = JobQueue(db_path=path, workers=1, lease_sec=60)
+    second.register("echo", lambda payload: seen.append(("second", payload["n"])))
+    second.start()
+    try:
+        assert not second.work_once()
+        assert second.get(job_id)["status"] == "running"
+    finally:
+        second.stop()
+
+    # Once the lease runs out (the first process died), the job is taken over
+    first._conn().execute("UPDATE jobs SET lease_expires = 0 WHERE id = ?", (job_id,))
+    assert second.work_once()
+    assert seen == [("second", 1)]
+    assert second.get(job_id)["status"] == "done"
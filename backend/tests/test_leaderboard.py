@@ -0,0 +1,57 @@
+import random
+import datetime
+from fakes import FakeFirestore
+from src.core.leaderboard import Leaderboard, TopKBoard
+from src.core.counters import ShardedCounters
+
+AT = datetime.datetime(2026, 3, 4, 12, 0, tzinfo=datetime.timezone.utc)
+
+def test_topk_matches_full_sort():
+    rng = random.Random(3)
+    board = TopKBoard(k=5)
+    totals = {}
+    for _ in range(2000):
+        user = f"u{rng.randint(0, 200)}"
+        board.record(user, completed=1)
+        totals[user] = totals.get(user, 0) + 1
+
+    expected = sorted(totals.items(), key=lambda kv: (-kv[1], kv[0]))[:5]
+    assert [(uid, score) for uid, score, _ in board.top(5)] == expected
+
+def test_windows_and_snapshot(tmp_path):
+    path = str(tmp_path / "board.json")
+    lb = Leaderboard(None, None, k=10, snapshot_path=path)
+    lb.record("alice", completed=1, at=AT)
+    lb.record("alice", completed=1, at=AT)
+    lb.record("bob", completed=1, at=AT)
+    lb.record("bob", failed=1, at=AT)
+    lb.record("carol", completed=1, at=AT + datetime.timedelta(days=40)) # Next month
+
+    top = lb.top("monthly", at=AT)
+    assert [e["user_id"] for e in top] == ["alice", "bob"]
+    assert top[1]["trust_score"] == 50
+    assert [e["user_id"] for e in lb.top("all", at=AT)] == ["alice", "bob", "carol"]
+
+    lb.save_snapshot()
+    restored = Leaderboard(None, None, k=10, snapshot_path=path)
+    assert restored.top("all", at=AT) == lb.top("all", at=AT)
+
+def test_seeds_from_sharded_counters(tmp_path):
+    db = FakeFirestore()
+    db.collection('users').document('ann').set({'stats': {'contracts_completed': 9}}) # Legacy, pre-sharding
+    counters = ShardedCounters(db, num_shards=3)
+    for _ in range(4):
+        counters.increment("ann", "contracts_completed")
+    for _ in range(12):
+        counters.increment("bob", "contracts_completed")
+    counters.increment("bob", "contracts_failed", amount=4)
+    counters.increment("cat", "contracts_completed")
+
+    lb = Leaderboard(db, None, k=2, snapshot_path=str(tmp_path / "none.json"), counters=counters)
+    top = lb.top("all", at=AT)
+    assert [(e["user_id"], e["contracts_completed"]) for e in top] == [("ann", 13), ("bob", 12)]
+    assert top[1]["trust_score"] == 75
+
+    # cat was below the cut at seeding; new completions add to the seeded total
+    lb.record("cat", completed=13, at=AT)
+    assert [(e["user_id"], e["contracts_completed"]) for e in lb.top("all", at=AT)] == [("cat", 14), ("ann", 13)]
@@ -0,0 +1,94 @@
+import time
+import threading
+from types import SimpleNamespace
+import pytest
+from src.core.llm_gateway import LLMGateway, CircuitBreaker, CircuitOpen, LLMTimeout, is_retryable
+
+class ApiError(Exception):
+    def __init__(self, code):
+        super().__init__(f"HTTP {code}")
+        self.code = code
+
+class ScriptedModel:
+    """Plays back a script of outcomes: an exception to raise, or a delay in seconds before answering."""
+
+    def __init__(self, script=(), delay=0.0):
+        self.script = list(script)
+        self.delay = delay
+        self.calls = 0
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def generate_content(self, contents, generation_config=None):
+        with self.lock:
+            self.calls += 1
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+            step = self.script.pop(0) if self.script else None
+        try:
+            if isinstance(step, Exception):
+                raise step
+            time.sleep(step if isinstance(step, (int, float)) else self.delay)
+            usage = SimpleNamespace(prompt_token_count=100, candidates_token_count=20, total_token_count=120)
+            return SimpleNamespace(text="{}", usage_metadata=usage)
+        finally:
+            with self.lock:
+                self.active -= 1
+
+def gateway(**kwargs):
+    args = dict(api_key="", concurrency=2, timeout_sec=5, max_retries=3, backoff_sec=0.01, breaker=CircuitBreaker(3, 60))
+    args.update(kwargs)
+    return LLMGateway(**args)
+
+def test_retries_transient_errors_and_records_usage():
+    llm = gateway()
+    model = ScriptedModel([ApiError(429), ApiError(503)])
+    assert llm.generate(model, "hi", caller="test").text == "{}"
+    stats = llm.stats()
+    assert model.calls == 3
+    assert stats["retries"] == 2 and stats["succeeded"] == 1
+    assert stats["total_tokens"] == 120
+    assert stats["by_caller"]["test"]["succeeded"] == 1
+
+def test_client_errors_are_not_retried():
+    llm = gateway()
+    model = ScriptedModel([ApiError(400)])
+    with pytest.raises(ApiError):
+        llm.generate(model, "hi")
+    assert model.calls == 1
+    assert llm.breaker.state == CircuitBreaker.CLOSED
+    assert not is_retryable(ApiError(404)) and is_retryable(ConnectionError())
+
+def test_deadline_covers_the_call():
+    llm = gateway(timeout_sec=0.1)
+    start = time.monotonic()
+    with pytest.raises(LLMTimeout):
+        llm.generate(ScriptedModel([1.0]), "hi")
+    assert time.monotonic() - start < 0.5
+
+def test_concurrency_cap():
+    llm = gateway(concurrency=2)
+    model = ScriptedModel(delay=0.05)
+    threads = [threading.Thread(target=llm.generate, args=(model, "hi")) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert model.calls == 8 and model.peak == 2
+
+def test_breaker_opens_fails_fast_and_recovers():
+    clock = [0.0]
+    llm = gateway(max_retries=0, breaker=CircuitBreaker(3, 30, clock=lambda: clock[0]))
+    failing = ScriptedModel([ApiError(500)] * 3)
+    for _ in range(3):
+        with pytest.raises(ApiError):
+            llm.generate(failing, "hi")
+    with pytest.raises(CircuitOpen):
+        llm.generate(failing, "hi")
+    assert failing.calls == 3
+
+    clock[0] = 31 # Half-open: one probe goes through and closes the breaker
+    assert llm.generate(ScriptedModel(), "hi").text == "{}"
+    assert llm.stats()["breaker"] == {"state": "closed", "consecutive_failures": 0, "opens": 1}
+    assert llm.stats()["short_circuited"] == 1
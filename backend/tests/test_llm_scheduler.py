@@ -0,0 +1,151 @@
+import time
+import asyncio
+import threading
+from types import SimpleNamespace
+import pytest
+from src.agents.contract import ContractAgent
+from src.core.llm_gateway import LLMGateway, CircuitBreaker, QuotaExhausted
+from src.core.micro_batch import MicroBatcher
+from src.core.llm_scheduler import LLMScheduler, llm_priority, current_priority, INTERACTIVE, BACKGROUND, EVAL
+from src.core.rate_limit import RateLimitExceeded, TokenBucket
+from src.core.single_flight import SingleFlight, current_cancel_token
+
+class Model:
+    def generate_content(self, contents, generation_config=None):
+        return SimpleNamespace(text="{}", usage_metadata=None)
+
+def test_token_bucket_refills_per_window():
+    now = [0.0]
+    bucket = TokenBucket([(2, 10.0)], clock=lambda: now[0])
+    assert bucket.try_acquire() == 0.0 and bucket.try_acquire() == 0.0
+    assert bucket.try_acquire() == pytest.approx(5.0)
+    now[0] = 5.0
+    assert bucket.try_acquire() == 0.0
+
+def test_higher_priority_classes_go_first():
+    scheduler = LLMScheduler(limits=[(1, 0.3)])
+    scheduler.acquire(INTERACTIVE) # Spend the burst
+    order = []
+    def wait(priority):
+        scheduler.acquire(priority)
+        order.append(priority)
+    threads = []
+    for priority in (EVAL, BACKGROUND, INTERACTIVE): # Lowest priority queues first
+        threads.append(threading.Thread(target=wait, args=(priority,)))
+        threads[-1].start()
+        time.sleep(0.03)
+    for t in threads:
+        t.join()
+    assert order == [INTERACTIVE, BACKGROUND, EVAL]
+    stats = scheduler.stats()["by_class"]
+    assert stats[EVAL]["wait_ms"]["max"] > stats[INTERACTIVE]["wait_ms"]["max"]
+    assert stats[INTERACTIVE]["granted"] == 2 and stats[EVAL]["queued"] == 0
+
+def test_interactive_calls_fail_fast_when_quota_is_spent():
+    scheduler = LLMScheduler(limits=[(1, 1.0)], max_wait_sec={INTERACTIVE: 1.5})
+    scheduler.acquire(INTERACTIVE)
+    spent = LLMScheduler(limits=[(1, 60.0)], max_wait_sec={INTERACTIVE: 1.0})
+    spent.acquire(INTERACTIVE)
+    start = time.monotonic()
+    with pytest.raises(RateLimitExceeded): # Next token in 60s: no point waiting out the 1s deadline
+        spent.acquire(INTERACTIVE)
+    assert time.monotonic() - start < 0.1
+
+    # Two calls already queued at 1 call/s: a third can't make a 1.5s deadline and is rejected at once
+    outcomes = []
+    def queued():
+        try:
+            outcomes.append(scheduler.acquire(INTERACTIVE) >= 0)
+        except RateLimitExceeded:
+            outcomes.append(False)
+    threads = [threading.Thread(target=queued) for _ in range(2)]
+    for t in threads:
+        t.start()
+    time.sleep(0.05)
+    with pytest.raises(RateLimitExceeded) as rejected:
+        scheduler.acquire(INTERACTIVE)
+    assert rejected.value.retry_after == pytest.approx(2.0)
+    for t in threads:
+        t.join()
+    # The first queued call gets the next token; the second would need ~2s and gives up when it's next in line
+    assert outcomes == [True, False]
+    stats = scheduler.stats()["by_class"][INTERACTIVE]
+    assert stats["rejected"] == 1 and stats["timed_out"] == 1
+
+def test_gateway_admits_by_priority_and_surfaces_quota_errors():
+    scheduler = LLMScheduler(limits=[(1, 60.0)], max_wait_sec={INTERACTIVE: 0.1, BACKGROUND: 0.1})
+    llm = LLMGateway(api_key="", breaker=CircuitBreaker(5, 60), scheduler=scheduler)
+    assert current_priority() == INTERACTIVE
+    with llm_priority(BACKGROUND):
+        assert llm.generate(Model(), "hi", caller="reaper").text == "{}"
+    with pytest.raises(QuotaExhausted):
+        llm.generate(Model(), "hi", caller="contract_agent")
+    stats = llm.stats()
+    assert stats["throttled"] == 1 and stats["by_caller"]["contract_agent"]["throttled"] == 1
+    assert stats["scheduler"]["by_class"][BACKGROUND]["granted"] == 1
+    assert stats["scheduler"]["by_class"][INTERACTIVE]["timed_out"] == 1
+    assert stats["breaker"]["state"] == "closed"
+
+def test_no_quota_without_an_api_key():
+    llm = LLMGateway(api_key="", breaker=CircuitBreaker(5, 60))
+    for _ in range(30):
+        llm.generate(Model(), "hi")
+    assert llm.stats()["scheduler"]["quota"] is None
+
+def test_negotiate_surfaces_quota_errors_instead_of_a_fallback_contract():
+    scheduler = LLMScheduler(limits=[(1, 60.0)], max_wait_sec={INTERACTIVE: 0.1})
+    agent = ContractAgent(cache=False, llm=LLMGateway(api_key="test-key", breaker=CircuitBreaker(5, 60), scheduler=scheduler))
+    agent.fast_path = False
+    agent.model = Model()
+    scheduler.acquire(INTERACTIVE) # Quota spent
+
+    with pytest.raises(QuotaExhausted) as exhausted:
+        agent.negotiate("Plan a weekend trip")
+    assert exhausted.value.retry_after > 0
+    events = list(agent.negotiate_stream("Plan a weekend trip"))
+    assert [kind for kind, _ in events] == ["error"] and events[0][1]["retry_after"] > 0
+
+def test_micro_batch_flushes_at_the_highest_priority_in_the_batch():
+    seen = []
+    def flush(items):
+        seen.append(current_priority())
+        return items
+    batcher = MicroBatcher(flush, window_sec=0.1, max_batch=10)
+
+    def submit(priority, item):
+        with llm_priority(priority):
+            batcher.submit(item)
+    leader = threading.Thread(target=submit, args=(BACKGROUND, "batch item"))
+    leader.start()
+    time.sleep(0.02)
+    submit(INTERACTIVE, "user /verify")
+    leader.join()
+    assert seen == [INTERACTIVE]
+
+def test_shared_call_queues_at_the_highest_priority_of_its_callers():
+    scheduler = LLMScheduler(limits=[(1, 0.3)])
+    scheduler.acquire(INTERACTIVE) # Spend the burst
+    order = []
+    def wait(priority):
+        scheduler.acquire(priority)
+        order.append(priority)
+    background = threading.Thread(target=wait, args=(BACKGROUND,))
+    background.start()
+    time.sleep(0.02)
+
+    def shared_call():
+        scheduler.acquire(cancel_token=current_cancel_token())
+        order.append("shared")
+        return "ok"
+    flights = SingleFlight(enabled=True, poll_sec=0.01)
+    async def caller(priority, delay):
+        await asyncio.sleep(delay)
+        with llm_priority(priority):
+            return await flights.run("k", shared_call)
+    async def main():
+        # Started by an eval caller (queued behind background); an interactive request joins while it waits
+        return await asyncio.gather(caller(EVAL, 0), caller(INTERACTIVE, 0.05))
+    assert asyncio.run(main()) == ["ok", "ok"]
+    background.join()
+    assert order == ["shared", BACKGROUND]
+    assert scheduler.stats()["by_class"][INTERACTIVE]["granted"] == 2
@@ -0,0 +1,48 @@
+import json
+import pytest
+from datetime import datetime, timedelta, timezone
+from fakes import FakeFirestore
+from src.core.jobs import JobQueue
+from src.core.profiles import ProfileCache
+from src.core.feed import FeedCache
+from src.core.leaderboard import Leaderboard
+from src.core.counters import ShardedCounters
+from src.core.post_verification import PostVerificationEffects
+from src.core.schemas import (GoalContract, Penalty, ConsequenceType, VerificationResult, VerificationStatus,
+                              AuditorDecision, AuditorVerdict)
+
+class RecordingStakes:
+    def __init__(self):
+        self.calls = []
+
+    def handle_outcome(self, user_id, verification_result, idempotency_key=None):
+        self.calls.append(idempotency_key)
+
+@pytest.fixture
+def effects(tmp_path):
+    db = FakeFirestore()
+    queue = JobQueue(db_path=str(tmp_path / "jobs.sqlite3"), workers=1, base_backoff_sec=0.0)
+    queue.start = lambda: None
+    counters = ShardedCounters(db, num_shards=4, cache_ttl_sec=0)
+    leaderboard = Leaderboard(db, None, k=10, snapshot_path=str(tmp_path / "board.json"))
+    return PostVerificationEffects(queue, db, None, RecordingStakes(), ProfileCache(db), FeedCache(db),
+                                   leaderboard, counters)
+
+def test_stats_and_feed_run_once_per_request(effects):
+    contract = GoalContract(target_distance_km=5.0, deadline_utc=datetime.now(timezone.utc) + timedelta(days=1),
+                            penalty=Penalty(type=ConsequenceType.DONATION, amount_usd=10))
+    result = VerificationResult(status=VerificationStatus.SUCCESS, confidence=0.98)
+    decision = AuditorDecision(verdict=AuditorVerdict.BLOCK, reason="test")
+    jobs = effects.schedule("req-1", "alice", contract, result, decision)
+    assert set(jobs) == {"stats", "stake", "feed"}
+
+    # A job re-run after a retry or lease takeover must not count or post twice
+    for stage, handler in (("stats", effects._run_stats), ("feed", effects._run_feed)):
+        payload = json.loads(effects.queue.get(jobs[stage])["payload"])
+        handler(payload)
+        handler(payload)
+
+    assert effects.counters.get("alice") == {"contracts_completed": 1}
+    assert effects.leaderboard.top("all")[0]["contracts_completed"] == 1
+    assert len(effects.db.collection('feed').get()) == 1
+    assert len(effects.db.collection('stats_events').get()) == 1
@@ -0,0 +1,174 @@
+import datetime
+import pytest
+from unittest.mock import MagicMock
+from fakes import FakeFirestore
+from src.core.reaper import Reaper, SKIPPED
+from src.core.batch_writer import BatchWriter
+from src.core.profiles import ProfileCache
+from src.core.counters import ShardedCounters
+from src.core.schemas import AuditorDecision, AuditorVerdict
+
+NOW = datetime.datetime(2026, 3, 1, 12, 0, tzinfo=datetime.timezone.utc)
+
+def add_contract(db, doc_id, hours_from_now, status='Active'):
+    deadline = NOW + datetime.timedelta(hours=hours_from_now)
+    db.collection('contracts').document(doc_id).set({
+        'goal_description': f"Goal {doc_id}",
+        'deadline_utc': deadline.isoformat(),
+        'deadline_at': deadline,
+        'status': status,
+        'user_id': 'u1',
+        'penalty': {'type': 'stake_burn', 'amount_usd': 10},
+    })
+
+def make_reaper(db, **kwargs):
+    detect = MagicMock()
+    detect.evaluate.return_value = AuditorDecision(verdict=AuditorVerdict.BLOCK, reason="test")
+    db.collection('users').document('u1').set({'display_name': 'Tester'})
+    return Reaper(db, detect, MagicMock(), MagicMock(), MagicMock(), ProfileCache(db), **kwargs)
+
+def status(db, doc_id):
+    return db.collection('contracts').document(doc_id).get().to_dict()['status']
+
+def test_reaps_only_expired_past_grace():
+    db = FakeFirestore()
+    add_contract(db, 'expired', -5)
+    add_contract(db, 'in_grace', -0.5)
+    add_contract(db, 'future', 24)
+
+    result = make_reaper(db).run(now=NOW)
+
+    assert result['processed'] == 1
+    assert result['complete']
+    assert status(db, 'expired') == 'Failed'
+    assert status(db, 'in_grace') == 'Active'
+    assert status(db, 'future') == 'Active'
+
+def test_pages_through_all_expired():
+    db = FakeFirestore()
+    for i in range(7):
+        add_contract(db, f"c{i}", -10 - i)
+
+    result = make_reaper(db, page_size=3).run(now=NOW)
+
+    assert result['processed'] == 7
+    assert result['pages'] == 3
+    assert all(status(db, f"c{i}") == 'Failed' for i in range(7))
+
+def test_time_budget_checkpoint_and_resume():
+    db = FakeFirestore()
+    for i in range(5):
+        add_contract(db, f"c{i}", -10 - i)
+    reaper = make_reaper(db, page_size=2, workers=1)
+
+    calls = []
+    original_enforce = reaper._enforce
+    def slow_enforce(contract_id, *args):
+        calls.append(contract_id)
+        outcome = original_enforce(contract_id, *args)
+        if len(calls) == 2:
+            reaper.time_budget_sec = 1e-9 # Budget runs out after the second contract
+        return outcome
+    reaper._enforce = slow_enforce
+
+    first = reaper.run(now=NOW)
+    assert first['processed'] == 2
+    assert not first['complete']
+
+    reaper.time_budget_sec = 60
+    second = reaper.run(now=NOW)
+    assert second['resumed_from_checkpoint']
+    assert second['complete']
+    assert first['processed'] + second['processed'] == 5
+
+def test_batches_plain_writes_and_reports_stages():
+    db = FakeFirestore()
+    for i in range(6):
+        add_contract(db, f"c{i}", -10 - i)
+
+    result = make_reaper(db, page_size=10, workers=4).run(now=NOW)
+
+    assert result['processed'] == 6
+    assert result['batch_commits'] == 1
+    assert ShardedCounters(db).get('u1')['contracts_failed'] == 6
+    assert {'query', 'detect', 'stake', 'user_read', 'tweet', 'batch_commit'} <= set(result['stage_timings'])
+    assert result['throughput_per_sec'] > 0
+
+def test_claims_before_enforcing_and_never_re_enforces(monkeypatch):
+    db = FakeFirestore()
+    for i in range(3):
+        add_contract(db, f"c{i}", -10 - i)
+    reaper = make_reaper(db, claim_lease_sec=600)
+
+    # A manual /verify completes c1 while the page is being read
+    original_claim = reaper._claim
+    def claim(contract_id, claimed_at):
+        if contract_id == 'c1':
+            db.collection('contracts').document('c1').update({'status': 'Completed'})
+        return original_claim(contract_id, claimed_at)
+    reaper._claim = claim
+
+    # The batched Failed writes are lost after enforcement
+    def lost_commit(writer):
+        if writer._pending:
+            raise RuntimeError("commit failed")
+    with monkeypatch.context() as patch:
+        patch.setattr(BatchWriter, "flush", lost_commit)
+        with pytest.raises(RuntimeError):
+            reaper.run(now=NOW)
+    assert reaper.stake_manager.handle_outcome.call_count == 2
+    assert status(db, 'c1') == 'Completed'
+    assert status(db, 'c0') == status(db, 'c2') == 'Reaping'
+
+    reaper._claim = original_claim
+    again = reaper.run(now=NOW) # Within the lease: left alone
+    assert again['processed'] == 0
+    later = reaper.run(now=NOW + datetime.timedelta(minutes=11))
+    assert later['processed'] == 2
+    assert status(db, 'c0') == status(db, 'c2') == 'Failed'
+    assert reaper.stake_manager.handle_outcome.call_count == 2 # Never re-enforced
+    assert ShardedCounters(db).get('u1')['contracts_failed'] == 2
+
+def test_skipped_contract_keeps_later_outcomes_and_failed_enforcement_is_retried():
+    db = FakeFirestore()
+    for i in range(4):
+        add_contract(db, f"c{i}", -10 - i)
+    reaper = make_reaper(db, page_size=10, workers=4)
+
+    original_enforce = reaper._enforce
+    def enforce(contract_id, data, timings, out_of_time, now):
+        if contract_id == 'c2': # Oldest deadline but one: sorted second
+            return SKIPPED
+        return original_enforce(contract_id, data, timings, out_of_time, now)
+    reaper._enforce = enforce
+    reaper.detect_agent.evaluate.side_effect = lambda contract, result: (
+        (_ for _ in ()).throw(RuntimeError("detect down")) if contract.goal_description == "Goal c3"
+        else AuditorDecision(verdict=AuditorVerdict.BLOCK, reason="test"))
+
+    result = reaper.run(now=NOW)
+    assert not result['complete']
+    assert sorted(result['details']) == ["Reaped c0 for user u1", "Reaped c1 for user u1"]
+    assert status(db, 'c0') == status(db, 'c1') == 'Failed' # c0 sorts after the skipped c2, still recorded
+    assert status(db, 'c2') == 'Active'
+    assert status(db, 'c3') == 'Active' # Claim released for the next pass
+
+def test_legacy_contracts_without_deadline_at_are_backfilled_and_reaped():
+    db = FakeFirestore()
+    add_contract(db, 'indexed', -5)
+    for doc_id, hours in (('legacy_expired', -5), ('legacy_future', 24)):
+        add_contract(db, doc_id, hours)
+        del db._data['contracts'][doc_id]['deadline_at'] # Written before the field existed
+
+    reaper = make_reaper(db, page_size=2)
+    result = reaper.run(now=NOW)
+
+    assert result['legacy_backfilled'] == 2
+    assert status(db, 'indexed') == 'Failed' and status(db, 'legacy_expired') == 'Failed'
+    assert status(db, 'legacy_future') == 'Active'
+    assert db._data['contracts']['legacy_future']['deadline_at'] == NOW + datetime.timedelta(hours=24)
+
+    # Once every Active contract has been covered, later ticks skip the legacy pass
+    queries = db.queries
+    assert reaper.run(now=NOW)['legacy_backfilled'] == 0
+    assert db._data['system']['reaper_legacy_backfill']['complete']
+    assert db.queries - queries == 2 # Stale claims + expired page only
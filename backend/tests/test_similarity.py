@@ -0,0 +1,31 @@
+from datetime import datetime, timedelta, timezone
+from src.core.similarity import contract_index_fields, find_duplicate, is_duplicate_goal, number_fingerprint
+
+NOW = datetime(2026, 3, 1, 12, 0, tzinfo=timezone.utc)
+
+def stored(goal, deadline):
+    doc = {"goal_description": goal, "deadline_utc": deadline.isoformat()}
+    doc.update(contract_index_fields(goal, deadline))
+    return doc
+
+def test_number_fingerprint():
+    assert number_fingerprint("run 5km 3x a week") == "3,5"
+    assert number_fingerprint("meditate daily") == ""
+
+def test_duplicate_semantics():
+    assert is_duplicate_goal("run 5km every morning", "run 5km every morning")
+    assert is_duplicate_goal("run 5km every morning", "run 5km every mornings")
+    assert not is_duplicate_goal("run 5km every morning", "run 10km every morning")
+    assert not is_duplicate_goal("meditate daily", "ship 3 pull requests")
+
+def test_find_duplicate_within_window():
+    existing = stored("Run 5km every morning", NOW)
+    assert find_duplicate("run 5km every morning!", NOW + timedelta(hours=3), [existing]) is existing
+
+def test_find_duplicate_outside_window():
+    existing = stored("Run 5km every morning", NOW)
+    assert find_duplicate("Run 5km every morning", NOW + timedelta(hours=13), [existing]) is None
+
+def test_find_duplicate_legacy_doc_without_index_fields():
+    legacy = {"goal_description": "Read 30 pages", "deadline_utc": NOW.isoformat()}
+    assert find_duplicate("read 30 pages", NOW, [legacy]) is legacy
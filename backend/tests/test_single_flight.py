@@ -0,0 +1,95 @@
+import time
+import asyncio
+import threading
+from types import SimpleNamespace
+import pytest
+from src.core.llm_gateway import LLMGateway, CircuitBreaker
+from src.core.single_flight import SingleFlight, ClientDisconnected, CallCancelled, current_cancel_token
+
+class SlowCall:
+    def __init__(self, delay=0.2, error=None):
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+        self.saw_cancel = threading.Event()
+
+    def __call__(self, value):
+        self.calls += 1
+        token = current_cancel_token()
+        if token and token.wait(self.delay):
+            self.saw_cancel.set()
+            raise CallCancelled("cancelled")
+        if self.error:
+            raise self.error
+        return value * 2
+
+def disconnect_after(sec):
+    start = time.monotonic()
+    async def is_disconnected():
+        return time.monotonic() - start >= sec
+    return is_disconnected
+
+def test_identical_calls_share_one_execution():
+    flights, call = SingleFlight(enabled=True, poll_sec=0.01), SlowCall()
+    async def main():
+        return await asyncio.gather(*[flights.run("k", call, 21) for _ in range(5)], flights.run("other", call, 1))
+    assert asyncio.run(main()) == [42] * 5 + [2]
+    assert call.calls == 2
+    stats = flights.stats()
+    assert stats["calls"] == 2 and stats["coalesced"] == 4 and stats["completed"] == 2 and stats["in_flight"] == 0
+
+def test_errors_reach_every_waiter():
+    flights = SingleFlight(enabled=True, poll_sec=0.01)
+    async def main():
+        return await asyncio.gather(*[flights.run("k", SlowCall(0.05, ValueError("boom")), 1) for _ in range(3)],
+                                    return_exceptions=True)
+    assert all(isinstance(r, ValueError) for r in asyncio.run(main()))
+
+def test_one_waiter_leaving_does_not_cancel_the_others():
+    flights, call = SingleFlight(enabled=True, poll_sec=0.01), SlowCall(0.2)
+    async def main():
+        return await asyncio.gather(flights.run("k", call, 21, is_disconnected=disconnect_after(0.05)),
+                                    flights.run("k", call, 21), return_exceptions=True)
+    gone, stayed = asyncio.run(main())
+    assert isinstance(gone, ClientDisconnected) and stayed == 42
+    assert not call.saw_cancel.is_set()
+    assert flights.stats()["abandoned_waiters"] == 1 and flights.stats()["cancelled"] == 0
+
+def test_call_is_cancelled_when_every_waiter_left():
+    flights, call = SingleFlight(enabled=True, poll_sec=0.01), SlowCall(5.0)
+    async def main():
+        results = await asyncio.gather(*[flights.run("k", call, 1, is_disconnected=disconnect_after(0.05)) for _ in range(2)],
+                                       return_exceptions=True)
+        await asyncio.sleep(0.1)
+        return results
+    start = time.monotonic()
+    assert all(isinstance(r, ClientDisconnected) for r in asyncio.run(main()))
+    assert call.saw_cancel.wait(1.0) and time.monotonic() - start < 1.0
+    assert flights.stats()["cancelled"] == 1 and flights.stats()["in_flight"] == 0
+
+class SlowStream:
+    def generate_content(self, contents, generation_config=None, stream=False):
+        def chunks():
+            for _ in range(100):
+                time.sleep(0.02)
+                yield SimpleNamespace(text="x", usage_metadata=None)
+        return chunks() if stream else SimpleNamespace(text="x" * 100, usage_metadata=None)
+
+def test_cancelled_llm_calls_give_their_slot_back():
+    llm = LLMGateway(api_key="", concurrency=1, timeout_sec=10, max_retries=0, breaker=CircuitBreaker(5, 60))
+    flights = SingleFlight(enabled=True, poll_sec=0.01)
+    model = SlowStream()
+    stream = lambda: "".join(llm.generate_stream(model, "hi", caller="test"))
+    async def main():
+        # The first flight holds the only slot mid-stream; the second waits for it in the gateway
+        return await asyncio.gather(flights.run("a", stream, is_disconnected=disconnect_after(0.1)),
+                                    flights.run("b", stream, is_disconnected=disconnect_after(0.1)),
+                                    return_exceptions=True)
+    assert all(isinstance(r, ClientDisconnected) for r in asyncio.run(main()))
+    # Both stop within a poll interval; the streaming one stops reading, so the slot frees right away
+    assert llm._slots.acquire(timeout=0.5)
+    llm._slots.release()
+    deadline = time.monotonic() + 1.0
+    while llm.stats()["cancelled"] < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert llm.stats()["by_caller"]["test"]["cancelled"] == 2
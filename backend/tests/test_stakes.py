@@ -0,0 +1,17 @@
+from fakes import FakeFirestore
+from src.core.stakes import StakeManager
+from src.core.schemas import VerificationResult
+
+def test_stake_outcome_is_applied_once_per_idempotency_key():
+    db = FakeFirestore()
+    stakes = StakeManager(db)
+    success = VerificationResult(status="SUCCESS", confidence=0.99)
+
+    first = stakes.handle_outcome("u1", success, idempotency_key="req-1:stake")
+    again = stakes.handle_outcome("u1", success, idempotency_key="req-1:stake")
+    assert first["action"] == "EARN" and not first.get("duplicate")
+    assert again == {"action": "EARN", "amount": first["amount"], "duplicate": True}
+    assert db.collection('stake_ledgers').document('u1').get().to_dict()['current_balance'] == first["new_balance"]
+
+    stakes.handle_outcome("u1", success, idempotency_key="req-2:stake")
+    assert db.collection('stake_ledgers').document('u1').get().to_dict()['current_balance'] == first["new_balance"] + first["amount"]
@@ -0,0 +1,129 @@
+import time
+from datetime import datetime, timedelta, timezone
+import pytest
+import requests
+from fakes import FakeFirestore
+from src.agents.verify import VerifyAgent
+from src.core.activity_streams import StreamCache
+from src.core.rate_limit import SharedRateLimiter, RateLimitExceeded, parse_limits
+from src.core.schemas import GoalContract, Penalty, ConsequenceType, VerificationStatus
+from src.integrations.strava import StravaClient, StravaAccounts, StravaNotLinked
+from src.utils.strava_standin import StravaStandIn
+
+@pytest.fixture
+def standin():
+    with StravaStandIn(limits=(100, 1000), activities=450) as server:
+        yield server
+
+def make_client(standin, tmp_path, **kwargs):
+    limiter = kwargs.pop("limiter", None) or SharedRateLimiter("strava", [(100, 900), (1000, 86400)], db_path=str(tmp_path / "limits.db"))
+    return StravaClient("token", standin.base_url, limiter=limiter, **kwargs)
+
+def test_parse_limits():
+    assert parse_limits("100/900, 1000/86400") == [(100, 900.0), (1000, 86400.0)]
+
+def test_shared_limiter_enforces_every_window(tmp_path):
+    db_path = str(tmp_path / "limits.db")
+    a = SharedRateLimiter("api", [(3, 900), (5, 86400)], db_path=db_path)
+    b = SharedRateLimiter("api", [(3, 900), (5, 86400)], db_path=db_path) # Another worker, same host
+    a.acquire()
+    b.acquire()
+    a.acquire()
+    with pytest.raises(RateLimitExceeded) as exc:
+        b.acquire()
+    assert 0 < exc.value.retry_after <= 300
+    b.sync([None, 0])
+    assert b.try_acquire() > 0
+
+def test_summary_ttl_and_etag_revalidation(standin, tmp_path):
+    client = make_client(standin, tmp_path, summary_ttl_sec=60)
+    first = client.get_activity("run_valid_outdoor")
+    assert client.get_activity("run_valid_outdoor") == first
+    assert standin.stats()["by_path"] == {"activity": 1}
+
+    client.summary_ttl_sec = 0 # Expired: revalidate with If-None-Match
+    assert client.get_activity("run_valid_outdoor") == first
+    assert standin.stats()["not_modified"] == 1
+
+    standin.update_activity("run_valid_outdoor", distance=6000.0)
+    assert client.get_activity("run_valid_outdoor")["distance"] == 6000.0
+    assert client.stats()["not_modified"] == 1
+
+def test_streams_cached_by_the_caller_and_keep_alive(standin, tmp_path):
+    client = make_client(standin, tmp_path)
+    cache = StreamCache(str(tmp_path / "streams")) # As VerifyAgent does; the client itself doesn't cache streams
+    streams = cache.get_or_fetch("treadmill_valid", lambda: client.get_activity_streams("treadmill_valid"))
+    assert len(streams) == 150 and "heartrate" in streams
+    cache.get_or_fetch("treadmill_valid", lambda: client.get_activity_streams("treadmill_valid"))
+    assert len(client.get_activity_streams("run_x")) == 3600
+    assert standin.stats()["by_path"]["streams"] == 2
+    assert standin.stats()["connections"] == 1 # One pooled keep-alive connection
+
+def test_list_activities_pages(standin, tmp_path):
+    activities = make_client(standin, tmp_path).list_activities(per_page=200)
+    assert len(activities) == 450
+    assert standin.stats()["by_path"]["athlete_activities"] == 3
+
+def test_rate_limit_from_headers_and_429(tmp_path):
+    with StravaStandIn(limits=(5, 1000)) as server:
+        client = make_client(server, tmp_path, summary_ttl_sec=0)
+        client.limit_wait_sec = 0
+        # The local bucket allows 100, but Strava's headers say 5: the client stops before a 429
+        for i in range(5):
+            client.get_activity(f"a{i}")
+        with pytest.raises(RateLimitExceeded):
+            client.get_activity("a5")
+        assert server.stats()["throttled"] == 0
+
+        # Usage from elsewhere (limiter unaware) -> Strava's 429 surfaces as RateLimitExceeded
+        fresh = make_client(server, tmp_path / "other", summary_ttl_sec=0, limiter=SharedRateLimiter("other", [(100, 900)], db_path=str(tmp_path / "other.db")))
+        with pytest.raises(RateLimitExceeded):
+            fresh.get_activity("a6")
+        assert fresh.stats()["throttled"] == 1
+
+def test_accounts_use_each_users_token_and_refresh(tmp_path):
+    db = FakeFirestore()
+    now = time.time()
+    db.collection('users').document('u1').set({'strava_auth': {'access_token': 'a1', 'refresh_token': 'r1', 'expires_at': now + 3600}})
+    db.collection('users').document('u2').set({'strava_auth': {'access_token': 'old', 'refresh_token': 'r2', 'expires_at': now - 10}})
+    db.collection('users').document('u3').set({'display_name': 'Not connected'})
+
+    with StravaStandIn(access_tokens={'a1'}, refresh_tokens={'r2'}) as server:
+        limiter = SharedRateLimiter("strava", [(100, 900)], db_path=str(tmp_path / "limits.db"))
+        accounts = StravaAccounts(db, "client", "secret", base_url=server.base_url, token_url=server.token_url,
+                                  limiter=limiter, summary_ttl_sec=0)
+        accounts.client('u1').get_activity("run_valid_outdoor")
+        accounts.client('u2').get_activity("run_valid_outdoor") # Expired: refreshed before the request
+        auth = db._data['users']['u2']['strava_auth']
+        assert auth['access_token'] != 'old' and auth['refresh_token'] != 'r2' # Rotated and written back
+        assert accounts.client('u1').limiter is accounts.client('u2').limiter
+
+        server.revoke(auth['access_token']) # A 401 refreshes once and retries
+        accounts.client('u2').get_activity("run_short")
+        assert accounts.stats()['token_refreshes'] == 2
+
+        with pytest.raises(StravaNotLinked):
+            accounts.client('u3').get_activity("run_valid_outdoor")
+
+        # The verifier reads each user's activities with their own client
+        agent = VerifyAgent(memo=False, strava_accounts=accounts)
+        contract = GoalContract(target_distance_km=5.0, deadline_utc=datetime.now(timezone.utc) + timedelta(days=1),
+                                penalty=Penalty(type=ConsequenceType.DONATION, amount_usd=10))
+        assert agent.verify(contract, "run_valid_outdoor", user_id="u1").status == VerificationStatus.SUCCESS
+        unlinked = agent.verify(contract, "run_valid_outdoor", user_id="u3")
+        assert unlinked.status == VerificationStatus.UNCERTAIN and "not connected Strava" in unlinked.failure_reason
+
+def test_link_stores_tokens_and_athlete_id(tmp_path):
+    db = FakeFirestore()
+    db.collection('users').document('u1').set({'display_name': 'Ann'})
+    with StravaStandIn(access_tokens=set(), codes={'good-code': 4242}) as server:
+        limiter = SharedRateLimiter("strava", [(100, 900)], db_path=str(tmp_path / "limits.db"))
+        accounts = StravaAccounts(db, "client", "secret", base_url=server.base_url, token_url=server.token_url,
+                                  limiter=limiter)
+        assert accounts.link('u1', 'good-code') == '4242'
+        user = db._data['users']['u1']
+        assert user['strava_athlete_id'] == '4242' and user['display_name'] == 'Ann'
+        accounts.client('u1').get_activity("run_valid_outdoor") # The stored token is accepted
+
+        with pytest.raises(requests.HTTPError):
+            accounts.link('u1', 'good-code') # Codes are single use
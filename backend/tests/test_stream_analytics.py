@@ -0,0 +1,41 @@
+import numpy as np
+from src.core.stream_analytics import analyze_hr_stream, analyze_streams, _rolling_stdev
+
+def synthetic_run(n=20000, seed=0):
+    """1 Hz treadmill intervals: HR follows speed with a lag, plus sensor noise."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(n, dtype=np.float64)
+    velocity = 3.0 + 1.0 * (np.sin(t / 300.0) > 0) # Alternating 3 / 4 m/s blocks
+    lagged = np.convolve(velocity, np.ones(45) / 45, mode="same")
+    hr = 100 + 15 * lagged + rng.normal(0, 2.0, n)
+    return t, hr, velocity
+
+def test_rolling_stdev_matches_naive():
+    values = np.random.default_rng(1).normal(140, 5, 500)
+    expected = np.array([np.std(values[i:i + 30], ddof=1) for i in range(len(values) - 29)])
+    assert np.allclose(_rolling_stdev(values, 30), expected)
+
+def test_genuine_run_has_no_flags():
+    t, hr, v = synthetic_run()
+    report = analyze_hr_stream(t, hr, v)
+    assert report["flags"] == []
+    assert report["hr_pace_corr"] > 0.5
+
+def test_detects_flat_segment_spikes_and_pace_mismatch():
+    t, hr, v = synthetic_run()
+
+    flat = hr.copy()
+    flat[5000:5900] = 150.0 # 15 min replayed constant value
+    assert any("HR flat" in f for f in analyze_hr_stream(t, flat, v)["flags"])
+
+    spiky = hr.copy()
+    spiky[::50] += 80 # 2% of samples
+    assert any("spikes" in f for f in analyze_hr_stream(t, spiky, v)["flags"])
+
+    inverted = 100 + 15 * (7.0 - np.convolve(v, np.ones(45) / 45, mode="same")) # HR drops when speed rises
+    assert any("does not follow pace" in f for f in analyze_hr_stream(t, inverted, v)["flags"])
+
+def test_list_of_dicts_keeps_legacy_message():
+    flat = [{"heartrate": 80, "time": i} for i in range(0, 1500, 10)]
+    assert analyze_streams(flat)["flags"] == ["HR Variability suspicious (stdev=0.00)"]
+    assert analyze_streams([{"heartrate": 80, "time": 0}])["flags"] == []
@@ -0,0 +1,106 @@
+import json
+import time
+from types import SimpleNamespace
+import pytest
+from src.agents.contract import ContractAgent
+from src.core.llm_gateway import LLMGateway, CircuitBreaker, LLMTimeout
+from src.core.streaming import IncrementalJSONParser, sse_event
+
+CONTRACT = {
+    "goal_type": "running",
+    "goal_description": "Run 5km, \"fast\" {no walking}",
+    "target_distance_km": 5.0,
+    "allowed_activity_types": ["Run", "Treadmill"],
+    "deadline_utc": "2026-10-18T23:59:59Z",
+    "penalty": {"type": "stake_burn", "amount_usd": 10, "destination": "Ledger"},
+}
+
+class ApiError(Exception):
+    def __init__(self, code):
+        super().__init__(f"HTTP {code}")
+        self.code = code
+
+class StreamingModel:
+    """Streams `text` in `size`-char chunks; `script` holds an exception to raise per attempt (None = succeed)."""
+
+    def __init__(self, text, size=7, delay=0.0, script=(), fail_after=None):
+        self.text, self.size, self.delay = text, size, delay
+        self.script = list(script)
+        self.fail_after = fail_after
+        self.calls = 0
+
+    def generate_content(self, contents, generation_config=None, stream=False):
+        self.calls += 1
+        step = self.script.pop(0) if self.script else None
+        if step:
+            raise step
+        def chunks():
+            for i in range(0, len(self.text), self.size):
+                if self.fail_after is not None and i >= self.fail_after:
+                    raise ApiError(503)
+                time.sleep(self.delay)
+                yield SimpleNamespace(text=self.text[i:i + self.size], usage_metadata=None)
+        return chunks()
+
+def gateway(**kwargs):
+    args = dict(api_key="", concurrency=2, timeout_sec=5, max_retries=2, backoff_sec=0.01, breaker=CircuitBreaker(5, 60))
+    args.update(kwargs)
+    return LLMGateway(**args)
+
+def test_parser_emits_members_as_they_complete():
+    text = "```json\n" + json.dumps(CONTRACT) + "\n```"
+    parser = IncrementalJSONParser()
+    seen = []
+    for ch in text: # Worst case: one character per chunk
+        seen += parser.feed(ch)
+    assert [k for k, _ in seen] == list(CONTRACT)
+    assert parser.result() == CONTRACT
+
+    partial = IncrementalJSONParser()
+    assert partial.feed('{"goal_type": "running", "goal_desc') == [("goal_type", "running")]
+    with pytest.raises(ValueError):
+        partial.result()
+
+def test_sse_format():
+    assert sse_event("field", {"name": "x", "value": 1}) == 'event: field\ndata: {"name": "x", "value": 1}\n\n'
+
+def test_gateway_stream_retries_before_first_chunk_only():
+    llm = gateway()
+    model = StreamingModel("hello world", script=[ApiError(503)])
+    assert "".join(llm.generate_stream(model, "hi", caller="test")) == "hello world"
+    stats = llm.stats()
+    assert model.calls == 2 and stats["retries"] == 1
+    assert stats["by_caller"]["test"]["streams"] == 1 and stats["by_caller"]["test"]["succeeded"] == 1
+
+    broken = StreamingModel("hello world", size=3, fail_after=6)
+    with pytest.raises(ApiError):
+        list(llm.generate_stream(broken, "hi"))
+    assert broken.calls == 1
+
+def test_gateway_stream_deadline():
+    llm = gateway(timeout_sec=0.2)
+    start = time.monotonic()
+    with pytest.raises(LLMTimeout):
+        list(llm.generate_stream(StreamingModel("x" * 50, size=1, delay=0.05), "hi"))
+    assert time.monotonic() - start < 0.6
+
+def streaming_agent(model):
+    agent = ContractAgent(cache=False, llm=gateway(api_key="test-key"))
+    agent.fast_path = False
+    agent.model = model
+    return agent
+
+def test_negotiate_stream_emits_fields_then_contract():
+    agent = streaming_agent(StreamingModel(json.dumps(CONTRACT), size=16))
+    events = list(agent.negotiate_stream("Run 5km by Sunday"))
+    fields = [data["name"] for kind, data in events if kind == "field"]
+    assert fields == list(CONTRACT)
+    kind, contract = events[-1]
+    assert kind == "contract" and contract.target_distance_km == 5.0
+
+def test_negotiate_stream_falls_back_on_a_broken_stream():
+    agent = streaming_agent(StreamingModel(json.dumps(CONTRACT), size=16, fail_after=48))
+    events = list(agent.negotiate_stream("Read 30 pages a day with a donation"))
+    kinds = [kind for kind, _ in events]
+    assert kinds[0] == "field" and kinds[-2:] == ["error", "contract"]
+    assert events[-1][1].penalty.type.value == "donation"
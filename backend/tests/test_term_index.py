@@ -0,0 +1,51 @@
+import os
+import json
+import numpy as np
+from src.core.term_index import TermIndex, HashingEmbedder
+
+KB = {
+    "running": {"description": "Running goals.", "keywords": "run, jog, marathon, km", "terms": ["GPS data required.", "Single continuous activity."],
+                "risk_factors": "GPS drift."},
+    "fitness": {"description": "Gym goals.", "keywords": "gym, lift, weights, yoga", "terms": ["Photo of equipment.", "Heart rate preferred."],
+                "risk_factors": "Old photos."},
+    "general": {"description": "Anything else.", "keywords": "habit, save, quit", "terms": ["Photo evidence of the result."],
+                "risk_factors": "Ambiguity."},
+}
+
+def write_kb(tmp_path, kb=KB):
+    path = tmp_path / "terms.json"
+    path.write_text(json.dumps(kb))
+    return str(path)
+
+def test_embeddings_are_stable_unit_vectors():
+    a, b = HashingEmbedder(256), HashingEmbedder(256)
+    vec = a.embed("Run 5km by Sunday")
+    assert np.allclose(vec, b.embed("Run 5km by Sunday"))
+    assert abs(np.linalg.norm(vec) - 1.0) < 1e-5
+    assert not a.embed("").any()
+
+def test_top_k_and_rendered_context():
+    index = TermIndex.build(KB, dim=256)
+    score, row = index.search("Jog a half marathon", k=2)[0]
+    assert row["category"] == "running" and score > 0
+    context = index.context("Lift weights at the gym")
+    assert "CATEGORY: FITNESS" in context and "RUNNING" not in context
+    assert 'STANDARD TERMS: ["Photo of equipment.", "Heart rate preferred."]' in context
+    # Nothing relevant: the general terms, like the old keyword fallback
+    assert "CATEGORY: GENERAL" in index.context("zzz qqq")
+
+def test_compiled_index_is_memory_mapped_and_checked_for_staleness(tmp_path):
+    kb_path = write_kb(tmp_path)
+    assert TermIndex.load(kb_path) is None
+    TermIndex.build(KB, dim=256).save(kb_path)
+    index = TermIndex.load(kb_path)
+    assert index.stats() == {"rows": 5, "categories": 3, "dim": 256, "memory_mapped": True}
+    assert index.search("marathon", k=1)[0][1]["category"] == "running"
+
+    edited = dict(KB, coding={"description": "Code.", "terms": ["Commit link."], "risk_factors": "Empty commits."})
+    write_kb(tmp_path, edited)
+    assert TermIndex.load(kb_path) is None
+    assert TermIndex.load_or_build(kb_path).stats()["rows"] == 6
+
+def test_shipped_index_matches_knowledge_base():
+    assert TermIndex.load(os.path.join(os.path.dirname(__file__), "..", "src", "data", "standard_terms.json")) is not None
@@ -0,0 +1,69 @@
+import time
+import threading
+from datetime import datetime, timedelta, timezone
+from src.agents.verify import VerifyAgent
+from src.core.verification_memo import ResultMemo, verification_key
+from src.core.contract_cache import DiskCacheBackend
+from src.core.schemas import GoalContract, Penalty, ConsequenceType, Evidence, VerificationResult, VerificationStatus
+
+DEADLINE = datetime(2026, 12, 1, tzinfo=timezone.utc)
+HASH = "ab" * 32
+
+def contract(goal="Do 50 pushups"):
+    return GoalContract(goal_description=goal, deadline_utc=DEADLINE, penalty=Penalty(type=ConsequenceType.STAKE_BURN, amount_usd=5))
+
+def evidence(text="50 pushups done", urls=(), at=None):
+    return Evidence(start_time=at or datetime.now(timezone.utc), activity_type="Generic", text_evidence=text, image_urls=list(urls))
+
+def test_key_ignores_request_time_and_url_form():
+    a = verification_key(contract(), None, evidence(urls=[f"https://storage.googleapis.com/b/evidence/sha256/{HASH}.jpg"]))
+    b = verification_key(contract(), None, evidence(urls=[f"https://cdn.example/evidence/sha256/{HASH}.jpg"], at=DEADLINE - timedelta(days=3)))
+    assert a == b
+    assert a != verification_key(contract(), None, evidence(text="40 pushups done"))
+    assert a != verification_key(contract("Do 60 pushups"), None, evidence(urls=[f"/sha256/{HASH}"]))
+    # One user's verdict is never another's
+    assert verification_key(contract(), "123", None, "u1") != verification_key(contract(), "123", None, "u2")
+
+def test_retries_return_stored_verdict_but_uncertain_is_retried():
+    agent = VerifyAgent(memo=ResultMemo())
+    calls = []
+    verdicts = iter([VerificationStatus.UNCERTAIN, VerificationStatus.SUCCESS, VerificationStatus.FAILURE])
+
+    def judge(contract, evidence):
+        calls.append(1)
+        return VerificationResult(status=next(verdicts), confidence=0.9)
+    agent.model = object()
+    agent.batcher = None
+    agent._judge_one = judge
+
+    assert agent.verify(contract(), None, evidence()).status == VerificationStatus.UNCERTAIN
+    assert agent.verify(contract(), None, evidence()).status == VerificationStatus.SUCCESS
+    assert agent.verify(contract(), None, evidence()).status == VerificationStatus.SUCCESS # Memoized
+    assert len(calls) == 2
+
+def test_concurrent_double_tap_computes_once():
+    memo = ResultMemo()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.1)
+        return {"status": "SUCCESS"}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(memo.get_or_compute("k", compute))) for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert [value for value, _ in results] == [{"status": "SUCCESS"}] * 3
+    assert memo.stats()["joined_in_flight"] == 2
+
+def test_disk_backend_and_ttl(tmp_path):
+    memo = ResultMemo(DiskCacheBackend(str(tmp_path / "memo.sqlite3"), table="verification_memo"), ttl_sec=60)
+    memo.set("k", {"status": "FAILURE"})
+    assert ResultMemo(DiskCacheBackend(str(tmp_path / "memo.sqlite3"), table="verification_memo")).get("k") == {"status": "FAILURE"}
+    memo.ttl_sec = -1
+    assert memo.get("k") is None
@@ -0,0 +1,103 @@
+import re
+import json
+import threading
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from src.agents.verify import VerifyAgent
+from src.core.micro_batch import MicroBatcher
+from src.core.schemas import GoalContract, Penalty, ConsequenceType, Evidence, VerificationStatus
+
+class FakeModel:
+    def __init__(self, malformed=False):
+        self.prompts = []
+        self.malformed = malformed
+        self.lock = threading.Lock()
+
+    def generate_content(self, contents, generation_config=None):
+        prompt = "\n".join(part for part in contents if isinstance(part, str))
+        with self.lock:
+            self.prompts.append(prompt)
+        ids = [int(i) for i in re.findall(r"\[ITEM id=(\d+)\]", prompt)]
+        if not ids:
+            return SimpleNamespace(text=json.dumps({"final_verdict": "SUCCESS", "proof_quality_score": 70, "reasoning": "single"}))
+        if self.malformed:
+            # Truncated array that only covers the first item
+            return SimpleNamespace(text=json.dumps([{"id": 0, "final_verdict": "FAILURE", "reasoning": "no"}]))
+        return SimpleNamespace(text=json.dumps([
+            {"id": i, "final_verdict": "SUCCESS", "proof_quality_score": 80, "reasoning": "batched"} for i in ids
+        ]))
+
+def make_agent(monkeypatch, model, window_ms="200", max_batch="8"):
+    monkeypatch.setenv("PACT_VERIFY_BATCH_WINDOW_MS", window_ms)
+    monkeypatch.setenv("PACT_VERIFY_BATCH_MAX", max_batch)
+    agent = VerifyAgent()
+    agent.model = model
+    return agent
+
+def contract(i):
+    return GoalContract(
+        goal_description=f"Do {i} pushups",
+        deadline_utc=datetime.now(timezone.utc) + timedelta(days=1),
+        penalty=Penalty(type=ConsequenceType.STAKE_BURN, amount_usd=5)
+    )
+
+def evidence(i):
+    return Evidence(start_time=datetime.now(timezone.utc), activity_type="Generic", text_evidence=f"Did {i} pushups")
+
+def run_concurrently(agent, n):
+    results = [None] * n
+    def worker(i):
+        results[i] = agent.verify_generic(contract(i), evidence(i))
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+def test_concurrent_requests_share_one_call(monkeypatch):
+    model = FakeModel()
+    agent = make_agent(monkeypatch, model)
+
+    results = run_concurrently(agent, 5)
+
+    assert len(model.prompts) == 1
+    assert all(r.status == VerificationStatus.SUCCESS and r.confidence == 0.8 for r in results)
+    assert [r.evidence.text_evidence for r in results] == [f"Did {i} pushups" for i in range(5)]
+    stats = agent.batch_stats()
+    assert stats["calls_saved"] == 4 and stats["avg_added_latency_ms"] > 0
+
+def test_malformed_batch_falls_back_per_item(monkeypatch):
+    model = FakeModel(malformed=True)
+    agent = make_agent(monkeypatch, model)
+
+    results = run_concurrently(agent, 3)
+
+    assert len(model.prompts) == 3 # 1 batched + 2 individual re-judgements
+    assert sorted(r.status for r in results).count(VerificationStatus.SUCCESS) == 2
+    assert agent.batch_stats()["fallback_calls"] == 2
+
+def test_disabled_window_calls_directly(monkeypatch):
+    model = FakeModel()
+    agent = make_agent(monkeypatch, model, window_ms="0")
+    assert agent.batcher is None
+    assert agent.verify_generic(contract(1), evidence(1)).status == VerificationStatus.SUCCESS
+
+def test_batcher_splits_at_max_batch():
+    sizes = []
+    def flush(items):
+        sizes.append(len(items))
+        return [item * 2 for item in items]
+
+    batcher = MicroBatcher(flush, window_sec=0.2, max_batch=3)
+    results = [None] * 7
+    def worker(i):
+        results[i] = batcher.submit(i)
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(7)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert results == [i * 2 for i in range(7)]
+    assert sum(sizes) == 7 and max(sizes) <= 3
@@ -0,0 +1,211 @@
+import time
+import datetime
+import threading
+from unittest.mock import MagicMock
+import pytest
+from fakes import FakeFirestore
+from src.agents.verify import VerifyAgent
+from src.core.auto_verify import AutoVerifier
+from src.core.jobs import JobQueue, DONE, PENDING
+from src.core.webhooks import WebhookIngestor, IngestQueueFull, ACCEPTED, COALESCED, DUPLICATE, IGNORED, DEFERRED, journal_key, event_key
+from src.core.schemas import AuditorDecision, AuditorVerdict
+from src.utils.strava_webhook_fake import StravaWebhookFake
+
+def event(activity, aspect="create", owner=1, t=1000, object_type="activity", **updates):
+    return {"object_type": object_type, "object_id": activity, "aspect_type": aspect, "owner_id": owner,
+            "subscription_id": 1, "event_time": t, "updates": updates}
+
+class FakeClock:
+    def __init__(self):
+        self.t = 0.0
+
+    def __call__(self):
+        return self.t
+
+class RecordingSink:
+    def __init__(self, gate: threading.Event = None):
+        self.calls = []
+        self.gate = gate
+
+    def __call__(self, owner, activity_ids):
+        if self.gate:
+            self.gate.wait(5)
+        self.calls.append((owner, activity_ids))
+
+def test_dedupes_and_coalesces_per_athlete():
+    sink = RecordingSink()
+    clock = FakeClock()
+    ingestor = WebhookIngestor(sink, coalesce_sec=60, workers=1, clock=clock)
+    assert ingestor.handle(event(11)) == ACCEPTED
+    assert ingestor.handle(event(11)) == DUPLICATE # Redelivery
+    assert ingestor.handle(event(11, "update", t=1005, title="Run")) == COALESCED
+    assert ingestor.handle(event(12, t=1010)) == COALESCED
+    assert ingestor.handle(event(21, owner=2)) == ACCEPTED
+    assert ingestor.handle(event(21, "delete", owner=2, t=1100)) == IGNORED
+
+    clock.t = 20
+    assert ingestor.flush() == 0 # Still inside the quiet window
+    assert ingestor.drain(timeout=5)
+    assert sink.calls == [("1", ["11", "12"])]
+    stats = ingestor.stats()
+    assert stats["batches"] == 1 and stats["duplicate"] == 1 and stats["pending"] == 0
+
+def test_quiet_window_and_max_delay():
+    clock = FakeClock()
+    ingestor = WebhookIngestor(RecordingSink(), coalesce_sec=2, max_delay_sec=10, workers=1, clock=clock)
+    ingestor.handle(event(1, owner=1))
+    ingestor.handle(event(2, owner=2))
+    for i in range(1, 6):
+        clock.t = i * 1.5
+        ingestor.handle(event(2, "update", owner=2, t=1000 + i)) # Keeps athlete 2 busy
+    assert ingestor.flush() == 1 # Athlete 1 went quiet
+    clock.t = 8.5
+    assert ingestor.flush() == 0
+    clock.t = 10.0
+    assert ingestor.flush() == 1 # Athlete 2 hit max delay
+    ingestor.stop()
+
+def test_backpressure_when_full():
+    gate = threading.Event()
+    sink = RecordingSink(gate)
+    ingestor = WebhookIngestor(sink, coalesce_sec=0, max_pending=2, workers=1)
+    ingestor.handle(event(1, owner=1))
+    ingestor.handle(event(2, owner=2))
+    with pytest.raises(IngestQueueFull):
+        ingestor.handle(event(3, owner=3))
+    assert ingestor.handle(event(4, owner=1, t=1001)) == COALESCED # Known athlete is absorbed
+
+    gate.set()
+    assert ingestor.drain(timeout=5)
+    assert ingestor.handle(event(3, owner=3)) == ACCEPTED
+    assert ingestor.stats()["rejected"] == 1
+    ingestor.stop()
+
+def test_journal_persists_accepted_events(tmp_path):
+    gate = threading.Event()
+    sink = RecordingSink(gate)
+    journal = JobQueue(db_path=str(tmp_path / "jobs.sqlite3"), workers=1, poll_interval_sec=0.01)
+    ingestor = WebhookIngestor(sink, coalesce_sec=0, max_pending=1, workers=1, journal=journal, recovery_sec=60)
+    assert ingestor.handle(event(1, owner=1)) == ACCEPTED
+    assert ingestor.handle(event(3, owner=3)) == DEFERRED # Past capacity: journaled and due now, not refused
+    gate.set()
+    assert ingestor.drain(timeout=5)
+    while journal.metrics()["depth"] - journal.metrics()["delayed"] or journal.metrics()["running"]:
+        time.sleep(0.01)
+
+    assert sorted(sink.calls) == [("1", ["1"]), ("3", ["3"])]
+    row = journal._conn().execute("SELECT status, attempts FROM jobs WHERE idempotency_key = ?",
+                                  (journal_key(event_key(event(1, owner=1))),)).fetchone()
+    assert row["status"] == DONE and row["attempts"] == 0 # Settled by its batch, never replayed
+    assert ingestor.stats()["deferred"] == 1 and ingestor.stats()["replayed"] == 1
+    ingestor.stop()
+    journal.stop()
+
+def test_journal_replays_events_lost_from_memory(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    journal = JobQueue(db_path=path, workers=1)
+    lost = WebhookIngestor(RecordingSink(), coalesce_sec=60, workers=1, journal=journal, recovery_sec=0)
+    lost.handle(event(11, owner=7))
+    lost.handle(event(12, owner=7, t=1001))
+    lost.handle(event(12, "delete", owner=7, t=1002)) # Deleted before dispatch: nothing to replay
+    journal.stop() # "Crash": the pending batch never reached the sink
+
+    sink = RecordingSink()
+    restarted = JobQueue(db_path=path, workers=1)
+    WebhookIngestor(sink, journal=restarted, recovery_sec=0)
+    restarted._conn().execute("UPDATE jobs SET run_at = 0 WHERE status = ?", (PENDING,))
+    while restarted.work_once():
+        pass
+    assert sink.calls == [("7", ["11"])]
+
+def test_fake_source_replay():
+    sink = RecordingSink()
+    ingestor = WebhookIngestor(sink, coalesce_sec=60, max_pending=100_000, workers=2)
+    for e in StravaWebhookFake(athletes=200, seed=3).events(5_000):
+        ingestor.handle(e)
+    assert ingestor.drain(timeout=10)
+    stats = ingestor.stats()
+    assert stats["received"] == 5_000
+    assert stats["duplicate"] > 0
+    assert stats["batches"] == len(sink.calls) <= 200
+    ingestor.stop()
+
+def test_auto_verifier_completes_matching_contract():
+    db = FakeFirestore()
+    now = datetime.datetime.now(datetime.timezone.utc)
+    db.collection('users').document('u1').set({'strava_athlete_id': '42'})
+    for doc_id, km in (("c5k", 5.0), ("c10k", 10.0)):
+        deadline = now + datetime.timedelta(days=1)
+        db.collection('contracts').document(doc_id).set({
+            'goal_description': f"Run {km}km", 'target_distance_km': km,
+            'deadline_utc': deadline.isoformat(), 'deadline_at': deadline,
+            'status': 'Active', 'user_id': 'u1', 'penalty': {'type': 'stake_burn', 'amount_usd': 10},
+        })
+    detect = MagicMock()
+    detect.evaluate.return_value = AuditorDecision(verdict=AuditorVerdict.BLOCK, reason="ok")
+    effects = MagicMock()
+
+    result = AutoVerifier(db, VerifyAgent(memo=False), detect, effects).run("42", ["run_short", "run_valid_outdoor"], now=now)
+
+    assert result["completed"] == ["c5k"]
+    contracts = db._data['contracts']
+    assert contracts['c5k']['status'] == 'Completed' and contracts['c5k']['verified_activity_id'] == 'run_valid_outdoor'
+    assert contracts['c10k']['status'] == 'Active'
+    assert effects.schedule.call_args[0][0] == "strava:c5k:run_valid_outdoor"
+    assert AutoVerifier(db, MagicMock(), detect, effects).run("999", ["x"])["user_id"] is None
+
+def test_auto_verifier_schedules_nothing_for_a_contract_settled_elsewhere():
+    db = FakeFirestore()
+    now = datetime.datetime.now(datetime.timezone.utc)
+    deadline = now + datetime.timedelta(days=1)
+    db.collection('users').document('u1').set({'strava_athlete_id': '42'})
+    db.collection('contracts').document('c5k').set({
+        'goal_description': "Run 5km", 'target_distance_km': 5.0,
+        'deadline_utc': deadline.isoformat(), 'deadline_at': deadline,
+        'status': 'Active', 'user_id': 'u1', 'penalty': {'type': 'stake_burn', 'amount_usd': 10},
+    })
+    verify = VerifyAgent(memo=False)
+    real_verify = verify.verify
+
+    def verify_while_the_reaper_claims(contract, activity_id, user_id=None):
+        # The Reaper takes the contract between the query and the completion
+        db.collection('contracts').document('c5k').update({'status': 'Reaping'})
+        return real_verify(contract, activity_id, user_id=user_id)
+    verify.verify = verify_while_the_reaper_claims
+    effects = MagicMock()
+
+    result = AutoVerifier(db, verify, MagicMock(), effects).run("42", ["run_valid_outdoor"], now=now)
+
+    assert result["completed"] == []
+    assert db._data['contracts']['c5k']['status'] == 'Reaping'
+    effects.schedule.assert_not_called()
+
+def test_auto_verifier_retries_scheduling_after_the_completion_committed(tmp_path):
+    db = FakeFirestore()
+    now = datetime.datetime.now(datetime.timezone.utc)
+    deadline = now + datetime.timedelta(days=1)
+    db.collection('users').document('u1').set({'strava_athlete_id': '42'})
+    db.collection('contracts').document('c5k').set({
+        'goal_description': "Run 5km", 'target_distance_km': 5.0,
+        'deadline_utc': deadline.isoformat(), 'deadline_at': deadline,
+        'status': 'Active', 'user_id': 'u1', 'penalty': {'type': 'stake_burn', 'amount_usd': 10},
+    })
+    queue = JobQueue(db_path=str(tmp_path / "jobs.sqlite3"), workers=1, base_backoff_sec=0.0)
+    queue.start = lambda: None
+    effects = MagicMock()
+    effects.queue = queue
+    effects.schedule.side_effect = [RuntimeError("job db locked"), {}]
+    detect = MagicMock()
+    detect.evaluate.return_value = AuditorDecision(verdict=AuditorVerdict.BLOCK, reason="ok")
+
+    result = AutoVerifier(db, VerifyAgent(memo=False), detect, effects).run("42", ["run_valid_outdoor"], now=now)
+
+    # Committed, but its effects weren't scheduled: the completion job is still pending
+    assert result["completed"] == []
+    assert db._data['contracts']['c5k']['status'] == 'Completed'
+    assert queue.metrics()["depth_by_kind"] == {"auto_verify.complete": 1}
+
+    assert queue.work_once()
+    assert effects.schedule.call_count == 2
+    assert effects.schedule.call_args[0][0] == "strava:c5k:run_valid_outdoor"
+    assert queue.metrics()["depth"] == 0